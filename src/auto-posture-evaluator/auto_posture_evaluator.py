@@ -1,16 +1,36 @@
 #!/usr/local/bin/python3
-import asyncio
+import collections.abc
+import concurrent.futures
 import datetime
+import json
 import os
+import time
 import uuid
 
 import importlib
+import itertools
 import sys
-from grpclib.client import Channel
-from model import SecurityReportTestResult, SecurityReportIngestionServiceStub, SecurityReportContext, SecurityReport, \
-    SecurityReportTestResultResult
+import threading
+from model import SecurityReportTestResult, SecurityReportContext, SecurityReportTestResultResult
 from model.helper import struct_from_dict
-import concurrent.futures
+from model.encoder import EncodedSecurityReport, encode_end_time, encode_report_context, encode_start_time, \
+    encode_struct, encode_test_result
+from result_record import ResultRecord
+from scheduler import TesterScheduler, WorkItem
+from aws_context import AwsContext
+from aws_cassette import AwsCassette
+from inventory_snapshot import InventorySnapshot
+from reporter import SecurityReportReporter
+from checkpoint import Checkpoint
+from delta_report import DeltaFilter, DeltaReporter
+from incremental import IncrementalEvaluator
+from organization import AccountSessionPool, organization_accounts_from_environment
+from state_store import state_store_from_environment
+from shard_planner import DURATIONS_DOCUMENT, DurationHistory, ShardPlanner, shard_document_name, shared_execution_id
+from profiling import Profiler
+from run_stats import RunSummaryTester, TesterRunStats
+from batcher import ReportBatcher, SizeHistogram
+import interfaces
 
 testers_module_names = []
 if not os.environ.get('TESTER_LIST'):
@@ -61,21 +81,85 @@ def _to_model(log_message, start_time, end_time) -> "SecurityReportTestResult":
     )
 
 
+def _encode_result(log_message, start_time_field):
+    # Wire encoded equivalent of `_to_model`
+    converted_log_message = _adapter(log_message)
+    additional_data = {}
+    for key in converted_log_message.keys():
+        if not hasattr(SecurityReportTestResult, key) and converted_log_message[key]:
+            additional_data[key] = converted_log_message[key]
+    return encode_test_result(
+        name=converted_log_message["name"],
+        start_time_field=start_time_field,
+        item=converted_log_message["item"],
+        item_type=converted_log_message["item_type"],
+        failed=converted_log_message["result"] != "no_issue_found",
+        additional_data=additional_data
+    )
+
+
+def _encode_record(record, start_time_field, encoded_contexts):
+    # Same output as `_encode_result` for the equivalent dict, but the account fields of a context are
+    # encoded once and shared by all of its results
+    context = record.context
+    encoded_context = encoded_contexts.get(context)
+    if encoded_context is None:
+        encoded_context = encode_struct({key: value for key, value in (
+            ("user", context.user), ("account_arn", context.account_arn), ("account", context.account)) if value})
+        encoded_contexts[context] = encoded_context
+    additional_data = {"timestamp": record.timestamp}
+    if record.region:
+        additional_data["region"] = record.region
+    for key, value in record.additional_data.items():
+        if not hasattr(SecurityReportTestResult, key) and value:
+            additional_data[key] = value
+    return encode_test_result(
+        name=record.test_name,
+        start_time_field=start_time_field,
+        item=record.item,
+        item_type=record.item_type,
+        failed=record.test_result != "no_issue_found",
+        additional_data=additional_data,
+        encoded_additional_data=encoded_context
+    )
+
+
 class AutoPostureEvaluator:
     def __init__(self):
         if not os.environ.get('API_KEY'):
             raise Exception("Missing the API_KEY environment variable. CANNOT CONTINUE")
 
         # Configuration for grpc endpoint
-        endpoint = os.environ.get("CORALOGIX_ENDPOINT_HOST")  # eg.: ng-api-grpc.dev-shared.coralogix.net
-        port = os.environ.get("CORALOGIX_ENDPOINT_PORT", "443")
-        self.channel = Channel(host=endpoint, port=int(port), ssl=True)
-        self.client = SecurityReportIngestionServiceStub(channel=self.channel)
+        self.endpoint = os.environ.get("CORALOGIX_ENDPOINT_HOST")  # eg.: ng-api-grpc.dev-shared.coralogix.net
+        self.port = int(os.environ.get("CORALOGIX_ENDPOINT_PORT", "443"))
+        # Plaintext is only meant for local stand-ins of the ingestion service
+        self.endpoint_ssl = os.environ.get("CORALOGIX_ENDPOINT_SSL", "true").lower() != "false"
+        self.reporter_max_in_flight = int(os.environ.get('REPORTER_MAX_IN_FLIGHT', '4'))
+        self.reporter_queue_size = int(os.environ.get('REPORTER_QUEUE_SIZE', '16'))
+        self.reporter = None
+        # RUN_SUMMARY_REPORT=true also ships the run summary as a SecurityReport of its own service
+        self.report_run_summary = os.environ.get('RUN_SUMMARY_REPORT', 'false').lower() == 'true'
+        self.run_summary_service_name = os.environ.get('RUN_SUMMARY_SERVICE_NAME', 'auto_posture_evaluator')
+        # PROFILE_MODE=cprofile,tracemalloc profiles each tester, or the whole run with PROFILE_SCOPE=run
+        self.profiler = Profiler.from_environment()
         self.api_key = os.environ.get('API_KEY')
         self.tests = []
         self.application_name = os.environ.get('APPLICATION_NAME', 'NO_APP_NAME')
         self.subsystem_name = os.environ.get('SUBSYSTEM_NAME', 'NO_SUB_NAME')
         self.batch_size = 2000
+        # gRPC rejects messages above 4MiB by default, keep a margin below it
+        self.batch_max_bytes = int(os.environ.get('BATCH_MAX_BYTES', str(3 * 1024 * 1024)))
+        self.size_histograms = {}
+        self._size_histograms_lock = threading.Lock()
+        # Testers are not started in the last DEADLINE_MARGIN_SECONDS of an invocation, so the running ones and
+        # the uploads can complete. The work items left are picked up by the next invocation from the checkpoint.
+        self.deadline_margin_seconds = float(os.environ.get('DEADLINE_MARGIN_SECONDS', '120'))
+        self.checkpoint_interval_seconds = float(os.environ.get('CHECKPOINT_INTERVAL_SECONDS', '10'))
+        self.checkpoint_max_age_seconds = float(os.environ.get('CHECKPOINT_MAX_AGE_HOURS', '24')) * 3600
+        # Shards started independently, without an execution id, agree on one per window of that many minutes
+        self.shard_execution_window_minutes = int(os.environ.get('SHARD_EXECUTION_WINDOW_MINUTES', '60'))
+        self.max_concurrent_testers = int(os.environ.get('MAX_CONCURRENT_TESTERS', '10'))
+        self.max_concurrent_testers_per_service = int(os.environ.get('MAX_CONCURRENT_TESTERS_PER_SERVICE', '4'))
         self.regions = []
         if not os.environ.get('REGION_LIST'):
             self.regions = ['eu-north-1', 'ap-south-1', 'eu-west-3', 'eu-west-2', 'eu-west-1', 'ap-northeast-3'
@@ -89,73 +173,432 @@ class AutoPostureEvaluator:
             if "Tester" in sys.modules[tester_module].__dict__:
                 self.tests.append(sys.modules[tester_module].__dict__["Tester"])
 
-    def run_single_test(self, cur_tester, execution_id,loop):
-        events_buffer = []
+    def run_single_test(self, cur_tester, execution_id, run_stats: TesterRunStats = None,
+                        delta_filter: DeltaFilter = None):
+        if run_stats is None:
+            run_stats = TesterRunStats(cur_tester.declare_tested_service(), "")
         cur_test_start_timestamp = datetime.datetime.now()
-        #print("INFO: Start " + str(cur_tester.declare_tested_service()) + " tester")
-        #try:
+        run_start = time.perf_counter()
+        try:
+            self._run_single_test(cur_tester, execution_id, run_stats, cur_test_start_timestamp, delta_filter)
+        finally:
+            # Whatever was not spent converting or waiting on the reporter was spent in the tester
+            run_stats.run_tests_seconds = time.perf_counter() - run_start - run_stats.conversion_seconds - \
+                run_stats.submit_wait_seconds
+
+    def _run_single_test(self, cur_tester, execution_id, run_stats, cur_test_start_timestamp, delta_filter=None):
         tester_result = cur_tester.run_tests()
-        cur_test_end_timestamp = datetime.datetime.now()
-        # except Exception as exTesterException:
-        #     print("WARN: The tester " + cur_tester.declare_tested_service() + " has crashed with the following exception during 'run_tests()'. SKIPPED: " +
-        #         str(exTesterException))
-        #     return
         error_template = "The result object from the tester " + cur_tester.declare_tested_service() + \
                          " does not match the required standard"
         if tester_result is None:
             print(error_template + " (ResultIsNone).")
             return
-        if not isinstance(tester_result, list):
+        if isinstance(tester_result, list):
+            # The tester already finished, all the results share its end time
+            cur_test_end_timestamp = datetime.datetime.now()
+            get_end_timestamp = lambda: cur_test_end_timestamp
+        elif isinstance(tester_result, collections.abc.Iterator):
+            # Streaming tester, results are shipped as they are produced and every batch ends when it is cut
+            get_end_timestamp = datetime.datetime.now
+        else:
             print(error_template + " (NotArray).")
             return
-        if not tester_result:
-            #print(error_template + " (Empty array).")
-            return
-        else:
+        if delta_filter is not None:
+            tester_result = delta_filter.filter(tester_result)
+
+        context_field = encode_report_context(self._build_report_context(cur_tester, execution_id))
+        start_time_field = encode_start_time(cur_test_start_timestamp)
+        # The SecurityReport is itself wrapped by the PostSecurityReportRequest
+        batcher = ReportBatcher(self.batch_size, self.batch_max_bytes, len(context_field) + 16,
+                                self._get_size_histogram(cur_tester.declare_tested_service()))
+        encoded_contexts = {}
+        try:
             for result_obj in tester_result:
-                if "timestamp" not in result_obj or "item" not in result_obj or "item_type" \
-                        not in result_obj or "test_result" not in result_obj:
-                    print(error_template + " (FieldsMissing). CANNOT CONTINUE.")
-                    continue
-                if result_obj["item"] is None:
-                    print(error_template + " (ItemIsNone). CANNOT CONTINUE.")
-                    continue
-                if not isinstance(result_obj["timestamp"], float):
-                    print(error_template + " (ItemDateIsNotFloat). CANNOT CONTINUE.")
-                    continue
-                if len(str(int(result_obj["timestamp"]))) != 10:
-                    print(error_template + " (ItemDateIsNotTenDigitsIntPart). CANNOT CONTINUE.")
-                    continue
-                events_buffer.append(_to_model(result_obj, cur_test_start_timestamp, cur_test_end_timestamp))
-
-                if len(events_buffer) % self.batch_size == 0:
-                    self.report_test_result(cur_tester, events_buffer.copy(), execution_id,loop)
-                    events_buffer = []
-        if len(events_buffer) > 0:
-            self.report_test_result(cur_tester, events_buffer.copy(), execution_id,loop)
-
-    def run_tests(self):
-        loop = asyncio.get_event_loop()
-        execution_id = str(uuid.uuid4())
+                conversion_start = time.perf_counter()
+                run_stats.results += 1
+                if isinstance(result_obj, ResultRecord):
+                    if result_obj.item is None:
+                        print(error_template + " (ItemIsNone). CANNOT CONTINUE.")
+                        continue
+                    encoded_result = _encode_record(result_obj, start_time_field, encoded_contexts)
+                else:
+                    if "timestamp" not in result_obj or "item" not in result_obj or "item_type" \
+                            not in result_obj or "test_result" not in result_obj:
+                        print(error_template + " (FieldsMissing). CANNOT CONTINUE.")
+                        continue
+                    if result_obj["item"] is None:
+                        print(error_template + " (ItemIsNone). CANNOT CONTINUE.")
+                        continue
+                    if not isinstance(result_obj["timestamp"], float):
+                        print(error_template + " (ItemDateIsNotFloat). CANNOT CONTINUE.")
+                        continue
+                    if len(str(int(result_obj["timestamp"]))) != 10:
+                        print(error_template + " (ItemDateIsNotTenDigitsIntPart). CANNOT CONTINUE.")
+                        continue
+                    encoded_result = _encode_result(result_obj, start_time_field)
+                # Streamed results get their final end time when their batch is cut
+                full_batch = batcher.add(encoded_result, encoded_result.size)
+                run_stats.conversion_seconds += time.perf_counter() - conversion_start
+                if full_batch:
+                    self._report_batch(cur_tester, context_field, full_batch, get_end_timestamp(), run_stats)
+        except Exception:
+            # The results the tester produced before failing are as valid as the batches already shipped
+            pending_batch = batcher.flush()
+            if pending_batch:
+                print("WARN: The tester " + cur_tester.declare_tested_service() + " failed partway, sending the " +
+                      str(len(pending_batch)) + " results it produced since its last batch")
+                self._report_batch(cur_tester, context_field, pending_batch, get_end_timestamp(), run_stats)
+            raise
+        last_batch = batcher.flush()
+        if last_batch:
+            self._report_batch(cur_tester, context_field, last_batch, get_end_timestamp(), run_stats)
+
+    def _get_size_histogram(self, service_name) -> SizeHistogram:
+        with self._size_histograms_lock:
+            if service_name not in self.size_histograms:
+                self.size_histograms[service_name] = SizeHistogram()
+            return self.size_histograms[service_name]
+
+    def _report_batch(self, cur_tester, context_field, events_buffer, end_timestamp, run_stats):
+        submit_start = time.perf_counter()
+        self.report_test_result(cur_tester, EncodedSecurityReport(context_field, events_buffer,
+                                                                  encode_end_time(end_timestamp)), run_stats)
+        run_stats.batches += 1
+        run_stats.submit_wait_seconds += time.perf_counter() - submit_start
+
+    def _plan_work_items(self, aws_context, account_contexts: dict = None) -> list:
+        if account_contexts is None:
+            return self._plan_account_work_items(aws_context)
+        # The accounts are resolved concurrently, an account whose role cannot be assumed is skipped
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_concurrent_testers) as executor:
+            futures = {account_id: executor.submit(self._plan_account_work_items, account_context, True)
+                       for account_id, account_context in account_contexts.items()}
+        account_work_items = []
+        for account_id, future in futures.items():
+            try:
+                account_work_items.append(future.result())
+            except Exception as ex:
+                print("WARN: Skipping the account " + account_id + ", it could not be accessed: " + str(ex))
+        # Interleaved, so every account progresses and fewer testers share the API rate limits of one account
+        return [work_item for work_items in itertools.zip_longest(*account_work_items)
+                for work_item in work_items if work_item is not None]
+
+    def _plan_account_work_items(self, aws_context, tag_account: bool = False) -> list:
+        enabled_regions = aws_context.get_enabled_regions()
+        regions = [region for region in self.regions if region == interfaces.GLOBAL_REGION or region in enabled_regions]
+        work_items = []
+        for tester in self.tests:
+            for region in tester.declare_tested_regions(regions):
+                work_items.append(WorkItem(tester, region, aws_context if tag_account else None))
+        return work_items
+
+    def _create_account_contexts(self, aws_context, cassette: AwsCassette = None,
+                                 snapshot: InventorySnapshot = None):
+        # ORGANIZATION_ACCOUNTS scans other accounts by assuming ORGANIZATION_ROLE_NAME in them
+        account_ids = organization_accounts_from_environment(aws_context)
+        if not account_ids:
+            return None
+        session_pool = AccountSessionPool.from_environment(aws_context)
+        account_contexts = {}
+        for account_id in account_ids:
+            if account_id == aws_context.account_id:
+                account_contexts[account_id] = aws_context
+            else:
+                account_contexts[account_id] = AwsContext(session=session_pool.get_session(account_id),
+                                                          cassette=cassette, snapshot=snapshot,
+                                                          state_store=aws_context.state_store)
+        return account_contexts
+
+    def plan_shards(self, shard_count: int, aws_context: AwsContext = None, execution_id: str = None) -> dict:
+        # The plan lists the work items of every shard, e.g. as the input of a Step Functions Map state
+        if aws_context is None:
+            aws_context = AwsContext()
+        if execution_id is None:
+            execution_id = str(uuid.uuid4())
+        state_store = state_store_from_environment(aws_context)
+        history = DurationHistory.load(state_store, shard_count) if state_store else DurationHistory()
+        work_items = self._plan_work_items(aws_context, self._create_account_contexts(aws_context))
+        shards = ShardPlanner(shard_count, history, execution_id).plan(work_items)
+        return {
+            "execution_id": execution_id,
+            "shard_count": shard_count,
+            "shards": [{
+                "shard_index": shard.index,
+                "shard_count": shard_count,
+                "execution_id": execution_id,
+                "work_items": [work_item.key for work_item in shard.work_items],
+                "estimated_seconds": round(shard.estimated_seconds, 3),
+            } for shard in shards],
+        }
+
+    def run_tests(self, aws_context: AwsContext = None, get_remaining_time_in_millis=None, shard_index: int = None,
+                  shard_count: int = None, execution_id: str = None, work_item_keys: list = None,
+                  execution_seed: str = None):
+        # `get_remaining_time_in_millis`, from the Lambda context, makes the run stop starting testers
+        # DEADLINE_MARGIN_SECONDS before the invocation times out.
+        # With `shard_count`, only the work items of the shard `shard_index` run, or the `work_item_keys` of a
+        # plan. All the shards of a run report under one execution id, the given one or, when the shards are
+        # started independently, one derived from the account and `execution_seed`, e.g. the event time.
+        if shard_count is not None and (shard_index is None or not 0 <= shard_index < shard_count):
+            raise Exception("The shard index must be between 0 and " + str(shard_count - 1))
+        deadline = None
+        if get_remaining_time_in_millis is not None:
+            deadline = time.monotonic() + get_remaining_time_in_millis() / 1000 - self.deadline_margin_seconds
         lambda_start_timestamp = datetime.datetime.now()
-        for i in range(0, len(self.tests)):
-            tester = self.tests[i]
-            for region in self.regions:
-                try:
-                    cur_tester = tester(region)
-                    print("INFO:Start tester " + cur_tester.declare_tested_service() +" for region "+region)
-                    with concurrent.futures.ThreadPoolExecutor() as executor:
-                        executor.submit(self.run_single_test, cur_tester, execution_id,loop)
-                except Exception as exTesterException:
-                    print(
-                        "WARN: The tester " + cur_tester.declare_tested_service() + " has crashed with the following exception during 'run_tests()'. SKIPPED: " +
-                        str(exTesterException))
-                    continue
-
-        print("Lambda taken " + str(datetime.datetime.now() - lambda_start_timestamp))
-
-    def report_test_result(self,  cur_tester, events_buffer, execution_id,loop):
-        context = SecurityReportContext(
+        if aws_context is None:
+            # AWS_CASSETTE_MODE=record|replay captures the AWS responses of a run or runs against captured ones.
+            # INVENTORY_SNAPSHOT_MODE=write|read does the same with the inventories stored apart and compact.
+            snapshot = InventorySnapshot.from_environment()
+            if snapshot and os.environ.get('AWS_CASSETTE_MODE'):
+                raise Exception("INVENTORY_SNAPSHOT_MODE and AWS_CASSETTE_MODE cannot be used together, "
+                                "the inventory snapshot has its own cassette")
+            cassette = snapshot.create_cassette() if snapshot else AwsCassette.from_environment()
+            aws_context = AwsContext(cassette=cassette, snapshot=snapshot)
+        cassette = aws_context.cassette
+        snapshot = aws_context.inventory.snapshot
+        state_store = state_store_from_environment(aws_context)
+        aws_context.state_store = state_store
+        # INCREMENTAL_MODE=re-emit|suppress runs the resource tests only for the resources that changed
+        incremental = IncrementalEvaluator.from_environment(state_store)
+        delta_reporter = DeltaReporter.from_environment(state_store)
+        checkpoint_name = shard_document_name('checkpoint', shard_index, shard_count)
+        checkpoint = self._load_checkpoint(state_store, checkpoint_name, execution_id)
+        if checkpoint is None:
+            if execution_id is None and shard_count is not None:
+                execution_id = shared_execution_id(aws_context.account_id, execution_seed or self._execution_window())
+            checkpoint = Checkpoint(execution_id or str(uuid.uuid4()))
+        execution_id = checkpoint.execution_id
+        history = DurationHistory.load(state_store, shard_count) if state_store else DurationHistory()
+        account_contexts = self._create_account_contexts(aws_context, cassette, snapshot)
+        planned_work_items = self._select_work_items(self._plan_work_items(aws_context, account_contexts),
+                                                     shard_index, shard_count, work_item_keys, state_store, history,
+                                                     execution_id)
+        if shard_count is not None:
+            print("INFO: Running the shard " + str(shard_index) + " of " + str(shard_count) + " of the execution " +
+                  execution_id + " with " + str(len(planned_work_items)) + " work items")
+        work_items = [work_item for work_item in planned_work_items if work_item.key not in checkpoint.completed]
+        if checkpoint.completed:
+            print("INFO: Resuming the execution " + execution_id + ", " + str(len(planned_work_items) -
+                  len(work_items)) + " of " + str(len(planned_work_items)) + " work items are already completed")
+        tester_run_stats = {}
+        undelivered_keys = []
+        # Delta baselines and incremental evaluations are saved once the reporter delivered the batches of
+        # their work item
+        pending_delta_baselines = []
+        pending_incremental_evaluations = []
+        last_checkpoint = time.monotonic()
+
+        def is_delivered(key):
+            # An item with a batch the reporter gave up on stays out of the checkpoint, a resumed run retries it
+            run_stats = tester_run_stats.get(key)
+            return run_stats is None or not run_stats.failed_batches
+
+        def on_item_done(work_item, exception):
+            # Crashed items are not retried, they would most likely crash again
+            nonlocal last_checkpoint
+            undelivered_keys.append(work_item.key)
+            if state_store and time.monotonic() - last_checkpoint >= self.checkpoint_interval_seconds and \
+                    self.reporter.is_drained():
+                # Only items whose reports were all shipped are checkpointed, not the ones still queued
+                checkpoint.completed.update(key for key in undelivered_keys if is_delivered(key))
+                undelivered_keys.clear()
+                state_store.save(checkpoint_name, checkpoint.to_dict())
+                last_checkpoint = time.monotonic()
+
+        def run_tester(work_item):
+            run_stats = tester_run_stats[work_item.key] = TesterRunStats(work_item.service, work_item.region,
+                                                                         work_item.account_id)
+            tester_aws_context = work_item.aws_context or aws_context
+            construction_start = time.perf_counter()
+            if work_item.tester.inventory_views and work_item.region != interfaces.GLOBAL_REGION:
+                tester_aws_context.inventory.prefetch(work_item.tester.inventory_views, work_item.region)
+            cur_tester = work_item.tester(work_item.region, aws_context=tester_aws_context)
+            incremental_tester = None
+            if incremental and work_item.tester.resource_tests:
+                cur_tester = incremental_tester = incremental.wrap(
+                    work_item.key, cur_tester, tester_aws_context.result_context(work_item.region))
+                run_stats.unchanged_resources = len(incremental_tester.previous)
+                run_stats.evaluated_resources = len(incremental_tester.fingerprints) - run_stats.unchanged_resources
+            delta_filter = None
+            if delta_reporter:
+                delta_filter = delta_reporter.create_filter(tester_aws_context.account_id, work_item.service,
+                                                            work_item.region,
+                                                            tester_aws_context.result_context(work_item.region))
+            run_stats.construction_seconds = time.perf_counter() - construction_start
+            print("INFO:Start tester " + cur_tester.declare_tested_service() + " for region " + work_item.region)
+            self.run_single_test(cur_tester, execution_id, run_stats, delta_filter)
+            if delta_filter:
+                pending_delta_baselines.append((tester_aws_context.account_id, work_item, delta_filter, run_stats))
+                run_stats.unchanged_results = delta_filter.unchanged
+            if incremental_tester is not None:
+                pending_incremental_evaluations.append((work_item, incremental_tester, run_stats))
+
+        def run_work_item(work_item):
+            if self.profiler:
+                with self.profiler.profile_tester(work_item.key, work_item.service, execution_id):
+                    run_tester(work_item)
+            else:
+                run_tester(work_item)
+
+        if self.profiler:
+            self.profiler.start_run()
+        self.reporter = self._create_reporter()
+        stats = None
+        try:
+            scheduler = TesterScheduler(self.max_concurrent_testers, self.max_concurrent_testers_per_service)
+            stats = scheduler.run(work_items, run_work_item, deadline, on_item_done)
+        finally:
+            self.reporter.close()
+            for account_id, work_item, delta_filter, run_stats in pending_delta_baselines:
+                if run_stats.failed_batches:
+                    # The results that were not delivered must come out as changed again on the next run
+                    print("WARN: Keeping the previous delta baseline of " + work_item.key + ", " +
+                          str(run_stats.failed_batches) + " of its batches failed")
+                else:
+                    delta_reporter.save(account_id, work_item.service, work_item.region, delta_filter)
+            for work_item, incremental_tester, run_stats in pending_incremental_evaluations:
+                if run_stats.failed_batches:
+                    # Suppressed on the next run, results that were not delivered would never be
+                    print("WARN: Keeping the previous incremental evaluation of " + work_item.key + ", " +
+                          str(run_stats.failed_batches) + " of its batches failed")
+                else:
+                    incremental.save(work_item.key, incremental_tester)
+            if state_store:
+                # The reporter is closed, so the reports of every finished item were shipped or given up on
+                checkpoint.completed.update(key for key in undelivered_keys if is_delivered(key))
+                failed_keys = sorted(key for key in tester_run_stats if not is_delivered(key))
+                if failed_keys:
+                    print("WARN: Reports of " + ", ".join(failed_keys) + " could not be sent, the work items are left "
+                          "out of the checkpoint of the execution " + execution_id + " to be run again")
+                if stats is not None and not stats.skipped and not failed_keys:
+                    state_store.delete(checkpoint_name)
+                else:
+                    state_store.save(checkpoint_name, checkpoint.to_dict())
+            if self.profiler:
+                self.profiler.stop_run(execution_id)
+            if cassette:
+                cassette.save()
+            if snapshot:
+                snapshot.save([aws_context] + [account_context for account_context in (account_contexts or {}).values()
+                                               if account_context is not aws_context])
+        if stats.skipped:
+            print("WARN: The invocation is about to time out, " + str(len(stats.skipped)) + " work items of the "
+                  "execution " + execution_id + " are left for the next invocation")
+        for failure in stats.failures:
+            print(
+                "WARN: The tester " + failure.work_item.service + " for region " + failure.work_item.region +
+                " has crashed with the following exception during 'run_tests()'. SKIPPED: " + str(failure.exception))
+
+        print("Lambda taken " + str(datetime.datetime.now() - lambda_start_timestamp) +
+              " (wall " + str(round(stats.wall_time, 3)) + "s, cpu " + str(round(stats.cpu_time, 3)) +
+              "s, summed tester time " + str(round(stats.summed_item_time, 3)) + "s, " +
+              str(stats.completed) + " completed, " + str(len(stats.failures)) + " failed, " +
+              str(self.reporter.sent_results) + " results sent in " + str(self.reporter.sent_batches) + " batches, " +
+              str(self.reporter.failed_batches) + " batches failed, " +
+              str(self.reporter.split_batches) + " batches split)")
+        for service_name, histogram in sorted(self.size_histograms.items()):
+            print("INFO: Report sizes for service " + service_name + ": " + json.dumps(histogram.to_dict()))
+        if cassette:
+            print("INFO: AWS cassette " + json.dumps(cassette.to_dict()))
+        if snapshot:
+            print("INFO: Inventory snapshot " + json.dumps(snapshot.to_dict()))
+
+        for failure in stats.failures:
+            if failure.work_item.key in tester_run_stats:
+                tester_run_stats[failure.work_item.key].failed = True
+        if state_store:
+            # Crashed items are not recorded, their duration says nothing about the next runs
+            for key, run_stats in tester_run_stats.items():
+                if not run_stats.failed:
+                    history.record(key, run_stats.construction_seconds + run_stats.run_tests_seconds +
+                                   run_stats.conversion_seconds + run_stats.submit_wait_seconds, execution_id)
+            history.save(state_store, shard_document_name(DURATIONS_DOCUMENT, shard_index, shard_count))
+        summary = {
+            "execution_id": execution_id,
+            "shard_index": shard_index,
+            "shard_count": shard_count,
+            "resumed_work_items": len(planned_work_items) - len(work_items),
+            "skipped_work_items": len(stats.skipped),
+            "unchanged_resources": sum(run_stats.unchanged_resources or 0 for run_stats in tester_run_stats.values()),
+            "wall_seconds": round(stats.wall_time, 3),
+            "cpu_seconds": round(stats.cpu_time, 3),
+            "sent_results": self.reporter.sent_results,
+            "sent_batches": self.reporter.sent_batches,
+            "failed_batches": self.reporter.failed_batches,
+            "testers": sorted((run_stats.to_dict() for run_stats in tester_run_stats.values()),
+                              key=lambda run_stats: run_stats["run_tests_seconds"], reverse=True),
+            "api_calls": self._api_call_stats(aws_context, account_contexts),
+        }
+        if self.profiler:
+            summary["profiles"] = self.profiler.profiles
+        print("INFO: Run summary " + json.dumps(summary))
+        if self.report_run_summary:
+            self._report_run_summary(summary, aws_context, execution_id)
+
+    @staticmethod
+    def _api_call_stats(aws_context, account_contexts) -> list:
+        if account_contexts is None:
+            return aws_context.api_calls.to_list()
+        api_calls = [dict(account=account_id, **operation_stats) for account_id, account_context in
+                     account_contexts.items() for operation_stats in account_context.api_calls.to_list()]
+        if aws_context not in account_contexts.values():
+            # The AssumeRole and Organizations calls
+            api_calls.extend(aws_context.api_calls.to_list())
+        api_calls.sort(key=lambda operation_stats: operation_stats["total_seconds"], reverse=True)
+        return api_calls
+
+    def _select_work_items(self, work_items, shard_index, shard_count, work_item_keys, state_store, history,
+                           execution_id) -> list:
+        if work_item_keys is not None:
+            keys = set(work_item_keys)
+            unknown_keys = keys.difference(work_item.key for work_item in work_items)
+            if unknown_keys:
+                print("WARN: Skipping the unknown work items " + ", ".join(sorted(unknown_keys)))
+            return [work_item for work_item in work_items if work_item.key in keys]
+        if shard_count is None:
+            return work_items
+        # Every shard computes the same plan, from the durations recorded before the execution
+        if state_store is None or not state_store.shared:
+            print("WARN: The state store is not shared between the shards, planning them from the static weights only")
+        planner = ShardPlanner.for_independent_shards(shard_count, state_store, history, execution_id)
+        return planner.plan(work_items)[shard_index].work_items
+
+    def _execution_window(self) -> str:
+        window_seconds = self.shard_execution_window_minutes * 60
+        return str(int(time.time() // window_seconds * window_seconds))
+
+    def _load_checkpoint(self, state_store, name, execution_id) -> Checkpoint:
+        document = state_store.load(name) if state_store else None
+        checkpoint = Checkpoint.from_dict(document) if document else None
+        if checkpoint is not None and execution_id is not None and checkpoint.execution_id != execution_id:
+            # Left by another execution, which this one replaces
+            checkpoint = None
+        if checkpoint is not None and time.time() - checkpoint.started_at > self.checkpoint_max_age_seconds:
+            print("WARN: The checkpoint of the execution " + checkpoint.execution_id + " is too old, starting over")
+            checkpoint = None
+        return checkpoint
+
+    def _create_reporter(self) -> SecurityReportReporter:
+        reporter = SecurityReportReporter(self.endpoint, self.port, self.api_key,
+                                          ssl=True if self.endpoint_ssl else None,
+                                          max_in_flight=self.reporter_max_in_flight,
+                                          queue_size=self.reporter_queue_size)
+        reporter.start()
+        return reporter
+
+    def _report_run_summary(self, summary, aws_context, execution_id):
+        # Shipped once every upload of the run is over, so the upload times it carries are final
+        self.reporter = self._create_reporter()
+        try:
+            self.run_single_test(RunSummaryTester(summary, aws_context.result_context(),
+                                                  self.run_summary_service_name), execution_id)
+        finally:
+            self.reporter.close()
+        if self.reporter.failed_batches:
+            print("WARN: Failed to send the run summary of the execution " + execution_id)
+
+    def _build_report_context(self, cur_tester, execution_id) -> SecurityReportContext:
+        return SecurityReportContext(
             provider=cur_tester.declare_tested_provider(),
             service=cur_tester.declare_tested_service(),
             execution_id=execution_id,
@@ -163,14 +606,6 @@ class AutoPostureEvaluator:
             computer_name="CoralogixServerlessLambda",
             subsystem_name=self.subsystem_name
         )
-        report = SecurityReport(context=context, test_results=events_buffer)
-        # print("DEBUG: Sent " + str(len(events_buffer)) + " events for " +
-        #       cur_tester.declare_tested_service())
-        try:
-            asyncio.set_event_loop(loop)
-            loop.run_until_complete(self.client.post_security_report(api_key=self.api_key, security_report=report))
-        except Exception as ex:
-            print("ERROR: Failed to send " + str(len(events_buffer)) + " events for tester " +
-                  cur_tester.declare_tested_service() + " due to the following exception: " + str(ex))
-        self.channel.close()
 
+    def report_test_result(self, cur_tester, report, run_stats: TesterRunStats = None):
+        self.reporter.submit(report, cur_tester.declare_tested_service(), run_stats)
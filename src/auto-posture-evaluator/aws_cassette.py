@@ -0,0 +1,180 @@
+import base64
+import datetime
+import gzip
+import json
+import os
+import threading
+import time
+
+import boto3
+import botocore.handlers
+
+MODE_RECORD = 'record'
+MODE_REPLAY = 'replay'
+
+_CASSETTE_VERSION = 1
+
+
+class _UnrecordableValue(Exception):
+    pass
+
+
+def _encode_value(value):
+    if isinstance(value, datetime.datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, (bytes, bytearray)):
+        return {"__bytes__": base64.b64encode(bytes(value)).decode("ascii")}
+    raise _UnrecordableValue(type(value).__name__)
+
+
+def _decode_value(value: dict):
+    if "__datetime__" in value:
+        return datetime.datetime.fromisoformat(value["__datetime__"])
+    if "__bytes__" in value:
+        return base64.b64decode(value["__bytes__"])
+    return value
+
+
+def _params_key(params: dict) -> str:
+    # Parameters are normalized so the same call made by different testers maps to the same entry
+    return json.dumps(params, sort_keys=True, separators=(",", ":"), default=str)
+
+
+class _ReplayedHttpResponse:
+    # Stands in for botocore's AWSResponse. `raw` is None so after-call handlers that re-parse the body,
+    # like the one of s3.GetBucketLocation, leave the recorded response alone.
+    raw = None
+    content = b""
+
+    def __init__(self, status_code: int):
+        self.status_code = status_code
+        self.headers = {}
+
+
+class AwsCassette:
+    """Records the AWS API responses of a run to a gzipped NDJSON file, or serves them back.
+
+    Calls are keyed by service, region, operation and parameters, and hooked into botocore's events
+    so the testers and the AwsContext are unaware of it. A replayed call never reaches the network,
+    does not need credentials, and can be slowed down by `latency_ms` to model real API latency.
+    """
+
+    def __init__(self, path: str, mode: str, latency_ms: float = 0, skip_call=None):
+        if mode not in (MODE_RECORD, MODE_REPLAY):
+            raise Exception("Unknown AWS cassette mode " + str(mode) + ", expected record or replay")
+        self.path = path
+        self.mode = mode
+        self.latency_ms = latency_ms
+        # Recording leaves out the calls made while `skip_call()` is true
+        self.skip_call = skip_call
+        self.default_region = None
+        self.recorded = 0
+        self.replayed = 0
+        self.missed = 0
+        self.unrecordable = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+        if mode == MODE_REPLAY:
+            self._load()
+
+    @classmethod
+    def from_environment(cls):
+        mode = os.environ.get('AWS_CASSETTE_MODE')
+        if not mode:
+            return None
+        return cls(os.environ.get('AWS_CASSETTE_PATH', 'aws_cassette.ndjson.gz'), mode.lower(),
+                   float(os.environ.get('AWS_CASSETTE_LATENCY_MS', '0')))
+
+    def create_session(self) -> boto3.session.Session:
+        if self.mode == MODE_REPLAY:
+            # Replayed calls are never signed, but clients still need a region and some credentials
+            return boto3.session.Session(aws_access_key_id='replay', aws_secret_access_key='replay',
+                                         region_name=self.default_region)
+        return boto3.session.Session()
+
+    def attach(self, session: boto3.session.Session):
+        if self.mode == MODE_RECORD:
+            self.default_region = session.region_name
+        session.events.register('before-parameter-build', self._on_before_parameter_build)
+        if self.mode == MODE_REPLAY:
+            session.events.register('before-call', self._on_before_call)
+            # Responses are recorded after botocore's own after-call handlers, like the one decoding the IAM
+            # policy documents, so they must not run a second time on a replayed response
+            for handler in botocore.handlers.BUILTIN_HANDLERS:
+                if handler[0].startswith('after-call.'):
+                    session.events.unregister(handler[0], handler[1])
+        else:
+            session.events.register_last('after-call', self._on_after_call)
+
+    def _on_before_parameter_build(self, params, model, context, **kwargs):
+        context['cassette_key'] = (model.service_model.service_name, context.get('client_region'), model.name,
+                                   _params_key(params))
+
+    def _on_before_call(self, context, **kwargs):
+        key = context.get('cassette_key')
+        entry = self._entries.get(key)
+        if entry is None:
+            with self._lock:
+                self.missed += 1
+            raise Exception("No recorded response in the AWS cassette for " + " ".join(str(part) for part in key))
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        with self._lock:
+            self.replayed += 1
+        status_code, response = entry
+        # Callers may mutate what they get back, so every call decodes its own copy
+        return _ReplayedHttpResponse(status_code), json.loads(response, object_hook=_decode_value)
+
+    def _on_after_call(self, http_response, parsed, context, **kwargs):
+        key = context.get('cassette_key')
+        if key is None or (self.skip_call is not None and self.skip_call()):
+            return
+        response = dict(parsed)
+        response['ResponseMetadata'] = {'HTTPStatusCode': http_response.status_code}
+        try:
+            encoded_response = json.dumps(response, separators=(",", ":"), default=_encode_value)
+        except _UnrecordableValue:
+            # Streaming bodies cannot be recorded without consuming them for the caller
+            with self._lock:
+                self.unrecordable += 1
+            return
+        with self._lock:
+            self._entries[key] = (http_response.status_code, encoded_response)
+            self.recorded += 1
+
+    def _load(self):
+        with gzip.open(self.path, 'rt', encoding='utf-8') as cassette_file:
+            header = json.loads(cassette_file.readline())
+            if header.get('version') != _CASSETTE_VERSION:
+                raise Exception("Unsupported AWS cassette version " + str(header.get('version')))
+            self.default_region = header.get('default_region')
+            for line in cassette_file:
+                entry = json.loads(line)
+                key = (entry['service'], entry['region'], entry['operation'], entry['params'])
+                self._entries[key] = (entry['status'], json.dumps(entry['response'], separators=(",", ":")))
+
+    def save(self):
+        if self.mode != MODE_RECORD:
+            return
+        with self._lock:
+            entries = sorted(self._entries.items(), key=lambda item: tuple(str(part) for part in item[0]))
+        with gzip.open(self.path, 'wt', encoding='utf-8') as cassette_file:
+            header = {'version': _CASSETTE_VERSION, 'default_region': self.default_region}
+            cassette_file.write(json.dumps(header) + "\n")
+            for (service, region, operation, params), (status, response) in entries:
+                # The response is already JSON, splice it in rather than nesting it as a string
+                entry = json.dumps({'service': service, 'region': region, 'operation': operation,
+                                    'params': params, 'status': status})
+                cassette_file.write(entry[:-1] + ', "response": ' + response + "}\n")
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "path": self.path,
+                "entries": len(self._entries),
+                "recorded": self.recorded,
+                "replayed": self.replayed,
+                "missed": self.missed,
+                "unrecordable": self.unrecordable,
+            }
@@ -0,0 +1,91 @@
+import os
+import threading
+
+import boto3
+import botocore.config
+from aws_cassette import AwsCassette
+from inventory import Inventory
+from result_record import ResultContext
+from run_stats import ApiCallRecorder
+
+
+class AwsContext:
+    """Run-scoped AWS state shared by every tester.
+
+    The caller identity and the enabled regions are resolved once, and boto3 clients are cached per
+    (service, region). Clients are thread safe and share one connection pool each, so the same
+    context can be handed to testers running concurrently. Resources are not thread safe and are
+    therefore created per call.
+    """
+
+    def __init__(self, session: boto3.session.Session = None, cassette: AwsCassette = None, snapshot=None,
+                 state_store=None):
+        if not session:
+            session = cassette.create_session() if cassette else boto3.session.Session()
+        if cassette:
+            cassette.attach(session)
+        self.api_calls = ApiCallRecorder()
+        self.api_calls.attach(session)
+        self.session = session
+        self.cassette = cassette
+        self.client_config = botocore.config.Config(
+            max_pool_connections=int(os.environ.get('AWS_MAX_POOL_CONNECTIONS', '50')))
+        self._session_lock = threading.Lock()
+        self._identity_lock = threading.Lock()
+        self._regions_lock = threading.Lock()
+        self._clients = {}
+        self._identity = None
+        self._enabled_regions = None
+        # Resources collected once and shared by the testers, see `inventory.COLLECTORS` for the views
+        self.inventory = Inventory(self, snapshot)
+        # Where the testers keep what they look up across runs, see `state_store`, None when nothing is kept
+        self.state_store = state_store
+
+    @property
+    def user_id(self) -> str:
+        return self.get_caller_identity().get('UserId')
+
+    @property
+    def account_arn(self) -> str:
+        return self.get_caller_identity().get('Arn')
+
+    @property
+    def account_id(self) -> str:
+        return self.get_caller_identity().get('Account')
+
+    def get_caller_identity(self) -> dict:
+        with self._identity_lock:
+            if self._identity is None:
+                self._identity = self.get_client('sts').get_caller_identity()
+            return self._identity
+
+    def result_context(self, region_name: str = None) -> ResultContext:
+        return ResultContext(self.user_id, self.account_arn, self.account_id, region_name)
+
+    def get_enabled_regions(self) -> list:
+        with self._regions_lock:
+            if self._enabled_regions is None:
+                response = self.get_client('ec2', 'us-east-1').describe_regions()
+                self._enabled_regions = [region['RegionName'] for region in response['Regions']]
+            return self._enabled_regions
+
+    def get_client(self, service_name: str, region_name: str = None):
+        client_key = (service_name, region_name)
+        client = self._clients.get(client_key)
+        if client is None:
+            # boto3 sessions are not thread safe, so clients are created under the session lock
+            with self._session_lock:
+                client = self._clients.get(client_key)
+                if client is None:
+                    client = self.session.client(service_name, region_name=region_name, config=self.client_config)
+                    self._clients[client_key] = client
+        return client
+
+    def create_client(self, service_name: str, region_name: str = None):
+        # A client of its own, not shared with the other callers
+        with self._session_lock:
+            return self.session.client(service_name, region_name=region_name, config=self.client_config)
+
+    def create_resource(self, service_name: str, region_name: str = None):
+        with self._session_lock:
+            return self.session.resource(service_name, region_name=region_name, config=self.client_config)
@@ -0,0 +1,106 @@
+import threading
+
+# Room for the two Timestamp fields to change once the end time of a streamed batch is known
+_TIMESTAMP_SLACK_BYTES = 16
+
+
+def _length_delimited_size(payload_size: int) -> int:
+    # One byte for the field tag plus the varint holding the payload length
+    varint_size = 1
+    while payload_size >= 0x80:
+        payload_size >>= 7
+        varint_size += 1
+    return 1 + varint_size
+
+
+class SizeHistogram:
+    """Power-of-two histogram of result and batch sizes, in bytes."""
+
+    def __init__(self):
+        self.result_buckets = {}
+        self.batch_buckets = {}
+        self.results = 0
+        self.result_bytes = 0
+        self.batches = 0
+        self.batch_bytes = 0
+        self.max_result_bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _bucket(size: int) -> int:
+        bucket = 64
+        while bucket < size:
+            bucket <<= 1
+        return bucket
+
+    def record_result(self, size: int):
+        bucket = self._bucket(size)
+        with self._lock:
+            self.result_buckets[bucket] = self.result_buckets.get(bucket, 0) + 1
+            self.results += 1
+            self.result_bytes += size
+            self.max_result_bytes = max(self.max_result_bytes, size)
+
+    def record_batch(self, size: int):
+        bucket = self._bucket(size)
+        with self._lock:
+            self.batch_buckets[bucket] = self.batch_buckets.get(bucket, 0) + 1
+            self.batches += 1
+            self.batch_bytes += size
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "results": self.results,
+                "result_bytes": self.result_bytes,
+                "max_result_bytes": self.max_result_bytes,
+                "result_size_buckets": {"<=" + str(k): v for k, v in sorted(self.result_buckets.items())},
+                "batches": self.batches,
+                "batch_bytes": self.batch_bytes,
+                "batch_size_buckets": {"<=" + str(k): v for k, v in sorted(self.batch_buckets.items())},
+            }
+
+
+class ReportBatcher:
+    """Groups encoded SecurityReportTestResult messages into batches.
+
+    A batch is cut when it holds `max_results` results or when the next result would push the
+    estimated serialized SecurityReport past `max_bytes`. A single result larger than the budget is
+    sent on its own.
+    """
+
+    def __init__(self, max_results: int, max_bytes: int, report_overhead_bytes: int = 0,
+                 histogram: SizeHistogram = None):
+        self.max_results = max_results
+        self.max_bytes = max_bytes
+        self.report_overhead_bytes = report_overhead_bytes
+        self.histogram = histogram
+        self._batch = []
+        self._batch_bytes = report_overhead_bytes
+
+    @staticmethod
+    def estimate_size(payload_size: int) -> int:
+        payload_size += _TIMESTAMP_SLACK_BYTES
+        return _length_delimited_size(payload_size) + payload_size
+
+    def add(self, test_result, payload_size: int):
+        """Adds a result and returns the batch that had to be cut to make room for it, if any."""
+        result_size = self.estimate_size(payload_size)
+        if self.histogram is not None:
+            self.histogram.record_result(result_size)
+
+        full_batch = None
+        if self._batch and (len(self._batch) >= self.max_results or
+                            self._batch_bytes + result_size > self.max_bytes):
+            full_batch = self.flush()
+        self._batch.append(test_result)
+        self._batch_bytes += result_size
+        return full_batch
+
+    def flush(self) -> list:
+        batch = self._batch
+        if batch and self.histogram is not None:
+            self.histogram.record_batch(self._batch_bytes)
+        self._batch = []
+        self._batch_bytes = self.report_overhead_bytes
+        return batch
@@ -0,0 +1,169 @@
+"""Compares the betterproto and the direct wire encoding paths of SecurityReport batches.
+
+Every run first checks that both paths produce byte-identical SecurityReports, for a corpus of
+edge cases and for the synthetic results it then times. Run from src/auto-posture-evaluator:
+
+    python benchmarks/encoder_benchmark.py --results 10000,100000 --large
+
+`--large` adds the 1M results case, which takes the betterproto path a long while. The byte-identical
+output is also covered by tests/test_encoder.py.
+"""
+import argparse
+import copy
+import datetime as dt
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from auto_posture_evaluator import _encode_record, _encode_result, _to_model  # noqa: E402
+from model import SecurityReport, SecurityReportContext  # noqa: E402
+from model.encoder import EncodedSecurityReport, encode_end_time, encode_report_context, \
+    encode_start_time  # noqa: E402
+from result_record import ResultContext  # noqa: E402
+
+BATCH_SIZE = 2000
+LARGE_RESULTS = 1000000
+
+EDGE_CASES = [
+    {"item": "", "item_type": "", "test_name": "", "test_result": "no_issue_found"},
+    {"item": None, "item_type": None, "test_name": None, "test_result": "issue_found"},
+    {"item": "bucket", "item_type": "s3_bucket", "test_name": "s3_bucket_acl", "test_result": "issue_found",
+     "zero": 0, "false": False, "true": True, "empty_list": [], "empty_dict": {}, "none": None,
+     "negative": -12, "float": 3.25, "big": 2 ** 60, "unicode": "ŝẗŕĩñğ ☃"},
+    {"item": "i-0", "item_type": "ec2_instance", "test_name": "nested", "test_result": "issue_found",
+     "nested": {"": "empty key", "list": [1, "a", None, {"k": [True, {}]}, [], dt.datetime(2021, 1, 1)],
+                "deep": {"deeper": {"deepest": ""}}, "int_keys": {1: "a", 2: "b"}},
+     "when": dt.datetime(2022, 3, 4, 5, 6, 7, 891011)},
+]
+
+
+def build_context() -> SecurityReportContext:
+    return SecurityReportContext(
+        provider="aws",
+        service="s3",
+        execution_id="00000000-0000-0000-0000-000000000000",
+        application_name="application",
+        computer_name="computer",
+        subsystem_name="subsystem"
+    )
+
+
+def build_results(count: int, seed: int = 7) -> list:
+    rand = random.Random(seed)
+    results = []
+    for index in range(count):
+        result = {
+            "user": "AIDAEXAMPLEUSERID",
+            "account_arn": "arn:aws:iam::123456789012:user/evaluator",
+            "account": "123456789012",
+            "timestamp": 1650000000.123 + index,
+            "item": "bucket-" + str(index),
+            "item_type": "s3_bucket",
+            "test_name": rand.choice(["s3_bucket_acl", "s3_bucket_versioning", "s3_bucket_encryption"]),
+            "test_result": rand.choice(["no_issue_found", "issue_found"]),
+            "region": rand.choice(["us-east-1", "eu-west-1", "global"])
+        }
+        if index % 5 == 0:
+            result["grants"] = [{"grantee": "AllUsers", "permissions": ["READ", "WRITE"], "count": index}]
+        results.append(result)
+    return results
+
+
+def betterproto_batches(results: list, context: SecurityReportContext, start, end) -> list:
+    reports = []
+    for offset in range(0, len(results), BATCH_SIZE):
+        test_results = [_to_model(result, start, end) for result in results[offset:offset + BATCH_SIZE]]
+        reports.append(bytes(SecurityReport(context=context, test_results=test_results)))
+    return reports
+
+
+def encoded_batches(results: list, context: SecurityReportContext, start, end) -> list:
+    context_field = encode_report_context(context)
+    start_time_field = encode_start_time(start)
+    end_time_field = encode_end_time(end)
+    reports = []
+    for offset in range(0, len(results), BATCH_SIZE):
+        test_results = [_encode_result(result, start_time_field) for result in results[offset:offset + BATCH_SIZE]]
+        reports.append(bytes(EncodedSecurityReport(context_field, test_results, end_time_field)))
+    return reports
+
+
+def verify(results: list, context: SecurityReportContext):
+    timestamps = [
+        (dt.datetime(2022, 1, 1, 0, 0, 0, 123456), dt.datetime(2022, 1, 1, 0, 5)),
+        (dt.datetime.fromtimestamp(0, dt.timezone.utc), dt.datetime.fromtimestamp(0, dt.timezone.utc)),
+        (dt.datetime.now(), dt.datetime.now()),
+    ]
+    for start, end in timestamps:
+        expected = betterproto_batches(copy.deepcopy(results), context, start, end)
+        actual = encoded_batches(copy.deepcopy(results), context, start, end)
+        if expected != actual:
+            raise Exception("The encoded SecurityReport differs from the betterproto one for start " + str(start))
+    # An empty context must not be written either
+    if bytes(EncodedSecurityReport(encode_report_context(SecurityReportContext()), [], b"")) != \
+            bytes(SecurityReport(context=SecurityReportContext())):
+        raise Exception("The encoded empty SecurityReport differs from the betterproto one")
+
+
+def verify_records(results: list):
+    # `build_results` orders its keys the way `_encode_record` writes them, so records built from the same
+    # values must encode to the same bytes
+    result_context = ResultContext("AIDAEXAMPLEUSERID", "arn:aws:iam::123456789012:user/evaluator", "123456789012")
+    start_time_field = encode_start_time(dt.datetime.now())
+    encoded_contexts = {}
+    for result in copy.deepcopy(results):
+        extras = {key: value for key, value in result.items() if key == "grants"}
+        record = result_context.new_result(result["item"], result["item_type"], result["test_name"],
+                                           result["test_result"], region=result["region"], **extras)
+        record.timestamp = result["timestamp"]
+        if _encode_record(record, start_time_field, encoded_contexts).encode(b"") != \
+                _encode_result(result, start_time_field).encode(b""):
+            raise Exception("The encoded ResultRecord differs from the encoded dict for " + result["item"])
+
+
+def measure(path, results: list, context: SecurityReportContext, start) -> dict:
+    results = copy.deepcopy(results)
+    started = time.perf_counter()
+    reports = path(results, context, start, start)
+    elapsed = time.perf_counter() - started
+    return {
+        "seconds": round(elapsed, 3),
+        "results_per_second": round(len(results) / elapsed) if elapsed else None,
+        "bytes": sum(len(report) for report in reports)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--results", default="10000,100000",
+                        help="Comma separated result counts to time (the betterproto path needs minutes for 100k)")
+    parser.add_argument("--large", action="store_true", help="Also time 1M results")
+    args = parser.parse_args()
+
+    context = build_context()
+    verify(EDGE_CASES + build_results(BATCH_SIZE + 17), context)
+    verify_records(build_results(BATCH_SIZE))
+    print("INFO: The encoded and the betterproto SecurityReports are byte-identical")
+
+    counts = [int(value) for value in args.results.split(",")]
+    if args.large and LARGE_RESULTS not in counts:
+        counts.append(LARGE_RESULTS)
+    for count in counts:
+        results = build_results(count)
+        start = dt.datetime.now()
+        baseline = measure(betterproto_batches, results, context, start)
+        encoded = measure(encoded_batches, results, context, start)
+        print(json.dumps({
+            "results": count,
+            "betterproto": baseline,
+            "encoder": encoded,
+            "speedup": round(baseline["seconds"] / encoded["seconds"], 2) if encoded["seconds"] else None
+        }))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,350 @@
+"""Times the testers and the full evaluator against a synthetic AWS account of a chosen scale.
+
+AWS is replaced by the SyntheticAccount of benchmarks/synthetic_aws.py, the ingestion service by the
+local stand-in of benchmarks/local_ingestion_server.py, so nothing leaves the machine. Every tester is
+timed alone for each region it declares, then the whole AutoPostureEvaluator.run_tests is timed.
+Each run reports wall time, API calls, peak RSS and results per second, and can be saved as a JSON
+baseline that later runs are compared to. Run from src/auto-posture-evaluator:
+
+    python benchmarks/evaluator_benchmark.py --scale large --output baseline.json
+    python benchmarks/evaluator_benchmark.py --scale large --baseline baseline.json --tolerance 0.2
+
+The evaluator run can also write an inventory snapshot of the synthetic account, that later runs read
+instead of the account, to time the rule logic of the testers alone on a fixed dataset:
+
+    python benchmarks/evaluator_benchmark.py --scale large --skip-testers --write-snapshot /tmp/snapshot
+    python benchmarks/evaluator_benchmark.py --snapshot /tmp/snapshot --output baseline.json
+"""
+import argparse
+import asyncio
+import http.server
+import importlib
+import json
+import os
+import resource
+import sys
+import threading
+import time
+import traceback
+import urllib.parse
+
+import grpclib.server
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from aws_context import AwsContext  # noqa: E402
+from inventory_snapshot import MODE_READ, MODE_WRITE, InventorySnapshot  # noqa: E402
+from local_ingestion_server import CountingCodec, IngestionStats, LocalIngestionService  # noqa: E402
+from synthetic_aws import SCALES, SyntheticAccount, stable_fraction  # noqa: E402
+
+LAMBDA_RUNTIME_VERSIONS = {"python": ["3.8", "3.9"], "nodejs": ["14.x"], "java": ["11"], "go": ["1.x"],
+                           "ruby": ["2.7"], "dotnetcore": ["3.1"], "provided": [".al2"]}
+
+
+def reset_peak_rss():
+    # Writing 5 to clear_refs resets VmHWM, so every measurement gets its own peak
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+    except OSError:
+        pass
+
+
+def peak_rss_mib() -> float:
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    # ru_maxrss never resets, so without /proc this is the peak of the whole process
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def calls_delta(before: dict, after: dict) -> dict:
+    return {call: count - before.get(call, 0) for call, count in after.items() if count != before.get(call, 0)}
+
+
+class _LocalHttpHandler(http.server.BaseHTTPRequestHandler):
+    """Serves the Lambda runtime versions and the S3 bucket URL probes, so no request leaves the machine.
+
+    The S3 tester probes `/<protocol>/<bucket>` here through S3_BUCKET_URL_TEMPLATE, other plain HTTP
+    requests come as to the HTTP proxy of the run. Probes are answered with 200 for a few public buckets
+    and 403 for the others, the first probe of some buckets with a transient 503, to be retried.
+    """
+
+    _probed_hosts = set()
+    _probed_hosts_lock = threading.Lock()
+
+    def do_HEAD(self):
+        if self.path.startswith("/"):
+            host = self.path.rsplit("/", 1)[-1] + ".s3.amazonaws.com"
+        else:
+            host = urllib.parse.urlsplit(self.path).hostname or ""
+        with self._probed_hosts_lock:
+            first_probe = host not in self._probed_hosts
+            self._probed_hosts.add(host)
+        if first_probe and stable_fraction("flaky-url", host) < 0.1:
+            self.send_response(503)
+        else:
+            self.send_response(200 if stable_fraction("public-url", host) < 0.05 else 403)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        body = json.dumps(LAMBDA_RUNTIME_VERSIONS).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _LocalHttpServer(http.server.ThreadingHTTPServer):
+    # The probes come concurrently, a short backlog would drop connections and delay them by a second
+    request_queue_size = 128
+
+
+def start_local_http_server() -> http.server.ThreadingHTTPServer:
+    server = _LocalHttpServer(("127.0.0.1", 0), _LocalHttpHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    address = "http://127.0.0.1:" + str(server.server_address[1])
+    os.environ["LAMBDA_RUNTIME_VERSIONS_URL"] = address + "/"
+    os.environ["S3_BUCKET_URL_TEMPLATE"] = address + "/{protocol}/{bucket}"
+    os.environ["HTTP_PROXY"] = os.environ["HTTPS_PROXY"] = address
+    os.environ["NO_PROXY"] = "127.0.0.1,localhost"
+    return server
+
+
+class LocalIngestionThread:
+    """Runs the local ingestion service on an ephemeral port, on its own event loop thread."""
+
+    def __init__(self):
+        self.stats = IngestionStats()
+        self.port = None
+        self._loop = asyncio.new_event_loop()
+        self._server = None
+        self._started = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        self._started.wait()
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_until_complete(self._start_server())
+        self._started.set()
+        self._loop.run_forever()
+
+    async def _start_server(self):
+        self._server = grpclib.server.Server([LocalIngestionService(self.stats)],
+                                             codec=CountingCodec(self.stats, 4 * 1024 * 1024, False))
+        await self._server.start("127.0.0.1", 0)
+        self.port = self._server._server.sockets[0].getsockname()[1]
+
+    def stop(self):
+        async def close():
+            self._server.close()
+            await self._server.wait_closed()
+        asyncio.run_coroutine_threadsafe(close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+
+def load_testers(names: list) -> dict:
+    testers = {}
+    for name in names:
+        testers[name] = importlib.import_module("testers." + name + "_tester").Tester
+    return testers
+
+
+def create_aws_context(account: SyntheticAccount, snapshot_path: str = None, snapshot_mode: str = MODE_READ):
+    if not snapshot_path:
+        return AwsContext(session=account.create_session())
+    snapshot = InventorySnapshot(snapshot_path, snapshot_mode)
+    cassette = snapshot.create_cassette()
+    # Read from a snapshot, the synthetic account is never called
+    session = account.create_session() if snapshot_mode == MODE_WRITE else cassette.create_session()
+    return AwsContext(session=session, cassette=cassette, snapshot=snapshot)
+
+
+def benchmark_testers(account: SyntheticAccount, testers: dict, regions: list, snapshot_path: str = None) -> list:
+    aws_context = create_aws_context(account, snapshot_path)
+    runs = []
+    for name, tester in testers.items():
+        for region in tester.declare_tested_regions(regions):
+            calls_before = account.call_counts()
+            reset_peak_rss()
+            start = time.monotonic()
+            error = None
+            results = 0
+            try:
+                tester_result = tester(region, aws_context=aws_context).run_tests()
+                for _ in tester_result or []:
+                    results += 1
+            except Exception as ex:
+                frame = traceback.extract_tb(ex.__traceback__)[-1]
+                error = type(ex).__name__ + ": " + str(ex) + " at " + os.path.basename(frame.filename) + ":" + \
+                    str(frame.lineno)
+            wall_time = time.monotonic() - start
+            calls = calls_delta(calls_before, account.call_counts())
+            run = {
+                "tester": name,
+                "region": region,
+                "wall_seconds": round(wall_time, 3),
+                "results": results,
+                "results_per_second": round(results / wall_time, 1) if wall_time else 0,
+                "api_calls": sum(calls.values()),
+                "api_calls_per_operation": calls,
+                "peak_rss_mib": peak_rss_mib(),
+            }
+            if error:
+                run["error"] = error
+            print("INFO: " + json.dumps({key: value for key, value in run.items() if key != "api_calls_per_operation"}))
+            runs.append(run)
+    return runs
+
+
+def benchmark_evaluator(account: SyntheticAccount, tester_names: list, regions: list, snapshot_path: str = None,
+                        snapshot_mode: str = MODE_READ) -> dict:
+    ingestion = LocalIngestionThread()
+    ingestion.start()
+    os.environ.setdefault("API_KEY", "benchmark")
+    os.environ["CORALOGIX_ENDPOINT_HOST"] = "127.0.0.1"
+    os.environ["CORALOGIX_ENDPOINT_PORT"] = str(ingestion.port)
+    os.environ["CORALOGIX_ENDPOINT_SSL"] = "false"
+    os.environ["REGION_LIST"] = ",".join(regions)
+    # The evaluator picks its testers when it is first imported
+    os.environ["TESTER_LIST"] = ",".join(tester_names)
+    import auto_posture_evaluator
+
+    calls_before = account.call_counts()
+    reset_peak_rss()
+    start = time.monotonic()
+    try:
+        aws_context = create_aws_context(account, snapshot_path, snapshot_mode)
+        auto_posture_evaluator.AutoPostureEvaluator().run_tests(aws_context=aws_context)
+    finally:
+        wall_time = time.monotonic() - start
+        ingestion.stop()
+    calls = calls_delta(calls_before, account.call_counts())
+    ingested = ingestion.stats.to_dict()
+    return {
+        "wall_seconds": round(wall_time, 3),
+        "results": ingested["accepted_results"],
+        "results_per_second": round(ingested["accepted_results"] / wall_time, 1) if wall_time else 0,
+        "api_calls": sum(calls.values()),
+        "api_calls_per_operation": calls,
+        "peak_rss_mib": peak_rss_mib(),
+        "requests": ingested["requests"],
+        "request_bytes": ingested["request_bytes"],
+        "results_per_service": ingested["results_per_service"],
+    }
+
+
+def compare(baseline: dict, current: dict, tolerance: float, min_seconds: float) -> list:
+    # Times, memory and API calls may grow by the tolerance, result counts must not change
+    for setting in ("inventory", "regions", "latency_ms", "testers_list", "snapshot"):
+        if baseline.get(setting) != current.get(setting):
+            raise Exception("The baseline was taken with a different " + setting + ", the runs are not comparable")
+    regressions = []
+
+    def check(label, old, new):
+        if old is None or new is None:
+            return
+        if old.get("wall_seconds", 0) >= min_seconds and \
+                new.get("wall_seconds", 0) > old["wall_seconds"] * (1 + tolerance):
+            regressions.append(label + " wall_seconds " + str(old["wall_seconds"]) + " -> " + str(new["wall_seconds"]))
+        # Testers caching behind threads can race into a few duplicate calls, so calls are not exact either
+        for metric in ("peak_rss_mib", "api_calls"):
+            if old.get(metric) and new.get(metric, 0) > old[metric] * (1 + tolerance):
+                regressions.append(label + " " + metric + " " + str(old[metric]) + " -> " + str(new[metric]))
+        if "results" in old and new.get("results") != old["results"]:
+            regressions.append(label + " results " + str(old["results"]) + " -> " + str(new.get("results")))
+
+    old_runs = {(run["tester"], run["region"]): run for run in baseline.get("testers", [])}
+    for run in current.get("testers", []):
+        check(run["tester"] + "/" + run["region"], old_runs.get((run["tester"], run["region"])), run)
+    check("evaluator", baseline.get("evaluator"), current.get("evaluator"))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                        help="Overrides one inventory size of the scale, e.g. --set buckets=20000")
+    parser.add_argument("--regions", default="us-east-1,eu-west-1,global",
+                        help="Comma separated regions, global included for the global testers")
+    parser.add_argument("--testers", default="",
+                        help="Comma separated tester names, all the testers by default")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Latency added to every AWS call")
+    parser.add_argument("--skip-testers", action="store_true", help="Only time the full evaluator")
+    parser.add_argument("--skip-evaluator", action="store_true", help="Only time the testers one by one")
+    parser.add_argument("--write-snapshot", metavar="DIR",
+                        help="Writes the inventory snapshot of the evaluator run to DIR")
+    parser.add_argument("--snapshot", metavar="DIR",
+                        help="Runs against the inventory snapshot in DIR instead of the synthetic account")
+    parser.add_argument("--output", help="Path of the JSON results, to be used as a baseline later")
+    parser.add_argument("--baseline", help="Path of a previous JSON result to compare to")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed relative growth of wall time, API calls and peak RSS over the baseline")
+    parser.add_argument("--min-seconds", type=float, default=0.5,
+                        help="Wall times of the baseline below this are too noisy to be compared")
+    args = parser.parse_args()
+
+    os.chdir(BASE_DIR)
+    scale = dict(SCALES[args.scale])
+    for override in args.set:
+        key, _, value = override.partition("=")
+        if key not in scale:
+            raise Exception("Unknown inventory size " + key + ", expected one of " + ", ".join(sorted(scale)))
+        scale[key] = int(value)
+    regions = [region for region in args.regions.split(",") if region]
+    tester_names = [name for name in args.testers.split(",") if name] or sorted(
+        module[:-len("_tester.py")] for module in os.listdir(os.path.join(BASE_DIR, "testers"))
+        if module.endswith("_tester.py") and not module.startswith("_"))
+    account = SyntheticAccount(scale, [region for region in regions if region != "global"],
+                               latency_ms=args.latency_ms)
+    http_server = start_local_http_server()
+
+    report = {"scale": args.scale, "inventory": scale, "regions": regions, "latency_ms": args.latency_ms,
+              "testers_list": tester_names}
+    if args.snapshot:
+        report["snapshot"] = args.snapshot
+    try:
+        if not args.skip_testers:
+            report["testers"] = benchmark_testers(account, load_testers(tester_names), regions, args.snapshot)
+        if not args.skip_evaluator:
+            if args.write_snapshot:
+                report["evaluator"] = benchmark_evaluator(account, tester_names, regions, args.write_snapshot,
+                                                          MODE_WRITE)
+            else:
+                report["evaluator"] = benchmark_evaluator(account, tester_names, regions, args.snapshot)
+            print("INFO: Evaluator " + json.dumps({key: value for key, value in report["evaluator"].items()
+                                                   if key != "api_calls_per_operation"}))
+    finally:
+        http_server.shutdown()
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(report, output_file, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = compare(json.load(baseline_file), report, args.tolerance, args.min_seconds)
+        for regression in regressions:
+            print("ERROR: Regression " + regression)
+        if regressions:
+            sys.exit(1)
+        print("INFO: No regression against " + args.baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""Local stand-in for the SecurityReportIngestionService, to load test the reporting pipeline offline.
+
+It accepts PostSecurityReport calls, counts requests, bytes and test results, and can inject latency,
+errors and throttling. Point the evaluator at it with:
+
+    CORALOGIX_ENDPOINT_HOST=127.0.0.1 CORALOGIX_ENDPOINT_PORT=50051 CORALOGIX_ENDPOINT_SSL=false
+
+The server binds to the same variables. Like the evaluator it defaults to TLS, which then needs
+--certfile and --keyfile. Run from src/auto-posture-evaluator:
+
+    python benchmarks/local_ingestion_server.py --latency-ms 50 --throttle-rate 0.01
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import ssl
+import sys
+import time
+from dataclasses import dataclass
+from typing import List
+
+import betterproto
+import grpclib.server
+from grpclib.const import Status
+from grpclib.encoding.proto import ProtoCodec
+from grpclib.exceptions import GRPCError
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model import PostSecurityReportRequest, PostSecurityReportResponse, SecurityReportContext, \
+    SecurityReportIngestionServiceBase  # noqa: E402
+
+
+@dataclass(eq=False, repr=False)
+class ShallowSecurityReport(betterproto.Message):
+    """Wire compatible SecurityReport that keeps its test results encoded, so counting them is cheap."""
+    context: SecurityReportContext = betterproto.message_field(1)
+    test_results: List[bytes] = betterproto.bytes_field(2)
+
+
+@dataclass(eq=False, repr=False)
+class ShallowPostSecurityReportRequest(betterproto.Message):
+    security_report: ShallowSecurityReport = betterproto.message_field(1)
+
+
+class IngestionStats:
+    def __init__(self):
+        self.started = time.monotonic()
+        self.requests = 0
+        self.request_bytes = 0
+        self.max_request_bytes = 0
+        self.accepted_requests = 0
+        self.accepted_results = 0
+        self.failed_requests = 0
+        self.throttled_requests = 0
+        self.oversized_requests = 0
+        self.services = {}
+
+    def to_dict(self) -> dict:
+        elapsed = time.monotonic() - self.started
+        return {
+            "elapsed_seconds": round(elapsed, 3),
+            "requests": self.requests,
+            "request_bytes": self.request_bytes,
+            "max_request_bytes": self.max_request_bytes,
+            "accepted_requests": self.accepted_requests,
+            "accepted_results": self.accepted_results,
+            "accepted_results_per_second": round(self.accepted_results / elapsed, 1) if elapsed else 0,
+            "failed_requests": self.failed_requests,
+            "throttled_requests": self.throttled_requests,
+            "oversized_requests": self.oversized_requests,
+            "results_per_service": self.services,
+        }
+
+
+class CountingCodec(ProtoCodec):
+    """Counts the raw request sizes, rejects oversized ones and optionally skips decoding the results."""
+
+    def __init__(self, stats: IngestionStats, max_message_bytes: int, decode_results: bool):
+        self.stats = stats
+        self.max_message_bytes = max_message_bytes
+        self.decode_results = decode_results
+
+    def decode(self, data, message_type):
+        if message_type is PostSecurityReportRequest:
+            self.stats.requests += 1
+            self.stats.request_bytes += len(data)
+            self.stats.max_request_bytes = max(self.stats.max_request_bytes, len(data))
+            if len(data) > self.max_message_bytes:
+                self.stats.oversized_requests += 1
+                raise GRPCError(Status.RESOURCE_EXHAUSTED, "Received message larger than max (" +
+                                str(len(data)) + " vs. " + str(self.max_message_bytes) + ")")
+            if not self.decode_results:
+                message_type = ShallowPostSecurityReportRequest
+        return super().decode(data, message_type)
+
+
+class LocalIngestionService(SecurityReportIngestionServiceBase):
+    def __init__(self, stats: IngestionStats, latency_ms: float = 0, latency_jitter_ms: float = 0,
+                 error_rate: float = 0, throttle_rate: float = 0, seed: int = None):
+        self.stats = stats
+        self.latency_ms = latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.random = random.Random(seed)
+
+    async def post_security_report(self, security_report) -> PostSecurityReportResponse:
+        latency_ms = self.latency_ms + self.random.uniform(0, self.latency_jitter_ms)
+        if latency_ms > 0:
+            await asyncio.sleep(latency_ms / 1000)
+        if self.random.random() < self.throttle_rate:
+            self.stats.throttled_requests += 1
+            raise GRPCError(Status.RESOURCE_EXHAUSTED, "Injected throttling")
+        if self.random.random() < self.error_rate:
+            self.stats.failed_requests += 1
+            raise GRPCError(Status.UNAVAILABLE, "Injected failure")
+        service = str(security_report.context.service)
+        results = len(security_report.test_results)
+        self.stats.accepted_requests += 1
+        self.stats.accepted_results += results
+        self.stats.services[service] = self.stats.services.get(service, 0) + results
+        return PostSecurityReportResponse()
+
+
+def create_ssl_context(certfile: str, keyfile: str) -> ssl.SSLContext:
+    ssl_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    ssl_context.load_cert_chain(certfile, keyfile)
+    ssl_context.set_alpn_protocols(["h2"])
+    return ssl_context
+
+
+async def serve(args):
+    stats = IngestionStats()
+    service = LocalIngestionService(stats, args.latency_ms, args.latency_jitter_ms, args.error_rate,
+                                    args.throttle_rate, args.seed)
+    server = grpclib.server.Server([service], codec=CountingCodec(stats, args.max_message_bytes,
+                                                                  args.decode_results))
+    ssl_context = None
+    if args.ssl:
+        if not args.certfile or not args.keyfile:
+            raise Exception("TLS needs both --certfile and --keyfile, or CORALOGIX_ENDPOINT_SSL=false")
+        ssl_context = create_ssl_context(args.certfile, args.keyfile)
+    await server.start(args.host, args.port, ssl=ssl_context)
+    print("INFO: Listening on " + args.host + ":" + str(args.port) + (" with TLS" if ssl_context else ""))
+    deadline = time.monotonic() + args.duration if args.duration else None
+    try:
+        while deadline is None or time.monotonic() < deadline:
+            await asyncio.sleep(args.report_interval if deadline is None
+                                else min(args.report_interval, max(deadline - time.monotonic(), 0)))
+            print("INFO: " + json.dumps(stats.to_dict()))
+    finally:
+        server.close()
+        await server.wait_closed()
+        print("INFO: Final " + json.dumps(stats.to_dict()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=os.environ.get("CORALOGIX_ENDPOINT_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("CORALOGIX_ENDPOINT_PORT", "50051")))
+    parser.add_argument("--certfile", help="PEM certificate used when CORALOGIX_ENDPOINT_SSL is true")
+    parser.add_argument("--keyfile", help="PEM private key used when CORALOGIX_ENDPOINT_SSL is true")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Latency added to every call")
+    parser.add_argument("--latency-jitter-ms", type=float, default=0, help="Uniform random extra latency")
+    parser.add_argument("--error-rate", type=float, default=0, help="Share of calls failing with UNAVAILABLE")
+    parser.add_argument("--throttle-rate", type=float, default=0,
+                        help="Share of calls failing with RESOURCE_EXHAUSTED")
+    parser.add_argument("--max-message-bytes", type=int, default=4 * 1024 * 1024,
+                        help="Requests above this size fail with RESOURCE_EXHAUSTED, like the gRPC default")
+    parser.add_argument("--decode-results", action="store_true",
+                        help="Fully decode every test result instead of only counting them")
+    parser.add_argument("--report-interval", type=float, default=10, help="Seconds between stats lines")
+    parser.add_argument("--duration", type=float, default=0, help="Seconds to serve for, 0 serves forever")
+    parser.add_argument("--seed", type=int, default=None, help="Seed of the injected failures")
+    args = parser.parse_args()
+    args.ssl = os.environ.get("CORALOGIX_ENDPOINT_SSL", "true").lower() != "false"
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
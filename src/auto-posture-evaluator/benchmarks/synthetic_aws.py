@@ -0,0 +1,420 @@
+"""Synthetic AWS account served through botocore's event hooks, for offline benchmarks.
+
+Every API call is answered from a generated inventory instead of AWS. Responses are built from the
+botocore output shape of the operation, so every tester gets well-formed data. The operations
+below are overridden so the inventories that matter for scaling have realistic content and sizes:
+S3 buckets and their attributes, security groups and their rules, IAM users, Lambda function
+versions and Route53 records. No pagination token is ever returned, so every list is one page.
+"""
+import collections
+import datetime
+import hashlib
+import json
+import re
+import threading
+import time
+
+import boto3
+import botocore.session
+
+SCALES = {
+    "small": {
+        "buckets": 100, "security_groups": 50, "rules_per_security_group": 10, "ec2_instances": 50,
+        "iam_users": 50, "lambda_functions": 20, "versions_per_lambda_function": 10,
+        "hosted_zones": 2, "records_per_hosted_zone": 100, "default_list_size": 2,
+    },
+    "medium": {
+        "buckets": 1000, "security_groups": 500, "rules_per_security_group": 10, "ec2_instances": 500,
+        "iam_users": 500, "lambda_functions": 200, "versions_per_lambda_function": 10,
+        "hosted_zones": 5, "records_per_hosted_zone": 2000, "default_list_size": 3,
+    },
+    "large": {
+        "buckets": 10000, "security_groups": 5000, "rules_per_security_group": 10, "ec2_instances": 5000,
+        "iam_users": 5000, "lambda_functions": 2000, "versions_per_lambda_function": 10,
+        "hosted_zones": 10, "records_per_hosted_zone": 10000, "default_list_size": 5,
+    },
+}
+
+_TOKEN_MEMBER = re.compile(r"^(Next.*|.*Token|.*Marker|NextRecord.*)$", re.IGNORECASE)
+_CREATION_DATE = datetime.datetime(2021, 1, 1, tzinfo=datetime.timezone.utc)
+_LAMBDA_RUNTIMES = ["python3.9", "python3.6", "nodejs14.x", "nodejs10.x", "ruby2.7", "go1.x"]
+
+
+class SyntheticError(Exception):
+    def __init__(self, code: str, status_code: int = 400):
+        super().__init__(code)
+        self.code = code
+        self.status_code = status_code
+
+
+class _SyntheticHttpResponse:
+    raw = None
+    content = b""
+
+    def __init__(self, status_code: int):
+        self.status_code = status_code
+        self.headers = {}
+
+
+def stable_fraction(*parts) -> float:
+    # Deterministic pseudo random value in [0, 1) so every run serves the same inventory
+    digest = hashlib.md5("/".join(str(part) for part in parts).encode("utf-8")).digest()
+    return int.from_bytes(digest[:4], "big") / 2 ** 32
+
+
+class SyntheticAccount:
+    def __init__(self, scale: dict, regions: list, account_id: str = "123456789012", latency_ms: float = 0):
+        self.scale = scale
+        self.regions = regions
+        self.account_id = account_id
+        self.latency_ms = latency_ms
+        self.calls = collections.Counter()
+        self._calls_lock = threading.Lock()
+        self._service_models = {}
+        self._overrides = {
+            ("sts", "GetCallerIdentity"): self._get_caller_identity,
+            ("sts", "AssumeRole"): self._assume_role,
+            ("ec2", "DescribeRegions"): self._describe_regions,
+            ("ec2", "DescribeSecurityGroups"): self._describe_security_groups,
+            ("ec2", "DescribeInstances"): self._describe_instances,
+            ("ec2", "DescribeAddresses"): self._describe_addresses,
+            ("s3", "ListBuckets"): self._list_buckets,
+            ("s3", "GetBucketLocation"): self._get_bucket_location,
+            ("s3", "GetBucketAcl"): self._get_bucket_acl,
+            ("s3", "GetBucketPolicy"): self._get_bucket_policy,
+            ("s3", "GetBucketPolicyStatus"): self._get_bucket_policy_status,
+            ("s3", "GetBucketVersioning"): self._get_bucket_versioning,
+            ("s3", "GetBucketEncryption"): self._get_bucket_encryption,
+            ("s3", "GetBucketLogging"): self._get_bucket_logging,
+            ("s3", "GetPublicAccessBlock"): self._get_public_access_block,
+            ("iam", "ListUsers"): self._list_users,
+            ("iam", "ListPolicies"): self._list_policies,
+            ("lambda", "ListFunctions"): self._list_functions,
+            ("lambda", "GetPolicy"): self._get_lambda_policy,
+            ("route53", "ListHostedZones"): self._list_hosted_zones,
+            ("route53", "ListResourceRecordSets"): self._list_resource_record_sets,
+        }
+
+    def create_session(self) -> boto3.session.Session:
+        session = boto3.session.Session(aws_access_key_id="synthetic", aws_secret_access_key="synthetic",
+                                        region_name="us-east-1")
+        session.events.register("before-parameter-build", self._on_before_parameter_build)
+        session.events.register("before-call", self._on_before_call)
+        return session
+
+    def call_counts(self) -> dict:
+        with self._calls_lock:
+            return dict(self.calls)
+
+    def _on_before_parameter_build(self, params, context, **kwargs):
+        context["synthetic_params"] = dict(params)
+
+    def _on_before_call(self, model, context, **kwargs):
+        service_name = model.service_model.service_name
+        with self._calls_lock:
+            self.calls[service_name + "." + model.name] += 1
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        region = context.get("client_region")
+        params = context.get("synthetic_params", {})
+        override = self._overrides.get((service_name, model.name))
+        try:
+            if override:
+                response = override(params, region)
+            else:
+                response = self._generate_structure(model.output_shape, 0, 0) if model.output_shape else {}
+        except SyntheticError as ex:
+            return _SyntheticHttpResponse(ex.status_code), {
+                "Error": {"Code": ex.code, "Message": "Synthetic " + ex.code},
+                "ResponseMetadata": {"HTTPStatusCode": ex.status_code},
+            }
+        response["ResponseMetadata"] = {"HTTPStatusCode": 200}
+        return _SyntheticHttpResponse(200), response
+
+    # Generic responses, from the botocore output shapes
+
+    def _generate(self, shape, name: str, index: int, depth: int):
+        type_name = shape.type_name
+        if type_name == "structure":
+            return self._generate_structure(shape, index, depth + 1)
+        if type_name == "list":
+            # Only top level lists are sized by the scale, nested ones hold a single item
+            size = self.scale["default_list_size"] if depth <= 1 else 1
+            return [self._generate(shape.member, name, item_index, depth + 1) for item_index in range(size)]
+        if type_name == "map":
+            # Attribute maps get one entry per known attribute name
+            keys = shape.key.enum or (["Policy"] if name == "Attributes"
+                                      else [name[:1].lower() + name[1:] + "-" + str(index)])
+            return {key: self._generate(shape.value, key, index, depth + 1) for key in keys}
+        if type_name == "string":
+            if shape.enum:
+                return shape.enum[index % len(shape.enum)]
+            if "Policy" in name or "Document" in name or "Configuration" in name:
+                return json.dumps(self._policy_document(name + "-" + str(index), "*" if index % 2 else None))
+            if name.endswith("Arn") or name.endswith("ARN"):
+                return "arn:aws:synthetic:us-east-1:" + self.account_id + ":" + name.lower() + "/" + str(index)
+            if name == "SslProtocols":
+                return "TLSv1." + str(index % 3)
+            if name.lower().endswith("version"):
+                return "1." + str(20 + index % 3)
+            return name[:1].lower() + name[1:] + "-" + str(index)
+        if type_name in ("integer", "long"):
+            return index + 1
+        if type_name in ("float", "double"):
+            return float(index + 1)
+        if type_name == "boolean":
+            return index % 2 == 0
+        if type_name == "timestamp":
+            return _CREATION_DATE
+        if type_name == "blob":
+            return b""
+        return None
+
+    def _generate_structure(self, shape, index: int, depth: int) -> dict:
+        output = {}
+        # Recursive shapes, like IAM policy conditions, are cut short
+        if depth > 12:
+            return output
+        for member_name, member_shape in shape.members.items():
+            if member_name == "IsTruncated":
+                output[member_name] = False
+            elif _TOKEN_MEMBER.match(member_name):
+                continue
+            else:
+                output[member_name] = self._generate(member_shape, member_name, index, depth)
+        return output
+
+    def _output_shape(self, service_name: str, operation_name: str):
+        if service_name not in self._service_models:
+            self._service_models[service_name] = botocore.session.get_session().get_service_model(service_name)
+        return self._service_models[service_name].operation_model(operation_name).output_shape
+
+    def _policy_document(self, resource: str, principal) -> dict:
+        return {"Version": "2012-10-17", "Statement": [
+            {"Sid": "Synthetic", "Effect": "Allow",
+             "Principal": principal or {"AWS": "arn:aws:iam::" + self.account_id + ":root"},
+             "Action": "*", "Resource": resource}]}
+
+    # Identity and regions
+
+    def _get_caller_identity(self, params, region):
+        return {"UserId": "AIDASYNTHETIC", "Account": self.account_id,
+                "Arn": "arn:aws:iam::" + self.account_id + ":user/benchmark"}
+
+    def _assume_role(self, params, region):
+        return {"Credentials": {"AccessKeyId": "synthetic", "SecretAccessKey": "synthetic", "SessionToken": "synthetic",
+                                "Expiration": datetime.datetime.now(datetime.timezone.utc) +
+                                datetime.timedelta(seconds=params.get("DurationSeconds", 3600))}}
+
+    def _describe_regions(self, params, region):
+        return {"Regions": [{"RegionName": region_name, "Endpoint": "ec2." + region_name + ".amazonaws.com",
+                             "OptInStatus": "opt-in-not-required"} for region_name in self.regions]}
+
+    def _regional_share(self, total: int, region: str) -> range:
+        # Regional inventories are spread evenly across the enabled regions
+        if region not in self.regions:
+            return range(0)
+        region_index = self.regions.index(region)
+        return range(region_index, total, len(self.regions))
+
+    # S3
+
+    def _bucket_name(self, index: int) -> str:
+        return "synthetic-bucket-" + str(index)
+
+    def _bucket_index(self, params) -> int:
+        return int(params["Bucket"].rsplit("-", 1)[-1])
+
+    def _list_buckets(self, params, region):
+        return {"Buckets": [{"Name": self._bucket_name(index), "CreationDate": _CREATION_DATE}
+                            for index in range(self.scale["buckets"])],
+                "Owner": {"DisplayName": "benchmark", "ID": "owner-id"}}
+
+    def _get_bucket_location(self, params, region):
+        bucket_region = self.regions[self._bucket_index(params) % len(self.regions)]
+        return {"LocationConstraint": None if bucket_region == "us-east-1" else bucket_region}
+
+    def _get_bucket_acl(self, params, region):
+        grants = [{"Grantee": {"Type": "CanonicalUser", "ID": "owner-id", "DisplayName": "benchmark"},
+                   "Permission": "FULL_CONTROL"}]
+        fraction = stable_fraction("acl", params["Bucket"])
+        if fraction < 0.05:
+            grants.append({"Grantee": {"Type": "Group", "URI": "http://acs.amazonaws.com/groups/global/AllUsers"},
+                           "Permission": "READ"})
+        elif fraction < 0.1:
+            grants.append({"Grantee": {"Type": "Group",
+                                       "URI": "http://acs.amazonaws.com/groups/global/AuthenticatedUsers"},
+                           "Permission": "WRITE"})
+        return {"Owner": {"DisplayName": "benchmark", "ID": "owner-id"}, "Grants": grants}
+
+    def _get_bucket_policy(self, params, region):
+        fraction = stable_fraction("policy", params["Bucket"])
+        if fraction < 0.4:
+            raise SyntheticError("NoSuchBucketPolicy", 404)
+        principal = "*" if fraction < 0.5 else {"AWS": "arn:aws:iam::" + self.account_id + ":root"}
+        resource = "arn:aws:s3:::" + params["Bucket"]
+        policy = {"Version": "2012-10-17", "Statement": [
+            {"Sid": "Read", "Effect": "Allow", "Principal": principal,
+             "Action": ["s3:GetObject", "s3:ListBucket"], "Resource": [resource, resource + "/*"]},
+            {"Sid": "DenyInsecure", "Effect": "Deny", "Principal": "*", "Action": "s3:*",
+             "Resource": resource + "/*", "Condition": {"Bool": {"aws:SecureTransport": "false"}}},
+        ]}
+        return {"Policy": json.dumps(policy)}
+
+    def _get_bucket_policy_status(self, params, region):
+        if stable_fraction("policy", params["Bucket"]) < 0.4:
+            raise SyntheticError("NoSuchBucketPolicy", 404)
+        return {"PolicyStatus": {"IsPublic": stable_fraction("policy", params["Bucket"]) < 0.5}}
+
+    def _get_bucket_versioning(self, params, region):
+        fraction = stable_fraction("versioning", params["Bucket"])
+        if fraction < 0.3:
+            return {}
+        return {"Status": "Enabled", "MFADelete": "Enabled" if fraction < 0.4 else "Disabled"}
+
+    def _get_bucket_encryption(self, params, region):
+        fraction = stable_fraction("encryption", params["Bucket"])
+        if fraction < 0.2:
+            raise SyntheticError("ServerSideEncryptionConfigurationNotFoundError", 404)
+        if fraction < 0.6:
+            rule = {"SSEAlgorithm": "AES256"}
+        else:
+            rule = {"SSEAlgorithm": "aws:kms",
+                    "KMSMasterKeyID": "arn:aws:kms:us-east-1:" + self.account_id + ":key/synthetic-key"}
+        return {"ServerSideEncryptionConfiguration": {"Rules": [{"ApplyServerSideEncryptionByDefault": rule,
+                                                                 "BucketKeyEnabled": fraction < 0.8}]}}
+
+    def _get_bucket_logging(self, params, region):
+        if stable_fraction("logging", params.get("Bucket")) < 0.5:
+            return {}
+        return {"LoggingEnabled": {"TargetBucket": "synthetic-logs", "TargetPrefix": params.get("Bucket", "")}}
+
+    def _get_public_access_block(self, params, region):
+        key = params.get("Bucket") or params.get("AccountId")
+        fraction = stable_fraction("public-access-block", key)
+        if fraction < 0.2:
+            raise SyntheticError("NoSuchPublicAccessBlockConfiguration", 404)
+        blocked = fraction >= 0.3
+        return {"PublicAccessBlockConfiguration": {"BlockPublicAcls": blocked, "IgnorePublicAcls": blocked,
+                                                   "BlockPublicPolicy": blocked, "RestrictPublicBuckets": blocked}}
+
+    # EC2
+
+    def _security_group(self, index: int) -> dict:
+        rules = []
+        for rule_index in range(self.scale["rules_per_security_group"]):
+            port = [22, 80, 443, 3389, 5432, 9200, 25, 137, 445, 53][rule_index % 10]
+            open_to_world = stable_fraction("rule", index, rule_index) < 0.1
+            rules.append({
+                "IpProtocol": "-1" if rule_index == 9 and open_to_world else ("udp" if port in (53, 137) else "tcp"),
+                "FromPort": port, "ToPort": port,
+                "IpRanges": [{"CidrIp": "0.0.0.0/0" if open_to_world else "10.0.0.0/8"}],
+                "Ipv6Ranges": [], "PrefixListIds": [], "UserIdGroupPairs": [],
+            })
+        return {
+            "GroupId": "sg-" + format(index, "08x"), "GroupName": "synthetic-" + str(index),
+            "Description": "synthetic", "OwnerId": self.account_id, "VpcId": "vpc-" + format(index % 10, "08x"),
+            "IpPermissions": rules,
+            "IpPermissionsEgress": [{"IpProtocol": "-1", "IpRanges": [{"CidrIp": "0.0.0.0/0"}],
+                                     "Ipv6Ranges": [], "PrefixListIds": [], "UserIdGroupPairs": []}],
+        }
+
+    def _describe_security_groups(self, params, region):
+        if params.get("GroupIds"):
+            indexes = [int(group_id[3:], 16) for group_id in params["GroupIds"]]
+        else:
+            indexes = self._regional_share(self.scale["security_groups"], region)
+        return {"SecurityGroups": [self._security_group(index) for index in indexes]}
+
+    def _describe_instances(self, params, region):
+        instances = []
+        for index in self._regional_share(self.scale["ec2_instances"], region):
+            group_index = index % max(self.scale["security_groups"], 1)
+            instances.append({
+                "InstanceId": "i-" + format(index, "017x"), "InstanceType": "t3.micro",
+                "State": {"Code": 16, "Name": "running"}, "LaunchTime": _CREATION_DATE,
+                "ImageId": "ami-synthetic", "VpcId": "vpc-" + format(index % 10, "08x"),
+                "SecurityGroups": [{"GroupId": "sg-" + format(group_index, "08x"),
+                                    "GroupName": "synthetic-" + str(group_index)}],
+                "PublicIpAddress": "52.0." + str(index // 256 % 256) + "." + str(index % 256),
+                "MetadataOptions": {"HttpTokens": "optional" if index % 3 else "required"},
+                "Monitoring": {"State": "disabled"}, "Tags": [], "CpuOptions": {"CoreCount": 1, "ThreadsPerCore": 2},
+            })
+        return {"Reservations": [{"ReservationId": "r-" + str(index), "OwnerId": self.account_id,
+                                  "Instances": instances[index:index + 50]}
+                                 for index in range(0, len(instances), 50)]}
+
+    def _describe_addresses(self, params, region):
+        public_ips = params.get("PublicIps") or []
+        # A share of the addresses referenced by DNS records are no longer allocated to the account
+        if any(stable_fraction("address", public_ip) < 0.1 for public_ip in public_ips):
+            raise SyntheticError("InvalidAddress.NotFound")
+        return {"Addresses": [{"PublicIp": public_ip, "AllocationId": "eipalloc-" + str(index), "Domain": "vpc"}
+                              for index, public_ip in enumerate(public_ips)]}
+
+    # IAM
+
+    def _list_users(self, params, region):
+        return {"Users": [{"UserName": "synthetic-user-" + str(index), "UserId": "AIDA" + format(index, "016d"),
+                           "Path": "/", "CreateDate": _CREATION_DATE, "PasswordLastUsed": _CREATION_DATE,
+                           "Arn": "arn:aws:iam::" + self.account_id + ":user/synthetic-user-" + str(index)}
+                          for index in range(self.scale["iam_users"])]}
+
+    def _list_policies(self, params, region):
+        response = self._generate_structure(self._output_shape("iam", "ListPolicies"), 0, 0)
+        # The support access check expects the AWS managed policy to exist
+        response["Policies"][0].update({"PolicyName": "AWSSupportAccess",
+                                        "Arn": "arn:aws:iam::aws:policy/AWSSupportAccess"})
+        return response
+
+    # Lambda
+
+    def _list_functions(self, params, region):
+        versions = self.scale["versions_per_lambda_function"] if params.get("FunctionVersion") == "ALL" else 1
+        functions = []
+        for index in self._regional_share(self.scale["lambda_functions"], region):
+            name = "synthetic-function-" + str(index)
+            arn = "arn:aws:lambda:" + region + ":" + self.account_id + ":function:" + name
+            for version in range(versions):
+                functions.append({
+                    "FunctionName": name, "FunctionArn": arn + ":" + (str(version) if version else "$LATEST"),
+                    "Runtime": _LAMBDA_RUNTIMES[(index + version) % len(_LAMBDA_RUNTIMES)],
+                    "Role": "arn:aws:iam::" + self.account_id + ":role/synthetic", "Handler": "index.handler",
+                    "Version": str(version) if version else "$LATEST", "LastModified": "2021-01-01T00:00:00.000+0000",
+                    "VpcConfig": {"SubnetIds": ["subnet-1"], "SecurityGroupIds": ["sg-1"], "VpcId": "vpc-1"}
+                    if index % 4 == 0 else {"SubnetIds": [], "SecurityGroupIds": [], "VpcId": ""},
+                })
+        return {"Functions": functions}
+
+    def _get_lambda_policy(self, params, region):
+        fraction = stable_fraction("lambda-policy", params["FunctionName"])
+        if fraction < 0.5:
+            raise SyntheticError("ResourceNotFoundException", 404)
+        principal = "*" if fraction < 0.55 else {"Service": "s3.amazonaws.com"}
+        return {"Policy": json.dumps({"Version": "2012-10-17", "Statement": [
+            {"Sid": "Invoke", "Effect": "Allow", "Principal": principal, "Action": "lambda:InvokeFunction",
+             "Resource": params["FunctionName"]}]}), "RevisionId": "1"}
+
+    # Route53
+
+    def _list_hosted_zones(self, params, region):
+        return {"HostedZones": [{"Id": "/hostedzone/Z" + format(index, "012d"),
+                                 "Name": "zone" + str(index) + ".example.",
+                                 "CallerReference": str(index), "ResourceRecordSetCount": 0,
+                                 "Config": {"PrivateZone": index % 5 == 4}}
+                                for index in range(self.scale["hosted_zones"])],
+                "IsTruncated": False, "MaxItems": "100"}
+
+    def _list_resource_record_sets(self, params, region):
+        zone_index = int(params["HostedZoneId"].rsplit("Z", 1)[-1])
+        records = []
+        for index in range(self.scale["records_per_hosted_zone"]):
+            name = "host" + str(index) + ".zone" + str(zone_index) + ".example."
+            if index % 4 == 3:
+                records.append({"Name": name, "Type": "CNAME", "TTL": 300,
+                                "ResourceRecords": [{"Value": "target" + str(index) + ".example."}]})
+            else:
+                value = "54." + str(zone_index % 256) + "." + str(index // 256 % 256) + "." + str(index % 256)
+                records.append({"Name": name, "Type": "A", "TTL": 300, "ResourceRecords": [{"Value": value}]})
+        return {"ResourceRecordSets": records, "IsTruncated": False, "MaxItems": "300"}
+
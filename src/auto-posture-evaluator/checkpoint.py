@@ -0,0 +1,18 @@
+import time
+
+
+class Checkpoint:
+    """The work items a run has completed, so a later invocation can resume it under the same execution id."""
+
+    def __init__(self, execution_id: str, started_at: float = None, completed: set = None):
+        self.execution_id = execution_id
+        self.started_at = started_at if started_at is not None else time.time()
+        self.completed = completed if completed is not None else set()
+
+    def to_dict(self) -> dict:
+        return {"execution_id": self.execution_id, "started_at": self.started_at,
+                "completed": sorted(self.completed)}
+
+    @classmethod
+    def from_dict(cls, checkpoint: dict) -> "Checkpoint":
+        return cls(checkpoint["execution_id"], checkpoint["started_at"], set(checkpoint["completed"]))
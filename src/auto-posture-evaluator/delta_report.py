@@ -0,0 +1,108 @@
+import json
+import os
+
+from result_record import ResultRecord
+
+DOCUMENT_PREFIX = 'delta-'
+
+DELTA_NEW = 'new'
+DELTA_CHANGED = 'changed'
+DELTA_DISAPPEARED = 'disappeared'
+
+
+def _result_fields(result) -> tuple:
+    if isinstance(result, ResultRecord):
+        return result.test_name, result.item, result.region, result.item_type, result.test_result
+    return result.get("test_name"), result.get("item"), result.get("region"), result.get("item_type"), \
+        result.get("test_result")
+
+
+class DeltaFilter:
+    """Lets through the results of one tester run that differ from the outcome of the previous run.
+
+    Results are matched on (test_name, item, region), kept as a JSON list. New and changed results are
+    sent with a `delta` field, unchanged ones are only counted, and the results of the previous run that
+    did not come back are sent once as disappeared. Every test then gets a summary result, on the
+    `summary_item` like "s3/global", with its pass and fail counts.
+    """
+
+    def __init__(self, baseline: dict, result_context, summary_item: str):
+        self.baseline = baseline
+        self.result_context = result_context
+        self.summary_item = summary_item
+        self.outcomes = {}
+        self.unchanged = 0
+        self.completed = False
+        self._test_counts = {}
+
+    def _count(self, test_name: str, counter: str):
+        counts = self._test_counts.get(test_name)
+        if counts is None:
+            counts = self._test_counts[test_name] = {"passed": 0, "failed": 0, "unchanged": 0, DELTA_NEW: 0,
+                                                     DELTA_CHANGED: 0, DELTA_DISAPPEARED: 0}
+        counts[counter] += 1
+
+    def filter(self, tester_result):
+        for result in tester_result:
+            test_name, item, region, item_type, test_result = _result_fields(result)
+            key = json.dumps([test_name, item, region], default=str)
+            self.outcomes[key] = [test_result, item_type]
+            self._count(test_name, "passed" if test_result == "no_issue_found" else "failed")
+            previous = self.baseline.get(key)
+            if previous is not None and previous[0] == test_result:
+                self.unchanged += 1
+                self._count(test_name, "unchanged")
+                continue
+            delta = DELTA_NEW if previous is None else DELTA_CHANGED
+            self._count(test_name, delta)
+            if isinstance(result, ResultRecord):
+                result.additional_data = dict(result.additional_data, delta=delta)
+                if previous is not None:
+                    result.additional_data["previous_result"] = previous[0]
+            else:
+                result = dict(result, delta=delta)
+                if previous is not None:
+                    result["previous_result"] = previous[0]
+            yield result
+        for key, (previous_result, item_type) in self.baseline.items():
+            if key in self.outcomes:
+                continue
+            test_name, item, region = json.loads(key)
+            self._count(test_name, DELTA_DISAPPEARED)
+            yield self.result_context.new_result(item, item_type, test_name, "no_issue_found", region=region,
+                                                 delta=DELTA_DISAPPEARED, previous_result=previous_result)
+        for test_name, counts in sorted(self._test_counts.items(), key=lambda item: str(item[0])):
+            yield self.result_context.new_result(self.summary_item, "delta_summary", test_name,
+                                                 "issue_found" if counts["failed"] else "no_issue_found", **counts)
+        self.completed = True
+
+
+class DeltaReporter:
+    """Keeps the outcome of every result of the previous run, per account and tester x region, in the state store."""
+
+    def __init__(self, state_store):
+        self.state_store = state_store
+
+    @classmethod
+    def from_environment(cls, state_store):
+        # DELTA_REPORTING=true only sends the results that changed since the previous run
+        if os.environ.get('DELTA_REPORTING', 'false').lower() != 'true':
+            return None
+        if state_store is None:
+            raise Exception("The delta reporting needs a state store, STATE_STORE cannot be none")
+        return cls(state_store)
+
+    @staticmethod
+    def _document_name(account_id: str, service: str, region: str) -> str:
+        return DOCUMENT_PREFIX + str(account_id) + ":" + service + ":" + region
+
+    def create_filter(self, account_id: str, service: str, region: str, result_context) -> DeltaFilter:
+        baseline = self.state_store.load(self._document_name(account_id, service, region)) or {}
+        return DeltaFilter(baseline, result_context, service + "/" + region)
+
+    def save(self, account_id: str, service: str, region: str, delta_filter: DeltaFilter):
+        # A tester that crashed or returned nothing keeps the previous baseline. The caller saves only once
+        # the results were delivered, a finding that failed to upload stays new for the next run.
+        if not delta_filter.completed:
+            return
+        self.state_store.save(self._document_name(account_id, service, region), delta_filter.outcomes)
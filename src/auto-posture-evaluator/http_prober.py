@@ -0,0 +1,97 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+import requests.adapters
+
+from single_flight import SingleFlight
+
+# Answers worth asking again, the endpoint being throttled or briefly unavailable
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class HttpProber:
+    """Probes URLs with HEAD requests through one pooled session, at most `max_workers` at a time.
+
+    Every request is bounded by a connect and a read timeout, connection errors, timeouts and transient
+    answers are retried with an exponential backoff, and each URL is probed once, its status being shared
+    by every caller. A probe waiting to be retried does not count against `max_workers`. The prober holds
+    connections and threads until it is closed.
+    """
+
+    def __init__(self, max_workers: int = 16, connect_timeout: float = 3, read_timeout: float = 5, retries: int = 2,
+                 backoff_factor: float = 0.2):
+        self.max_workers = max_workers
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        # Retried here rather than by urllib3, which would sleep while holding a slot of `_in_flight`
+        adapter = requests.adapters.HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers,
+                                                max_retries=0)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._statuses = SingleFlight()
+        # Callers probing at the same time share the bound
+        self._in_flight = threading.BoundedSemaphore(max_workers)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        # The probes `prefetch` started, cancelled by `close` when still queued
+        self._prefetched = []
+
+    @classmethod
+    def from_environment(cls):
+        return cls(int(os.environ.get('HTTP_PROBE_CONCURRENCY', '16')),
+                   float(os.environ.get('HTTP_PROBE_CONNECT_TIMEOUT', '3')),
+                   float(os.environ.get('HTTP_PROBE_READ_TIMEOUT', '5')),
+                   int(os.environ.get('HTTP_PROBE_RETRIES', '2')))
+
+    def probe(self, url: str):
+        # The status code of the URL, None when it could not be reached
+        return self._statuses.get(url, lambda: self._head(url))
+
+    def probe_all(self, urls: list) -> dict:
+        return dict(zip(urls, self._get_executor().map(self.probe, urls)))
+
+    def prefetch(self, urls: list):
+        # Starts probing the URLs without waiting for them, the later callers share these probes
+        executor = self._get_executor()
+        futures = [executor.submit(self.probe, url) for url in urls]
+        with self._executor_lock:
+            self._prefetched.extend(futures)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # One pool for every caller, with room for the probes backing off besides the ones in flight
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers * 2)
+            return self._executor
+
+    def _head(self, url: str):
+        status = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(self.backoff_factor * (2 ** (attempt - 1)))
+            with self._in_flight:
+                try:
+                    status = self.session.head(url, timeout=self.timeout).status_code
+                except (requests.ConnectionError, requests.Timeout):
+                    status = None
+                except requests.RequestException:
+                    return None
+            if status is not None and status not in RETRY_STATUSES:
+                return status
+        return status
+
+    def close(self):
+        # Only the probes already running are waited for, the queued ones are dropped
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+            prefetched, self._prefetched = self._prefetched, []
+        for future in prefetched:
+            future.cancel()
+        if executor is not None:
+            executor.shutdown(wait=True)
+        self.session.close()
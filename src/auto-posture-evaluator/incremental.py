@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+import time
+
+from result_record import ResultRecord
+
+MODE_OFF = 'off'
+MODE_REEMIT = 're-emit'
+MODE_SUPPRESS = 'suppress'
+
+DOCUMENT_PREFIX = 'incremental-'
+
+
+def _digest(value) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+                          .encode("utf-8")).hexdigest()
+
+
+def _capture(result) -> dict:
+    if isinstance(result, ResultRecord):
+        return {"record": {"item": result.item, "item_type": result.item_type, "test_name": result.test_name,
+                           "test_result": result.test_result, "region": result.region,
+                           "additional_data": result.additional_data}}
+    return {"dict": result}
+
+
+def _restore(result: dict, result_context, timestamp: float):
+    if "record" in result:
+        record = result["record"]
+        return ResultRecord(result_context, record["item"], record["item_type"], record["test_name"],
+                            record["test_result"], timestamp, record["region"], record["additional_data"])
+    return dict(result["dict"], timestamp=timestamp)
+
+
+class IncrementalTester:
+    """Runs the resource tests of a tester for its changed and new resources only.
+
+    The resources whose fingerprint is the one stored by a previous evaluation younger than `max_age_seconds`
+    are left out of `evaluated_resources`, and their stored results are re-emitted after the ones of the
+    tester, unless `reemit` is False. The other tests of the tester still evaluate every resource.
+    """
+
+    def __init__(self, tester, result_context, fingerprints: dict, evaluation: dict, reemit: bool,
+                 max_age_seconds: float):
+        self.tester = tester
+        self.result_context = result_context
+        self.fingerprints = fingerprints
+        self.reemit = reemit
+        self.resource_tests = set(tester.resource_tests)
+        self.evaluated_at = time.time()
+        self.previous = {}
+        if evaluation is not None:
+            self.previous = {resource_id: resource for resource_id, resource in evaluation.get("resources", {}).items()
+                             if fingerprints.get(resource_id) == resource["fingerprint"] and
+                             self.evaluated_at - resource["evaluated_at"] <= max_age_seconds}
+        if self.previous:
+            tester.evaluated_resources = set(fingerprints).difference(self.previous)
+        # The results of the resource tests of this run, per resource
+        self.results = {}
+
+    def declare_tested_service(self) -> str:
+        return self.tester.declare_tested_service()
+
+    def declare_tested_provider(self) -> str:
+        return self.tester.declare_tested_provider()
+
+    def run_tests(self):
+        tester_result = self.tester.run_tests()
+        if tester_result is None:
+            return None
+        if isinstance(tester_result, list):
+            for result in tester_result:
+                self._capture(result)
+            return tester_result + list(self._previous_results())
+        return self._run_iterator(tester_result)
+
+    def _run_iterator(self, tester_result):
+        for result in tester_result:
+            self._capture(result)
+            yield result
+        yield from self._previous_results()
+
+    def _capture(self, result):
+        if isinstance(result, ResultRecord):
+            item, test_name = result.item, result.test_name
+        else:
+            item, test_name = result.get("item"), result.get("test_name")
+        if test_name in self.resource_tests and item in self.fingerprints:
+            self.results.setdefault(item, []).append(_capture(result))
+
+    def _previous_results(self):
+        if not self.reemit:
+            return
+        timestamp = time.time()
+        for resource in self.previous.values():
+            for result in resource["results"]:
+                yield _restore(result, self.result_context, timestamp)
+
+    def to_dict(self) -> dict:
+        resources = {}
+        for resource_id, fingerprint in self.fingerprints.items():
+            if resource_id in self.previous:
+                resources[resource_id] = self.previous[resource_id]
+            else:
+                resources[resource_id] = {"fingerprint": fingerprint, "evaluated_at": self.evaluated_at,
+                                          "results": self.results.get(resource_id, [])}
+        return {"service": self.declare_tested_service(), "resources": resources}
+
+
+class IncrementalEvaluator:
+    """Re-runs the resource tests of a tester x region only for the resources that changed since their last run.
+
+    Testers take part by listing their `resource_tests` and returning the configuration those tests read
+    about each resource from `resource_fingerprints`. A digest of that configuration is stored per resource
+    with the results of its resource tests. The inventory is still collected and the other tests still run
+    in full, the resource tests, the conversion of their results and, when suppressed, their upload are
+    skipped for the unchanged resources.
+    """
+
+    def __init__(self, state_store, mode: str = MODE_REEMIT, max_age_seconds: float = 86400):
+        if mode not in (MODE_REEMIT, MODE_SUPPRESS):
+            raise Exception("Unknown incremental mode " + str(mode) + ", expected off, re-emit or suppress")
+        self.state_store = state_store
+        self.mode = mode
+        self.max_age_seconds = max_age_seconds
+
+    @classmethod
+    def from_environment(cls, state_store):
+        # INCREMENTAL_MODE=off (default), re-emit or suppress
+        mode = os.environ.get('INCREMENTAL_MODE', MODE_OFF).lower()
+        if mode == MODE_OFF:
+            return None
+        if state_store is None:
+            raise Exception("The incremental mode needs a state store, STATE_STORE cannot be none")
+        return cls(state_store, mode, float(os.environ.get('INCREMENTAL_MAX_AGE_HOURS', '24')) * 3600)
+
+    def wrap(self, work_item_key: str, tester, result_context) -> IncrementalTester:
+        fingerprints = {str(resource_id): _digest(configuration)
+                        for resource_id, configuration in tester.resource_fingerprints().items()}
+        evaluation = self.state_store.load(DOCUMENT_PREFIX + work_item_key)
+        return IncrementalTester(tester, result_context, fingerprints, evaluation, self.mode == MODE_REEMIT,
+                                 self.max_age_seconds)
+
+    def save(self, work_item_key: str, incremental_tester: IncrementalTester):
+        try:
+            self.state_store.save(DOCUMENT_PREFIX + work_item_key, incremental_tester.to_dict())
+        except Exception as ex:
+            # Results JSON cannot store, or a store that failed, leave the resources to be evaluated on the next run
+            print("WARN: Could not store the evaluation of " + work_item_key + ": " + str(ex))
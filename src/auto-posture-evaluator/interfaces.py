@@ -1,9 +1,59 @@
+import typing
+
+from result_record import ResultRecord
+
+GLOBAL_REGION = 'global'
+
+REGION_SCOPE_GLOBAL = 'global'
+REGION_SCOPE_REGIONAL = 'regional'
+REGION_SCOPE_GLOBAL_AND_REGIONAL = 'global_and_regional'
+
+
 class TesterInterface:
+    # Testers override these to tell the orchestrator where they have something to test, so it never
+    # instantiates a tester for a region it would skip. `tested_regions` optionally restricts a
+    # regional tester to an explicit list of regions.
+    tested_region_scope = REGION_SCOPE_REGIONAL
+    tested_regions = None
+    # The `inventory.Inventory` views the tester reads, collected concurrently before it is constructed
+    inventory_views = []
+    # The tests evaluating each resource on its own, from nothing but what `resource_fingerprints` returns
+    # for it, with the resource id as the item of their results. The incremental mode narrows
+    # `evaluated_resources` to the ids of the changed and new resources, the resource tests evaluate only
+    # those and the other tests every resource. None evaluates every resource.
+    resource_tests = []
+    evaluated_resources = None
+
     def declare_tested_service(self) -> str:
         pass
 
     def declare_tested_provider(self) -> str:
         pass
 
-    def run_tests(self) -> list:
+    def run_tests(self) -> typing.Union[typing.List[ResultRecord], typing.Iterator[ResultRecord]]:
+        # Either return the complete list of results, or yield them so the orchestrator can convert, batch
+        # and ship them while they are produced. Returning None means nothing was tested. Results are built
+        # through `AwsContext.result_context(...).new_result(...)`; plain dicts are still accepted.
         pass
+
+    def resource_fingerprints(self) -> dict:
+        # {resource id: the configuration the `resource_tests` read about the resource}
+        return {}
+
+    def select_evaluated(self, resources: list, id_key: str) -> list:
+        # The resources the resource tests evaluate
+        if self.evaluated_resources is None:
+            return resources
+        return [resource for resource in resources if resource[id_key] in self.evaluated_resources]
+
+    @classmethod
+    def declare_tested_regions(cls, regions: list) -> list:
+        tested_regions = []
+        for region in regions:
+            if region == GLOBAL_REGION:
+                if cls.tested_region_scope != REGION_SCOPE_REGIONAL:
+                    tested_regions.append(region)
+            elif cls.tested_region_scope != REGION_SCOPE_GLOBAL:
+                if cls.tested_regions is None or region in cls.tested_regions:
+                    tested_regions.append(region)
+        return tested_regions
@@ -0,0 +1,192 @@
+import concurrent.futures
+import json
+import threading
+
+from single_flight import SingleFlight
+
+COLLECTORS = {}
+
+_collecting = threading.local()
+
+
+def register_collector(view: str):
+    # A collector is called with the inventory and a region, and returns the whole view for that region
+    def register(collector):
+        COLLECTORS[view] = collector
+        return collector
+    return register
+
+
+def is_collecting() -> bool:
+    # Whether the calling thread is running a collector, e.g. to leave its AWS calls out of a cassette
+    return getattr(_collecting, 'depth', 0) > 0
+
+
+class Inventory:
+    """The resources of one account, collected once per (view, region) and shared by every tester.
+
+    Concurrent callers of a view share one collection. Views are shared between testers running in
+    parallel, so they must not be modified.
+    """
+
+    def __init__(self, aws_context, snapshot=None):
+        self.aws_context = aws_context
+        # An `inventory_snapshot.InventorySnapshot` read instead of AWS for the views it has
+        self.snapshot = snapshot
+        self._views = SingleFlight()
+
+    def get(self, view: str, region: str):
+        collector = COLLECTORS.get(view)
+        if collector is None:
+            raise Exception("Unknown inventory view " + view)
+        return self._views.get((view, region), lambda: self._collect(collector, view, region))
+
+    def collected(self) -> list:
+        # ((view, region), value) of every view collected so far
+        return self._views.items()
+
+    def _collect(self, collector, view: str, region: str):
+        if self.snapshot is not None and self.snapshot.contains(self.aws_context.account_id, view, region):
+            return self.snapshot.load(self.aws_context.account_id, view, region)
+        _collecting.depth = getattr(_collecting, 'depth', 0) + 1
+        try:
+            return collector(self, region)
+        finally:
+            _collecting.depth -= 1
+
+    def prefetch(self, views, region: str):
+        # Collects the views a tester declares concurrently, a failure is left for the tester to run into
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(views) or 1) as executor:
+            for view in views:
+                executor.submit(self.get, view, region)
+
+
+def _paginate(client, operation_name: str, result_key: str, **kwargs) -> list:
+    items = []
+    for page in client.get_paginator(operation_name).paginate(**kwargs):
+        items.extend(page.get(result_key, []))
+    return items
+
+
+@register_collector('ec2.instances')
+def _collect_ec2_instances(inventory, region):
+    reservations = _paginate(inventory.aws_context.get_client('ec2', region), 'describe_instances', 'Reservations')
+    return [instance for reservation in reservations for instance in reservation['Instances']]
+
+
+@register_collector('ec2.security_groups')
+def _collect_ec2_security_groups(inventory, region):
+    return _paginate(inventory.aws_context.get_client('ec2', region), 'describe_security_groups', 'SecurityGroups')
+
+
+@register_collector('ec2.security_groups_by_id')
+def _collect_ec2_security_groups_by_id(inventory, region):
+    return {group['GroupId']: group for group in inventory.get('ec2.security_groups', region)}
+
+
+@register_collector('ec2.vpcs')
+def _collect_ec2_vpcs(inventory, region):
+    return _paginate(inventory.aws_context.get_client('ec2', region), 'describe_vpcs', 'Vpcs')
+
+
+@register_collector('ec2.network_interfaces')
+def _collect_ec2_network_interfaces(inventory, region):
+    return _paginate(inventory.aws_context.get_client('ec2', region), 'describe_network_interfaces',
+                     'NetworkInterfaces')
+
+
+@register_collector('ec2.network_acls')
+def _collect_ec2_network_acls(inventory, region):
+    return _paginate(inventory.aws_context.get_client('ec2', region), 'describe_network_acls', 'NetworkAcls')
+
+
+@register_collector('ec2.internet_gateways')
+def _collect_ec2_internet_gateways(inventory, region):
+    return _paginate(inventory.aws_context.get_client('ec2', region), 'describe_internet_gateways',
+                     'InternetGateways')
+
+
+@register_collector('ec2.addresses')
+def _collect_ec2_addresses(inventory, region):
+    return inventory.aws_context.get_client('ec2', region).describe_addresses()['Addresses']
+
+
+@register_collector('ec2.account_attributes')
+def _collect_ec2_account_attributes(inventory, region):
+    return inventory.aws_context.get_client('ec2', region).describe_account_attributes()['AccountAttributes']
+
+
+@register_collector('config.configuration_recorders_status')
+def _collect_config_configuration_recorders_status(inventory, region):
+    response = inventory.aws_context.get_client('config', region).describe_configuration_recorder_status()
+    return response.get('ConfigurationRecordersStatus')
+
+
+@register_collector('service-quotas.ec2_standard_vcpus')
+def _collect_ec2_standard_vcpus_quota(inventory, region):
+    # Running On-Demand Standard instances
+    response = inventory.aws_context.get_client('service-quotas', region).get_service_quota(
+        ServiceCode='ec2', QuotaCode='L-1216C47A')
+    return response['Quota']['Value']
+
+
+@register_collector('elb.load_balancers')
+def _collect_elb_load_balancers(inventory, region):
+    return _paginate(inventory.aws_context.get_client('elb', region), 'describe_load_balancers',
+                     'LoadBalancerDescriptions')
+
+
+@register_collector('elb.load_balancer_attributes')
+def _collect_elb_load_balancer_attributes(inventory, region):
+    client = inventory.aws_context.get_client('elb', region)
+    return {elb['LoadBalancerName']: client.describe_load_balancer_attributes(
+        LoadBalancerName=elb['LoadBalancerName'])['LoadBalancerAttributes']
+        for elb in inventory.get('elb.load_balancers', region)}
+
+
+@register_collector('elbv2.load_balancers')
+def _collect_elbv2_load_balancers(inventory, region):
+    return _paginate(inventory.aws_context.get_client('elbv2', region), 'describe_load_balancers', 'LoadBalancers')
+
+
+@register_collector('elbv2.load_balancer_attributes')
+def _collect_elbv2_load_balancer_attributes(inventory, region):
+    client = inventory.aws_context.get_client('elbv2', region)
+    return {elb['LoadBalancerArn']: client.describe_load_balancer_attributes(
+        LoadBalancerArn=elb['LoadBalancerArn'])['Attributes'] for elb in inventory.get('elbv2.load_balancers', region)}
+
+
+@register_collector('elbv2.listeners')
+def _collect_elbv2_listeners(inventory, region):
+    client = inventory.aws_context.get_client('elbv2', region)
+    return {elb['LoadBalancerArn']: _paginate(client, 'describe_listeners', 'Listeners',
+                                              LoadBalancerArn=elb['LoadBalancerArn'])
+            for elb in inventory.get('elbv2.load_balancers', region)}
+
+
+@register_collector('eks.clusters')
+def _collect_eks_clusters(inventory, region):
+    client = inventory.aws_context.get_client('eks', region)
+    return [client.describe_cluster(name=name)['cluster'] for name in _paginate(client, 'list_clusters', 'clusters')]
+
+
+@register_collector('emr.clusters')
+def _collect_emr_clusters(inventory, region):
+    return _paginate(inventory.aws_context.get_client('emr', region), 'list_clusters', 'Clusters')
+
+
+@register_collector('emr.cluster_descriptions')
+def _collect_emr_cluster_descriptions(inventory, region):
+    client = inventory.aws_context.get_client('emr', region)
+    return {cluster['Id']: client.describe_cluster(ClusterId=cluster['Id'])['Cluster']
+            for cluster in inventory.get('emr.clusters', region)}
+
+
+@register_collector('emr.security_configurations')
+def _collect_emr_security_configurations(inventory, region):
+    # Parsed, for the configurations the clusters use
+    client = inventory.aws_context.get_client('emr', region)
+    names = {cluster['SecurityConfiguration'] for cluster in inventory.get('emr.cluster_descriptions', region).values()
+             if cluster.get('SecurityConfiguration') is not None}
+    return {name: json.loads(client.describe_security_configuration(Name=name)['SecurityConfiguration'])
+            for name in names}
@@ -0,0 +1,116 @@
+import datetime
+import gzip
+import json
+import os
+import threading
+
+from aws_cassette import MODE_RECORD, MODE_REPLAY, AwsCassette, _decode_value, _encode_value
+from inventory import is_collecting
+
+MODE_WRITE = 'write'
+MODE_READ = 'read'
+
+_SNAPSHOT_VERSION = 1
+_MANIFEST_NAME = 'manifest.json'
+_CASSETTE_NAME = 'aws_cassette.ndjson.gz'
+
+# How a view is laid out as lines: one line per item of a list, one {"key", "value"} line per entry of a
+# dict, or a single {"value"} line for anything else
+_SHAPE_LIST = 'list'
+_SHAPE_DICT = 'dict'
+_SHAPE_VALUE = 'value'
+
+
+class InventorySnapshot:
+    """The inventories of a run on disk, so every tester can run again against them without AWS calls.
+
+    Every view is a gzipped NDJSON file partitioned by account, service and region, like
+    `<account>/ec2/security_groups/us-east-1.ndjson.gz`, listed in `manifest.json`. The calls the
+    testers make outside of the inventory are captured next to it by an AWS cassette, which serves
+    them back when reading, so a read run never reaches AWS.
+    """
+
+    def __init__(self, directory: str, mode: str):
+        if mode not in (MODE_WRITE, MODE_READ):
+            raise Exception("Unknown inventory snapshot mode " + str(mode) + ", expected write or read")
+        self.directory = directory
+        self.mode = mode
+        self.written_partitions = 0
+        self.read_partitions = 0
+        self._manifest = {"version": _SNAPSHOT_VERSION, "accounts": {}}
+        self._lock = threading.Lock()
+        if mode == MODE_READ:
+            with open(os.path.join(directory, _MANIFEST_NAME)) as manifest_file:
+                self._manifest = json.load(manifest_file)
+            if self._manifest.get('version') != _SNAPSHOT_VERSION:
+                raise Exception("Unsupported inventory snapshot version " + str(self._manifest.get('version')))
+
+    @classmethod
+    def from_environment(cls):
+        mode = os.environ.get('INVENTORY_SNAPSHOT_MODE')
+        if not mode:
+            return None
+        return cls(os.environ.get('INVENTORY_SNAPSHOT_PATH', 'inventory_snapshot'), mode.lower())
+
+    def create_cassette(self) -> AwsCassette:
+        # The inventory calls are left out of the cassette, the snapshot already has their result
+        cassette_path = os.path.join(self.directory, _CASSETTE_NAME)
+        if self.mode == MODE_WRITE:
+            os.makedirs(self.directory, exist_ok=True)
+            return AwsCassette(cassette_path, MODE_RECORD, skip_call=is_collecting)
+        return AwsCassette(cassette_path, MODE_REPLAY)
+
+    def _partition_path(self, account_id: str, view: str, region: str) -> str:
+        service, view_name = view.split('.', 1)
+        return os.path.join(self.directory, account_id, service, view_name, region + ".ndjson.gz")
+
+    def contains(self, account_id: str, view: str, region: str) -> bool:
+        return region in self._manifest["accounts"].get(account_id, {}).get(view, {})
+
+    def load(self, account_id: str, view: str, region: str):
+        shape = self._manifest["accounts"][account_id][view][region]["shape"]
+        with gzip.open(self._partition_path(account_id, view, region), 'rt', encoding='utf-8') as partition_file:
+            lines = [json.loads(line, object_hook=_decode_value) for line in partition_file]
+        with self._lock:
+            self.read_partitions += 1
+        if shape == _SHAPE_LIST:
+            return lines
+        if shape == _SHAPE_DICT:
+            return {line["key"]: line["value"] for line in lines}
+        return lines[0]["value"]
+
+    def save(self, aws_contexts: list):
+        # Writes the views every context has collected so far, the testers that did not run are not in it
+        if self.mode != MODE_WRITE:
+            return
+        for aws_context in aws_contexts:
+            account_views = self._manifest["accounts"].setdefault(aws_context.account_id, {})
+            for (view, region), value in aws_context.inventory.collected():
+                account_views.setdefault(view, {})[region] = self._write_partition(
+                    self._partition_path(aws_context.account_id, view, region), value)
+        self._manifest["created_at"] = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        with open(os.path.join(self.directory, _MANIFEST_NAME), 'w') as manifest_file:
+            json.dump(self._manifest, manifest_file, indent=1, sort_keys=True)
+
+    def _write_partition(self, path: str, value) -> dict:
+        if isinstance(value, list):
+            shape, lines = _SHAPE_LIST, value
+        elif isinstance(value, dict):
+            shape, lines = _SHAPE_DICT, [{"key": key, "value": item} for key, item in value.items()]
+        else:
+            shape, lines = _SHAPE_VALUE, [{"value": value}]
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with gzip.open(path, 'wt', encoding='utf-8') as partition_file:
+            for line in lines:
+                partition_file.write(json.dumps(line, separators=(",", ":"), default=_encode_value) + "\n")
+        self.written_partitions += 1
+        return {"shape": shape, "records": len(lines)}
+
+    def to_dict(self) -> dict:
+        return {
+            "mode": self.mode,
+            "path": self.directory,
+            "accounts": len(self._manifest["accounts"]),
+            "written_partitions": self.written_partitions,
+            "read_partitions": self.read_partitions,
+        }
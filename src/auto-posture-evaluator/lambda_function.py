@@ -1,9 +1,25 @@
 #!/usr/local/bin/python3
+import json
+import sys
+
 import auto_posture_evaluator
 
 def lambda_handler(event, context):
     tester = auto_posture_evaluator.AutoPostureEvaluator()
-    tester.run_tests()
+    event = event if isinstance(event, dict) else {}
+    if event.get('mode') == 'plan':
+        # {"mode": "plan", "shard_count": K} returns the shards to fan out, e.g. with a Step Functions Map state
+        return tester.plan_shards(int(event['shard_count']), execution_id=event.get('execution_id'))
+    # {"shard_index": i, "shard_count": K} runs one shard, scheduled events bring the time shards agree on
+    shard_count = event.get('shard_count')
+    tester.run_tests(get_remaining_time_in_millis=context.get_remaining_time_in_millis,
+                     shard_index=int(event['shard_index']) if 'shard_index' in event else None,
+                     shard_count=int(shard_count) if shard_count is not None else None,
+                     execution_id=event.get('execution_id'), work_item_keys=event.get('work_items'),
+                     execution_seed=event.get('time'))
 
 if __name__ == "__main__":
-    auto_posture_evaluator.AutoPostureEvaluator().run_tests()
+    if len(sys.argv) == 3 and sys.argv[1] == "plan":
+        print(json.dumps(auto_posture_evaluator.AutoPostureEvaluator().plan_shards(int(sys.argv[2])), indent=2))
+    else:
+        auto_posture_evaluator.AutoPostureEvaluator().run_tests()
@@ -0,0 +1,223 @@
+import struct
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from . import SecurityReport, SecurityReportContext, SecurityReportIngestionServiceStub, PostSecurityReportResponse
+
+# Direct protobuf wire encoding of SecurityReport messages. The output is byte-identical to the
+# betterproto serialization of the same SecurityReport built through `model.helper.struct_from_dict`,
+# but skips the intermediate dataclasses and lets a batch reuse its encoded context and timestamps.
+
+_double = struct.Struct("<d").pack
+
+# Field tags, (field_number << 3) | wire_type
+_TAG_REPORT_CONTEXT = b"\x0a"
+_TAG_REPORT_TEST_RESULT = b"\x12"
+_TAG_REQUEST_SECURITY_REPORT = b"\x0a"
+_TAG_RESULT_NAME = b"\x1a"
+_TAG_RESULT_START_TIME = b"\x22"
+_TAG_RESULT_END_TIME = b"\x2a"
+_TAG_RESULT_ITEM = b"\x32"
+_TAG_RESULT_ITEM_TYPE = b"\x3a"
+_RESULT_TEST_FAILED = b"\x40\x01"
+_TAG_RESULT_ADDITIONAL_DATA = b"\x4a"
+_TAG_STRING_VALUE = b"\x0a"
+_TAG_STRUCT_FIELD = b"\x0a"
+_TAG_MAP_KEY = b"\x0a"
+_TAG_MAP_VALUE = b"\x12"
+_TAG_LIST_VALUE_ITEM = b"\x0a"
+_VALUE_NULL = b"\x08\x00"
+_TAG_VALUE_NUMBER = b"\x11"
+_TAG_VALUE_STRING = b"\x1a"
+_TAG_VALUE_STRUCT = b"\x2a"
+_TAG_VALUE_LIST = b"\x32"
+
+_SMALL_VARINTS = [bytes([i]) for i in range(128)]
+
+
+def _varint(value: int) -> bytes:
+    if value < 128:
+        return _SMALL_VARINTS[value]
+    output = bytearray()
+    while value >= 0x80:
+        output.append((value & 0x7F) | 0x80)
+        value >>= 7
+    output.append(value)
+    return bytes(output)
+
+
+def _signed_varint(value: int) -> bytes:
+    # int64/int32 fields hold negative numbers as their 64 bits two's complement
+    return _varint(value if value >= 0 else value + (1 << 64))
+
+
+def _length_delimited(tag: bytes, payload: bytes) -> bytes:
+    return tag + _varint(len(payload)) + payload
+
+
+def _string_wrapper(tag: bytes, value: str) -> bytes:
+    # google.protobuf.StringValue is always written once it is set, even when it holds ""
+    if not value:
+        return tag + b"\x00"
+    encoded = value.encode("utf-8")
+    inner = _TAG_STRING_VALUE + _varint(len(encoded)) + encoded
+    return tag + _varint(len(inner)) + inner
+
+
+def encode_timestamp_field(tag: bytes, value: datetime) -> bytes:
+    seconds = int(value.timestamp())
+    nanos = int(value.microsecond * 1e3)
+    payload = b""
+    if seconds:
+        payload += b"\x08" + _signed_varint(seconds)
+    if nanos:
+        payload += b"\x10" + _signed_varint(nanos)
+    if not payload:
+        return b""
+    return tag + _varint(len(payload)) + payload
+
+
+def encode_start_time(value: datetime) -> bytes:
+    return encode_timestamp_field(_TAG_RESULT_START_TIME, value)
+
+
+def encode_end_time(value: datetime) -> bytes:
+    return encode_timestamp_field(_TAG_RESULT_END_TIME, value)
+
+
+def _encode_value(value: Any) -> bytes:
+    # Mirrors `struct_from_dict.create_value`, including its type precedence (bools are numbers)
+    if isinstance(value, str):
+        if not value:
+            return _TAG_VALUE_STRING + b"\x00"
+        encoded = value.encode("utf-8")
+        return _TAG_VALUE_STRING + _varint(len(encoded)) + encoded
+    if isinstance(value, (int, float)):
+        return _TAG_VALUE_NUMBER + _double(float(value))
+    if isinstance(value, datetime):
+        encoded = value.isoformat().encode("utf-8")
+        return _TAG_VALUE_STRING + _varint(len(encoded)) + encoded
+    if isinstance(value, dict) and value and _has_string_keys(value):
+        return _length_delimited(_TAG_VALUE_STRUCT, encode_struct(value))
+    if isinstance(value, list):
+        payload = b"".join([_length_delimited(_TAG_LIST_VALUE_ITEM, _encode_value(item)) for item in value])
+        return _length_delimited(_TAG_VALUE_LIST, payload)
+    return _VALUE_NULL
+
+
+def _has_string_keys(value: dict) -> bool:
+    string_keys = 0
+    for key in value:
+        if isinstance(key, str):
+            string_keys += 1
+    if string_keys == len(value):
+        return True
+    if string_keys == 0:
+        return False
+    # Mixed key types, keep the exact (set order dependent) decision of `struct_from_dict`
+    return isinstance(list(set(value.keys()))[0], str)
+
+
+def encode_struct(fields: Dict[str, Any]) -> bytes:
+    """Encodes the google.protobuf.Struct payload that `struct_from_dict(fields)` serializes to."""
+    output = []
+    for key, value in fields.items():
+        if key:
+            encoded_key = key.encode("utf-8")
+            entry = _TAG_MAP_KEY + _varint(len(encoded_key)) + encoded_key
+        else:
+            entry = b""
+        encoded_value = _encode_value(value)
+        entry += _TAG_MAP_VALUE + _varint(len(encoded_value)) + encoded_value
+        output.append(_TAG_STRUCT_FIELD + _varint(len(entry)) + entry)
+    return b"".join(output)
+
+
+class EncodedTestResult:
+    """A SecurityReportTestResult encoded around its end time.
+
+    The end time is the only field that can still change once a result is produced (streamed
+    batches get it when they are cut), so the fields before and after it are kept encoded apart.
+    """
+    __slots__ = ("head", "tail")
+
+    def __init__(self, head: bytes, tail: bytes):
+        self.head = head
+        self.tail = tail
+
+    @property
+    def size(self) -> int:
+        return len(self.head) + len(self.tail)
+
+    def encode(self, end_time_field: bytes) -> bytes:
+        return _length_delimited(_TAG_REPORT_TEST_RESULT, self.head + end_time_field + self.tail)
+
+
+def encode_test_result(name: Optional[str], start_time_field: bytes, item: Optional[str],
+                       item_type: Optional[str], failed: bool, additional_data: Optional[Dict[str, Any]],
+                       encoded_additional_data: bytes = b"") -> EncodedTestResult:
+    # `encoded_additional_data` holds `encode_struct` output for fields shared by many results, written
+    # before the ones of `additional_data`
+    head = b""
+    if name is not None:
+        head += _string_wrapper(_TAG_RESULT_NAME, name)
+    head += start_time_field
+    tail = b""
+    if item is not None:
+        tail += _string_wrapper(_TAG_RESULT_ITEM, item)
+    if item_type is not None:
+        tail += _string_wrapper(_TAG_RESULT_ITEM_TYPE, item_type)
+    if failed:
+        tail += _RESULT_TEST_FAILED
+    if additional_data is not None:
+        tail += _length_delimited(_TAG_RESULT_ADDITIONAL_DATA, encoded_additional_data + encode_struct(additional_data))
+    return EncodedTestResult(head, tail)
+
+
+def encode_report_context(context: SecurityReportContext) -> bytes:
+    """Encodes the part of a SecurityReport that precedes its test results."""
+    return bytes(SecurityReport(context=context))
+
+
+class EncodedSecurityReport:
+    """A SecurityReport whose context and test results are already wire encoded."""
+
+    def __init__(self, context_field: bytes, test_results: List[EncodedTestResult], end_time_field: bytes):
+        self.context_field = context_field
+        self.test_results = test_results
+        self.end_time_field = end_time_field
+
+    def split(self) -> List["EncodedSecurityReport"]:
+        middle = len(self.test_results) // 2
+        return [EncodedSecurityReport(self.context_field, test_results, self.end_time_field)
+                for test_results in (self.test_results[:middle], self.test_results[middle:])]
+
+    def __bytes__(self) -> bytes:
+        end_time_field = self.end_time_field
+        return self.context_field + b"".join([test_result.encode(end_time_field)
+                                              for test_result in self.test_results])
+
+
+class EncodedPostSecurityReportRequest:
+    """PostSecurityReportRequest carrying an EncodedSecurityReport, as accepted by grpclib's ProtoCodec."""
+
+    def __init__(self, security_report: EncodedSecurityReport):
+        self.security_report = security_report
+
+    def SerializeToString(self) -> bytes:
+        report = bytes(self.security_report)
+        if not report:
+            return b""
+        return _length_delimited(_TAG_REQUEST_SECURITY_REPORT, report)
+
+
+class EncodedSecurityReportIngestionServiceStub(SecurityReportIngestionServiceStub):
+    async def post_encoded_security_report(
+        self, *, api_key: str, security_report: EncodedSecurityReport
+    ) -> "PostSecurityReportResponse":
+        return await self._unary_unary(
+            "/com.coralogix.xdr.ingestion.v1.SecurityReportIngestionService/PostSecurityReport",
+            EncodedPostSecurityReportRequest(security_report),
+            PostSecurityReportResponse,
+            metadata=[('authorization', api_key)]
+        )
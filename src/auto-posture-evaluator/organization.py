@@ -0,0 +1,97 @@
+import os
+import threading
+
+import boto3
+import botocore.credentials
+import botocore.session
+
+
+class AssumeRoleCredentialProvider(botocore.credentials.CredentialProvider):
+    """Credentials obtained by `refresh` on their first use and again shortly before they expire."""
+
+    METHOD = 'sts-assume-role'
+    CANONICAL_NAME = 'OrganizationAssumeRole'
+
+    def __init__(self, refresh):
+        super().__init__()
+        self.refresh = refresh
+
+    def load(self):
+        return botocore.credentials.DeferredRefreshableCredentials(self.refresh, self.METHOD)
+
+
+class AccountSessionPool:
+    """boto3 sessions into the accounts of an organization, assuming the same role in each of them.
+
+    The role is assumed on the first call made with a session, and assumed again by botocore shortly
+    before the credentials expire, so long runs never use expired credentials. Sessions are cached
+    per account and their credentials are safe to share between threads.
+    """
+
+    def __init__(self, aws_context, role_name: str, external_id: str = None, duration_seconds: int = 3600,
+                 session_name: str = 'auto-posture-evaluator'):
+        self.aws_context = aws_context
+        self.role_name = role_name
+        self.external_id = external_id
+        self.duration_seconds = duration_seconds
+        self.session_name = session_name
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_environment(cls, aws_context):
+        if not os.environ.get('ORGANIZATION_ROLE_NAME'):
+            raise Exception("Missing the ORGANIZATION_ROLE_NAME environment variable for the organization mode")
+        return cls(aws_context, os.environ.get('ORGANIZATION_ROLE_NAME'), os.environ.get('ORGANIZATION_EXTERNAL_ID'),
+                   int(os.environ.get('ORGANIZATION_SESSION_DURATION_SECONDS', '3600')))
+
+    def role_arn(self, account_id: str) -> str:
+        partition = self.aws_context.account_arn.split(':')[1]
+        return "arn:" + partition + ":iam::" + account_id + ":role/" + self.role_name
+
+    def get_session(self, account_id: str) -> boto3.session.Session:
+        with self._lock:
+            session = self._sessions.get(account_id)
+            if session is None:
+                botocore_session = botocore.session.Session()
+                botocore_session.register_component('credential_provider', botocore.credentials.CredentialResolver(
+                    [AssumeRoleCredentialProvider(self._assume_role_refresher(account_id))]))
+                session = boto3.session.Session(botocore_session=botocore_session,
+                                                region_name=self.aws_context.session.region_name)
+                self._sessions[account_id] = session
+            return session
+
+    def _assume_role_refresher(self, account_id: str):
+        assume_role_kwargs = {
+            "RoleArn": self.role_arn(account_id),
+            "RoleSessionName": self.session_name,
+            "DurationSeconds": self.duration_seconds,
+        }
+        if self.external_id:
+            assume_role_kwargs["ExternalId"] = self.external_id
+
+        def refresh() -> dict:
+            credentials = self.aws_context.get_client('sts').assume_role(**assume_role_kwargs)['Credentials']
+            return {
+                "access_key": credentials['AccessKeyId'],
+                "secret_key": credentials['SecretAccessKey'],
+                "token": credentials['SessionToken'],
+                "expiry_time": credentials['Expiration'].isoformat(),
+            }
+        return refresh
+
+
+def organization_accounts_from_environment(aws_context) -> list:
+    # ORGANIZATION_ACCOUNTS is a comma separated list of account ids, or `all` for the active accounts of
+    # the AWS Organizations organization, less the ORGANIZATION_EXCLUDED_ACCOUNTS. Unset, only the account of
+    # the credentials is scanned.
+    accounts = os.environ.get('ORGANIZATION_ACCOUNTS', '').strip()
+    if not accounts:
+        return []
+    if accounts.lower() != 'all':
+        return [account_id.strip() for account_id in accounts.split(',') if account_id.strip()]
+    account_ids = []
+    for page in aws_context.get_client('organizations').get_paginator('list_accounts').paginate():
+        account_ids.extend(account['Id'] for account in page['Accounts'] if account['Status'] == 'ACTIVE')
+    excluded = set(os.environ.get('ORGANIZATION_EXCLUDED_ACCOUNTS', '').split(','))
+    return [account_id for account_id in account_ids if account_id not in excluded]
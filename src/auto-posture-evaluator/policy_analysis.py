@@ -0,0 +1,199 @@
+import copy
+import json
+import re
+
+from single_flight import SingleFlight
+
+# Condition keys by what they restrict, keys are matched lower case
+CONDITION_NETWORK = 'network'
+CONDITION_PRINCIPAL = 'principal'
+CONDITION_SOURCE = 'source'
+CONDITION_TRANSPORT = 'transport'
+CONDITION_OTHER = 'other'
+
+_CONDITION_CLASSES = {
+    'aws:sourceip': CONDITION_NETWORK,
+    'aws:sourcevpc': CONDITION_NETWORK,
+    'aws:sourcevpce': CONDITION_NETWORK,
+    'aws:vpcsourceip': CONDITION_NETWORK,
+    'aws:principalorgid': CONDITION_PRINCIPAL,
+    'aws:principalorgpaths': CONDITION_PRINCIPAL,
+    'aws:principalaccount': CONDITION_PRINCIPAL,
+    'aws:principalarn': CONDITION_PRINCIPAL,
+    'aws:principaltype': CONDITION_PRINCIPAL,
+    'aws:userid': CONDITION_PRINCIPAL,
+    'aws:username': CONDITION_PRINCIPAL,
+    'aws:sourcearn': CONDITION_SOURCE,
+    'aws:sourceaccount': CONDITION_SOURCE,
+    'aws:sourceowner': CONDITION_SOURCE,
+    'aws:sourceorgid': CONDITION_SOURCE,
+    'aws:securetransport': CONDITION_TRANSPORT,
+}
+
+_ACCOUNT_ID = re.compile(r'\b\d{12}\b')
+
+# Policies are mostly the same few documents, parsed once by text
+_analyses = SingleFlight(max_size=4096)
+
+
+def _as_list(value) -> list:
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _compile_actions(patterns: list):
+    # Lower case patterns, * matches any characters and ? a single one
+    if not patterns:
+        return None
+    return re.compile("|".join(re.escape(pattern).replace(r'\*', '.*').replace(r'\?', '.')
+                               for pattern in patterns))
+
+
+def _literal_prefix(pattern: str) -> str:
+    for index, character in enumerate(pattern):
+        if character in '*?':
+            return pattern[:index]
+    return pattern
+
+
+class PolicyStatement:
+    """One statement of a policy, with its principals expanded, its actions compiled and its conditions classified.
+
+    `principals` are (type, value) pairs, like ('AWS', '*') or ('Service', 'lambda.amazonaws.com'), a
+    bare "*" principal being ('*', '*'). `conditions` are (operator, key, values) triples.
+    """
+
+    def __init__(self, statement: dict):
+        self.statement = statement
+        self.sid = statement.get('Sid')
+        self.effect = statement.get('Effect')
+        self.not_principal = 'NotPrincipal' in statement
+        self.principals = self._expand_principals(statement.get('NotPrincipal' if self.not_principal else 'Principal'))
+        self.not_action = 'NotAction' in statement
+        self.actions = [str(action) for action in _as_list(statement.get('NotAction' if self.not_action else 'Action'))]
+        self._patterns = [action.lower() for action in self.actions]
+        self._action_matcher = _compile_actions(self._patterns)
+        self.not_resource = 'NotResource' in statement
+        self.resources = [str(resource) for resource in
+                          _as_list(statement.get('NotResource' if self.not_resource else 'Resource'))]
+        self.conditions = []
+        for operator, keys in (statement.get('Condition') or {}).items():
+            for key, values in keys.items():
+                self.conditions.append((operator, key.lower(), tuple(str(value) for value in _as_list(values))))
+        self.condition_classes = frozenset(_CONDITION_CLASSES.get(key, CONDITION_OTHER)
+                                           for _, key, _ in self.conditions)
+
+    @staticmethod
+    def _expand_principals(principal) -> list:
+        if principal is None:
+            return []
+        if not isinstance(principal, dict):
+            return [('*', str(value)) for value in _as_list(principal)]
+        return [(principal_type, str(value)) for principal_type, values in principal.items()
+                for value in _as_list(values)]
+
+    @property
+    def is_allow(self) -> bool:
+        return self.effect == 'Allow'
+
+    @property
+    def is_anonymous(self) -> bool:
+        # "*" or {"AWS": "*"}, and an Allow with NotPrincipal, which allows everyone but the listed principals
+        if self.not_principal:
+            return self.is_allow
+        return any(value == '*' and principal_type in ('*', 'AWS') for principal_type, value in self.principals)
+
+    @property
+    def principal_accounts(self) -> set:
+        # The account ids of the AWS principals, from account ids and ARNs
+        accounts = set()
+        for principal_type, value in self.principals:
+            if principal_type == 'AWS':
+                match = _ACCOUNT_ID.search(value)
+                if match:
+                    accounts.add(match.group(0))
+        return accounts
+
+    def condition_values(self, operator: str, key: str) -> tuple:
+        return tuple(value for condition_operator, condition_key, values in self.conditions
+                     if condition_operator == operator and condition_key == key.lower() for value in values)
+
+    def allows_action(self, action: str = None) -> bool:
+        """Whether the statement covers `action`, any action when None.
+
+        An action ending with * is a family, like "s3:List*", covered when the statement may cover an action of it.
+        """
+        if action is None:
+            return bool(self.actions) or self.not_action
+        action = action.lower()
+        if not action.endswith('*'):
+            matched = self._action_matcher is not None and self._action_matcher.fullmatch(action) is not None
+            return matched != self.not_action
+        family = action[:-1]
+        if self.not_action:
+            # Excluded only when a NotAction pattern covers the whole family, like "s3:*" for "s3:List*"
+            return not any(pattern.endswith('*') and _literal_prefix(pattern) == pattern[:-1] and
+                           family.startswith(pattern[:-1]) for pattern in self._patterns)
+        for pattern in self._patterns:
+            prefix = _literal_prefix(pattern)
+            if prefix == pattern:
+                if pattern.startswith(family):
+                    return True
+            elif prefix.startswith(family) or family.startswith(prefix):
+                return True
+        return False
+
+
+class PolicyAnalysis:
+    """A policy parsed once, answering which actions it grants, and to whom, from an index of its statements.
+
+    Analyses are shared between the checks and the testers, so neither the document nor the statements
+    must be modified. Results reporting the policy get their own `copy_document()`.
+    """
+
+    def __init__(self, document: dict):
+        self.document = document
+        self.statements = [PolicyStatement(statement) for statement in _as_list(document.get('Statement'))
+                           if isinstance(statement, dict)]
+        self._allows = [statement for statement in self.statements if statement.is_allow]
+        # The index: allow statements by whether they are anonymous and unconditional
+        self._index = {
+            (False, False): self._allows,
+            (False, True): [statement for statement in self._allows if not statement.conditions],
+            (True, False): [statement for statement in self._allows if statement.is_anonymous],
+            (True, True): [statement for statement in self._allows if statement.is_anonymous and
+                           not statement.conditions],
+        }
+        self._grants = {}
+
+    def granting_statements(self, action: str = None, anonymous: bool = True, unconditional: bool = False) -> list:
+        """The allow statements granting `action`, to anyone when `anonymous`, without any condition when
+        `unconditional`. Deny statements are not weighed against them."""
+        return [statement for statement in self._index[(anonymous, unconditional)]
+                if statement.allows_action(action)]
+
+    def grants(self, action: str = None, anonymous: bool = True, unconditional: bool = False) -> bool:
+        key = (action, anonymous, unconditional)
+        granted = self._grants.get(key)
+        if granted is None:
+            granted = self._grants[key] = bool(self.granting_statements(action, anonymous, unconditional))
+        return granted
+
+    def copy_document(self) -> dict:
+        # A copy of the document for a result, which its consumers may modify
+        return copy.deepcopy(self.document)
+
+    def principal_accounts(self) -> set:
+        # The accounts the allow statements name
+        accounts = set()
+        for statement in self._allows:
+            accounts |= statement.principal_accounts
+        return accounts
+
+
+def analyze_policy(policy) -> PolicyAnalysis:
+    # A policy document, or its JSON text, memoized by text
+    if isinstance(policy, dict):
+        return PolicyAnalysis(policy)
+    return _analyses.get(policy, lambda: PolicyAnalysis(json.loads(policy)))
@@ -0,0 +1,168 @@
+import cProfile
+import contextlib
+import json
+import os
+import pstats
+import re
+import threading
+import tracemalloc
+
+MODE_CPROFILE = 'cprofile'
+MODE_TRACEMALLOC = 'tracemalloc'
+
+SCOPE_TESTER = 'tester'
+SCOPE_RUN = 'run'
+
+# Threads blocked on these are idle, their self time would hide the actual hotspots
+_IDLE_BUILTINS = re.compile(r"acquire' of '_thread|of '_queue\.SimpleQueue'|of 'select\.|time\.sleep|select\.select")
+
+
+def _short_path(path: str) -> str:
+    return "/".join(path.replace("\\", "/").split("/")[-2:])
+
+
+def _cpu_hotspots(stats: pstats.Stats, top_n: int) -> list:
+    hotspots = []
+    for (path, line, function), (_, calls, self_time, cumulative_time, _) in stats.stats.items():
+        if path == "~" and _IDLE_BUILTINS.search(function):
+            continue
+        hotspots.append({
+            "function": _short_path(path) + ":" + str(line) + "(" + function + ")",
+            "calls": calls,
+            "self_seconds": round(self_time, 4),
+            "cumulative_seconds": round(cumulative_time, 4),
+        })
+    hotspots.sort(key=lambda hotspot: hotspot["self_seconds"], reverse=True)
+    return hotspots[:top_n]
+
+
+def _allocation_sites(statistics: list, top_n: int) -> list:
+    sites = []
+    for statistic in statistics[:top_n]:
+        frame = statistic.traceback[0]
+        sites.append({
+            "site": _short_path(frame.filename) + ":" + str(frame.lineno),
+            "size_kib": round(getattr(statistic, "size_diff", statistic.size) / 1024, 1),
+            "count": getattr(statistic, "count_diff", statistic.count),
+        })
+    return sites
+
+
+class Profiler:
+    """Opt-in cProfile and tracemalloc profiling of each tester x region, or of the whole run.
+
+    Enabled by PROFILE_MODE=cprofile, tracemalloc or both comma separated. With the `tester` scope a
+    tester is profiled on the thread running it, threads it starts itself are not. The `run` scope
+    profiles every thread started during the run. tracemalloc is process wide, so allocations of
+    testers running concurrently are mixed, MAX_CONCURRENT_TESTERS=1 isolates them. The top
+    hotspots and allocation sites are kept per profile, and written with the raw pstats to
+    PROFILE_OUTPUT_DIR.
+    """
+
+    def __init__(self, modes: list, scope: str = SCOPE_TESTER, top_n: int = 20, output_dir: str = '/tmp',
+                 testers: list = None):
+        for mode in modes:
+            if mode not in (MODE_CPROFILE, MODE_TRACEMALLOC):
+                raise Exception("Unknown profiling mode " + mode + ", expected cprofile or tracemalloc")
+        if scope not in (SCOPE_TESTER, SCOPE_RUN):
+            raise Exception("Unknown profiling scope " + scope + ", expected tester or run")
+        self.cprofile = MODE_CPROFILE in modes
+        self.tracemalloc = MODE_TRACEMALLOC in modes
+        self.scope = scope
+        self.top_n = top_n
+        self.output_dir = output_dir
+        self.testers = testers
+        self.profiles = {}
+        self._lock = threading.Lock()
+        self._thread_profiles = []
+        self._run_snapshot = None
+        self._started_tracemalloc = False
+
+    @classmethod
+    def from_environment(cls):
+        modes = [mode.strip().lower() for mode in os.environ.get('PROFILE_MODE', '').split(',') if mode.strip()]
+        if not modes:
+            return None
+        # Named like in TESTER_LIST, e.g. s3,iam
+        testers = [tester + '_tester' for tester in os.environ.get('PROFILE_TESTERS', '').split(',') if tester]
+        return cls(modes, os.environ.get('PROFILE_SCOPE', SCOPE_TESTER).lower(),
+                   int(os.environ.get('PROFILE_TOP_N', '20')), os.environ.get('PROFILE_OUTPUT_DIR', '/tmp'),
+                   testers or None)
+
+    def start_run(self):
+        if self.tracemalloc and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        if self.scope == SCOPE_RUN:
+            if self.tracemalloc:
+                self._run_snapshot = tracemalloc.take_snapshot()
+                if hasattr(tracemalloc, 'reset_peak'):
+                    tracemalloc.reset_peak()
+            if self.cprofile:
+                threading.setprofile(self._start_thread_profile)
+                self._start_thread_profile()
+
+    def stop_run(self, execution_id: str):
+        try:
+            if self.scope == SCOPE_RUN:
+                profile = {}
+                if self.cprofile:
+                    threading.setprofile(None)
+                    with self._lock:
+                        thread_profiles, self._thread_profiles = self._thread_profiles, []
+                    # Every thread started during the run has its own profile, merged into a single one
+                    for thread_profile in thread_profiles:
+                        thread_profile.disable()
+                    stats = pstats.Stats(*thread_profiles)
+                    self._save(execution_id, "run", profile, stats)
+                if self.tracemalloc:
+                    self._add_allocations(profile, self._run_snapshot)
+                    profile["traced_peak_kib"] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+                self.profiles["run"] = profile
+        finally:
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+                self._started_tracemalloc = False
+        if self.output_dir:
+            with open(os.path.join(self.output_dir, execution_id + "-profiles.json"), "w") as profiles_file:
+                json.dump(self.profiles, profiles_file, indent=2)
+
+    def _start_thread_profile(self, *args):
+        # Called through the profile hook of every new thread, the profiler then takes over the hook
+        thread_profile = cProfile.Profile()
+        with self._lock:
+            self._thread_profiles.append(thread_profile)
+        thread_profile.enable()
+
+    @contextlib.contextmanager
+    def profile_tester(self, key: str, service: str, execution_id: str):
+        if self.scope != SCOPE_TESTER or (self.testers and service not in self.testers):
+            yield
+            return
+        profile = {}
+        snapshot = tracemalloc.take_snapshot() if self.tracemalloc else None
+        tester_profile = cProfile.Profile() if self.cprofile else None
+        if tester_profile:
+            tester_profile.enable()
+        try:
+            yield
+        finally:
+            if tester_profile:
+                tester_profile.disable()
+                self._save(execution_id, key, profile, pstats.Stats(tester_profile))
+            if snapshot:
+                self._add_allocations(profile, snapshot)
+            with self._lock:
+                self.profiles[key] = profile
+
+    def _add_allocations(self, profile: dict, snapshot):
+        statistics = tracemalloc.take_snapshot().compare_to(snapshot, 'lineno')
+        profile["allocation_sites"] = _allocation_sites(statistics, self.top_n)
+
+    def _save(self, execution_id: str, key: str, profile: dict, stats: pstats.Stats):
+        profile["cpu_hotspots"] = _cpu_hotspots(stats, self.top_n)
+        if self.output_dir:
+            # Raw stats can be explored later with `python -m pstats <file>` or snakeviz
+            path = os.path.join(self.output_dir, execution_id + "-" + re.sub(r"[^\w.-]", "_", key) + ".pstats")
+            stats.dump_stats(path)
+            profile["pstats_path"] = path
@@ -0,0 +1,119 @@
+import asyncio
+import threading
+import time
+
+from grpclib.client import Channel
+from grpclib.const import Status
+from grpclib.exceptions import GRPCError
+from model.encoder import EncodedSecurityReportIngestionServiceStub
+
+
+class SecurityReportReporter:
+    """Ships encoded SecurityReport batches over one long-lived gRPC channel.
+
+    The channel lives on a dedicated event loop thread. Tester threads hand batches over through a
+    bounded queue and only block when it is full, while up to `max_in_flight` PostSecurityReport
+    calls are kept running concurrently on the channel. `close()` drains the queue and closes the
+    channel once.
+    """
+
+    def __init__(self, host: str, port: int, api_key: str, ssl=True, max_in_flight: int = 4,
+                 queue_size: int = 16):
+        self.host = host
+        self.port = port
+        self.api_key = api_key
+        self.ssl = ssl
+        self.max_in_flight = max_in_flight
+        self.queue_size = queue_size
+        self.sent_batches = 0
+        self.sent_results = 0
+        self.failed_batches = 0
+        self.split_batches = 0
+        self.submitted_reports = 0
+        self.processed_reports = 0
+        self._loop = None
+        self._queue = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._submitted_lock = threading.Lock()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run_loop, name="security-report-reporter", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    def submit(self, report, service_name: str, run_stats=None):
+        # `run_stats`, a TesterRunStats, gets the time spent posting the report added to its upload time
+        if self._thread is None or not self._thread.is_alive():
+            raise Exception("The security report reporter is not running")
+        with self._submitted_lock:
+            self.submitted_reports += 1
+        asyncio.run_coroutine_threadsafe(self._queue.put((report, service_name, run_stats)), self._loop).result()
+
+    def is_drained(self) -> bool:
+        # True when every report submitted so far was either sent or given up on
+        processed_reports = self.processed_reports
+        return processed_reports == self.submitted_reports
+
+    def close(self):
+        if self._thread is None:
+            return
+        for _ in range(self.max_in_flight):
+            asyncio.run_coroutine_threadsafe(self._queue.put(None), self._loop).result()
+        self._thread.join()
+        self._thread = None
+
+    def _run_loop(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._serve())
+        finally:
+            self._ready.set()
+            self._loop.close()
+
+    async def _serve(self):
+        channel = Channel(host=self.host, port=self.port, ssl=self.ssl)
+        client = EncodedSecurityReportIngestionServiceStub(channel=channel)
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        workers = [asyncio.ensure_future(self._worker(client)) for _ in range(self.max_in_flight)]
+        self._ready.set()
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            channel.close()
+
+    async def _worker(self, client):
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                return
+            report, service_name, run_stats = item
+            post_start = time.monotonic()
+            await self._post(client, report, service_name, run_stats)
+            if run_stats is not None:
+                run_stats.upload_seconds += time.monotonic() - post_start
+            self.processed_reports += 1
+
+    async def _post(self, client, report, service_name, run_stats=None):
+        try:
+            await client.post_encoded_security_report(api_key=self.api_key, security_report=report)
+            self.sent_batches += 1
+            self.sent_results += len(report.test_results)
+        except GRPCError as ex:
+            if ex.status == Status.RESOURCE_EXHAUSTED and len(report.test_results) > 1:
+                # The server refused the message size, retry each half on its own
+                self.split_batches += 1
+                for half_report in report.split():
+                    await self._post(client, half_report, service_name, run_stats)
+            else:
+                self._report_failure(report, service_name, ex, run_stats)
+        except Exception as ex:
+            self._report_failure(report, service_name, ex, run_stats)
+
+    def _report_failure(self, report, service_name, ex, run_stats=None):
+        self.failed_batches += 1
+        if run_stats is not None:
+            run_stats.failed_batches += 1
+        print("ERROR: Failed to send " + str(len(report.test_results)) + " events for tester " +
+              service_name + " due to the following exception: " + str(ex))
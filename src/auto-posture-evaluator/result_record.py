@@ -0,0 +1,35 @@
+import time
+
+
+class ResultContext:
+    """Values shared by all the results of a tester run, stored once instead of on every result."""
+    __slots__ = ("user", "account_arn", "account", "region")
+
+    def __init__(self, user: str, account_arn: str, account: str, region: str = None):
+        self.user = user
+        self.account_arn = account_arn
+        self.account = account
+        self.region = region
+
+    def new_result(self, item, item_type: str, test_name: str, test_result: str, region: str = None,
+                   **additional_data) -> "ResultRecord":
+        # `region` overrides the region of the context for results about resources living elsewhere, like S3 buckets
+        return ResultRecord(self, item, item_type, test_name, test_result, time.time(),
+                            region if region is not None else self.region, additional_data)
+
+
+class ResultRecord:
+    """A single test result. Any keyword given to `ResultContext.new_result` is sent as additional data."""
+    __slots__ = ("context", "item", "item_type", "test_name", "test_result", "timestamp", "region",
+                 "additional_data")
+
+    def __init__(self, context: ResultContext, item, item_type: str, test_name: str, test_result: str,
+                 timestamp: float, region: str, additional_data: dict):
+        self.context = context
+        self.item = item
+        self.item_type = item_type
+        self.test_name = test_name
+        self.test_result = test_result
+        self.timestamp = timestamp
+        self.region = region
+        self.additional_data = additional_data
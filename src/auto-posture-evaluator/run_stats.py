@@ -0,0 +1,184 @@
+import threading
+import time
+
+import boto3
+
+import interfaces
+
+# Error codes AWS services answer with when a caller is rate limited, botocore retries them
+THROTTLING_ERROR_CODES = {
+    'Throttling', 'ThrottlingException', 'ThrottledException', 'RequestThrottledException',
+    'TooManyRequestsException', 'ProvisionedThroughputExceededException', 'TransactionInProgressException',
+    'RequestLimitExceeded', 'BandwidthLimitExceeded', 'LimitExceededException', 'RequestThrottled',
+    'SlowDown', 'PriorRequestNotComplete', 'EC2ThrottledException',
+}
+
+
+class ApiCallStats:
+    __slots__ = ("calls", "errors", "throttles", "retries", "total_seconds", "max_seconds")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.throttles = 0
+        self.retries = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "throttles": self.throttles,
+            "retries": self.retries,
+            "total_seconds": round(self.total_seconds, 3),
+            "max_seconds": round(self.max_seconds, 3),
+            "avg_seconds": round(self.total_seconds / self.calls, 4) if self.calls else 0,
+        }
+
+
+class ApiCallRecorder:
+    """Counts the AWS API calls of a session, per service and operation, through botocore's events.
+
+    A call is timed from its parameter validation to its parsed response, retries included. Throttled
+    attempts are counted as they come back, so throttling is visible even when a retry succeeds.
+    """
+
+    def __init__(self):
+        self.operations = {}
+        self._lock = threading.Lock()
+
+    def attach(self, session: boto3.session.Session):
+        session.events.register('before-parameter-build', self._on_before_parameter_build)
+        session.events.register('response-received', self._on_response_received)
+        session.events.register('after-call', self._on_after_call)
+        session.events.register('after-call-error', self._on_after_call_error)
+
+    def _get_stats(self, context) -> ApiCallStats:
+        operation_key = context.get('api_call_operation', ('unknown', 'unknown'))
+        stats = self.operations.get(operation_key)
+        if stats is None:
+            stats = self.operations[operation_key] = ApiCallStats()
+        return stats
+
+    def _on_before_parameter_build(self, model, context, **kwargs):
+        context['api_call_operation'] = (model.service_model.service_name, model.name)
+        context['api_call_start'] = time.monotonic()
+
+    def _on_response_received(self, parsed_response, context, **kwargs):
+        if parsed_response and parsed_response.get('Error', {}).get('Code') in THROTTLING_ERROR_CODES:
+            with self._lock:
+                self._get_stats(context).throttles += 1
+
+    def _on_after_call(self, http_response, parsed, context, **kwargs):
+        self._record(context, http_response.status_code >= 300,
+                     parsed.get('ResponseMetadata', {}).get('RetryAttempts', 0))
+
+    def _on_after_call_error(self, context, **kwargs):
+        self._record(context, True, 0)
+
+    def _record(self, context, failed: bool, retries: int):
+        duration = time.monotonic() - context.get('api_call_start', time.monotonic())
+        with self._lock:
+            stats = self._get_stats(context)
+            stats.calls += 1
+            stats.errors += failed
+            stats.retries += retries
+            stats.total_seconds += duration
+            if duration > stats.max_seconds:
+                stats.max_seconds = duration
+
+    def to_list(self) -> list:
+        with self._lock:
+            operations = [dict(service=service, operation=operation, **stats.to_dict())
+                          for (service, operation), stats in self.operations.items()]
+        operations.sort(key=lambda operation: operation["total_seconds"], reverse=True)
+        return operations
+
+
+class TesterRunStats:
+    """Where the time of one tester x region went. Upload time is the time its batches spent in
+    PostSecurityReport calls, which overlap with the tester itself."""
+
+    def __init__(self, service: str, region: str, account: str = None):
+        self.service = service
+        self.region = region
+        self.account = account
+        self.construction_seconds = 0.0
+        self.run_tests_seconds = 0.0
+        self.conversion_seconds = 0.0
+        self.submit_wait_seconds = 0.0
+        self.upload_seconds = 0.0
+        self.results = 0
+        self.batches = 0
+        # Batches the reporter gave up on, counted once they were posted
+        self.failed_batches = 0
+        self.failed = False
+        # With the incremental mode, the resources whose resource tests were run and the ones left unchanged
+        self.evaluated_resources = None
+        self.unchanged_resources = None
+        # With the delta reporting, the results left out because they did not change
+        self.unchanged_results = None
+
+    def to_dict(self) -> dict:
+        run_stats = {
+            "service": self.service,
+            "region": self.region,
+            "construction_seconds": round(self.construction_seconds, 3),
+            "run_tests_seconds": round(self.run_tests_seconds, 3),
+            "conversion_seconds": round(self.conversion_seconds, 3),
+            "submit_wait_seconds": round(self.submit_wait_seconds, 3),
+            "upload_seconds": round(self.upload_seconds, 3),
+            "results": self.results,
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+            "failed": self.failed,
+        }
+        if self.account:
+            run_stats["account"] = self.account
+        if self.unchanged_resources is not None:
+            run_stats["evaluated_resources"] = self.evaluated_resources
+            run_stats["unchanged_resources"] = self.unchanged_resources
+        if self.unchanged_results is not None:
+            run_stats["unchanged_results"] = self.unchanged_results
+        return run_stats
+
+
+class RunSummaryTester(interfaces.TesterInterface):
+    """Turns the run summary into test results, so it can be shipped like the results of any tester."""
+
+    def __init__(self, summary: dict, result_context, service_name: str):
+        self.summary = summary
+        self.result_context = result_context
+        self.service_name = service_name
+
+    def declare_tested_service(self) -> str:
+        return self.service_name
+
+    def declare_tested_provider(self) -> str:
+        return 'aws'
+
+    def run_tests(self) -> list:
+        result = []
+        for tester_stats in self.summary["testers"]:
+            tester_stats = dict(tester_stats)
+            region = tester_stats.pop("region")
+            item = tester_stats["service"] + ":" + region
+            if "account" in tester_stats:
+                # The account of the results is the one running the evaluator
+                tester_stats["scanned_account"] = tester_stats.pop("account")
+                item = tester_stats["scanned_account"] + ":" + item
+            result.append(self.result_context.new_result(
+                item, "tester_run", "tester_run_stats",
+                "issue_found" if tester_stats["failed"] else "no_issue_found", region=region, **tester_stats))
+        for operation_stats in self.summary["api_calls"]:
+            operation_stats = dict(operation_stats)
+            item = operation_stats["service"] + "." + operation_stats["operation"]
+            if "account" in operation_stats:
+                operation_stats["scanned_account"] = operation_stats.pop("account")
+                item = operation_stats["scanned_account"] + ":" + item
+            result.append(self.result_context.new_result(
+                item, "aws_api_operation",
+                "aws_api_call_stats", "issue_found" if operation_stats["throttles"] else "no_issue_found",
+                **operation_stats))
+        return result
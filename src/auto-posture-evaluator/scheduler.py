@@ -0,0 +1,104 @@
+import collections
+import concurrent.futures
+import time
+
+
+class WorkItem:
+    def __init__(self, tester, region, aws_context=None):
+        self.tester = tester
+        self.region = region
+        self.service = tester.__module__.split('.')[-1]
+        # Only set when scanning several accounts, the run's context is used otherwise
+        self.aws_context = aws_context
+        self.account_id = aws_context.account_id if aws_context else None
+
+    @property
+    def key(self) -> str:
+        if self.account_id:
+            return self.account_id + ":" + self.service + ":" + self.region
+        return self.service + ":" + self.region
+
+
+class WorkItemFailure:
+    def __init__(self, work_item, exception):
+        self.work_item = work_item
+        self.exception = exception
+
+
+class SchedulerStats:
+    def __init__(self):
+        self.completed = 0
+        self.failures = []
+        # Items never started because the deadline was reached
+        self.skipped = []
+        self.wall_time = 0.0
+        self.cpu_time = 0.0
+        self.summed_item_time = 0.0
+
+
+class TesterScheduler:
+    """Runs (tester, region) work items concurrently.
+
+    At most `max_workers` items run at the same time, and at most
+    `max_workers_per_service` of them belong to the same tester module and account.
+    """
+
+    def __init__(self, max_workers: int, max_workers_per_service: int):
+        if max_workers < 1 or max_workers_per_service < 1:
+            raise Exception("The scheduler concurrency limits must be positive integers")
+        self.max_workers = max_workers
+        self.max_workers_per_service = max_workers_per_service
+
+    def run(self, work_items, handler, deadline: float = None, on_item_done=None) -> SchedulerStats:
+        # No item is started once time.monotonic() passes `deadline`, the running ones are awaited.
+        # `on_item_done(work_item, exception)` is called on the calling thread as each item ends.
+        stats = SchedulerStats()
+        pending = collections.deque(work_items)
+        running = {}
+        running_per_service = collections.Counter()
+        wall_start = time.monotonic()
+        cpu_start = time.process_time()
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                if pending and deadline is not None and time.monotonic() >= deadline:
+                    stats.skipped.extend(pending)
+                    pending.clear()
+                    if not running:
+                        break
+                for _ in range(len(pending)):
+                    if len(running) >= self.max_workers:
+                        break
+                    work_item = pending.popleft()
+                    if running_per_service[work_item.account_id, work_item.service] >= \
+                            self.max_workers_per_service:
+                        pending.append(work_item)
+                        continue
+                    running_per_service[work_item.account_id, work_item.service] += 1
+                    running[executor.submit(self._run_item, handler, work_item)] = work_item
+
+                done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    work_item = running.pop(future)
+                    running_per_service[work_item.account_id, work_item.service] -= 1
+                    item_time, exception = future.result()
+                    stats.summed_item_time += item_time
+                    if exception is not None:
+                        stats.failures.append(WorkItemFailure(work_item, exception))
+                    else:
+                        stats.completed += 1
+                    if on_item_done:
+                        on_item_done(work_item, exception)
+
+        stats.wall_time = time.monotonic() - wall_start
+        stats.cpu_time = time.process_time() - cpu_start
+        return stats
+
+    @staticmethod
+    def _run_item(handler, work_item):
+        item_start = time.monotonic()
+        try:
+            handler(work_item)
+        except Exception as ex:
+            return time.monotonic() - item_start, ex
+        return time.monotonic() - item_start, None
@@ -0,0 +1,131 @@
+import heapq
+import statistics
+import time
+import uuid
+
+# Relative cost of a tester x region that has no recorded duration yet. Testers walking whole account
+# inventories or probing every resource weigh more than the default of 1.
+STATIC_WEIGHTS = {
+    's3_tester': 20.0,
+    'iam_tester': 10.0,
+    'ec2_tester': 6.0,
+    'route53_tester': 6.0,
+    'lambda_tester': 4.0,
+    'vpc_tester': 3.0,
+    'elb_tester': 3.0,
+    'cloudtrail_tester': 2.0,
+    'cloudwatch_tester': 2.0,
+}
+DEFAULT_WEIGHT = 1.0
+
+DURATIONS_DOCUMENT = 'durations'
+
+
+def shard_document_name(name: str, shard_index: int, shard_count: int) -> str:
+    if shard_count is None:
+        return name
+    return name + "-shard-" + str(shard_index) + "-of-" + str(shard_count)
+
+
+def shared_execution_id(account_id: str, seed: str) -> str:
+    # Shards started independently, like by several scheduled rules, agree on the execution id of the run
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, "auto-posture-evaluator:" + str(account_id) + ":" + seed))
+
+
+class DurationHistory:
+    """Smoothed duration of every work item over the previous runs.
+
+    Entries remember the execution that last updated them and the value before it, so shards of one
+    execution still plan with the same durations when some of them already finished and recorded theirs.
+    """
+
+    def __init__(self, entries: dict = None):
+        self.entries = entries if entries is not None else {}
+
+    @classmethod
+    def load(cls, state_store, shard_count: int = None) -> "DurationHistory":
+        # Every shard records its own document, the newest entry of a work item wins
+        names = [DURATIONS_DOCUMENT]
+        if shard_count:
+            names.extend(shard_document_name(DURATIONS_DOCUMENT, shard_index, shard_count)
+                         for shard_index in range(shard_count))
+        entries = {}
+        for name in names:
+            for key, entry in (state_store.load(name) or {}).items():
+                if key not in entries or entry["updated_at"] > entries[key]["updated_at"]:
+                    entries[key] = entry
+        return cls(entries)
+
+    def estimate(self, key: str, execution_id: str = None):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry["execution_id"] == execution_id:
+            return entry.get("previous_seconds")
+        return entry["seconds"]
+
+    def record(self, key: str, seconds: float, execution_id: str):
+        # Recording an item twice in one execution keeps the value from before the execution as the previous one
+        previous_seconds = self.estimate(key, execution_id)
+        smoothed_seconds = seconds if previous_seconds is None else (previous_seconds + seconds) / 2
+        self.entries[key] = {"seconds": round(smoothed_seconds, 3), "previous_seconds": previous_seconds,
+                             "execution_id": execution_id, "updated_at": time.time()}
+
+    def save(self, state_store, name: str):
+        state_store.save(name, self.entries)
+
+
+class Shard:
+    def __init__(self, index: int):
+        self.index = index
+        self.work_items = []
+        self.estimated_seconds = 0.0
+
+
+class ShardPlanner:
+    """Splits the work items into `shard_count` balanced shards with the longest processing time first rule.
+
+    Items are estimated from their recorded durations. Items never recorded get their static weight,
+    scaled to seconds by the median seconds per weight of the recorded ones. Planning is deterministic,
+    so every shard computing the plan on its own from the same history gets the same one.
+    """
+
+    def __init__(self, shard_count: int, history: DurationHistory = None, execution_id: str = None):
+        if shard_count < 1:
+            raise Exception("The shard count must be a positive integer")
+        self.shard_count = shard_count
+        self.history = history if history is not None else DurationHistory()
+        self.execution_id = execution_id
+
+    @classmethod
+    def for_independent_shards(cls, shard_count: int, state_store, history: DurationHistory,
+                               execution_id: str = None) -> "ShardPlanner":
+        # Shards planning on their own agree on the plan only when they read the same durations. With a store
+        # that is not shared, each instance has its own history, so they all plan from the static weights.
+        if state_store is None or not state_store.shared:
+            history = DurationHistory()
+        return cls(shard_count, history, execution_id)
+
+    def estimate(self, work_items) -> dict:
+        recorded = {}
+        for work_item in work_items:
+            seconds = self.history.estimate(work_item.key, self.execution_id)
+            if seconds is not None:
+                recorded[work_item.key] = seconds
+        ratios = [recorded[work_item.key] / STATIC_WEIGHTS.get(work_item.service, DEFAULT_WEIGHT)
+                  for work_item in work_items if work_item.key in recorded]
+        seconds_per_weight = statistics.median(ratios) if ratios else 1.0
+        return {work_item.key: recorded.get(work_item.key,
+                                            STATIC_WEIGHTS.get(work_item.service, DEFAULT_WEIGHT) * seconds_per_weight)
+                for work_item in work_items}
+
+    def plan(self, work_items) -> list:
+        estimates = self.estimate(work_items)
+        shards = [Shard(shard_index) for shard_index in range(self.shard_count)]
+        loads = [(0.0, shard_index) for shard_index in range(self.shard_count)]
+        for work_item in sorted(work_items, key=lambda item: (-estimates[item.key], item.key)):
+            load, shard_index = heapq.heappop(loads)
+            shards[shard_index].work_items.append(work_item)
+            shards[shard_index].estimated_seconds = load + estimates[work_item.key]
+            heapq.heappush(loads, (shards[shard_index].estimated_seconds, shard_index))
+        return shards
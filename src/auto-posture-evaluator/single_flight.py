@@ -0,0 +1,122 @@
+import collections
+import copy
+import threading
+import time
+
+
+class _Call:
+    __slots__ = ("done", "value", "exception")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.exception = None
+
+
+class _Entry:
+    __slots__ = ("value", "exception", "expires_at")
+
+    def __init__(self, value, exception, expires_at):
+        self.value = value
+        self.exception = exception
+        self.expires_at = expires_at
+
+
+class SingleFlight:
+    """Memoizes a value per key, computing it once even when several threads ask for it at the same time.
+
+    The first caller of a key computes it, the callers arriving meanwhile wait for that computation and
+    get its value or its exception. Failures are not memoized, the next caller computes the key again,
+    except the ones `cache_error` accepts, like a NoSuchBucketPolicy answer, which are raised again to
+    the next callers. Entries older than `ttl_seconds` are computed again, and past `max_size` entries
+    the least recently used one is evicted.
+    """
+
+    def __init__(self, ttl_seconds: float = None, max_size: int = None, cache_error=None):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self.cache_error = cache_error
+        # Calls answered from memory or by joining a computation in flight, and calls that computed
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = collections.OrderedDict()
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def _lookup(self, key):
+        # The live entry of a key, called under the lock
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at is not None and time.monotonic() >= entry.expires_at:
+            del self._entries[key]
+            self.evictions += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def get(self, key, compute):
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is None:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = _Call()
+                    self.misses += 1
+                else:
+                    self.hits += 1
+            else:
+                self.hits += 1
+        if entry is not None:
+            if entry.exception is not None:
+                # A copy, so the memoized exception does not collect the traceback of every caller
+                raise copy.copy(entry.exception)
+            return entry.value
+        if not leader:
+            call.done.wait()
+            if call.exception is not None:
+                raise call.exception
+            return call.value
+        try:
+            call.value = compute()
+        except BaseException as ex:
+            call.exception = ex
+            raise
+        finally:
+            with self._lock:
+                if call.exception is None or (self.cache_error is not None and
+                                              isinstance(call.exception, Exception) and
+                                              self.cache_error(call.exception)):
+                    self._store(key, call.value, call.exception)
+                del self._calls[key]
+            call.done.set()
+        return call.value
+
+    def _store(self, key, value, exception):
+        expires_at = None if self.ttl_seconds is None else time.monotonic() + self.ttl_seconds
+        self._entries[key] = _Entry(value, exception, expires_at)
+        self._entries.move_to_end(key)
+        while self.max_size is not None and len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def __contains__(self, key) -> bool:
+        # Whether the key has a memoized value, memoized failures do not count
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry.exception is None and (
+                entry.expires_at is None or time.monotonic() < entry.expires_at)
+
+    def items(self) -> list:
+        # (key, value) of the memoized values
+        now = time.monotonic()
+        with self._lock:
+            return [(key, entry.value) for key, entry in self._entries.items()
+                    if entry.exception is None and (entry.expires_at is None or now < entry.expires_at)]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "size": len(self._entries)}
@@ -0,0 +1,76 @@
+import json
+import os
+
+from botocore.exceptions import ClientError
+
+
+class FileStateStore:
+    """Named JSON documents kept across runs, as files of a directory."""
+    # Seen by one instance only, a Lambda instance keeps its own /tmp
+    shared = False
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name + ".json")
+
+    def load(self, name: str):
+        path = self._path(name)
+        if not os.path.exists(path):
+            return None
+        with open(path) as document_file:
+            return json.load(document_file)
+
+    def save(self, name: str, document):
+        os.makedirs(self.directory, exist_ok=True)
+        # Written aside and renamed, so a process killed mid-write leaves the previous document
+        temporary_path = self._path(name) + ".tmp"
+        with open(temporary_path, "w") as document_file:
+            json.dump(document, document_file)
+        os.replace(temporary_path, self._path(name))
+
+    def delete(self, name: str):
+        if os.path.exists(self._path(name)):
+            os.remove(self._path(name))
+
+
+class S3StateStore:
+    """Named JSON documents kept across runs, as objects under an S3 prefix, to share them between instances."""
+    shared = True
+
+    def __init__(self, s3_client, bucket: str, prefix: str):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def load(self, name: str):
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket, Key=self.prefix + name + ".json")
+        except ClientError as ex:
+            if ex.response['Error']['Code'] in ('NoSuchKey', '404'):
+                return None
+            raise
+        return json.loads(response['Body'].read())
+
+    def save(self, name: str, document):
+        self.s3_client.put_object(Bucket=self.bucket, Key=self.prefix + name + ".json", Body=json.dumps(document),
+                                  ContentType='application/json')
+
+    def delete(self, name: str):
+        self.s3_client.delete_object(Bucket=self.bucket, Key=self.prefix + name + ".json")
+
+
+def state_store_from_environment(aws_context):
+    # STATE_STORE=file (default), s3 or none
+    store_type = os.environ.get('STATE_STORE', 'file').lower()
+    if store_type == 'none':
+        return None
+    if store_type == 'file':
+        return FileStateStore(os.environ.get('STATE_DIR', '/tmp/auto_posture_evaluator'))
+    if store_type == 's3':
+        if not os.environ.get('STATE_S3_BUCKET'):
+            raise Exception("Missing the STATE_S3_BUCKET environment variable for the s3 state store")
+        return S3StateStore(aws_context.get_client('s3'), os.environ.get('STATE_S3_BUCKET'),
+                            os.environ.get('STATE_S3_PREFIX', 'auto-posture-evaluator/'))
+    raise Exception("Unknown state store " + store_type + ", expected file, s3 or none")
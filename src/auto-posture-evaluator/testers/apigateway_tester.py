@@ -1,19 +1,16 @@
 import concurrent.futures
-import time
 
-import boto3
 import interfaces
+from aws_context import AwsContext
 
 
 class Tester(interfaces.TesterInterface):
-    def __init__(self, region_name):
-        self.ssm = boto3.client('ssm')
-        self.aws_apigatewayv2_client = boto3.client('apigatewayv2', region_name=region_name)
+    def __init__(self, region_name, aws_context=None):
+        self.aws_context = aws_context if aws_context else AwsContext()
+        self.aws_apigatewayv2_client = self.aws_context.get_client('apigatewayv2', region_name=region_name)
         self.cache = {}
         self.region_name = region_name
-        self.user_id = boto3.client('sts').get_caller_identity().get('UserId')
-        self.account_arn = boto3.client('sts').get_caller_identity().get('Arn')
-        self.account_id = boto3.client('sts').get_caller_identity().get('Account')
+        self.result_context = self.aws_context.result_context()
         self.v2_domain_names = []
 
     def declare_tested_service(self) -> str:
@@ -38,25 +35,10 @@ class Tester(interfaces.TesterInterface):
         return return_value
 
     def _get_regions(self) -> list:
-        region_list = []
-        for page in self.ssm.get_paginator('get_parameters_by_path').paginate(
-                Path='/aws/service/global-infrastructure/regions'
-        ):
-            for p in page['Parameters']:
-                region_list.append(p['Value'])
-        return region_list
+        return self.aws_context.get_enabled_regions()
 
     def _append_apigatewayv2_test_result(self, apigatewayv2_name, test_name, issue_status):
-        return {
-            "user": self.user_id,
-            "account_arn": self.account_arn,
-            "account": self.account_id,
-            "timestamp": time.time(),
-            "item": apigatewayv2_name,
-            "item_type": "apigatewayv2",
-            "test_name": test_name,
-            "test_result": issue_status
-        }
+        return self.result_context.new_result(apigatewayv2_name, "apigatewayv2", test_name, issue_status)
 
     def _return_all_v2_domain_names(self):
         response = self.aws_apigatewayv2_client.get_domain_names(
@@ -1,18 +1,18 @@
-import time
 from concurrent.futures import ThreadPoolExecutor
 
-import boto3
 import interfaces
+from aws_context import AwsContext
 
 
 class Tester(interfaces.TesterInterface):
-    def __init__(self, region_name='global'):
-        self.aws_cloudfront_client = boto3.client('cloudfront', region_name=region_name)
+    tested_region_scope = interfaces.REGION_SCOPE_GLOBAL
+
+    def __init__(self, region_name='global', aws_context=None):
+        self.aws_context = aws_context if aws_context else AwsContext()
+        self.aws_cloudfront_client = self.aws_context.get_client('cloudfront', region_name=region_name)
         self.cache = {}
         self.region_name = region_name
-        self.user_id = boto3.client('sts').get_caller_identity().get('UserId')
-        self.account_arn = boto3.client('sts').get_caller_identity().get('Arn')
-        self.account_id = boto3.client('sts').get_caller_identity().get('Account')
+        self.result_context = self.aws_context.result_context(region_name)
         self.all_cloud_front_details = []
 
     def declare_tested_service(self) -> str:
@@ -68,17 +68,7 @@ class Tester(interfaces.TesterInterface):
         return cloud_front_details
 
     def _append_cloudfront_test_result(self, cloud_front_id, test_name, issue_status):
-        return {
-            "user": self.user_id,
-            "account_arn": self.account_arn,
-            "account": self.account_id,
-            "timestamp": time.time(),
-            "item": cloud_front_id,
-            "item_type": "cloud_front",
-            "test_name": test_name,
-            "test_result": issue_status,
-            "region": self.region_name
-        }
+        return self.result_context.new_result(cloud_front_id, "cloud_front", test_name, issue_status)
 
     def detect_waf_enabled_disabled_distribution(self):
         waf_result = []
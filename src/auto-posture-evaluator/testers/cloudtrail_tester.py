@@ -1,17 +1,18 @@
-import time
-import boto3
 import interfaces
+from aws_context import AwsContext
+from result_record import ResultRecord
 from concurrent.futures import ThreadPoolExecutor
 
 
 class Tester(interfaces.TesterInterface):
-    def __init__(self, region_name='global'):
+    tested_region_scope = interfaces.REGION_SCOPE_GLOBAL
+
+    def __init__(self, region_name='global', aws_context=None):
+        self.aws_context = aws_context if aws_context else AwsContext()
         self.region_name = region_name
-        self.aws_cloudtrail_client = boto3.client('cloudtrail')
+        self.aws_cloudtrail_client = self.aws_context.get_client('cloudtrail')
         self.cache = {}
-        self.user_id = boto3.client('sts').get_caller_identity().get('UserId')
-        self.account_arn = boto3.client('sts').get_caller_identity().get('Arn')
-        self.account_id = boto3.client('sts').get_caller_identity().get('Account')
+        self.result_context = self.aws_context.result_context(region_name)
         self.all_cloudtrail_details = []
 
     def declare_tested_service(self) -> str:
@@ -51,18 +52,8 @@ class Tester(interfaces.TesterInterface):
             cloud_trail.extend(response['Trails'])
         return cloud_trail
 
-    def _append_cloudtrail_test_result(self, cloudtrail, test_name, issue_status) -> dict:
-        return {
-            "user": self.user_id,
-            "account_arn": self.account_arn,
-            "account": self.account_id,
-            "timestamp": time.time(),
-            "item": cloudtrail,
-            "item_type": "cloudtrail",
-            "test_name": test_name,
-            "test_result": issue_status,
-            "region": self.region_name
-        }
+    def _append_cloudtrail_test_result(self, cloudtrail, test_name, issue_status) -> ResultRecord:
+        return self.result_context.new_result(cloudtrail, "cloudtrail", test_name, issue_status)
 
     def detect_not_encrypted_with_sse_kms(self):
         result = []
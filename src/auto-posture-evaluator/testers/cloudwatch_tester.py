@@ -1,19 +1,17 @@
-import time
 import interfaces
-import boto3
+from aws_context import AwsContext
 import botocore.exceptions
 from concurrent.futures import ThreadPoolExecutor
 
 
 class Tester(interfaces.TesterInterface):
-    def __init__(self, region_name):
+    def __init__(self, region_name, aws_context=None):
+        self.aws_context = aws_context if aws_context else AwsContext()
         self.aws_region = region_name
-        self.aws_cloudwatch_client = boto3.client('cloudwatch', region_name=region_name)
-        self.aws_cloudformation_client = boto3.client('cloudformation', region_name=region_name)
+        self.aws_cloudwatch_client = self.aws_context.get_client('cloudwatch', region_name=region_name)
+        self.aws_cloudformation_client = self.aws_context.get_client('cloudformation', region_name=region_name)
         self.cache = {}
-        self.user_id = boto3.client('sts').get_caller_identity().get('UserId')
-        self.account_arn = boto3.client('sts').get_caller_identity().get('Arn')
-        self.account_id = boto3.client('sts').get_caller_identity().get('Account')
+        self.result_context = self.aws_context.result_context(region_name)
 
     def declare_tested_service(self) -> str:
         return 'cloudwatch'
@@ -53,27 +51,10 @@ class Tester(interfaces.TesterInterface):
             return None
 
     def _get_result(self, item, item_type, test_name, issue_status):
-        return {
-            "user": self.user_id,
-            "account_arn": self.account_arn,
-            "account": self.account_id,
-            "timestamp": time.time(),
-            "item": item,
-            "item_type": item_type,
-            "test_name": test_name,
-            "test_result": issue_status,
-            "region": self.aws_region
-        }
+        return self.result_context.new_result(item, item_type, test_name, issue_status)
 
     def _get_all_aws_regions(self):
-        all_regions = []
-        boto_client = boto3.client('ec2', region_name='us-east-1')
-        response = boto_client.describe_regions(AllRegions=True)
-
-        for region in response['Regions']:
-            all_regions.append(region['RegionName'])
-
-        return all_regions
+        return self.aws_context.get_enabled_regions()
 
     def get_unauthorized_api_calls_not_monitored(self):
         test_name = "aws_cloudwatch_unauthorized_api_calls_not_monitored"
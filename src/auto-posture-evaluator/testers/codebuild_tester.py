@@ -1,16 +1,14 @@
-import time
-import boto3
 import interfaces
+from aws_context import AwsContext
 from concurrent.futures import ThreadPoolExecutor
 
 
 class Tester(interfaces.TesterInterface):
-    def __init__(self, region_name) -> None:
+    def __init__(self, region_name, aws_context=None) -> None:
+        self.aws_context = aws_context if aws_context else AwsContext()
         self.aws_region = region_name
-        self.user_id = boto3.client('sts').get_caller_identity().get('UserId')
-        self.account_arn = boto3.client('sts').get_caller_identity().get('Arn')
-        self.account_id = boto3.client('sts').get_caller_identity().get('Account')
-        self.aws_codebuild_client = boto3.client('codebuild', region_name=region_name)
+        self.result_context = self.aws_context.result_context()
+        self.aws_codebuild_client = self.aws_context.get_client('codebuild', region_name=region_name)
         self.codebuild_projects = []
 
     def declare_tested_provider(self) -> str:
@@ -47,27 +45,10 @@ class Tester(interfaces.TesterInterface):
         return projects
 
     def _get_all_aws_regions(self):
-        all_regions = []
-        boto3_client = boto3.client('ec2', region_name='us-east-1')
-        response = boto3_client.describe_regions(AllRegions=True)
-
-        for region in response['Regions']:
-            all_regions.append(region['RegionName'])
-
-        return all_regions
+        return self.aws_context.get_enabled_regions()
 
     def _append_codebuild_test_results(self, item, item_type, test_name, issue_status):
-        return {
-            "user": self.user_id,
-            "account_arn": self.account_arn,
-            "account": self.account_id,
-            "timestamp": time.time(),
-            "item": item,
-            "item_type": item_type,
-            "test_name": test_name,
-            "test_result": issue_status,
-            "region_name": self.aws_region
-        }
+        return self.result_context.new_result(item, item_type, test_name, issue_status, region_name=self.aws_region)
 
     def codebuild_project_build_artifacts_should_be_encrypted(self):
         result = []
@@ -1,20 +1,17 @@
 import concurrent.futures
-import time
 from datetime import timezone, datetime
 
-import boto3
 import interfaces
+from aws_context import AwsContext
 
 
 class Tester(interfaces.TesterInterface):
-    def __init__(self, region_name):
-        self.ssm = boto3.client('ssm')
+    def __init__(self, region_name, aws_context=None):
+        self.aws_context = aws_context if aws_context else AwsContext()
         self.region_name = region_name
-        self.aws_dms_client = boto3.client('dms', region_name=region_name)
+        self.aws_dms_client = self.aws_context.get_client('dms', region_name=region_name)
         self.cache = {}
-        self.user_id = boto3.client('sts').get_caller_identity().get('UserId')
-        self.account_arn = boto3.client('sts').get_caller_identity().get('Arn')
-        self.account_id = boto3.client('sts').get_caller_identity().get('Account')
+        self.result_context = self.aws_context.result_context(region_name)
         self.all_dms_replica_instances = []
 
     def declare_tested_service(self) -> str:
@@ -42,26 +39,10 @@ class Tester(interfaces.TesterInterface):
         return return_value
 
     def _get_regions(self) -> list:
-        region_list = []
-        for page in self.ssm.get_paginator('get_parameters_by_path').paginate(
-                Path='/aws/service/global-infrastructure/regions'
-        ):
-            for p in page['Parameters']:
-                region_list.append(p['Value'])
-        return region_list
+        return self.aws_context.get_enabled_regions()
 
     def _append_dms_test_result(self, dms_data, test_name, issue_status):
-        return {
-            "user": self.user_id,
-            "account_arn": self.account_arn,
-            "account": self.account_id,
-            "timestamp": time.time(),
-            "item": dms_data['ReplicationInstanceIdentifier'],
-            "item_type": "dms",
-            "test_name": test_name,
-            "test_result": issue_status,
-            "region": self.region_name
-        }
+        return self.result_context.new_result(dms_data['ReplicationInstanceIdentifier'], "dms", test_name, issue_status)
 
     def _return_all_dms_replica_instances(self):
         replica_instances = []
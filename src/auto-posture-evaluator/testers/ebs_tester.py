@@ -1,7 +1,6 @@
-import time
 from typing import List
-import boto3
 import interfaces
+from aws_context import AwsContext
 import datetime as dt
 from datetime import datetime
 import os
@@ -9,14 +8,14 @@ import concurrent.futures
 
 
 class Tester(interfaces.TesterInterface):
-    def __init__(self, region_name: str) -> None:
+    def __init__(self, region_name: str, aws_context=None) -> None:
+        self.aws_context = aws_context if aws_context else AwsContext()
         self.aws_region = region_name
-        self.aws_ec2_client = boto3.client('ec2', region_name=region_name)
-        self.aws_ec2_resource = boto3.resource('ec2', region_name=region_name)
-        self.aws_kms_client = boto3.client('kms', region_name=region_name)
-        self.user_id = boto3.client('sts').get_caller_identity().get('UserId')
-        self.account_arn = boto3.client('sts').get_caller_identity().get('Arn')
-        self.account_id = boto3.client('sts').get_caller_identity().get('Account')
+        self.aws_ec2_client = self.aws_context.get_client('ec2', region_name=region_name)
+        self.aws_ec2_resource = self.aws_context.create_resource('ec2', region_name=region_name)
+        self.aws_kms_client = self.aws_context.get_client('kms', region_name=region_name)
+        self.account_id = self.aws_context.account_id
+        self.result_context = self.aws_context.result_context(region_name)
         self.ebs_volumes = []
 
     def declare_tested_service(self) -> str:
@@ -46,27 +45,10 @@ class Tester(interfaces.TesterInterface):
             return None
 
     def _append_ebs_test_result(self, item, item_type, test_name, issue_status):
-        return {
-            "user": self.user_id,
-            "account_arn": self.account_arn,
-            "account": self.account_id,
-            "timestamp": time.time(),
-            "item": item,
-            "item_type": item_type,
-            "test_name": test_name,
-            "test_result": issue_status,
-            "region": self.aws_region
-        }
+        return self.result_context.new_result(item, item_type, test_name, issue_status)
 
     def _get_all_aws_regions(self):
-        all_regions = []
-        ec2_client = boto3.client('ec2', region_name='us-east-1')
-        response = ec2_client.describe_regions(AllRegions=True)
-
-        for i in response['Regions']:
-            all_regions.append(i['RegionName'])
-
-        return all_regions
+        return self.aws_context.get_enabled_regions()
 
     def _get_ebs_volumes(self):
         volumes = []
@@ -1,24 +1,47 @@
 import os
-import time
 from typing import Dict, List, Set
-import boto3
 import interfaces
+from aws_context import AwsContext
 from concurrent.futures import ThreadPoolExecutor
 
 
 class Tester(interfaces.TesterInterface):
-    def __init__(self, region_name: str) -> None:
+    inventory_views = ['ec2.security_groups', 'ec2.instances', 'ec2.vpcs', 'ec2.network_acls', 'ec2.internet_gateways',
+                       'ec2.addresses']
+    resource_tests = ['aws_ec2_inbound_http_access_restricted', 'aws_ec2_inbound_https_access_restricted',
+                      'aws_ec2_inbound_mongodb_access_restricted', 'aws_ec2_inbound_mysql_access_restricted',
+                      'aws_ec2_inbound_mssql_access_restricted', 'aws_ec2_inbound_ssh_access_restricted',
+                      'aws_ec2_inbound_rdp_access_restricted', 'aws_ec2_inbound_dns_access_restricted',
+                      'aws_ec2_inbound_telnet_access_restricted', 'aws_ec2_inbound_rpc_access_restricted',
+                      'aws_ec2_inbound_icmp_access_restricted',
+                      'aws_ec2_security_group_allows_ingress_to_remote_administration_ports_from_anywhere',
+                      'aws_ec2_outbound_access_to_all_ports_restricted', 'aws_ec2_inbound_oracle_access_restricted',
+                      'aws_ec2_inbound_ftp_access_restricted', 'aws_ec2_inbound_smtp_access_restricted',
+                      'aws_ec2_inbound_elasticsearch_access_restricted',
+                      'aws_ec2_inbound_tcp_netbios_access_restricted', 'aws_ec2_inbound_udp_netbios_access_restricted',
+                      'aws_ec2_inbound_cifs_access_restricted',
+                      'aws_ec2_security_group_allows_https_access',
+                      'aws_ec2_security_group_allows_inbound_access_from_ports_higher_than_1024',
+                      'aws_ec2_security_group_allows_all_inbound_traffic', 'aws_ec2_unrestricted_mysql_access',
+                      'aws_ec2_security_group_should_allow_access_to_specific_private_networks_only',
+                      'aws_ec2_instance_uses_metadata_service_version_2', 'aws_ec2_internet_gateway_presence_detected',
+                      'aws_ec2_sensitive_instance_tenancy_not_dedicated', 'aws_ec2_instance_iam_role_not_enabled',
+                      'aws_ec2_detect_classic_ec2_instances', 'aws_ec2_unrestricted_admin_port_access_in_network_acl',
+                      'aws_ec2_elastic_ip_in_use']
+
+    def __init__(self, region_name: str, aws_context=None) -> None:
+        self.aws_context = aws_context if aws_context else AwsContext()
         self.aws_region = region_name
         self.all_aws_regions = self._get_all_aws_regions()
-        self.aws_ec2_client = boto3.client('ec2', region_name=region_name)
-        self.aws_ec2_resource = boto3.resource('ec2', region_name=region_name)
-        self.aws_nfw_client = boto3.client('network-firewall', region_name=region_name)
-        self.user_id = boto3.client('sts').get_caller_identity().get('UserId')
-        self.account_arn = boto3.client('sts').get_caller_identity().get('Arn')
-        self.account_id = boto3.client('sts').get_caller_identity().get('Account')
+        self.aws_ec2_client = self.aws_context.get_client('ec2', region_name=region_name)
+        self.aws_nfw_client = self.aws_context.get_client('network-firewall', region_name=region_name)
+        self.inventory = self.aws_context.inventory
+        self.result_context = self.aws_context.result_context(region_name)
         self.security_groups = []
+        self.evaluated_security_groups = []
         self.set_security_group = []
         self.ec2_instances = []
+        self.evaluated_instances = []
         self.sensitive_instance_tag = os.environ.get('AUTOPOSTURE_EC2_SENSITIVE_TAG')
         self.per_region_max_cpu_count_diff = os.environ.get('AUTOPOSTURE_PER_REGION_MAX_CPU_COUNT_DIFF')
 
@@ -32,11 +55,16 @@ class Tester(interfaces.TesterInterface):
         all_aws_regions = self._get_all_aws_regions()
 
         if any([self.aws_region == region for region in all_aws_regions]):
-            self.security_groups = self.aws_ec2_resource.security_groups.all()
-            self.set_security_group = self._get_all_security_group_ids(self.security_groups)
-            all_inbound_permissions = self._get_all_inbound_permissions_by_security_groups(self.security_groups)
-            all_outbound_permissions = self._get_all_outbound_permissions_by_security_groups(self.security_groups)
-            self.ec2_instances = self._get_all_ec2_instances(self.aws_ec2_client)
+            self.security_groups = self.inventory.get('ec2.security_groups', self.aws_region)
+            # The tests of the VPCs, the regions and the scheduled events evaluate every resource
+            self.evaluated_security_groups = self.select_evaluated(self.security_groups, 'GroupId')
+            self.set_security_group = self._get_all_security_group_ids(self.evaluated_security_groups)
+            all_inbound_permissions = self._get_all_inbound_permissions_by_security_groups(
+                self.evaluated_security_groups)
+            all_outbound_permissions = self._get_all_outbound_permissions_by_security_groups(
+                self.evaluated_security_groups)
+            self.ec2_instances = self.inventory.get('ec2.instances', self.aws_region)
+            self.evaluated_instances = self.select_evaluated(self.ec2_instances, 'InstanceId')
             region_names = self._get_ec2_region_names()
 
             executor_list = []
@@ -63,15 +91,15 @@ class Tester(interfaces.TesterInterface):
                 executor_list.append(executor.submit(self.get_inbound_tcp_netbios_access, all_inbound_permissions))
                 executor_list.append(executor.submit(self.get_inbound_udp_netbios, all_inbound_permissions))
                 executor_list.append(executor.submit(self.get_inbound_cifs_access, all_inbound_permissions))
-                executor_list.append(executor.submit(self.get_instance_uses_metadata_service_version_2, self.ec2_instances))
+                executor_list.append(executor.submit(self.get_instance_uses_metadata_service_version_2, self.evaluated_instances))
                 executor_list.append(executor.submit(self.get_security_group_allows_https_access, all_inbound_permissions))
                 executor_list.append(executor.submit(self.get_security_group_allows_inbound_access_from_ports_higher_than_1024, all_inbound_permissions))
                 executor_list.append(executor.submit(self.get_unrestricted_admin_port_access_in_network_acl))
-                executor_list.append(executor.submit(self.get_internet_gateway_presence_detected, self.ec2_instances))
-                executor_list.append(executor.submit(self.get_sensitive_instance_tenancy_not_dedicated, self.ec2_instances))
+                executor_list.append(executor.submit(self.get_internet_gateway_presence_detected, self.evaluated_instances))
+                executor_list.append(executor.submit(self.get_sensitive_instance_tenancy_not_dedicated, self.evaluated_instances))
                 executor_list.append(executor.submit(self.get_aws_config_not_enabled_for_all_regions, region_names))
                 executor_list.append(executor.submit(self.get_nearing_regional_limit_for_elastic_ip_addresses, region_names))
-                executor_list.append(executor.submit(self.get_ec2_instance_iam_role_not_enabled, self.ec2_instances))
+                executor_list.append(executor.submit(self.get_ec2_instance_iam_role_not_enabled, self.evaluated_instances))
                 executor_list.append(executor.submit(self.get_security_group_allows_inbound_traffic, all_inbound_permissions))
                 executor_list.append(executor.submit(self.get_instance_with_upcoming_system_maintenance_scheduled_event, self.ec2_instances))
                 executor_list.append(executor.submit(self.get_instance_with_upcoming_instance_stop_scheduled_event, self.ec2_instances))
@@ -91,63 +119,48 @@ class Tester(interfaces.TesterInterface):
         else:
             return None
 
-    def _get_all_aws_regions(self):
-        regions = []
-        response = boto3.client('ec2', region_name='us-east-1').describe_regions(AllRegions=True)
-        for region in response['Regions']:
-            regions.append(region['RegionName'])
+    def resource_fingerprints(self) -> dict:
+        gateways = self.inventory.get('ec2.internet_gateways', self.aws_region)
+        attached_vpc_ids = set(attachment['VpcId'] for gateway in gateways for attachment in gateway['Attachments'])
+        fingerprints = {}
+        for security_group in self.inventory.get('ec2.security_groups', self.aws_region):
+            fingerprints[security_group['GroupId']] = security_group
+        for instance in self.inventory.get('ec2.instances', self.aws_region):
+            fingerprints[instance['InstanceId']] = [instance, instance.get('VpcId') in attached_vpc_ids,
+                                                    self.sensitive_instance_tag]
+        for acl in self.inventory.get('ec2.network_acls', self.aws_region):
+            fingerprints[acl['NetworkAclId']] = acl
+        for address in self.inventory.get('ec2.addresses', self.aws_region):
+            fingerprints[address['PublicIp']] = address
+        return fingerprints
 
-        return regions
+    def _get_all_aws_regions(self):
+        return self.aws_context.get_enabled_regions()
 
     def _get_result_object(self, item, item_type, test_name, issue_status):
-        return {
-            "user": self.user_id,
-            "account_arn": self.account_arn,
-            "account": self.account_id,
-            "timestamp": time.time(),
-            "item": item,
-            "item_type": item_type,
-            "test_name": test_name,
-            "test_result": issue_status,
-            "region": self.aws_region
-        }
-
-    def _get_all_security_group_ids(self, instances) -> Set:
-        return set(list(map(lambda i: i.id, list(instances))))
-
-    def _get_all_inbound_permissions(self, instances):
-        all_inbound_permissions = []
-        for instance in instances:
-            security_groups = instance.security_groups
-            for security_group in security_groups:
-                inbound_permissions = self.aws_ec2_resource.SecurityGroup(security_group['GroupId']).ip_permissions
-                for i in inbound_permissions:
-                    i['instance'] = instance
-                    i['security_group'] = security_group
-                    all_inbound_permissions.append(i)
-        return all_inbound_permissions
+        return self.result_context.new_result(item, item_type, test_name, issue_status)
+
+    def _get_all_security_group_ids(self, security_groups) -> Set:
+        return set(security_group['GroupId'] for security_group in security_groups)
 
     def _get_all_inbound_permissions_by_security_groups(self, security_groups) -> List[Dict]:
+        # Rules are copied, the inventory is shared with the other testers
         inbound_rules = []
         for security_group in security_groups:
-            rules = security_group.ip_permissions
-            for rule in rules:
-                rule['security_group'] = security_group
-                inbound_rules.append(rule)
+            for rule in security_group['IpPermissions']:
+                inbound_rules.append(dict(rule, security_group=security_group))
         return inbound_rules
 
     def _get_all_outbound_permissions_by_security_groups(self, security_groups) -> List[Dict]:
         outbound_rules = []
         for security_group in security_groups:
-            rules = security_group.ip_permissions_egress
-            for rule in rules:
-                rule['security_group'] = security_group
-                outbound_rules.append(rule)
+            for rule in security_group['IpPermissionsEgress']:
+                outbound_rules.append(dict(rule, security_group=security_group))
         return outbound_rules
 
     def _get_inbound_port_access(self, all_inbound_permissions, target_port, test_name, protocol="tcp") -> List[Dict]:
         result = []
-        instances = list(map(lambda i: i['security_group'].id, list(filter(lambda permission: (permission['IpProtocol'] == "-1") or ((permission['FromPort']
+        instances = list(map(lambda i: i['security_group']['GroupId'], list(filter(lambda permission: (permission['IpProtocol'] == "-1") or ((permission['FromPort']
                          <= target_port and permission['ToPort'] >= target_port) and permission['IpProtocol'] == protocol), all_inbound_permissions))))
         instances_with_issue = set(instances)
         instances_with_no_issue = self.set_security_group.difference(instances_with_issue)
@@ -160,35 +173,7 @@ class Tester(interfaces.TesterInterface):
         return result
 
     def _get_ec2_region_names(self) -> List:
-        regions = self.aws_ec2_client.describe_regions()
-        region_names = []
-        for region in regions['Regions']:
-            region_names.append(region['RegionName'])
-        return region_names
-
-    def _get_all_ec2_instances(self, client, filters=[]) -> List:
-        instances = []
-        can_paginate = client.can_paginate('describe_instances')
-        if can_paginate:
-            reservations = []
-            paginator = client.get_paginator('describe_instances')
-            response_iterator = paginator.paginate(PaginationConfig={'PageSize': 50}, Filters=filters)
-            for page in response_iterator:
-                reservations.extend(page['Reservations'])
-            for reservation in reservations:
-                instances.extend(reservation['Instances'])
-        else:
-            response = client.describe_instances(Filters=filters)
-            for reservation in response['Reservations']:
-                instances.extend(reservation['Instances'])
-        return instances
-
-    def _get_service_clients_for_all_regions(self, client_name):
-        regions = self._get_ec2_region_names()
-        clients = []
-        for region in regions:
-            clients.append(boto3.client(client_name, region_name=region))
-        return clients
+        return self.aws_context.get_enabled_regions()
 
     def get_inbound_http_access(self, all_inbound_permissions) -> List:
         test_name = "aws_ec2_inbound_http_access_restricted"
@@ -230,13 +215,13 @@ class Tester(interfaces.TesterInterface):
         SESSIONPORT = 139
         DATAGRAMPORT = 138
 
-        instancse_137 = list(map(lambda i: i['security_group'].id, list(filter(lambda permission: (permission['IpProtocol'] == '-1')
+        instancse_137 = list(map(lambda i: i['security_group']['GroupId'], list(filter(lambda permission: (permission['IpProtocol'] == '-1')
                              or ((permission['FromPort'] <= NAMERESPORT and permission['ToPort'] >= NAMERESPORT) and permission['IpProtocol'] == 'tcp'), all_inbound_permissions))))
         instances.extend(instancse_137)
-        instancse_139 = list(map(lambda i: i['security_group'].id, list(filter(lambda permission: (permission['IpProtocol'] == '-1')
+        instancse_139 = list(map(lambda i: i['security_group']['GroupId'], list(filter(lambda permission: (permission['IpProtocol'] == '-1')
                              or ((permission['FromPort'] <= SESSIONPORT and permission['ToPort'] >= SESSIONPORT) and permission['IpProtocol'] == 'tcp'), all_inbound_permissions))))
         instances.extend(instancse_139)
-        instances_138 = list(map(lambda i: i['security_group'].id, list(filter(lambda permission: (permission['IpProtocol'] == '-1') or ((permission['FromPort']
+        instances_138 = list(map(lambda i: i['security_group']['GroupId'], list(filter(lambda permission: (permission['IpProtocol'] == '-1') or ((permission['FromPort']
                              <= DATAGRAMPORT and permission['ToPort'] >= DATAGRAMPORT) and permission['IpProtocol'] == 'tcp'), all_inbound_permissions))))
         instances.extend(instances_138)
 
@@ -255,7 +240,7 @@ class Tester(interfaces.TesterInterface):
         test_name = "aws_ec2_inbound_dns_access_restricted"
         result = []
         target_port = 53
-        instances = list(map(lambda i: i['security_group'].id, list(filter(lambda permission: (permission['IpProtocol'] == "-1") or ((permission['FromPort']
+        instances = list(map(lambda i: i['security_group']['GroupId'], list(filter(lambda permission: (permission['IpProtocol'] == "-1") or ((permission['FromPort']
                          <= target_port and permission['ToPort'] >= target_port) and (permission['IpProtocol'] == "tcp" or permission['IpProtocol'] == "udp")), all_inbound_permissions))))
         instances_with_issue = set(instances)
         instances_with_no_issue = self.set_security_group.difference(instances_with_issue)
@@ -280,19 +265,19 @@ class Tester(interfaces.TesterInterface):
         PORT445 = 445
         PORT3020 = 3020
 
-        instancse_137 = list(map(lambda i: i['security_group'].id, list(filter(lambda permission: (permission['IpProtocol'] == '-1')
+        instancse_137 = list(map(lambda i: i['security_group']['GroupId'], list(filter(lambda permission: (permission['IpProtocol'] == '-1')
                              or ((permission['FromPort'] <= PORT137 and permission['ToPort'] >= PORT137) and permission['IpProtocol'] == 'udp'), all_inbound_permissions))))
         instances.extend(instancse_137)
-        instancse_138 = list(map(lambda i: i['security_group'].id, list(filter(lambda permission: (permission['IpProtocol'] == '-1')
+        instancse_138 = list(map(lambda i: i['security_group']['GroupId'], list(filter(lambda permission: (permission['IpProtocol'] == '-1')
                              or ((permission['FromPort'] <= PORT138 and permission['ToPort'] >= PORT138) and permission['IpProtocol'] == 'udp'), all_inbound_permissions))))
         instances.extend(instancse_138)
-        instancse_139 = list(map(lambda i: i['security_group'].id, list(filter(lambda permission: (permission['IpProtocol'] == '-1')
+        instancse_139 = list(map(lambda i: i['security_group']['GroupId'], list(filter(lambda permission: (permission['IpProtocol'] == '-1')
                              or ((permission['FromPort'] <= PORT139 and permission['ToPort'] >= PORT139) and permission['IpProtocol'] == 'tcp'), all_inbound_permissions))))
         instances.extend(instancse_139)
-        instancse_445 = list(map(lambda i: i['security_group'].id, list(filter(lambda permission: (permission['IpProtocol'] == '-1')
+        instancse_445 = list(map(lambda i: i['security_group']['GroupId'], list(filter(lambda permission: (permission['IpProtocol'] == '-1')
                              or ((permission['FromPort'] <= PORT445 and permission['ToPort'] >= PORT445) and permission['IpProtocol'] == 'tcp'), all_inbound_permissions))))
         instances.extend(instancse_445)
-        instancse_3020 = list(map(lambda i: i['security_group'].id, list(filter(lambda permission: (permission['IpProtocol'] == '-1')
+        instancse_3020 = list(map(lambda i: i['security_group']['GroupId'], list(filter(lambda permission: (permission['IpProtocol'] == '-1')
                               or ((permission['FromPort'] <= PORT3020 and permission['ToPort'] >= PORT3020) and permission['IpProtocol'] == 'tcp'), all_inbound_permissions))))
         instances.extend(instancse_3020)
 
@@ -313,10 +298,10 @@ class Tester(interfaces.TesterInterface):
         instances = []
         PORT9200 = 9200
         PORT9300 = 9300
-        instances_9200 = list(map(lambda i: i['security_group'].id, list(filter(lambda permission: (permission['IpProtocol'] == '-1')
+        instances_9200 = list(map(lambda i: i['security_group']['GroupId'], list(filter(lambda permission: (permission['IpProtocol'] == '-1')
                               or ((permission['FromPort'] <= PORT9200 and permission['ToPort'] >= PORT9200) and permission['IpProtocol'] == 'tcp'), all_inbound_permissions))))
         instances.extend(instances_9200)
-        instances_9300 = list(map(lambda i: i['security_group'].id, list(filter(lambda permission: (permission['IpProtocol'] == '-1')
+        instances_9300 = list(map(lambda i: i['security_group']['GroupId'], list(filter(lambda permission: (permission['IpProtocol'] == '-1')
                               or ((permission['FromPort'] <= PORT9300 and permission['ToPort'] >= PORT9300) and permission['IpProtocol'] == 'tcp'), all_inbound_permissions))))
         instances.extend(instances_9300)
 
@@ -337,10 +322,10 @@ class Tester(interfaces.TesterInterface):
         PORT25 = 25
         PORT587 = 587
         instances = []
-        instances_25 = list(map(lambda i: i['security_group'].id, list(filter(lambda permission: (permission['IpProtocol'] == '-1')
+        instances_25 = list(map(lambda i: i['security_group']['GroupId'], list(filter(lambda permission: (permission['IpProtocol'] == '-1')
                             or ((permission['FromPort'] <= PORT25 and permission['ToPort'] >= PORT25) and permission['IpProtocol'] == 'tcp'), all_inbound_permissions))))
         instances.extend(instances_25)
-        instances_587 = list(map(lambda i: i['security_group'].id, list(filter(lambda permission: (permission['IpProtocol'] == '-1')
+        instances_587 = list(map(lambda i: i['security_group']['GroupId'], list(filter(lambda permission: (permission['IpProtocol'] == '-1')
                              or ((permission['FromPort'] <= PORT587 and permission['ToPort'] >= PORT587) and permission['IpProtocol'] == 'tcp'), all_inbound_permissions))))
         instances.extend(instances_587)
 
@@ -365,10 +350,10 @@ class Tester(interfaces.TesterInterface):
         instances = []
         DATAPORT = 20
         COMMANDPORT = 21
-        instances_20 = list(map(lambda i: i['security_group'].id, list(filter(lambda permission: (permission['IpProtocol'] == '-1')
+        instances_20 = list(map(lambda i: i['security_group']['GroupId'], list(filter(lambda permission: (permission['IpProtocol'] == '-1')
                             or ((permission['FromPort'] <= DATAPORT and permission['ToPort'] >= DATAPORT) and permission['IpProtocol'] == 'tcp'), all_inbound_permissions))))
         instances.extend(instances_20)
-        instances_21 = list(map(lambda i: i['security_group'].id, list(filter(lambda permission: (permission['IpProtocol'] == '-1')
+        instances_21 = list(map(lambda i: i['security_group']['GroupId'], list(filter(lambda permission: (permission['IpProtocol'] == '-1')
                             or ((permission['FromPort'] <= COMMANDPORT and permission['ToPort'] >= COMMANDPORT) and permission['IpProtocol'] == 'tcp'), all_inbound_permissions))))
         instances.extend(instances_21)
 
@@ -391,13 +376,13 @@ class Tester(interfaces.TesterInterface):
         DATAGRAMPORT = 138
         SESSIONPORT = 139
 
-        instancse_137 = list(map(lambda i: i['security_group'].id, list(filter(lambda permission: (permission['IpProtocol'] == '-1')
+        instancse_137 = list(map(lambda i: i['security_group']['GroupId'], list(filter(lambda permission: (permission['IpProtocol'] == '-1')
                              or ((permission['FromPort'] <= NAMERESPORT and permission['ToPort'] >= NAMERESPORT) and permission['IpProtocol'] == 'udp'), all_inbound_permissions))))
         instances.extend(instancse_137)
-        instancse_138 = list(map(lambda i: i['security_group'].id, list(filter(lambda permission: (permission['IpProtocol'] == '-1') or ((permission['FromPort']
+        instancse_138 = list(map(lambda i: i['security_group']['GroupId'], list(filter(lambda permission: (permission['IpProtocol'] == '-1') or ((permission['FromPort']
                              <= DATAGRAMPORT and permission['ToPort'] >= DATAGRAMPORT) and permission['IpProtocol'] == 'udp'), all_inbound_permissions))))
         instances.extend(instancse_138)
-        instance_139 = list(map(lambda i: i['security_group'].id, list(filter(lambda permission: (permission['IpProtocol'] == '-1')
+        instance_139 = list(map(lambda i: i['security_group']['GroupId'], list(filter(lambda permission: (permission['IpProtocol'] == '-1')
                             or ((permission['FromPort'] <= SESSIONPORT and permission['ToPort'] >= SESSIONPORT) and permission['IpProtocol'] == 'udp'), all_inbound_permissions))))
         instances.extend(instance_139)
 
@@ -419,7 +404,7 @@ class Tester(interfaces.TesterInterface):
 
         for outbound_permission in all_outbound_permissions:
             if outbound_permission['IpProtocol'] == '-1':
-                security_groups.append(outbound_permission['security_group'].id)
+                security_groups.append(outbound_permission['security_group']['GroupId'])
 
         security_groups_with_issues = set(security_groups)
         security_groups_with_no_issues = self.set_security_group.difference(security_groups_with_issues)
@@ -443,14 +428,14 @@ class Tester(interfaces.TesterInterface):
         vpcs_with_issue = []
         security_groups = self.security_groups
         for security_group in security_groups:
-            if security_group.group_name == "default":
-                ingress_rules = security_group.ip_permissions
-                egress_rules = security_group.ip_permissions_egress
+            if security_group['GroupName'] == "default":
+                ingress_rules = security_group['IpPermissions']
+                egress_rules = security_group['IpPermissionsEgress']
                 ingress_results = list(filter(lambda rule: (rule['IpProtocol'] == "-1") or (rule['FromPort'] >= 0 and rule['ToPort'] <= 65535), ingress_rules))
                 egress_results = list(filter(lambda rule: (rule['IpProtocol'] == "-1") or (rule['FromPort'] >= 0 and rule['ToPort'] <= 65535), egress_rules))
 
                 if len(ingress_results) != 0 or len(egress_results) != 0:
-                    vpcs_with_issue.append(security_group.vpc_id)
+                    vpcs_with_issue.append(security_group.get('VpcId'))
 
         vpcs_with_issue = set(vpcs_with_issue)
         vpcs_with_no_issue = all_vpcs.difference(vpcs_with_issue)
@@ -471,13 +456,13 @@ class Tester(interfaces.TesterInterface):
         result = []
         instances = []
 
-        instances_1521 = list(map(lambda i: i['security_group'].id, list(filter(lambda permission: (permission['IpProtocol'] == '-1') or (permission['FromPort']
+        instances_1521 = list(map(lambda i: i['security_group']['GroupId'], list(filter(lambda permission: (permission['IpProtocol'] == '-1') or (permission['FromPort']
                               <= PORT1521 and permission['ToPort'] >= PORT1521 and permission['IpProtocol'] == 'tcp'), all_inbound_permissions))))
         instances.extend(instances_1521)
-        instances_2483 = list(map(lambda i: i['security_group'].id, list(filter(lambda permission: (permission['IpProtocol'] == '-1')
+        instances_2483 = list(map(lambda i: i['security_group']['GroupId'], list(filter(lambda permission: (permission['IpProtocol'] == '-1')
                               or (permission['FromPort'] <= PORT2483 and permission['ToPort'] >= PORT2483), all_inbound_permissions))))
         instances.extend(instances_2483)
-        instances_2484 = list(map(lambda i: i['security_group'].id, list(filter(lambda permission: (permission['IpProtocol'] == '-1')
+        instances_2484 = list(map(lambda i: i['security_group']['GroupId'], list(filter(lambda permission: (permission['IpProtocol'] == '-1')
                               or (permission['FromPort'] <= PORT2484 and permission['ToPort'] >= PORT2484), all_inbound_permissions))))
         instances.extend(instances_2484)
 
@@ -495,7 +480,7 @@ class Tester(interfaces.TesterInterface):
     def get_inbound_icmp_access(self, all_inbound_permissions):
         test_name = "aws_ec2_inbound_icmp_access_restricted"
         result = []
-        instances = list(map(lambda i: i['security_group'].id, list(filter(lambda permission: permission['IpProtocol']
+        instances = list(map(lambda i: i['security_group']['GroupId'], list(filter(lambda permission: permission['IpProtocol']
                          == "icmp" or permission['IpProtocol'] == "-1" or permission['IpProtocol'] == "icmpv6", all_inbound_permissions))))
         instances_with_issue = set(instances)
         instances_with_no_issue = self.set_security_group.difference(instances_with_issue)
@@ -516,15 +501,15 @@ class Tester(interfaces.TesterInterface):
             if i['IpProtocol'] == "-1" and len(i['IpRanges']) == 0: pass
             elif i['IpProtocol'] == "-1" and len(i['IpRanges']) != 0:
                 if any([ip['CidrIp'] == '0.0.0.0/0' for ip in i['IpRanges']]):
-                    security_groups.append(i['security_group'].id)
+                    security_groups.append(i['security_group']['GroupId'])
                 if any([ip['CidrIpv6'] == '::/0' for ip in i['Ipv6Ranges']]):
-                    security_groups.append(i['security_group'].id)
+                    security_groups.append(i['security_group']['GroupId'])
 
             elif (i['FromPort'] <= SSHPORT and i['ToPort'] >= SSHPORT) or (i['FromPort'] <= RDPPORT and i['ToPort'] >= RDPPORT):
                 if any([ip['CidrIp'] == '0.0.0.0/0' for ip in i['IpRanges']]):
-                    security_groups.append(i['security_group'].id)
+                    security_groups.append(i['security_group']['GroupId'])
                 if any([ip['CidrIpv6'] == '::/0' for ip in i['Ipv6Ranges']]):
-                    security_groups.append(i['security_group'].id)
+                    security_groups.append(i['security_group']['GroupId'])
             else:
                 continue
         security_groups_with_issue = set(security_groups)
@@ -556,7 +541,7 @@ class Tester(interfaces.TesterInterface):
         instances = []
         PORT443 = 443
 
-        instances_443 = list(map(lambda i: i['security_group'].id, list(filter(lambda permission: (permission['IpProtocol'] == '-1') or ((permission['FromPort'] <= PORT443 and permission['ToPort'] >= PORT443)
+        instances_443 = list(map(lambda i: i['security_group']['GroupId'], list(filter(lambda permission: (permission['IpProtocol'] == '-1') or ((permission['FromPort'] <= PORT443 and permission['ToPort'] >= PORT443)
                              and permission['IpProtocol'] == 'tcp' and any([range.get('CidrIp', '') == '0.0.0.0/0' or range.get('CidrIp', '') == '::/0' for range in permission['IpRanges']])), all_inbound_permissions))))
         instances.extend(instances_443)
 
@@ -577,7 +562,7 @@ class Tester(interfaces.TesterInterface):
         instances = []
         PORT1024 = 1024
         HISHESTPORT = 65535
-        instances_1024 = list(map(lambda i: i['security_group'].id, list(filter(lambda permission: (permission['IpProtocol'] == '-1')
+        instances_1024 = list(map(lambda i: i['security_group']['GroupId'], list(filter(lambda permission: (permission['IpProtocol'] == '-1')
                                                                                 or ((permission['FromPort'] >= PORT1024 and permission['ToPort'] <= HISHESTPORT)
                                                                                     and (any([range.get('CidrIp', '') == '0.0.0.0/0' or range.get('CidrIp', '') == '::/0' for range in permission['IpRanges']])
                                                                                          or any([range.get('CidrIpv6', '') == '::/0' for range in permission['Ipv6Ranges']]))), all_inbound_permissions))))
@@ -598,17 +583,10 @@ class Tester(interfaces.TesterInterface):
     def get_unrestricted_admin_port_access_in_network_acl(self):
         test_name = "aws_ec2_unrestricted_admin_port_access_in_network_acl"
         results = []
-        can_paginate = self.aws_ec2_client.can_paginate('describe_network_acls')
-        acls = []
-        filters = [{'Name': 'entry.protocol', 'Values': ['6']}]
-        if can_paginate:
-            paginator = self.aws_ec2_client.get_paginator('describe_network_acls')
-            response_iterator = paginator.paginate(PaginationConfig={'PageSize': 50}, Filters=filters)
-            for page in response_iterator:
-                acls.extend(page['NetworkAcls'])
-        else:
-            response = self.aws_ec2_client.describe_network_acls(Filters=filters)
-            acls.extend(response)
+        # The ACLs with TCP entries
+        network_acls = self.select_evaluated(self.inventory.get('ec2.network_acls', self.aws_region), 'NetworkAclId')
+        acls = [acl for acl in network_acls
+                if any(entry.get('Protocol') == '6' for entry in acl['Entries'])]
 
         for acl in acls:
             issue_found = False
@@ -625,17 +603,7 @@ class Tester(interfaces.TesterInterface):
     def get_internet_gateway_presence_detected(self, instances):
         test_name = "aws_ec2_internet_gateway_presence_detected"
         result = []
-        gateways = []
-        can_paginate = self.aws_ec2_client.can_paginate('describe_internet_gateways')
-        if can_paginate:
-            paginator = self.aws_ec2_client.get_paginator('describe_internet_gateways')
-            response_iterator = paginator.paginate(PaginationConfig={'PageSize': 50})
-            for response in response_iterator:
-                gateways.extend(response['InternetGateways'])
-        else:
-            response = self.aws_ec2_client.describe_internet_gateways()
-            for response in response['InternetGateways']:
-                gateways.extend(response)
+        gateways = self.inventory.get('ec2.internet_gateways', self.aws_region)
         vpc_ids = []
         for gateway in gateways:
             for attachment in gateway['Attachments']:
@@ -669,11 +637,9 @@ class Tester(interfaces.TesterInterface):
 
     def get_aws_config_not_enabled_for_all_regions(self, region_names):
         test_name = "aws_ec2_aws_config_not_enabled_for_all_regions"
-        clients = self._get_service_clients_for_all_regions('config')
         result = []
-        for i in range(len(clients)):
-            response = clients[i].describe_configuration_recorder_status()
-            configuration_records_status = response.get('ConfigurationRecordersStatus')
+        for i in range(len(region_names)):
+            configuration_records_status = self.inventory.get('config.configuration_recorders_status', region_names[i])
             if configuration_records_status is not None:
                 if len(configuration_records_status) == 0 or configuration_records_status[0]['recording'] is False:
                     result.append(self._get_result_object(region_names[i], "ec2_region", test_name, "issue_found"))
@@ -685,15 +651,15 @@ class Tester(interfaces.TesterInterface):
 
     def get_nearing_regional_limit_for_elastic_ip_addresses(self, region_names):
         test_name = "aws_ec2_nearing_regional_limit_for_elastic_ip_addresses"
-        clients = self._get_service_clients_for_all_regions('ec2')
         result = []
-        for i in range(len(clients)):
-            response = clients[i].describe_account_attributes(AttributeNames=['vpc-max-elastic-ips'])
-            account_attrs = response['AccountAttributes']
+        for i in range(len(region_names)):
+            account_attrs = [attribute for attribute in self.inventory.get('ec2.account_attributes', region_names[i])
+                             if attribute['AttributeName'] == 'vpc-max-elastic-ips']
             if account_attrs:
-                limit = response['AccountAttributes'][0]['AttributeValues'][0]['AttributeValue']
-                addresses = clients[i].describe_addresses(Filters=[{'Name': 'domain', 'Values': ['vpc']}])
-                if len(addresses['Addresses']) == limit:
+                limit = account_attrs[0]['AttributeValues'][0]['AttributeValue']
+                addresses = [address for address in self.inventory.get('ec2.addresses', region_names[i])
+                             if address.get('Domain') == 'vpc']
+                if len(addresses) == limit:
                     result.append(self._get_result_object(region_names[i], "ec2_region", test_name, "issue_found"))
                 else:
                     result.append(self._get_result_object(region_names[i], "ec2_region", test_name, "no_issue_found"))
@@ -713,19 +679,12 @@ class Tester(interfaces.TesterInterface):
         return result
 
     def _get_all_vpcs(self):
-        vpcs = []
-        paginator = self.aws_ec2_client.get_paginator('describe_vpcs')
-        response_iterator = paginator.paginate()
-
-        for page in response_iterator:
-            vpcs.extend(page['Vpcs'])
-
-        return vpcs
+        return self.inventory.get('ec2.vpcs', self.aws_region)
 
     def get_security_group_allows_inbound_traffic(self, all_inbound_permissions):
         test_name = "aws_ec2_security_group_allows_all_inbound_traffic"
         result = []
-        instances = list(map(lambda i: i['security_group'].id, list(filter(lambda permission: any([range.get('CidrIp', '')
+        instances = list(map(lambda i: i['security_group']['GroupId'], list(filter(lambda permission: any([range.get('CidrIp', '')
                          == '0.0.0.0/0' or range.get('CidrIp', '') == '::/0' for range in permission['IpRanges']]), all_inbound_permissions))))
 
         instances_with_issue = set(instances)
@@ -794,12 +753,10 @@ class Tester(interfaces.TesterInterface):
         test_name = "aws_ec2_region_nearing_limits_of_ec2_instances"
         result = []
         cpu_count_limit = int(self.per_region_max_cpu_count_diff) if self.per_region_max_cpu_count_diff else 50
-        service_quota_clients = self._get_service_clients_for_all_regions('service-quotas')
-        ec2_clients = self._get_service_clients_for_all_regions('ec2')
         for i in range(len(region_names)):
-            region_vcpu_quota = service_quota_clients[i].get_service_quota(ServiceCode='ec2', QuotaCode='L-1216C47A')
-            region_limit = region_vcpu_quota['Quota']['Value']
-            instances = self._get_all_ec2_instances(ec2_clients[i], filters=[{'Name': 'instance-state-name', 'Values': ['running']}])
+            region_limit = self.inventory.get('service-quotas.ec2_standard_vcpus', region_names[i])
+            instances = [instance for instance in self.inventory.get('ec2.instances', region_names[i])
+                         if instance['State']['Name'] == 'running']
             current_cpu_count = 0
             for instance in instances:
                 current_cpu_count += instance['CpuOptions']['CoreCount'] * instance['CpuOptions']['ThreadsPerCore']
@@ -813,8 +770,7 @@ class Tester(interfaces.TesterInterface):
         result = []
         test_name = "aws_ec2_elastic_ip_in_use"
 
-        response = self.aws_ec2_client.describe_addresses()
-        addresses = response['Addresses']
+        addresses = self.select_evaluated(self.inventory.get('ec2.addresses', self.aws_region), 'PublicIp')
 
         for address in addresses:
             public_ip = address['PublicIp']
@@ -832,7 +788,7 @@ class Tester(interfaces.TesterInterface):
 
         filtered_port = list(filter(lambda permission: (permission['IpProtocol'] == "-1")
                                     or ((permission['FromPort'] <= 3306 and permission['ToPort'] >= 3306) and permission['IpProtocol'] == 'tcp'), all_inbound_permissions))
-        instances = list(map(lambda x: x['security_group'].id, list(filter(lambda permission: any([ip_range.get("CidrIp", "")
+        instances = list(map(lambda x: x['security_group']['GroupId'], list(filter(lambda permission: any([ip_range.get("CidrIp", "")
                          == "0.0.0.0/0" or ip_range.get("CidrIp", "") == "::/0" for ip_range in permission['IpRanges']]), filtered_port))))
 
         instances_with_issue = set(instances)
@@ -849,7 +805,7 @@ class Tester(interfaces.TesterInterface):
         result = []
         test_name = "aws_ec2_detect_classic_ec2_instances"
 
-        ec2_instances = self.ec2_instances
+        ec2_instances = self.evaluated_instances
 
         for instance in ec2_instances:
             instance_id = instance['InstanceId']
@@ -865,8 +821,11 @@ class Tester(interfaces.TesterInterface):
     def get_security_group_should_allow_access_to_specific_private_networks_only(self):
         test_name = "aws_ec2_security_group_should_allow_access_to_specific_private_networks_only"
         result = []
-        security_groups = self.aws_ec2_client.describe_security_groups(Filters=[{'Name': 'ip-permission.cidr', 'Values': ['10.0.0.0/8', '172.16.0.0/12', '192.168.0.0/16']}])
-        instances_with_issue = set(list(map(lambda x: x['GroupId'], security_groups['SecurityGroups'])))
+        private_networks = ['10.0.0.0/8', '172.16.0.0/12', '192.168.0.0/16']
+        instances_with_issue = set(security_group['GroupId'] for security_group in self.evaluated_security_groups
+                                   if any(ip_range.get('CidrIp') in private_networks
+                                          for permission in security_group['IpPermissions']
+                                          for ip_range in permission.get('IpRanges', [])))
         instances_with_no_issue = self.set_security_group.difference(instances_with_issue)
         for i in instances_with_issue:
             result.append(self._get_result_object(i, "ec2_security_group", test_name, "issue_found"))
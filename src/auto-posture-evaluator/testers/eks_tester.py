@@ -1,23 +1,30 @@
-import time
 from datetime import datetime, timezone
-import boto3
 import interfaces
+from aws_context import AwsContext
 import concurrent.futures
 
 
 
 
 class Tester(interfaces.TesterInterface):
-    def __init__(self, region_name):
-        self.ssm = boto3.client('ssm')
+    inventory_views = ['eks.clusters', 'ec2.vpcs', 'ec2.security_groups']
+    resource_tests = ['aws_eks_kubernetes_api_server_publicly_accessible', 'aws_eks_control_plane_logging_is_disabled',
+                      'aws_eks_metric_and_alarm_do_not_exist_for_eks_configuration_changes',
+                      'aws_eks_unsupported_kubernetes_installed_on_eks_cluster',
+                      'aws_eks_default_vpc_is_being_used_to_launch_an_eks_cluster',
+                      'aws_eks_cluster_has_been_assigned_with_multiple_security_groups',
+                      'aws_eks_security_group_allows_incoming_traffic_on_forbidden_ports',
+                      'aws_eks_cluster_secrets_are_not_encrypted']
+
+    def __init__(self, region_name, aws_context=None):
+        self.aws_context = aws_context if aws_context else AwsContext()
         self.region_name = region_name
-        self.aws_eks_client = boto3.client('eks', region_name=region_name)
-        self.ec2_vpc_client = boto3.client('ec2', region_name=region_name)
-        self.cache = {}
-        self.user_id = boto3.client('sts').get_caller_identity().get('UserId')
-        self.account_arn = boto3.client('sts').get_caller_identity().get('Arn')
-        self.account_id = boto3.client('sts').get_caller_identity().get('Account')
+        self.aws_eks_client = self.aws_context.get_client('eks', region_name=region_name)
+        self.ec2_vpc_client = self.aws_context.get_client('ec2', region_name=region_name)
+        self.inventory = self.aws_context.inventory
+        self.result_context = self.aws_context.result_context(region_name)
         self.eks_cluster = []
+        self.evaluated_eks_cluster = []
 
     def declare_tested_service(self) -> str:
         return 'eks'
@@ -29,6 +36,8 @@ class Tester(interfaces.TesterInterface):
         if self.region_name == 'global' or self.region_name not in self._get_regions():
             return None
         self.eks_cluster = self._return_all_eks_cluster()
+        # The tests calling the EKS API evaluate every cluster, their answers are not part of the fingerprints
+        self.evaluated_eks_cluster = self.select_evaluated(self.eks_cluster, 'name')
         executor_list = []
         return_value = []
         with concurrent.futures.ThreadPoolExecutor() as executor:
@@ -50,46 +59,31 @@ class Tester(interfaces.TesterInterface):
         return return_value
 
     def _get_regions(self) -> list:
-        region_list = []
-        for page in self.ssm.get_paginator('get_parameters_by_path').paginate(
-                Path='/aws/service/global-infrastructure/regions'
-        ):
-            for p in page['Parameters']:
-                region_list.append(p['Value'])
-        return region_list
+        return self.aws_context.get_enabled_regions()
+
+    def resource_fingerprints(self) -> dict:
+        default_vpc = set(vpc['VpcId'] for vpc in self.inventory.get('ec2.vpcs', self.region_name) if vpc['IsDefault'])
+        security_groups_by_id = self.inventory.get('ec2.security_groups_by_id', self.region_name)
+        fingerprints = {}
+        for eks_data in self._return_all_eks_cluster():
+            vpc_config = eks_data.get('resourcesVpcConfig', {})
+            fingerprints[eks_data['name']] = [
+                vpc_config, eks_data.get('logging'), eks_data.get('version'), eks_data.get('encryptionConfig'),
+                vpc_config.get('vpcId') in default_vpc,
+                [security_groups_by_id.get(group_id, {}).get('IpPermissions')
+                 for group_id in vpc_config.get('securityGroupIds', [])]]
+        return fingerprints
 
     def _return_all_eks_cluster(self):
-        eks_cluster_response = self.aws_eks_client.list_clusters(
-            maxResults=100
-        )
-        eks_cluster_list = eks_cluster_response['clusters']
-        while 'nextToken' in eks_cluster_response and eks_cluster_response['nextToken']:
-            eks_cluster_response = self.aws_eks_client.list_clusters(
-                maxResults=100,
-                nextToken=eks_cluster_response['nextToken']
-            )
-            eks_cluster_list.append(eks_cluster_response['clusters'])
-        eks_cluster_describtion = [self.aws_eks_client.describe_cluster(name=eks_cluster)['cluster'] for eks_cluster in
-                                   eks_cluster_list]
-        return eks_cluster_describtion
+        return self.inventory.get('eks.clusters', self.region_name)
 
     def _append_eks_test_result(self, eks, test_name, issue_status):
-        return {
-            "user": self.user_id,
-            "account_arn": self.account_arn,
-            "account": self.account_id,
-            "timestamp": time.time(),
-            "item": eks['name'],
-            "item_type": "eks",
-            "test_name": test_name,
-            "test_result": issue_status,
-            "region": self.region_name
-        }
+        return self.result_context.new_result(eks['name'], "eks", test_name, issue_status)
 
     def detect_eks_kubernetes_api_server_publicly_accessible(self):
         publicly_accessible = []
         test_name = 'aws_eks_kubernetes_api_server_publicly_accessible'
-        for eks_data in self.eks_cluster:
+        for eks_data in self.evaluated_eks_cluster:
             if 'resourcesVpcConfig' in eks_data and 'endpointPublicAccess' in eks_data['resourcesVpcConfig'] and \
                     eks_data['resourcesVpcConfig']['endpointPublicAccess']:
                 # issue found
@@ -102,7 +96,7 @@ class Tester(interfaces.TesterInterface):
     def detect_eks_control_plane_logging_is_disabled(self):
         control_plane = []
         test_name = 'aws_eks_control_plane_logging_is_disabled'
-        for eks_data in self.eks_cluster:
+        for eks_data in self.evaluated_eks_cluster:
             issue_found = True
             if 'logging' in eks_data and 'clusterLogging' in eks_data['logging'] and eks_data['logging'][
                 'clusterLogging']:
@@ -121,7 +115,7 @@ class Tester(interfaces.TesterInterface):
     def detect_eks_metric_and_alarm_do_not_exist_for_eks_configuration_changes(self):
         metric_and_alarm_result = []
         test_name = 'aws_eks_metric_and_alarm_do_not_exist_for_eks_configuration_changes'
-        for eks_data in self.eks_cluster:
+        for eks_data in self.evaluated_eks_cluster:
             issue_found = True
             for cluster_logging_dict in eks_data['logging']['clusterLogging']:
                 if 'types' in cluster_logging_dict and cluster_logging_dict[
@@ -178,7 +172,7 @@ class Tester(interfaces.TesterInterface):
         unsupported_eks = []
         supported_versions = [1.22, 1.21, 1.20, 1.19]
         test_name = 'aws_eks_unsupported_kubernetes_installed_on_eks_cluster'
-        for eks_data in self.eks_cluster:
+        for eks_data in self.evaluated_eks_cluster:
             if 'version' in eks_data and float(eks_data['version']) not in supported_versions:
                 unsupported_eks.append(self._append_eks_test_result(eks_data, test_name, 'issue_found'))
             else:
@@ -188,23 +182,18 @@ class Tester(interfaces.TesterInterface):
     def detect_eks_default_vpc_is_being_used_to_launch_an_eks_cluster(self):
         eks_default_vpc = []
         test_name = 'aws_eks_default_vpc_is_being_used_to_launch_an_eks_cluster'
-        default_vpc = []
-        for eks_data in self.eks_cluster:
+        default_vpc = set(vpc['VpcId'] for vpc in self.inventory.get('ec2.vpcs', self.region_name) if vpc['IsDefault'])
+        for eks_data in self.evaluated_eks_cluster:
             if eks_data['resourcesVpcConfig']['vpcId'] in default_vpc:
                 eks_default_vpc.append(self._append_eks_test_result(eks_data, test_name, 'issue_found'))
             else:
-                vpc_response = self.ec2_vpc_client.describe_vpcs(VpcIds=[eks_data['resourcesVpcConfig']['vpcId']])
-                if vpc_response['Vpcs'][0]['IsDefault']:
-                    default_vpc.append(eks_data['resourcesVpcConfig']['vpcId'])
-                    eks_default_vpc.append(self._append_eks_test_result(eks_data, test_name, 'issue_found'))
-                else:
-                    eks_default_vpc.append(self._append_eks_test_result(eks_data, test_name, 'no_issue_found'))
+                eks_default_vpc.append(self._append_eks_test_result(eks_data, test_name, 'no_issue_found'))
         return eks_default_vpc
 
     def detect_eks_cluster_has_been_assigned_with_multiple_security_groups(self):
         multiple_security_groups = []
         test_name = 'aws_eks_cluster_has_been_assigned_with_multiple_security_groups'
-        for eks_data in self.eks_cluster:
+        for eks_data in self.evaluated_eks_cluster:
             if 'resourcesVpcConfig' in eks_data and 'securityGroupIds' in eks_data['resourcesVpcConfig'] and len(
                     eks_data['resourcesVpcConfig']['securityGroupIds']) > 1:
                 multiple_security_groups.append(self._append_eks_test_result(eks_data, test_name, 'issue_found'))
@@ -216,35 +205,23 @@ class Tester(interfaces.TesterInterface):
     def detect_eks_security_group_allows_incoming_traffic_on_forbidden_ports(self):
         incoming_traffic_on_forbidden_ports = []
         test_name = 'aws_eks_security_group_allows_incoming_traffic_on_forbidden_ports'
-        for eks_data in self.eks_cluster:
+        security_groups_by_id = self.inventory.get('ec2.security_groups_by_id', self.region_name)
+        for eks_data in self.evaluated_eks_cluster:
             issue_found = False
             if 'resourcesVpcConfig' in eks_data and 'securityGroupIds' in eks_data['resourcesVpcConfig'] and len(
                     eks_data['resourcesVpcConfig']['securityGroupIds']):
                 for security_group_id in eks_data['resourcesVpcConfig']['securityGroupIds']:
-                    security_groups_response = self.ec2_vpc_client.describe_security_groups(
-                        Filters=[
-                            {
-                                'Name': 'group-id',
-                                'Values': [
-                                    security_group_id,
-                                ]
-                            },
-                        ])
-                    if 'SecurityGroups' in security_groups_response and security_groups_response[
-                        'SecurityGroups']:
-                        for security_group_dict in security_groups_response['SecurityGroups']:
-                            for ip_permissions_dict in security_group_dict['IpPermissions']:
-                                if not ('FromPort' in ip_permissions_dict and ip_permissions_dict[
-                                    'FromPort'] and 'ToPort' in ip_permissions_dict and ip_permissions_dict[
-                                            'ToPort'] and \
-                                        ip_permissions_dict['ToPort'] == ip_permissions_dict['FromPort'] and \
-                                        ip_permissions_dict['FromPort'] in [
-                                            443] and 'IpProtocol' in ip_permissions_dict and \
-                                        ip_permissions_dict['IpProtocol'] == 'tcp'):
-                                    issue_found = True
-                                    break
-                            if issue_found:
-                                break
+                    security_group_dict = security_groups_by_id.get(security_group_id, {})
+                    for ip_permissions_dict in security_group_dict.get('IpPermissions', []):
+                        if not ('FromPort' in ip_permissions_dict and ip_permissions_dict[
+                            'FromPort'] and 'ToPort' in ip_permissions_dict and ip_permissions_dict[
+                                    'ToPort'] and \
+                                ip_permissions_dict['ToPort'] == ip_permissions_dict['FromPort'] and \
+                                ip_permissions_dict['FromPort'] in [
+                                    443] and 'IpProtocol' in ip_permissions_dict and \
+                                ip_permissions_dict['IpProtocol'] == 'tcp'):
+                            issue_found = True
+                            break
                     if issue_found:
                         break
             if issue_found:
@@ -288,7 +265,7 @@ class Tester(interfaces.TesterInterface):
     def detect_eks_cluster_secrets_are_not_encrypted(self):
         eks_cluster_secrets = []
         test_name = 'aws_eks_cluster_secrets_are_not_encrypted'
-        for eks_data in self.eks_cluster:
+        for eks_data in self.evaluated_eks_cluster:
             issue_found = True
             if 'encryptionConfig' in eks_data and eks_data['encryptionConfig']:
                 for encryption_config_dict in eks_data['encryptionConfig']:
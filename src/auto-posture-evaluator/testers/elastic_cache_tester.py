@@ -1,6 +1,5 @@
-import time
-import boto3
 import interfaces
+from aws_context import AwsContext
 import concurrent.futures
 
 def _return_default_port_on_elasticache_engines(cluster_type):
@@ -13,14 +12,12 @@ def _return_default_port_on_elasticache_engines(cluster_type):
 
 
 class Tester(interfaces.TesterInterface):
-    def __init__(self, region_name):
-        self.ssm = boto3.client('ssm')
+    def __init__(self, region_name, aws_context=None):
+        self.aws_context = aws_context if aws_context else AwsContext()
         self.region_name = region_name
-        self.aws_elasticache_client = boto3.client('elasticache', region_name=region_name)
+        self.aws_elasticache_client = self.aws_context.get_client('elasticache', region_name=region_name)
         self.cache = {}
-        self.user_id = boto3.client('sts').get_caller_identity().get('UserId')
-        self.account_arn = boto3.client('sts').get_caller_identity().get('Arn')
-        self.account_id = boto3.client('sts').get_caller_identity().get('Account')
+        self.result_context = self.aws_context.result_context(region_name)
         self.elasticache_clusters = []
 
     def declare_tested_service(self) -> str:
@@ -47,26 +44,11 @@ class Tester(interfaces.TesterInterface):
         return return_value
 
     def _get_regions(self) -> list:
-        region_list = []
-        for page in self.ssm.get_paginator('get_parameters_by_path').paginate(
-                Path='/aws/service/global-infrastructure/regions'
-        ):
-            for p in page['Parameters']:
-                region_list.append(p['Value'])
-        return region_list
+        return self.aws_context.get_enabled_regions()
 
     def _append_elasticache_test_result(self, elasticache, test_name, issue_status):
-        return {
-            "user": self.user_id,
-            "account_arn": self.account_arn,
-            "account": self.account_id,
-            "timestamp": time.time(),
-            "item": elasticache['CacheClusterId'],
-            "item_type": "elasticache_cluster",
-            "test_name": test_name,
-            "test_result": issue_status,
-            "region": self.region_name
-        }
+        return self.result_context.new_result(
+            elasticache['CacheClusterId'], "elasticache_cluster", test_name, issue_status)
 
     def _return_latest_version_for_given_engine(self, engine_type):
         versions = self.aws_elasticache_client.describe_cache_engine_versions(
@@ -1,6 +1,6 @@
-import time
-import boto3
 import interfaces
+from aws_context import AwsContext
+from policy_analysis import analyze_policy
 import json
 import concurrent.futures
 
@@ -9,14 +9,12 @@ def _format_string_to_json(text):
 
 
 class Tester(interfaces.TesterInterface):
-    def __init__(self, region_name):
-        self.ssm = boto3.client('ssm')
+    def __init__(self, region_name, aws_context=None):
+        self.aws_context = aws_context if aws_context else AwsContext()
         self.region_name = region_name
-        self.aws_elastic_search_client = boto3.client('es', region_name=region_name)
+        self.aws_elastic_search_client = self.aws_context.get_client('es', region_name=region_name)
         self.cache = {}
-        self.user_id = boto3.client('sts').get_caller_identity().get('UserId')
-        self.account_arn = boto3.client('sts').get_caller_identity().get('Arn')
-        self.account_id = boto3.client('sts').get_caller_identity().get('Account')
+        self.result_context = self.aws_context.result_context(region_name)
         self.elastic_search_domain_names = {}
 
     def declare_tested_service(self) -> str:
@@ -46,42 +44,19 @@ class Tester(interfaces.TesterInterface):
         return return_value
 
     def _get_regions(self) -> list:
-        region_list = []
-        for page in self.ssm.get_paginator('get_parameters_by_path').paginate(
-                Path='/aws/service/global-infrastructure/regions'
-        ):
-            for p in page['Parameters']:
-                region_list.append(p['Value'])
-        return region_list
+        return self.aws_context.get_enabled_regions()
 
     def _append_elastic_search_test_result(self, elastic_search, test_name, issue_status):
-        return {
-            "user": self.user_id,
-            "account_arn": self.account_arn,
-            "account": self.account_id,
-            "timestamp": time.time(),
-            "item": elastic_search['DomainName'],
-            "item_type": "elastic_search_cluster",
-            "test_name": test_name,
-            "test_result": issue_status,
-            "region": self.region_name
-        }
+        return self.result_context.new_result(
+            elastic_search['DomainName'], "elastic_search_cluster", test_name, issue_status)
 
     def _check_es_domain_not_publicly_accessible(self, access_policy):
-        access_policy = _format_string_to_json(access_policy)
-        is_exposed = False
-        for statement in access_policy['Statement']:
-            if 'Effect' in statement and statement['Effect'] == 'Deny':
-                continue
-            if 'Principal' in statement and 'AWS' in statement['Principal'] and statement['Principal'][
-                'AWS'] == '*' and 'Condition' not in statement:
-                is_exposed = True
-                break
-            if 'IpAddress' in statement['Condition'] and 'aws:SourceIp' in statement['Condition'][
-                'IpAddress'] and '0.0.0.0/0' in statement['Condition']['IpAddress']['aws:SourceIp']:
-                is_exposed = True
-                break
-        return is_exposed
+        policy = analyze_policy(access_policy)
+        if policy.grants(anonymous=True, unconditional=True):
+            return True
+        # Open to any address
+        return any('0.0.0.0/0' in statement.condition_values('IpAddress', 'aws:SourceIp')
+                   for statement in policy.granting_statements(anonymous=False))
 
     def detect_elastic_search_cluster_using_latest_engine_version(self):
         test_name = "aws_elastic_search_cluster_using_latest_engine_version"
@@ -1,17 +1,15 @@
-import time
-import boto3
 import jmespath
 import interfaces
+from aws_context import AwsContext
 from concurrent.futures import ThreadPoolExecutor
 
 
 class Tester(interfaces.TesterInterface):
-    def __init__(self, region_name) -> None:
+    def __init__(self, region_name, aws_context=None) -> None:
+        self.aws_context = aws_context if aws_context else AwsContext()
         self.aws_region = region_name
-        self.user_id = boto3.client('sts').get_caller_identity().get('UserId')
-        self.account_arn = boto3.client('sts').get_caller_identity().get('Arn')
-        self.account_id = boto3.client('sts').get_caller_identity().get('Account')
-        self.aws_elasticbeanstalk_client = boto3.client('elasticbeanstalk', region_name=region_name)
+        self.result_context = self.aws_context.result_context(region_name)
+        self.aws_elasticbeanstalk_client = self.aws_context.get_client('elasticbeanstalk', region_name=region_name)
         self.elasticbeanstalk_enviroments = []
 
     def declare_tested_provider(self) -> str:
@@ -41,27 +39,10 @@ class Tester(interfaces.TesterInterface):
             return None
 
     def _append_elasticbeanstalk_test_result(self, item, item_type, test_name, issue_status):
-        return {
-            "user": self.user_id,
-            "account_arn": self.account_arn,
-            "account": self.account_id,
-            "timestamp": time.time(),
-            "item": item,
-            "item_type": item_type,
-            "test_name": test_name,
-            "test_result": issue_status,
-            "region": self.aws_region
-        }
+        return self.result_context.new_result(item, item_type, test_name, issue_status)
 
     def _get_all_aws_regions(self):
-        all_regions = []
-        boto3_client = boto3.client('ec2', region_name='us-east-1')
-        response = boto3_client.describe_regions(AllRegions=True)
-
-        for region in response['Regions']:
-            all_regions.append(region['RegionName'])
-
-        return all_regions
+        return self.aws_context.get_enabled_regions()
 
     def _get_all_environemnts(self):
         environments = []
@@ -1,27 +1,36 @@
 import os
 from datetime import datetime
-import time
 from typing import Dict, List
 import interfaces
-import boto3
+from aws_context import AwsContext
 import jmespath
 from concurrent.futures import ThreadPoolExecutor
 
 
 class Tester(interfaces.TesterInterface):
-    def __init__(self, region_name) -> None:
+    inventory_views = ['elb.load_balancers', 'elb.load_balancer_attributes', 'elbv2.load_balancers',
+                       'elbv2.load_balancer_attributes', 'elbv2.listeners']
+    resource_tests = ['aws_elbv2_is_not_internet_facing', 'aws_elbv2_alb_is_using_secure_listeners',
+                      'aws_elbv2_using_latest_security_policy', 'aws_elbv2_has_deletion_protection_enabled',
+                      'aws_elb_is_generating_access_log', 'aws_elb_listeners_securely_configurd', 'aws_elb_internet_facing',
+                      'aws_elb_cross_zone_load_balancing_should_be_enabled', 'aws_elb_connection_draining_enabled',
+                      'aws_elb_no_registered_instances']
+
+    def __init__(self, region_name, aws_context=None) -> None:
+        self.aws_context = aws_context if aws_context else AwsContext()
         self.aws_region = region_name
-        self.user_id = boto3.client('sts').get_caller_identity().get('UserId')
-        self.account_arn = boto3.client('sts').get_caller_identity().get('Arn')
-        self.account_id = boto3.client('sts').get_caller_identity().get('Account')
-        self.aws_elbs_client = boto3.client('elb', region_name=region_name)
-        self.aws_elbsv2_client = boto3.client('elbv2', region_name=region_name)
+        self.result_context = self.aws_context.result_context(region_name)
+        self.aws_elbs_client = self.aws_context.get_client('elb', region_name=region_name)
+        self.aws_elbsv2_client = self.aws_context.get_client('elbv2', region_name=region_name)
+        self.inventory = self.aws_context.inventory
         self.elbs = []
         self.elbsv2 = []
+        self.evaluated_elbs = []
+        self.evaluated_elbsv2 = []
         self.cipher_suites = self._get_cipher_suite_details()
         self.latest_security_policies = self._get_aws_latest_security_policies()
-        self.aws_acm_client = boto3.client('acm')
-        self.aws_iam_client = boto3.client('iam')
+        self.aws_acm_client = self.aws_context.get_client('acm')
+        self.aws_iam_client = self.aws_context.get_client('iam')
         self.ssl_certificate_age = os.environ.get('AUTOPOSTURE_ALB_SSL_CERTIFICATE_AGE')
         self.elb_ssl_certificate_expiry = os.environ.get('AUTOPOSTURE_ELB_SSL_CERTIFICATE_EXPIRY')
         self.elb_ssl_certificate_renew = os.environ.get('AUTOPOSTURE_ELB_SSL_CERTIFICATE_ADVANCE_RENEW')
@@ -37,6 +46,9 @@ class Tester(interfaces.TesterInterface):
         if any([self.aws_region == region for region in all_aws_regions]):
             self.elbs = self._get_all_elb()
             self.elbsv2 = self._get_all_elbv2()
+            # The tests calling the AWS APIs or reading the current date evaluate every load balancer
+            self.evaluated_elbs = self.select_evaluated(self.elbs, 'LoadBalancerName')
+            self.evaluated_elbsv2 = self.select_evaluated(self.elbsv2, 'LoadBalancerArn')
             executor_list = []
             return_values = []
 
@@ -73,31 +85,32 @@ class Tester(interfaces.TesterInterface):
             return None
 
     def _get_all_aws_regions(self):
-        regions = []
-        response = boto3.client('ec2', region_name='us-east-1').describe_regions(AllRegions=True)
-        for region in response['Regions']:
-            regions.append(region['RegionName'])
-        return regions
+        return self.aws_context.get_enabled_regions()
+
+    def resource_fingerprints(self) -> dict:
+        fingerprints = {}
+        for elb in self._get_all_elb():
+            fingerprints[elb['LoadBalancerName']] = [elb, self._get_elb_attributes(elb['LoadBalancerName'])]
+        for elb in self._get_all_elbv2():
+            fingerprints[elb['LoadBalancerArn']] = [elb, self._get_elbv2_attributes(elb['LoadBalancerArn']),
+                                                    self._get_elbv2_listeners(elb['LoadBalancerArn']),
+                                                    self.latest_security_policies]
+        return fingerprints
 
     def _get_all_elbv2(self) -> List:
-        elbs = []
-        paginator = self.aws_elbsv2_client.get_paginator('describe_load_balancers')
-        response_iterator = paginator.paginate()
-
-        for page in response_iterator:
-            elbs.extend(page['LoadBalancers'])
-
-        return elbs
+        return self.inventory.get('elbv2.load_balancers', self.aws_region)
 
     def _get_all_elb(self) -> List:
-        elbs = []
-        paginator = self.aws_elbs_client.get_paginator('describe_load_balancers')
-        response_iterator = paginator.paginate()
+        return self.inventory.get('elb.load_balancers', self.aws_region)
+
+    def _get_elb_attributes(self, load_balancer_name) -> Dict:
+        return self.inventory.get('elb.load_balancer_attributes', self.aws_region)[load_balancer_name]
 
-        for page in response_iterator:
-            elbs.extend(page['LoadBalancerDescriptions'])
+    def _get_elbv2_attributes(self, load_balancer_arn) -> List:
+        return self.inventory.get('elbv2.load_balancer_attributes', self.aws_region)[load_balancer_arn]
 
-        return elbs
+    def _get_elbv2_listeners(self, load_balancer_arn) -> List:
+        return self.inventory.get('elbv2.listeners', self.aws_region)[load_balancer_arn]
 
     def _get_aws_latest_security_policies(self) -> List:
         policies = ['ELBSecurityPolicy-2016-08', 'ELBSecurityPolicy-FS-2018-06']
@@ -127,20 +140,10 @@ class Tester(interfaces.TesterInterface):
         return cipher_suites
 
     def _apprend_tester_result(self, item, item_type, test_name, issue_status):
-        return {
-            "user": self.user_id,
-            "account_arn": self.account_arn,
-            "account": self.account_id,
-            "timestamp": time.time(),
-            "item": item,
-            "item_type": item_type,
-            "test_name": test_name,
-            "test_result": issue_status,
-            "region": self.aws_region
-        }
+        return self.result_context.new_result(item, item_type, test_name, issue_status)
 
     def get_elbv2_internet_facing(self) -> List:
-        elbs = self.elbsv2
+        elbs = self.evaluated_elbsv2
         test_name = "aws_elbv2_is_not_internet_facing"
         result = []
 
@@ -159,14 +162,14 @@ class Tester(interfaces.TesterInterface):
         return result
 
     def get_elb_generating_access_log(self) -> List:
-        elbs = self.elbs
+        elbs = self.evaluated_elbs
         test_name = "aws_elb_is_generating_access_log"
         result = []
 
         for elb in elbs:
             load_balancer_name = elb['LoadBalancerName']
-            response = self.aws_elbs_client.describe_load_balancer_attributes(LoadBalancerName=load_balancer_name)
-            if response['LoadBalancerAttributes']['AccessLog']['Enabled']:
+            attributes = self._get_elb_attributes(load_balancer_name)
+            if attributes['AccessLog']['Enabled']:
                 # no issue
                 result.append(self._apprend_tester_result(load_balancer_name, "aws_elb", test_name, "no_issue_found"))
             else:
@@ -177,15 +180,14 @@ class Tester(interfaces.TesterInterface):
 
     def get_alb_using_secure_listener(self) -> List:
         test_name = "aws_elbv2_alb_is_using_secure_listeners"
-        elbs = self.elbsv2
+        elbs = self.evaluated_elbsv2
         result = []
 
         for elb in elbs:
             # check elbv2 type and only let ALB pass
             if elb['Type'] == "application":
                 load_balancer_arn = elb['LoadBalancerArn']
-                response = self.aws_elbsv2_client.describe_listeners(LoadBalancerArn=load_balancer_arn)
-                listeners = response['Listeners']
+                listeners = self._get_elbv2_listeners(load_balancer_arn)
                 secure_listener_count = 0
                 for listener in listeners:
                     if listener['Protocol'] == "HTTPS":
@@ -210,8 +212,7 @@ class Tester(interfaces.TesterInterface):
             elb_type = elb['Type']
 
             if elb_type == 'application' or elb_type == 'network':
-                elb_attributes = self.aws_elbsv2_client.describe_load_balancer_attributes(LoadBalancerArn=elb_arn)
-                attributes = elb_attributes['Attributes']
+                attributes = self._get_elbv2_attributes(elb_arn)
                 for i in attributes:
                     if i['Key'] == 'access_logs.s3.enabled':
                         if i['Value'] == 'false':
@@ -226,9 +227,9 @@ class Tester(interfaces.TesterInterface):
                 temp = arn_split[-1]
                 description_temp = temp.split('loadbalancer/')
                 network_interface_description = 'ELB' + ' ' + description_temp[-1]
-                ec2_client = boto3.client('ec2')
-                response = ec2_client.describe_network_interfaces(Filters=[{'Name': 'description', 'Values': [network_interface_description]}])
-                network_interfaces = response['NetworkInterfaces']
+                ec2_client = self.aws_context.get_client('ec2', region_name=self.aws_region)
+                network_interfaces = [interface for interface in self.inventory.get('ec2.network_interfaces', self.aws_region)
+                                      if interface.get('Description') == network_interface_description]
                 interface_ids = []
                 for interface in network_interfaces:
                     interface_ids.append(interface['NetworkInterfaceId'])
@@ -288,7 +289,7 @@ class Tester(interfaces.TesterInterface):
         test_name = "aws_elb_listeners_securely_configurd"
         result = []
 
-        elbs = self.elbs
+        elbs = self.evaluated_elbs
 
         for elb in elbs:
             listeners = elb['ListenerDescriptions']
@@ -392,12 +393,11 @@ class Tester(interfaces.TesterInterface):
 
     def get_elbv2_using_latest_security_policy(self) -> List:
         test_name = "aws_elbv2_using_latest_security_policy"
-        elbv2 = self.elbsv2
+        elbv2 = self.evaluated_elbsv2
         latest_security_policies = self.latest_security_policies
         result = []
         for elb in elbv2:
-            response = self.aws_elbsv2_client.describe_listeners(LoadBalancerArn=elb['LoadBalancerArn'])
-            listeners = response['Listeners']
+            listeners = self._get_elbv2_listeners(elb['LoadBalancerArn'])
             elb_arn = elb['LoadBalancerArn']
             elb_type = elb['Type']
 
@@ -421,13 +421,11 @@ class Tester(interfaces.TesterInterface):
     def get_elbv2_has_deletion_protection(self) -> List:
         result = []
         test_name = "aws_elbv2_has_deletion_protection_enabled"
-        elbs = self.elbsv2
+        elbs = self.evaluated_elbsv2
 
         for elb in elbs:
             elb_arn = elb['LoadBalancerArn']
-            response = self.aws_elbsv2_client.describe_load_balancer_attributes(LoadBalancerArn=elb_arn)
-
-            attrs = response['Attributes']
+            attrs = self._get_elbv2_attributes(elb_arn)
 
             for attr in attrs:
                 if attr['Key'] == 'deletion_protection.enabled':
@@ -447,11 +445,7 @@ class Tester(interfaces.TesterInterface):
 
         for elb in elbs:
             elb_arn = elb['LoadBalancerArn']
-            paginator = self.aws_elbsv2_client.get_paginator('describe_listeners')
-            response_iterator = paginator.paginate(LoadBalancerArn=elb_arn)
-            listerners = []
-            for page in response_iterator:
-                listerners.extend(page['Listeners'])
+            listerners = self._get_elbv2_listeners(elb_arn)
 
             for listerner in listerners:
                 protocol = listerner['Protocol']
@@ -482,12 +476,7 @@ class Tester(interfaces.TesterInterface):
                 elb_type = elb['Type']
 
                 if elb_type == 'application':
-                    paginator = self.aws_elbsv2_client.get_paginator('describe_listeners')
-                    response_iterator = paginator.paginate(LoadBalancerArn=elb_arn)
-                    listerners = []
-
-                    for page in response_iterator:
-                        listerners.extend(page['Listeners'])
+                    listerners = self._get_elbv2_listeners(elb_arn)
 
                     for listener in listerners:
                         ssl_policy = listener['SslPolicy'] if listener.get('SslPolicy') else 'no_ssl_policy'
@@ -539,11 +528,7 @@ class Tester(interfaces.TesterInterface):
                 elb_type = elb['Type']
 
                 if elb_type == 'network':
-                    paginator = self.aws_elbsv2_client.get_paginator('describe_listeners')
-                    response_iterator = paginator.paginate(LoadBalancerArn=elb_arn)
-                    listerners = []
-                    for page in response_iterator:
-                        listerners.extend(page['Listeners'])
+                    listerners = self._get_elbv2_listeners(elb_arn)
 
                     for listener in listerners:
                         ssl_policy = listener['SslPolicy'] if listener.get('SslPolicy') else 'no_ssl_policy'
@@ -581,7 +566,7 @@ class Tester(interfaces.TesterInterface):
         return result
 
     def get_elb_internet_facing(self) -> List:
-        elbs = self.elbs
+        elbs = self.evaluated_elbs
         test_name = "aws_elb_internet_facing"
         result = []
 
@@ -606,12 +591,7 @@ class Tester(interfaces.TesterInterface):
                 elb_arn = elb['LoadBalancerArn']
                 elb_type = elb['Type']
                 if elb_type == 'network':
-                    paginator = self.aws_elbsv2_client.get_paginator('describe_listeners')
-                    response_iterator = paginator.paginate(LoadBalancerArn=elb_arn)
-                    listerners = []
-
-                    for page in response_iterator:
-                        listerners.extend(page['Listeners'])
+                    listerners = self._get_elbv2_listeners(elb_arn)
 
                     for listener in listerners:
                         ssl_policy = listener['SslPolicy'] if listener.get('SslPolicy') else 'no_ssl_policy'
@@ -664,12 +644,7 @@ class Tester(interfaces.TesterInterface):
                 elb_type = elb['Type']
                 elb_arn = elb['LoadBalancerArn']
                 if elb_type == 'application':
-                    paginator = self.aws_elbsv2_client.get_paginator('describe_listeners')
-                    response_iterator = paginator.paginate(LoadBalancerArn=elb_arn)
-                    listerners = []
-
-                    for page in response_iterator:
-                        listerners.extend(page['Listeners'])
+                    listerners = self._get_elbv2_listeners(elb_arn)
 
                     elb_certificates = []
 
@@ -724,12 +699,11 @@ class Tester(interfaces.TesterInterface):
         result = []
         test_name = "aws_elb_cross_zone_load_balancing_should_be_enabled"
 
-        elbs = self.elbs
+        elbs = self.evaluated_elbs
 
         for elb in elbs:
             load_balancer_name = elb['LoadBalancerName']
-            response = self.aws_elbs_client.describe_load_balancer_attributes(LoadBalancerName=load_balancer_name)
-            attrs = response['LoadBalancerAttributes']
+            attrs = self._get_elb_attributes(load_balancer_name)
 
             cross_zone_enabled = attrs['CrossZoneLoadBalancing']['Enabled']
             if cross_zone_enabled:
@@ -742,12 +716,11 @@ class Tester(interfaces.TesterInterface):
         result = []
         test_name = "aws_elb_connection_draining_enabled"
 
-        elbs = self.elbs
+        elbs = self.evaluated_elbs
 
         for elb in elbs:
             load_balancer_name = elb['LoadBalancerName']
-            response = self.aws_elbs_client.describe_load_balancer_attributes(LoadBalancerName=load_balancer_name)
-            attrs = response['LoadBalancerAttributes']
+            attrs = self._get_elb_attributes(load_balancer_name)
 
             connection_draining_enabled = attrs['ConnectionDraining']['Enabled']
             if connection_draining_enabled:
@@ -761,7 +734,7 @@ class Tester(interfaces.TesterInterface):
         result = []
         test_name = "aws_elb_no_registered_instances"
 
-        elbs = self.elbs
+        elbs = self.evaluated_elbs
 
         for elb in elbs:
             instances = elb['Instances']
@@ -1,18 +1,23 @@
-import time
-import boto3
 import interfaces
-import json
+from aws_context import AwsContext
 from concurrent.futures import ThreadPoolExecutor
 
 
 class Tester(interfaces.TesterInterface):
-    def __init__(self, region_name) -> None:
+    inventory_views = ['emr.clusters', 'emr.cluster_descriptions', 'emr.security_configurations']
+    resource_tests = ['aws_emr_cluster_should_have_a_security_configuration',
+                      'aws_emr_cluster_should_use_keberos_authentication',
+                      'aws_emr_in_transit_and_at_rest_encryption_enabled', 'aws_emr_cluster_should_use_kms_for_s3_sse',
+                      'aws_emr_cluster_should_upload_logs_to_s3', 'aws_emr_cluster_should_have_local_disk_encryption',
+                      'aws_emr_cluster_should_have_encryption_in_transit_enabled',
+                      'aws_emr_cluster_should_use_kms_for_s3_cse', 'aws_emr_cluster_encryption_should_be_enabled']
+
+    def __init__(self, region_name, aws_context=None) -> None:
+        self.aws_context = aws_context if aws_context else AwsContext()
         self.aws_region = region_name
-        self.user_id = boto3.client('sts').get_caller_identity().get('UserId')
-        self.account_arn = boto3.client('sts').get_caller_identity().get('Arn')
-        self.account_id = boto3.client('sts').get_caller_identity().get('Account')
-        self.aws_emr_client = boto3.client('emr', region_name=region_name)
-        self.aws_kms_client = boto3.client('kms', region_name=region_name)
+        self.result_context = self.aws_context.result_context(region_name)
+        self.aws_kms_client = self.aws_context.get_client('kms', region_name=region_name)
+        self.inventory = self.aws_context.inventory
         self.emr_clusters = []
 
     def declare_tested_provider(self) -> str:
@@ -48,37 +53,33 @@ class Tester(interfaces.TesterInterface):
             return None
 
     def _get_all_aws_regions(self):
-        all_regions = []
-        boto3_client = boto3.client('ec2', region_name='us-east-1')
-        response = boto3_client.describe_regions(AllRegions=True)
-
-        for i in response['Regions']:
-            all_regions.append(i['RegionName'])
-
-        return all_regions
+        return self.aws_context.get_enabled_regions()
+
+    def resource_fingerprints(self) -> dict:
+        # The state and the security settings of each cluster, its instance hours and timeline change all along
+        descriptions = self.inventory.get('emr.cluster_descriptions', self.aws_region)
+        security_configurations = self.inventory.get('emr.security_configurations', self.aws_region)
+        fingerprints = {}
+        for cluster in self.inventory.get('emr.clusters', self.aws_region):
+            description = descriptions[cluster['Id']]
+            security_configuration = description.get('SecurityConfiguration')
+            fingerprints[cluster['Id']] = [cluster['Status']['State'], security_configuration,
+                                           security_configurations.get(security_configuration),
+                                           description.get('KerberosAttributes'), description.get('LogUri')]
+        return fingerprints
 
     def _get_all_emr_clusters(self):
-        clusters = []
-        paginator = self.aws_emr_client.get_paginator('list_clusters')
-        response_iterator = paginator.paginate()
+        # Every check of the tester is a resource test
+        return self.select_evaluated(self.inventory.get('emr.clusters', self.aws_region), 'Id')
 
-        for page in response_iterator:
-            clusters.extend(page['Clusters'])
+    def _get_cluster_description(self, cluster_id):
+        return self.inventory.get('emr.cluster_descriptions', self.aws_region)[cluster_id]
 
-        return clusters
+    def _get_security_configuration(self, name):
+        return self.inventory.get('emr.security_configurations', self.aws_region)[name]
 
     def _append_emr_cluster_test_result(self, item, item_type, test_name, issue_status):
-        return {
-            "user": self.user_id,
-            "account_arn": self.account_arn,
-            "account": self.account_id,
-            "timestamp": time.time(),
-            "item": item,
-            "item_type": item_type,
-            "test_name": test_name,
-            "test_result": issue_status,
-            "region": self.aws_region
-        }
+        return self.result_context.new_result(item, item_type, test_name, issue_status)
 
     def emr_cluster_should_have_a_security_configuration(self):
         result = []
@@ -92,8 +93,7 @@ class Tester(interfaces.TesterInterface):
 
             if cluster_state == "TERMINATING" or cluster_state == "TERMINATED" or cluster_state == "TERMINATED_WITH_ERRORS": pass
             else:
-                response = self.aws_emr_client.describe_cluster(ClusterId=cluster_id)
-                cluster_info = response['Cluster']
+                cluster_info = self._get_cluster_description(cluster_id)
                 security_config = cluster_info.get("SecurityConfiguration")
 
                 if security_config is not None:
@@ -115,8 +115,7 @@ class Tester(interfaces.TesterInterface):
 
             if cluster_state == "TERMINATING" or cluster_state == "TERMINATED" or cluster_state == "TERMINATED_WITH_ERRORS": pass
             else:
-                response = self.aws_emr_client.describe_cluster(ClusterId=cluster_id)
-                cluster_info = response['Cluster']
+                cluster_info = self._get_cluster_description(cluster_id)
 
                 kerberos_attrs = cluster_info.get('KerberosAttributes')
 
@@ -139,8 +138,7 @@ class Tester(interfaces.TesterInterface):
 
             if cluster_state == "TERMINATING" or cluster_state == "TERMINATED" or cluster_state == "TERMINATED_WITH_ERRORS": pass
             else:
-                response = self.aws_emr_client.describe_cluster(ClusterId=cluster_id)
-                cluster_info = response['Cluster']
+                cluster_info = self._get_cluster_description(cluster_id)
 
                 security_conf = cluster_info.get('SecurityConfiguration')
 
@@ -163,14 +161,11 @@ class Tester(interfaces.TesterInterface):
 
             if cluster_state == "TERMINATING" or cluster_state == "TERMINATED" or cluster_state == "TERMINATED_WITH_ERRORS": pass
             else:
-                response = self.aws_emr_client.describe_cluster(ClusterId=cluster_id)
-                cluster_info = response["Cluster"]
+                cluster_info = self._get_cluster_description(cluster_id)
                 security_conf = cluster_info.get("SecurityConfiguration")
 
                 if security_conf is not None:
-                    response = self.aws_emr_client.describe_security_configuration(Name=security_conf)
-                    security_conf_json = response['SecurityConfiguration']
-                    security_conf_obj = json.loads(security_conf_json)
+                    security_conf_obj = self._get_security_configuration(security_conf)
                     encryption_conf = security_conf_obj.get("EncryptionConfiguration")
                     if encryption_conf is not None:
                         at_rest_encrypt_config = encryption_conf.get("AtRestEncryptionConfiguration")
@@ -203,14 +198,11 @@ class Tester(interfaces.TesterInterface):
 
             if cluster_state == "TERMINATING" or cluster_state == "TERMINATED" or cluster_state == "TERMINATED_WITH_ERRORS": pass
             else:
-                response = self.aws_emr_client.describe_cluster(ClusterId=cluster_id)
-                cluster_info = response["Cluster"]
+                cluster_info = self._get_cluster_description(cluster_id)
                 security_conf = cluster_info.get("SecurityConfiguration")
 
                 if security_conf is not None:
-                    security_conf = self.aws_emr_client.describe_security_configuration(Name=security_conf)
-                    security_conf_json = response['SecurityConfiguration']
-                    security_conf_obj = json.loads(security_conf_json)
+                    security_conf_obj = self._get_security_configuration(security_conf)
                     encryption_conf = security_conf_obj.get("EncryptionConfiguration")
 
                     if encryption_conf is not None:
@@ -245,8 +237,7 @@ class Tester(interfaces.TesterInterface):
 
         for cluster in clusters:
             cluster_id = cluster['Id']
-            response = self.aws_emr_client.describe_cluster(ClusterId=cluster_id)
-            cluster_obj = response['Cluster']
+            cluster_obj = self._get_cluster_description(cluster_id)
 
             log_uri = cluster_obj.get("LogUri")
 
@@ -269,14 +260,11 @@ class Tester(interfaces.TesterInterface):
 
             if cluster_state == "TERMINATING" or cluster_state == "TERMINATED" or cluster_state == "TERMINATED_WITH_ERRORS": pass
             else:
-                response = self.aws_emr_client.describe_cluster(ClusterId=cluster_id)
-                cluster_info = response["Cluster"]
+                cluster_info = self._get_cluster_description(cluster_id)
                 security_conf = cluster_info.get("SecurityConfiguration")
 
                 if security_conf is not None:
-                    security_conf = self.aws_emr_client.describe_security_configuration(Name=security_conf)
-                    security_conf_json = response['SecurityConfiguration']
-                    security_conf_obj = json.loads(security_conf_json)
+                    security_conf_obj = self._get_security_configuration(security_conf)
                     encryption_conf = security_conf_obj.get("EncryptionConfiguration")
 
                     if encryption_conf is not None:
@@ -303,14 +291,11 @@ class Tester(interfaces.TesterInterface):
 
             if cluster_state == "TERMINATING" or cluster_state == "TERMINATED" or cluster_state == "TERMINATED_WITH_ERRORS": pass
             else:
-                response = self.aws_emr_client.describe_cluster(ClusterId=cluster_id)
-                cluster_info = response["Cluster"]
+                cluster_info = self._get_cluster_description(cluster_id)
                 security_conf = cluster_info.get("SecurityConfiguration")
 
                 if security_conf is not None:
-                    security_conf = self.aws_emr_client.describe_security_configuration(Name=security_conf)
-                    security_conf_json = response['SecurityConfiguration']
-                    security_conf_obj = json.loads(security_conf_json)
+                    security_conf_obj = self._get_security_configuration(security_conf)
                     encryption_conf = security_conf_obj.get("EncryptionConfiguration")
 
                     if encryption_conf is not None:
@@ -337,15 +322,11 @@ class Tester(interfaces.TesterInterface):
 
             if cluster_state == "TERMINATING" or cluster_state == "TERMINATED" or cluster_state == "TERMINATED_WITH_ERRORS": pass
             else:
-                response = self.aws_emr_client.describe_cluster(ClusterId=cluster_id)
-
-                cluster_info = response["Cluster"]
+                cluster_info = self._get_cluster_description(cluster_id)
                 security_conf = cluster_info.get("SecurityConfiguration")
 
                 if security_conf is not None:
-                    response = self.aws_emr_client.describe_security_configuration(Name=security_conf)
-                    security_conf_json = response['SecurityConfiguration']
-                    security_conf_obj = json.loads(security_conf_json)
+                    security_conf_obj = self._get_security_configuration(security_conf)
                     encryption_conf = security_conf_obj.get("EncryptionConfiguration")
                     if encryption_conf is not None:
                         at_rest_encrypt_config = encryption_conf.get("AtRestEncryptionConfiguration")
@@ -378,14 +359,11 @@ class Tester(interfaces.TesterInterface):
 
             if cluster_state == "TERMINATING" or cluster_state == "TERMINATED" or cluster_state == "TERMINATED_WITH_ERRORS": pass
             else:
-                response = self.aws_emr_client.describe_cluster(ClusterId=cluster_id)
-                cluster_info = response["Cluster"]
+                cluster_info = self._get_cluster_description(cluster_id)
                 security_conf = cluster_info.get("SecurityConfiguration")
 
                 if security_conf is not None:
-                    response = self.aws_emr_client.describe_security_configuration(Name=security_conf)
-                    security_conf_json = response['SecurityConfiguration']
-                    security_conf_obj = json.loads(security_conf_json)
+                    security_conf_obj = self._get_security_configuration(security_conf)
                     encryption_conf = security_conf_obj.get("EncryptionConfiguration")
 
                     if encryption_conf is not None:
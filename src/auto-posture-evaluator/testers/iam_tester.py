@@ -1,8 +1,7 @@
 import os
-import time
 import jmespath
 import interfaces
-import boto3
+from aws_context import AwsContext
 from botocore.exceptions import ClientError
 import datetime as dt
 from datetime import datetime
@@ -10,14 +9,16 @@ from concurrent.futures import ThreadPoolExecutor
 
 
 class Tester(interfaces.TesterInterface):
-    def __init__(self, region_name: str) -> None:
-        self.aws_iam_client = boto3.client('iam')
-        self.aws_iam_resource = boto3.resource('iam')
-        self.aws_access_analyzer_client = boto3.client('accessanalyzer')
+    tested_region_scope = interfaces.REGION_SCOPE_GLOBAL
+
+    def __init__(self, region_name: str, aws_context=None) -> None:
+        self.aws_context = aws_context if aws_context else AwsContext()
+        self.aws_iam_client = self.aws_context.get_client('iam')
+        self.aws_iam_resource = self.aws_context.create_resource('iam')
+        self.aws_access_analyzer_client = self.aws_context.get_client('accessanalyzer')
         self.aws_region = region_name
-        self.user_id = boto3.client('sts').get_caller_identity().get('UserId')
-        self.account_arn = boto3.client('sts').get_caller_identity().get('Arn')
-        self.account_id = boto3.client('sts').get_caller_identity().get('Account')
+        self.account_id = self.aws_context.account_id
+        self.result_context = self.aws_context.result_context(region_name)
         self.iam_user_credentials_unuse_threshold = os.environ.get('AUTOPOSTURE_IAM_CREDENTIALS_UNUSE_THRESHOLD')
         self.password_maximum_age_policy = os.environ.get('AUTOPOSTURE_PASSWORD_MAX_AGE_POLICY')
         self.password_length_threshold_policy = os.environ.get('AUTOPOSTURE_PASSWORD_LENGTH_THRESHOLD_POLICY')
@@ -82,17 +83,7 @@ class Tester(interfaces.TesterInterface):
         return users
 
     def _append_iam_test_result(self, item, item_type, test_name, issue_status):
-        return {
-            "user": self.user_id,
-            "account_arn": self.account_arn,
-            "account": self.account_id,
-            "timestamp": time.time(),
-            "item": item,
-            "item_type": item_type,
-            "test_name": test_name,
-            "test_result": issue_status,
-            "region": self.aws_region
-        }
+        return self.result_context.new_result(item, item_type, test_name, issue_status)
 
     def get_password_policy_has_14_or_more_char(self):
         result = []
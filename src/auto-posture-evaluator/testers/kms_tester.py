@@ -1,17 +1,15 @@
 import interfaces
-import boto3
-import time
+from aws_context import AwsContext
 import botocore.exceptions
 from concurrent.futures import ThreadPoolExecutor
 
 
 class Tester(interfaces.TesterInterface):
-    def __init__(self, region_name) -> None:
+    def __init__(self, region_name, aws_context=None) -> None:
+        self.aws_context = aws_context if aws_context else AwsContext()
         self.aws_region = region_name
-        self.aws_kms_client = boto3.client('kms', region_name=region_name)
-        self.user_id = boto3.client('sts').get_caller_identity().get('UserId')
-        self.account_arn = boto3.client('sts').get_caller_identity().get('Arn')
-        self.account_id = boto3.client('sts').get_caller_identity().get('Account')
+        self.aws_kms_client = self.aws_context.get_client('kms', region_name=region_name)
+        self.result_context = self.aws_context.result_context(region_name)
         self.kms_keys = []
 
     def declare_tested_provider(self) -> str:
@@ -39,27 +37,10 @@ class Tester(interfaces.TesterInterface):
             return None
 
     def _get_all_aws_region(self):
-        all_regions = []
-        boto_client = boto3.client('ec2', region_name='us-east-1')
-        response = boto_client.describe_regions(AllRegions=True)
-
-        for r in response['Regions']:
-            all_regions.append(r['RegionName'])
-
-        return all_regions
+        return self.aws_context.get_enabled_regions()
 
     def _get_result_object(self, item, item_type, test_name, issue_status):
-        return {
-            "user": self.user_id,
-            "account_arn": self.account_arn,
-            "account": self.account_id,
-            "timestamp": time.time(),
-            "item": item,
-            "item_type": item_type,
-            "test_name": test_name,
-            "test_result": issue_status,
-            "region": self.aws_region
-        }
+        return self.result_context.new_result(item, item_type, test_name, issue_status)
 
     def _get_kms_keys(self):
         keys = []
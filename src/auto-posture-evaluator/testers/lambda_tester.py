@@ -1,22 +1,23 @@
-import time
 from typing import List
-import json
+import os
 import re
 import interfaces
-import boto3
+from aws_context import AwsContext
+from policy_analysis import analyze_policy
 import requests
 from concurrent.futures import ThreadPoolExecutor
 
 
 class Tester(interfaces.TesterInterface):
-    def __init__(self, region_name) -> None:
+    def __init__(self, region_name, aws_context=None) -> None:
+        self.aws_context = aws_context if aws_context else AwsContext()
         self.aws_region = region_name
-        self.aws_lambda_client = boto3.client('lambda', region_name=region_name)
-        self.user_id = boto3.client('sts').get_caller_identity().get('UserId')
-        self.account_arn = boto3.client('sts').get_caller_identity().get('Arn')
-        self.account_id = boto3.client('sts').get_caller_identity().get('Account')
+        self.aws_lambda_client = self.aws_context.get_client('lambda', region_name=region_name)
+        self.result_context = self.aws_context.result_context(region_name)
         self.functions = []
-        self.SUPPORTED_LAMBDA_RUNTIME = "https://cgx-s3-nsm-logshipper-config.s3.eu-west-1.amazonaws.com/acceptable-lambda-runtime-versions.json"
+        self.SUPPORTED_LAMBDA_RUNTIME = os.environ.get(
+            'LAMBDA_RUNTIME_VERSIONS_URL',
+            "https://cgx-s3-nsm-logshipper-config.s3.eu-west-1.amazonaws.com/acceptable-lambda-runtime-versions.json")
 
     def declare_tested_service(self) -> str:
         return 'lambda'
@@ -44,14 +45,7 @@ class Tester(interfaces.TesterInterface):
             return None
 
     def _get_all_aws_regions(self):
-        all_regions = []
-        boto3_client = boto3.client('ec2', region_name='us-east-1')
-        response = boto3_client.describe_regions(AllRegions=True)
-
-        for i in response['Regions']:
-            all_regions.append(i['RegionName'])
-
-        return all_regions
+        return self.aws_context.get_enabled_regions()
 
     def _get_all_functions(self) -> List:
         paginator = self.aws_lambda_client.get_paginator('list_functions')
@@ -64,17 +58,7 @@ class Tester(interfaces.TesterInterface):
         return functions
 
     def _append_lambda_test_result(self, test_name, item, item_type, issue_status):
-        return {
-            "user": self.user_id,
-            "account_arn": self.account_arn,
-            "account": self.account_id,
-            "timestamp": time.time(),
-            "item": item,
-            "item_type": item_type,
-            "test_name": test_name,
-            "test_result": issue_status,
-            "region": self.aws_region
-        }
+        return self.result_context.new_result(item, item_type, test_name, issue_status)
 
     def get_lambda_uses_latest_runtime(self) -> List:
         lambdas = self.functions
@@ -103,14 +87,10 @@ class Tester(interfaces.TesterInterface):
             function_arn = Lambda['FunctionArn']
             try:
                 policy = self.aws_lambda_client.get_policy(FunctionName=Lambda['FunctionName'])
-                policy_json = json.loads(policy['Policy'])
-                policy_statements = policy_json['Statement']
-                for statement in policy_statements:
-                    if (statement['Principal'] == '*' or statement['Principal']['AWS'] == '*') and 'Condition' not in statement:
-
-                        function_arn_with_issue.append(Lambda['FunctionArn'])
-                    else:
-                        result.append(self._append_lambda_test_result(test_name, function_arn, "aws_lambda", "no_issue_found"))
+                if analyze_policy(policy['Policy']).grants(anonymous=True, unconditional=True):
+                    function_arn_with_issue.append(Lambda['FunctionArn'])
+                else:
+                    result.append(self._append_lambda_test_result(test_name, function_arn, "aws_lambda", "no_issue_found"))
             except Exception:
                 result.append(self._append_lambda_test_result(test_name, function_arn, "aws_lambda", "no_issue_found"))
 
@@ -1,7 +1,6 @@
-import boto3
 import concurrent.futures
 import interfaces
-import time
+from aws_context import AwsContext
 from datetime import datetime, timezone
 
 
@@ -18,14 +17,12 @@ def _return_default_port_on_rds_engines(db_engine):
 
 
 class Tester(interfaces.TesterInterface):
-    def __init__(self, region_name):
-        self.ssm = boto3.client('ssm')
+    def __init__(self, region_name, aws_context=None):
+        self.aws_context = aws_context if aws_context else AwsContext()
         self.region_name = region_name
-        self.aws_rds_client = boto3.client('rds', region_name=region_name)
+        self.aws_rds_client = self.aws_context.get_client('rds', region_name=region_name)
         self.cache = {}
-        self.user_id = boto3.client('sts').get_caller_identity().get('UserId')
-        self.account_arn = boto3.client('sts').get_caller_identity().get('Arn')
-        self.account_id = boto3.client('sts').get_caller_identity().get('Account')
+        self.result_context = self.aws_context.result_context(region_name)
         self.rds_instances = []
         self.rds_snapshots = []
 
@@ -62,39 +59,13 @@ class Tester(interfaces.TesterInterface):
         return return_value
 
     def _get_regions(self) -> list:
-        region_list = []
-        for page in self.ssm.get_paginator('get_parameters_by_path').paginate(
-                Path='/aws/service/global-infrastructure/regions'
-        ):
-            for p in page['Parameters']:
-                region_list.append(p['Value'])
-        return region_list
+        return self.aws_context.get_enabled_regions()
 
     def _append_rds_test_result(self, rds, test_name, issue_status):
-        return {
-            "user": self.user_id,
-            "account_arn": self.account_arn,
-            "account": self.account_id,
-            "timestamp": time.time(),
-            "item": rds['DBInstanceIdentifier'],
-            "item_type": "rds_db_instance",
-            "test_name": test_name,
-            "test_result": issue_status,
-            "region": self.region_name
-        }
+        return self.result_context.new_result(rds['DBInstanceIdentifier'], "rds_db_instance", test_name, issue_status)
 
     def _append_rds_snap_test_result(self, rds, test_name, issue_status):
-        return {
-            "user": self.user_id,
-            "account_arn": self.account_arn,
-            "account": self.account_id,
-            "timestamp": time.time(),
-            "item": rds['DBSnapshotIdentifier'],
-            "item_type": "rds_snapshot",
-            "test_name": test_name,
-            "test_result": issue_status,
-            "region": self.region_name
-        }
+        return self.result_context.new_result(rds['DBSnapshotIdentifier'], "rds_snapshot", test_name, issue_status)
 
     def _fetch_snapshot_metadata(self, snapshot_identifier):
         return self.aws_rds_client.describe_db_snapshot_attributes(DBSnapshotIdentifier=snapshot_identifier)
@@ -1,6 +1,5 @@
-import time
-import boto3
 import interfaces
+from aws_context import AwsContext
 import concurrent.futures
 
 def _return_default_port_on_redshift_engines():
@@ -12,14 +11,12 @@ def _return_default_custom_master_username_on_redshift_engines():
 
 
 class Tester(interfaces.TesterInterface):
-    def __init__(self, region_name):
-        self.ssm = boto3.client('ssm')
+    def __init__(self, region_name, aws_context=None):
+        self.aws_context = aws_context if aws_context else AwsContext()
         self.region_name = region_name
-        self.aws_redshift_client = boto3.client('redshift', region_name=region_name)
+        self.aws_redshift_client = self.aws_context.get_client('redshift', region_name=region_name)
         self.cache = {}
-        self.user_id = boto3.client('sts').get_caller_identity().get('UserId')
-        self.account_arn = boto3.client('sts').get_caller_identity().get('Arn')
-        self.account_id = boto3.client('sts').get_caller_identity().get('Account')
+        self.result_context = self.aws_context.result_context(region_name)
         self.redshift_clusters = {}
 
     def declare_tested_service(self) -> str:
@@ -49,26 +46,11 @@ class Tester(interfaces.TesterInterface):
         return return_value
 
     def _get_regions(self) -> list:
-        region_list = []
-        for page in self.ssm.get_paginator('get_parameters_by_path').paginate(
-                Path='/aws/service/global-infrastructure/regions'
-        ):
-            for p in page['Parameters']:
-                region_list.append(p['Value'])
-        return region_list
+        return self.aws_context.get_enabled_regions()
 
     def _append_redshift_test_result(self, redshift, test_name, issue_status):
-        return {
-            "user": self.user_id,
-            "account_arn": self.account_arn,
-            "account": self.account_id,
-            "timestamp": time.time(),
-            "item": redshift['ClusterIdentifier'],
-            "item_type": "redshift_cluster",
-            "test_name": test_name,
-            "test_result": issue_status,
-            "region": self.region_name
-        }
+        return self.result_context.new_result(
+            redshift['ClusterIdentifier'], "redshift_cluster", test_name, issue_status)
 
     def _return_redshift_logging_status(self, cluster_identifier):
         return self.aws_redshift_client.describe_logging_status(ClusterIdentifier=cluster_identifier)
@@ -1,23 +1,24 @@
-import time
-import boto3
 import re
 import ipaddress
 import botocore.exceptions
 import interfaces
+from aws_context import AwsContext
 import datetime as dt
 from datetime import datetime
 from concurrent.futures import ThreadPoolExecutor
 
 
 class Tester(interfaces.TesterInterface):
-    def __init__(self, region_name: str):
+    tested_region_scope = interfaces.REGION_SCOPE_GLOBAL
+
+    def __init__(self, region_name: str, aws_context=None):
+        self.aws_context = aws_context if aws_context else AwsContext()
         self.aws_region = region_name
-        self.aws_route53_client = boto3.client('route53')
-        self.aws_ec2_client = boto3.client('ec2')
+        self.aws_route53_client = self.aws_context.get_client('route53')
+        self.aws_ec2_client = self.aws_context.get_client('ec2')
         self.hosted_zones = self.aws_route53_client.list_hosted_zones()
-        self.user_id = boto3.client('sts').get_caller_identity().get('UserId')
-        self.account_arn = boto3.client('sts').get_caller_identity().get('Arn')
-        self.account_id = boto3.client('sts').get_caller_identity().get('Account')
+        self.account_id = self.aws_context.account_id
+        self.result_context = self.aws_context.result_context(region_name)
         self.route53_domains = []
 
     def declare_tested_service(self) -> str:
@@ -85,62 +86,25 @@ class Tester(interfaces.TesterInterface):
 
                 if len(dangling_ip_addresses) > 0:
                     for dangling_ip_address in dangling_ip_addresses:
-                        result.append({
-                            "user": self.user_id,
-                            "account_arn": self.account_arn,
-                            "account": self.account_id,
-                            "item": dangling_ip_address + "@@" + record_name,
-                            "item_type": "dns_record",
-                            "dns_record": record_name,
-                            "record": record,
-                            "test_name": test_name,
-                            "dangling_ip": dangling_ip_address,
-                            "zone": cur_zone["Id"],
-                            "timestamp": time.time(),
-                            "test_result": "issue_found"
-                        })
+                        result.append(self.result_context.new_result(
+                            dangling_ip_address + "@@" + record_name, "dns_record", test_name, "issue_found",
+                            dns_record=record_name, record=record, dangling_ip=dangling_ip_address, zone=cur_zone["Id"]))
                 else:
-                    result.append({
-                        "user": self.user_id,
-                        "account_arn": self.account_arn,
-                        "account": self.account_id,
-                        "test_name": test_name,
-                        "item": record_name,
-                        "item_type": "dns_record",
-                        "record": record,
-                        "timestamp": time.time(),
-                        "test_result": "no_issue_found"
-                    })
+                    result.append(self.result_context.new_result(
+                        record_name, "dns_record", test_name, "no_issue_found", record=record))
 
         return result
 
     def _append_route53_test_result(self, test_name, item, item_type, issue_status):
-        return {
-            "user": self.user_id,
-            "account_arn": self.account_arn,
-            "account": self.account_id,
-            "test_name": test_name,
-            "item": item,
-            "item_type": item_type,
-            "timestamp": time.time(),
-            "test_result": issue_status,
-            "region": self.aws_region
-        }
+        return self.result_context.new_result(item, item_type, test_name, issue_status)
 
     def _get_all_aws_regions(self):
-        all_regions = []
-        client = boto3.client('ec2')
-        response = client.describe_regions(AllRegions=True)
-
-        for i in response['Regions']:
-            all_regions.append(i['RegionName'])
-
-        return all_regions
+        return self.aws_context.get_enabled_regions()
 
     def _get_all_route53_domains(self):
         domains = []
 
-        aws_route53_domain_client = boto3.client('route53domains', region_name='us-east-1')
+        aws_route53_domain_client = self.aws_context.get_client('route53domains', region_name='us-east-1')
         paginator = aws_route53_domain_client.get_paginator('list_domains')
         response_iterator = paginator.paginate()
         for page in response_iterator:
@@ -1,24 +1,77 @@
-import json
-import time
-import boto3
+import os
+import types
+import typing
 import botocore.exceptions
 import interfaces
-import requests
+from aws_context import AwsContext
+from result_record import ResultRecord
+from http_prober import HttpProber
+from policy_analysis import analyze_policy
+from single_flight import SingleFlight
 import urllib.parse
 from concurrent.futures import ThreadPoolExecutor
 
+# The state store document of the bucket regions of an account, by bucket name
+LOCATIONS_DOCUMENT_PREFIX = 's3-bucket-locations-'
+# Answers telling that a KMS key cannot be described whatever the number of attempts
+KMS_KEY_MISSING_ERROR_CODES = ('NotFoundException', 'InvalidArnException')
+
+# The bucket attributes the checks read, with the S3 operation returning each of them
+BUCKET_ATTRIBUTES = {
+    'acl': 'get_bucket_acl',
+    'versioning': 'get_bucket_versioning',
+    'encryption': 'get_bucket_encryption',
+    'public_access_block': 'get_public_access_block',
+    'policy_status': 'get_bucket_policy_status',
+    'policy': 'get_bucket_policy',
+    'logging': 'get_bucket_logging',
+}
+
+
+class BucketAttributes:
+    """The attributes of one bucket, fetched once before the checks run and shared by all of them.
+
+    An attribute S3 answered with an error, like NoSuchBucketPolicy, raises that error again when it is
+    read, so the checks handle it as if they had made the call. The view is read by every check at the
+    same time, so the responses must not be modified.
+    """
+
+    def __init__(self, name: str, region: str, responses: dict, errors: dict):
+        self.name = name
+        self.region = region
+        self._responses = types.MappingProxyType(responses)
+        self._errors = types.MappingProxyType(errors)
+
+    def get(self, attribute: str) -> dict:
+        error = self._errors.get(attribute)
+        if error is not None:
+            error_response, operation_name = error
+            raise botocore.exceptions.ClientError(error_response, operation_name)
+        return self._responses[attribute]
+
 
 class Tester(interfaces.TesterInterface):
-    def __init__(self, region_name: str):
-        self.aws_s3_client = boto3.client('s3')
-        self.aws_s3_resource = boto3.resource('s3')
-        self.aws_s3_control_client = boto3.client('s3control')
-        self.aws_kms_client = boto3.client('kms')
+    tested_region_scope = interfaces.REGION_SCOPE_GLOBAL
+
+    def __init__(self, region_name: str, aws_context=None):
+        self.aws_context = aws_context if aws_context else AwsContext()
+        self.aws_s3_client = self.aws_context.get_client('s3')
+        self.aws_s3_control_client = self.aws_context.get_client('s3control')
+        self.aws_kms_client = self.aws_context.get_client('kms')
         self.aws_region = region_name
-        self.cache = {}
-        self.user_id = boto3.client('sts').get_caller_identity().get('UserId')
-        self.account_arn = boto3.client('sts').get_caller_identity().get('Arn')
-        self.account_id = boto3.client('sts').get_caller_identity().get('Account')
+        # How many bucket calls are made at the same time, to locate the buckets and fetch their attributes
+        self.prefetch_concurrency = int(os.environ.get('S3_PREFETCH_CONCURRENCY', '32'))
+        self.bucket_attributes = {}
+        # The bucket URLs probed for public access, {protocol} and {bucket} are replaced
+        self.bucket_url_template = os.environ.get('S3_BUCKET_URL_TEMPLATE', '{protocol}://{bucket}.s3.amazonaws.com')
+        self.http_prober = HttpProber.from_environment()
+        # Buckets mostly share a few keys. A key that does not exist is not asked again, other failures, like
+        # throttling or a denied call, are retried by the next bucket using the key.
+        self.kms_key_aliases = SingleFlight(
+            cache_error=lambda ex: isinstance(ex, botocore.exceptions.ClientError) and
+            ex.response['Error']['Code'] in KMS_KEY_MISSING_ERROR_CODES)
+        self.account_id = self.aws_context.account_id
+        self.result_context = self.aws_context.result_context()
         self.s3_buckets = self._get_s3_buckets_and_region()
 
     def declare_tested_service(self) -> str:
@@ -27,297 +80,220 @@ class Tester(interfaces.TesterInterface):
     def declare_tested_provider(self) -> str:
         return 'aws'
 
-    def run_tests(self) -> list:
-
-        if self.aws_region.lower() == 'global':
-            executor_list = []
-            return_values = []
-
-            with ThreadPoolExecutor() as executor:
-                executor_list.append(executor.submit(self.detect_write_enabled_buckets, self.s3_buckets))
-                executor_list.append(executor.submit(self.detect_publicly_accessible_s3_buckets_by_acl, self.s3_buckets))
-                executor_list.append(executor.submit(self.detect_non_versioned_s3_buckets, self.s3_buckets))
-                executor_list.append(executor.submit(self.detect_not_encrypted_s3_buckets, self.s3_buckets))
-                executor_list.append(executor.submit(self.detect_full_control_allowed_s3_buckets, self.s3_buckets))
-                executor_list.append(executor.submit(self.detect_buckets_without_mfa_delete_s3_buckets, self.s3_buckets))
-                executor_list.append(executor.submit(self.detect_buckets_without_block_public_access_set, self.s3_buckets))
-                executor_list.append(executor.submit(self.detect_publicly_accessible_s3_buckets_by_policy, self.s3_buckets))
-                executor_list.append(executor.submit(self.detect_bucket_content_listable_by_users, self.s3_buckets))
-                executor_list.append(executor.submit(self.detect_bucket_content_permissions_viewable_by_users, self.s3_buckets))
-                executor_list.append(executor.submit(self.detect_bucket_content_permissions_modifiable_by_users, self.s3_buckets))
-                executor_list.append(executor.submit(self.detect_bucket_content_writable_by_anonymous, self.s3_buckets))
-                executor_list.append(executor.submit(self.detect_buckets_without_logging_set, self.s3_buckets))
-                executor_list.append(executor.submit(self.detect_buckets_accessible_by_http_url, self.s3_buckets))
-                executor_list.append(executor.submit(self.detect_buckets_accessible_by_https_url, self.s3_buckets))
-                executor_list.append(executor.submit(self.detect_bucket_logging_disabled, self.s3_buckets))
-                executor_list.append(executor.submit(self.detect_bucket_not_encrypted_with_cmk, self.s3_buckets))
-                executor_list.append(executor.submit(self.detect_block_public_access_setting_disabled))
-                executor_list.append(executor.submit(self.detect_bucket_not_configured_with_block_public_access, self.s3_buckets))
-                executor_list.append(executor.submit(self.detect_buckets_with_global_upload_and_delete_permission, self.s3_buckets))
-                executor_list.append(executor.submit(self.detect_bucket_has_global_list_acl_permission_through_acl, self.s3_buckets))
-                executor_list.append(executor.submit(self.detect_bucket_has_global_put_permissions_enabled_via_bucket_policy, self.s3_buckets))
-                executor_list.append(executor.submit(self.detect_bucket_has_global_list_permissions_enabled_via_bucket_policy, self.s3_buckets))
-                executor_list.append(executor.submit(self.detect_bucket_has_global_get_permissions_enabled_via_bucket_policy, self.s3_buckets))
-                executor_list.append(executor.submit(self.detect_bucket_has_global_delete_permissions_enabled_via_bucket_policy, self.s3_buckets))
-
-                for future in executor_list:
-                    return_values.extend(future.result())
-
-            return return_values
-        else:
-            return None
+    def run_tests(self) -> typing.Iterator[ResultRecord]:
+        if self.aws_region.lower() != 'global':
+            return
+
+        try:
+            self.bucket_attributes = self._prefetch_bucket_attributes(self.s3_buckets["Buckets"])
+            # The bucket URLs are probed in the background while the other checks run
+            self.http_prober.prefetch([self._bucket_url(bucket["Name"], protocol) for protocol in ("http", "https")
+                                       for bucket in self.s3_buckets["Buckets"]])
+            # The checks run one after the other and yield their results one by one, so besides the
+            # prefetched attributes and URL statuses only the result being shipped is held in memory
+            checks = [
+                self.detect_write_enabled_buckets(self.s3_buckets),
+                self.detect_publicly_accessible_s3_buckets_by_acl(self.s3_buckets),
+                self.detect_non_versioned_s3_buckets(self.s3_buckets),
+                self.detect_not_encrypted_s3_buckets(self.s3_buckets),
+                self.detect_full_control_allowed_s3_buckets(self.s3_buckets),
+                self.detect_buckets_without_mfa_delete_s3_buckets(self.s3_buckets),
+                self.detect_buckets_without_block_public_access_set(self.s3_buckets),
+                self.detect_publicly_accessible_s3_buckets_by_policy(self.s3_buckets),
+                self.detect_bucket_content_listable_by_users(self.s3_buckets),
+                self.detect_bucket_content_permissions_viewable_by_users(self.s3_buckets),
+                self.detect_bucket_content_permissions_modifiable_by_users(self.s3_buckets),
+                self.detect_bucket_content_writable_by_anonymous(self.s3_buckets),
+                self.detect_buckets_without_logging_set(self.s3_buckets),
+                self.detect_buckets_accessible_by_http_url(self.s3_buckets),
+                self.detect_buckets_accessible_by_https_url(self.s3_buckets),
+                self.detect_bucket_logging_disabled(self.s3_buckets),
+                self.detect_bucket_not_encrypted_with_cmk(self.s3_buckets),
+                self.detect_block_public_access_setting_disabled(),
+                self.detect_bucket_not_configured_with_block_public_access(self.s3_buckets),
+                self.detect_buckets_with_global_upload_and_delete_permission(self.s3_buckets),
+                self.detect_bucket_has_global_list_acl_permission_through_acl(self.s3_buckets),
+                self.detect_bucket_has_global_put_permissions_enabled_via_bucket_policy(self.s3_buckets),
+                self.detect_bucket_has_global_list_permissions_enabled_via_bucket_policy(self.s3_buckets),
+                self.detect_bucket_has_global_get_permissions_enabled_via_bucket_policy(self.s3_buckets),
+                self.detect_bucket_has_global_delete_permissions_enabled_via_bucket_policy(self.s3_buckets),
+            ]
+            for check in checks:
+                yield from check
+        finally:
+            # Its connections and threads are not left to the garbage collector
+            self.http_prober.close()
 
     def _get_s3_buckets_and_region(self):
         response = self.aws_s3_client.list_buckets()
         buckets = response['Buckets']
 
+        # Bucket regions are kept across runs, a bucket is located again only when it is new or was recreated
+        state_store = self.aws_context.state_store
+        document_name = LOCATIONS_DOCUMENT_PREFIX + str(self.account_id)
+        cached_locations = (state_store.load(document_name) if state_store else None) or {}
+        locations = {}
+        buckets_to_locate = []
+        for bucket in buckets:
+            cached_location = cached_locations.get(bucket['Name'])
+            if cached_location is not None and cached_location[0] == str(bucket['CreationDate']):
+                locations[bucket['Name']] = cached_location
+            else:
+                buckets_to_locate.append(bucket)
+
+        with ThreadPoolExecutor(max_workers=self.prefetch_concurrency) as executor:
+            for bucket, location_constraint in zip(buckets_to_locate, executor.map(
+                    self._get_bucket_location, [bucket['Name'] for bucket in buckets_to_locate])):
+                locations[bucket['Name']] = [str(bucket['CreationDate']), location_constraint]
+
         for bucket in buckets:
-            bucket_name = bucket['Name']
-            response = self.aws_s3_client.get_bucket_location(Bucket=bucket_name)
-            location_constraint = response['LocationConstraint'] if response['LocationConstraint'] else 'us-east-1'
-            bucket['location_constraint'] = location_constraint
+            bucket['location_constraint'] = locations[bucket['Name']][1]
+        # Deleted buckets are dropped from the cache
+        if state_store and locations != cached_locations:
+            state_store.save(document_name, locations)
 
         return_value = {"Buckets": buckets}
         return return_value
 
+    def _get_bucket_location(self, bucket_name: str) -> str:
+        response = self.aws_s3_client.get_bucket_location(Bucket=bucket_name)
+        return response['LocationConstraint'] if response['LocationConstraint'] else 'us-east-1'
+
+    def _prefetch_bucket_attributes(self, buckets: list) -> dict:
+        # Every attribute of every bucket is fetched once, concurrently, with a client of the bucket's region
+        fetched = {bucket["Name"]: ({}, {}) for bucket in buckets}
+
+        def fetch(bucket, attribute, operation_name):
+            # Buckets created in eu-west-1 long ago report the legacy EU location
+            region = 'eu-west-1' if bucket["location_constraint"] == 'EU' else bucket["location_constraint"]
+            responses, errors = fetched[bucket["Name"]]
+            try:
+                responses[attribute] = getattr(self.aws_context.get_client('s3', region), operation_name)(
+                    Bucket=bucket["Name"])
+            except botocore.exceptions.ClientError as ex:
+                errors[attribute] = (ex.response, ex.operation_name)
+
+        with ThreadPoolExecutor(max_workers=self.prefetch_concurrency) as executor:
+            futures = [executor.submit(fetch, bucket, attribute, operation_name)
+                       for bucket in buckets for attribute, operation_name in BUCKET_ATTRIBUTES.items()]
+            for future in futures:
+                future.result()
+
+        return {bucket["Name"]: BucketAttributes(bucket["Name"], bucket["location_constraint"],
+                                                 *fetched[bucket["Name"]]) for bucket in buckets}
+
     def detect_write_enabled_buckets(self, buckets_list):
         return self._detect_buckets_with_permissions_matching(buckets_list, "WRITE", "aws_s3_write_enabled_s3_buckets")
 
     def detect_publicly_accessible_s3_buckets_by_acl(self, buckets_list):
         test_name = "aws_s3_publicly_accessible_s3_buckets_by_acl"
-        result = []
         for bucket_meta in buckets_list["Buckets"]:
             issue_detected = False
             bucket_name = bucket_meta["Name"]
             bucket_region = bucket_meta['location_constraint']
-            cur_bucket_permissions = self._get_bucket_acl(bucket_name)
-            for grantee in cur_bucket_permissions.grants:
+            bucket_grants = self.bucket_attributes[bucket_name].get('acl')["Grants"]
+            for grantee in bucket_grants:
                 if grantee["Grantee"]["Type"] == "Group" and (
                         grantee["Grantee"]["URI"] == "http://acs.amazonaws.com/groups/global/AllUsers"
                         or grantee["Grantee"]["URI"] == "http://acs.amazonaws.com/groups/global/AuthenticatedUsers"):
-                    result.append({
-                        "user": self.user_id,
-                        "account_arn": self.account_arn,
-                        "account": self.account_id,
-                        "timestamp": time.time(),
-                        "item": bucket_name,
-                        "item_type": "s3_bucket",
-                        "test_name": test_name,
-                        "permissions": cur_bucket_permissions.grants,
-                        "test_result": "issue_found",
-                        "region": bucket_region
-                    })
+                    yield self.result_context.new_result(
+                        bucket_name, "s3_bucket", test_name, "issue_found", region=bucket_region,
+                        permissions=bucket_grants)
                     issue_detected = True
             if not issue_detected:
-                result.append({
-                    "user": self.user_id,
-                    "account_arn": self.account_arn,
-                    "account": self.account_id,
-                    "timestamp": time.time(),
-                    "item": bucket_name,
-                    "item_type": "s3_bucket",
-                    "test_name": test_name,
-                    "test_result": "no_issue_found",
-                    "region": bucket_region
-                })
-
-        return result
+                yield self.result_context.new_result(
+                    bucket_name, "s3_bucket", test_name, "no_issue_found", region=bucket_region)
 
     def detect_non_versioned_s3_buckets(self, buckets_list):
         test_name = "aws_s3_non_versioned_s3_buckets"
-        result = []
         for bucket_meta in buckets_list["Buckets"]:
             bucket_name = bucket_meta["Name"]
             bucket_region = bucket_meta['location_constraint']
-            cur_bucket_versioning = self._get_bucket_versioning(bucket_name)
-            if not cur_bucket_versioning.status:
-                result.append({
-                    "user": self.user_id,
-                    "account_arn": self.account_arn,
-                    "account": self.account_id,
-                    "timestamp": time.time(),
-                    "item": bucket_name,
-                    "item_type": "s3_bucket",
-                    "test_name": test_name,
-                    "test_result": "issue_found",
-                    "region": bucket_region
-                })
+            cur_bucket_versioning = self.bucket_attributes[bucket_name].get('versioning')
+            if not cur_bucket_versioning.get("Status"):
+                yield self.result_context.new_result(
+                    bucket_name, "s3_bucket", test_name, "issue_found", region=bucket_region)
             else:
-                result.append({
-                    "user": self.user_id,
-                    "account_arn": self.account_arn,
-                    "account": self.account_id,
-                    "timestamp": time.time(),
-                    "item": bucket_name,
-                    "item_type": "s3_bucket",
-                    "test_name": test_name,
-                    "test_result": "no_issue_found",
-                    "region": bucket_region
-                })
-
-        return result
+                yield self.result_context.new_result(
+                    bucket_name, "s3_bucket", test_name, "no_issue_found", region=bucket_region)
 
     def detect_not_encrypted_s3_buckets(self, buckets_list):
         test_name = "aws_s3_not_encrypted_buckets"
-        result = []
         for bucket_meta in buckets_list["Buckets"]:
             issue_detected = False
             bucket_name = bucket_meta["Name"]
             bucket_region = bucket_meta['location_constraint']
             try:
-                self.aws_s3_client.get_bucket_encryption(Bucket=bucket_name)
+                self.bucket_attributes[bucket_name].get('encryption')
             except botocore.exceptions.ClientError as ex:
                 if ex.response['Error']['Code'] == 'ServerSideEncryptionConfigurationNotFoundError':
-                    result.append({
-                        "user": self.user_id,
-                        "account_arn": self.account_arn,
-                        "account": self.account_id,
-                        "timestamp": time.time(),
-                        "item": bucket_name,
-                        "item_type": "s3_bucket",
-                        "test_name": test_name,
-                        "test_result": "issue_found",
-                        "region": bucket_region
-                    })
+                    yield self.result_context.new_result(
+                        bucket_name, "s3_bucket", test_name, "issue_found", region=bucket_region)
                     issue_detected = True
                 else:
                     raise ex
 
             if not issue_detected:
-                result.append({
-                    "user": self.user_id,
-                    "account_arn": self.account_arn,
-                    "account": self.account_id,
-                    "timestamp": time.time(),
-                    "item": bucket_name,
-                    "item_type": "s3_bucket",
-                    "test_name": test_name,
-                    "test_result": "no_issue_found",
-                    "region": bucket_region
-                })
-
-        return result
+                yield self.result_context.new_result(
+                    bucket_name, "s3_bucket", test_name, "no_issue_found", region=bucket_region)
 
     def detect_full_control_allowed_s3_buckets(self, buckets_list):
         return self._detect_buckets_with_permissions_matching(buckets_list, "FULL_CONTROL", "aws_s3_full_control_allowed_s3_buckets")
 
     def detect_buckets_without_mfa_delete_s3_buckets(self, buckets_list):
         test_name = "aws_s3_no_delete_mfa_buckets"
-        result = []
         for bucket_meta in buckets_list["Buckets"]:
             bucket_name = bucket_meta["Name"]
             bucket_region = bucket_meta['location_constraint']
-            cur_bucket_versioning = self._get_bucket_versioning(bucket_name)
-            if not cur_bucket_versioning.mfa_delete:
-                result.append({
-                    "user": self.user_id,
-                    "account_arn": self.account_arn,
-                    "account": self.account_id,
-                    "timestamp": time.time(),
-                    "item": bucket_name,
-                    "item_type": "s3_bucket",
-                    "test_name": test_name,
-                    "test_result": "issue_found",
-                    "region": bucket_region
-                })
+            cur_bucket_versioning = self.bucket_attributes[bucket_name].get('versioning')
+            if not cur_bucket_versioning.get("MFADelete"):
+                yield self.result_context.new_result(
+                    bucket_name, "s3_bucket", test_name, "issue_found", region=bucket_region)
             else:
-                result.append({
-                    "user": self.user_id,
-                    "account_arn": self.account_arn,
-                    "account": self.account_id,
-                    "timestamp": time.time(),
-                    "item": bucket_name,
-                    "item_type": "s3_bucket",
-                    "test_name": test_name,
-                    "test_result": "no_issue_found",
-                    "region": bucket_region
-                })
-
-        return result
+                yield self.result_context.new_result(
+                    bucket_name, "s3_bucket", test_name, "no_issue_found", region=bucket_region)
 
     def detect_buckets_without_block_public_access_set(self, buckets_list):
         test_name = "aws_s3_no_block_public_access_set"
-        result = []
         for bucket_meta in buckets_list["Buckets"]:
             issue_detected = False
             bucket_name = bucket_meta["Name"]
             bucket_region = bucket_meta['location_constraint']
             try:
-                public_access_block_kill_switch = self.aws_s3_client.get_public_access_block(Bucket=bucket_name)
+                public_access_block_kill_switch = self.bucket_attributes[bucket_name].get('public_access_block')
                 if not public_access_block_kill_switch["PublicAccessBlockConfiguration"]["BlockPublicAcls"] or \
                     not public_access_block_kill_switch["PublicAccessBlockConfiguration"]["IgnorePublicAcls"] or \
                     not public_access_block_kill_switch["PublicAccessBlockConfiguration"]["BlockPublicPolicy"] or \
                         not public_access_block_kill_switch["PublicAccessBlockConfiguration"]["RestrictPublicBuckets"]:
-                    result.append({
-                        "user": self.user_id,
-                        "account_arn": self.account_arn,
-                        "account": self.account_id,
-                        "timestamp": time.time(),
-                        "item": bucket_name,
-                        "item_type": "s3_bucket",
-                        "test_name": test_name,
-                        "public_access_block": public_access_block_kill_switch["PublicAccessBlockConfiguration"],
-                        "test_result": "issue_found",
-                        "region": bucket_region
-                    })
+                    yield self.result_context.new_result(
+                        bucket_name, "s3_bucket", test_name, "issue_found", region=bucket_region,
+                        public_access_block=public_access_block_kill_switch["PublicAccessBlockConfiguration"])
                     issue_detected = True
             except botocore.exceptions.ClientError as ex:
                 if ex.response['Error']['Code'] == 'NoSuchPublicAccessBlockConfiguration':
-                    result.append({
-                        "user": self.user_id,
-                        "account_arn": self.account_arn,
-                        "account": self.account_id,
-                        "timestamp": time.time(),
-                        "item": bucket_name,
-                        "item_type": "s3_bucket",
-                        "test_name": test_name,
-                        "public_access_block": {},
-                        "test_result": "issue_found",
-                        "region": bucket_region
-                    })
+                    yield self.result_context.new_result(
+                        bucket_name, "s3_bucket", test_name, "issue_found", region=bucket_region, public_access_block={})
                     issue_detected = True
                 else:
                     raise ex
 
             if not issue_detected:
-                result.append({
-                    "user": self.user_id,
-                    "account_arn": self.account_arn,
-                    "account": self.account_id,
-                    "timestamp": time.time(),
-                    "item": bucket_name,
-                    "item_type": "s3_bucket",
-                    "test_name": test_name,
-                    "test_result": "no_issue_found",
-                    "region": bucket_region
-                })
-
-        return result
+                yield self.result_context.new_result(
+                    bucket_name, "s3_bucket", test_name, "no_issue_found", region=bucket_region)
 
     def detect_publicly_accessible_s3_buckets_by_policy(self, buckets_list):
         test_name = "aws_s3_publicly_accessible_s3_buckets_by_policy"
-        result = []
         for bucket_meta in buckets_list["Buckets"]:
             issue_detected = False
             bucket_name = bucket_meta["Name"]
             bucket_region = bucket_meta['location_constraint']
             try:
-                bucket_policy_status = self.aws_s3_client.get_bucket_policy_status(Bucket=bucket_name)
+                bucket_policy_status = self.bucket_attributes[bucket_name].get('policy_status')
                 if bucket_policy_status["PolicyStatus"]["IsPublic"]:
-                    bucket_policy = self._get_bucket_policy(bucket_name)["Policy"]
-                    bucket_policy = json.loads(bucket_policy)
-                    result.append({
-                        "user": self.user_id,
-                        "account_arn": self.account_arn,
-                        "account": self.account_id,
-                        "timestamp": time.time(),
-                        "item": bucket_name,
-                        "item_type": "s3_bucket",
-                        "test_name": test_name,
-                        "policy": bucket_policy,
-                        "test_result": "issue_found",
-                        "region": bucket_region
-                    })
+                    bucket_policy = analyze_policy(
+                        self.bucket_attributes[bucket_name].get('policy')["Policy"]).copy_document()
+                    yield self.result_context.new_result(
+                        bucket_name, "s3_bucket", test_name, "issue_found", region=bucket_region, policy=bucket_policy)
                     issue_detected = True
             except botocore.exceptions.ClientError as ex:
                 if ex.response['Error']['Code'] == 'NoSuchBucketPolicy':
@@ -327,46 +303,22 @@ class Tester(interfaces.TesterInterface):
                     raise ex
 
             if not issue_detected:
-                result.append({
-                    "user": self.user_id,
-                    "account_arn": self.account_arn,
-                    "account": self.account_id,
-                    "timestamp": time.time(),
-                    "item": bucket_name,
-                    "item_type": "s3_bucket",
-                    "test_name": test_name,
-                    "test_result": "no_issue_found",
-                    "region": bucket_region
-                })
-
-        return result
+                yield self.result_context.new_result(
+                    bucket_name, "s3_bucket", test_name, "no_issue_found", region=bucket_region)
 
     def detect_bucket_content_listable_by_users(self, buckets_list):
         test_name = "aws_s3_bucket_content_listable_by_users"
-        result = []
         for bucket_meta in buckets_list["Buckets"]:
             issue_detected = False
             bucket_name = bucket_meta["Name"]
             bucket_region = bucket_meta['location_constraint']
             try:
-                bucket_policy = self._get_bucket_policy(bucket_name)
-                policy_statements = json.loads(bucket_policy['Policy'])['Statement']
-                for statement in policy_statements:
-                    if str(statement["Resource"]).endswith('*'):
-                        policy_for_response = json.loads(bucket_policy['Policy'])
-                        result.append({
-                            "user": self.user_id,
-                            "account_arn": self.account_arn,
-                            "account": self.account_id,
-                            "timestamp": time.time(),
-                            "item": bucket_name,
-                            "item_type": "s3_bucket",
-                            "test_name": test_name,
-                            "policy": policy_for_response,
-                            "test_result": "issue_found",
-                            "region": bucket_region
-                        })
-                        issue_detected = True
+                policy = analyze_policy(self.bucket_attributes[bucket_name].get('policy')['Policy'])
+                if policy.grants('s3:ListBucket', anonymous=True):
+                    yield self.result_context.new_result(
+                        bucket_name, "s3_bucket", test_name, "issue_found", region=bucket_region,
+                        policy=policy.copy_document())
+                    issue_detected = True
             except botocore.exceptions.ClientError as ex:
                 if ex.response['Error']['Code'] == 'NoSuchBucketPolicy':
                     # No policy means the bucket content is not listable by policy
@@ -375,203 +327,99 @@ class Tester(interfaces.TesterInterface):
                     raise ex
 
             if not issue_detected:
-                result.append({
-                    "user": self.user_id,
-                    "account_arn": self.account_arn,
-                    "account": self.account_id,
-                    "timestamp": time.time(),
-                    "item": bucket_name,
-                    "item_type": "s3_bucket",
-                    "test_name": test_name,
-                    "test_result": "no_issue_found",
-                    "region": bucket_region
-                })
-
-        return result
+                yield self.result_context.new_result(
+                    bucket_name, "s3_bucket", test_name, "no_issue_found", region=bucket_region)
 
     def detect_bucket_content_permissions_viewable_by_users(self, buckets_list):
         test_name = "aws_s3_bucket_content_permissions_viewable_by_users"
-        result = []
         for bucket_meta in buckets_list["Buckets"]:
             issue_detected = False
             bucket_name = bucket_meta["Name"]
             bucket_region = bucket_meta['location_constraint']
             try:
-                bucket_policy = self._get_bucket_policy(bucket_name)
-                policy_statements = json.loads(bucket_policy['Policy'])['Statement']
-                for statement in policy_statements:
-                    if statement["Principal"] == '*' and "s3:GetObjectAcl" in statement["Action"] and str(statement["Resource"]).endswith('*'):
-                        bucket_policy = json.loads(bucket_policy['Policy'])
-                        result.append({
-                            "user": self.user_id,
-                            "account_arn": self.account_arn,
-                            "account": self.account_id,
-                            "timestamp": time.time(),
-                            "item": bucket_name,
-                            "item_type": "s3_bucket",
-                            "test_name": test_name,
-                            "policy": bucket_policy,
-                            "test_result": "issue_found",
-                            "region": bucket_region
-                        })
-                        issue_detected = True
+                policy = analyze_policy(self.bucket_attributes[bucket_name].get('policy')['Policy'])
+                if policy.grants('s3:GetObjectAcl', anonymous=True):
+                    yield self.result_context.new_result(
+                        bucket_name, "s3_bucket", test_name, "issue_found", region=bucket_region,
+                        policy=policy.copy_document())
+                    issue_detected = True
             except botocore.exceptions.ClientError as ex:
                 if ex.response['Error']['Code'] == 'NoSuchBucketPolicy':
-                    # No policy means the bucket content is not listable by policy
+                    # No policy means the bucket content permissions are not viewable by policy
                     pass
                 else:
                     raise ex
 
             if not issue_detected:
-                result.append({
-                    "user": self.user_id,
-                    "account_arn": self.account_arn,
-                    "account": self.account_id,
-                    "timestamp": time.time(),
-                    "item": bucket_name,
-                    "item_type": "s3_bucket",
-                    "test_name": test_name,
-                    "test_result": "no_issue_found",
-                    "region": bucket_region
-                })
-
-        return result
+                yield self.result_context.new_result(
+                    bucket_name, "s3_bucket", test_name, "no_issue_found", region=bucket_region)
 
     def detect_bucket_content_permissions_modifiable_by_users(self, buckets_list):
         test_name = "aws_s3_bucket_content_permissions_modifiable_by_users"
-        result = []
         for bucket_meta in buckets_list["Buckets"]:
             issue_detected = False
             bucket_name = bucket_meta["Name"]
             bucket_region = bucket_meta['location_constraint']
             try:
-                bucket_policy = self._get_bucket_policy(bucket_name)
-                policy_statements = json.loads(bucket_policy['Policy'])['Statement']
-                for statement in policy_statements:
-                    if statement["Principal"] == '*' and "s3:PutObjectAcl" in statement["Action"] and str(statement["Resource"]).endswith('*'):
-                        bucket_policy = json.loads(bucket_policy['Policy'])
-                        result.append({
-                            "user": self.user_id,
-                            "account_arn": self.account_arn,
-                            "account": self.account_id,
-                            "timestamp": time.time(),
-                            "item": bucket_name,
-                            "item_type": "s3_bucket",
-                            "test_name": test_name,
-                            "policy": bucket_policy,
-                            "test_result": "issue_found",
-                            "region": bucket_region
-                        })
-                        issue_detected = True
+                policy = analyze_policy(self.bucket_attributes[bucket_name].get('policy')['Policy'])
+                if policy.grants('s3:PutObjectAcl', anonymous=True):
+                    yield self.result_context.new_result(
+                        bucket_name, "s3_bucket", test_name, "issue_found", region=bucket_region,
+                        policy=policy.copy_document())
+                    issue_detected = True
             except botocore.exceptions.ClientError as ex:
                 if ex.response['Error']['Code'] == 'NoSuchBucketPolicy':
-                    # No policy means the bucket content is not listable by policy
+                    # No policy means the bucket content permissions are not modifiable by policy
                     pass
                 else:
                     raise ex
 
             if not issue_detected:
-                result.append({
-                    "user": self.user_id,
-                    "account_arn": self.account_arn,
-                    "account": self.account_id,
-                    "timestamp": time.time(),
-                    "item": bucket_name,
-                    "item_type": "s3_bucket",
-                    "test_name": test_name,
-                    "test_result": "no_issue_found",
-                    "region": bucket_region
-                })
-
-        return result
+                yield self.result_context.new_result(
+                    bucket_name, "s3_bucket", test_name, "no_issue_found", region=bucket_region)
 
     def detect_bucket_content_writable_by_anonymous(self, buckets_list):
         test_name = "aws_s3_bucket_content_writable_by_anonymous"
-        result = []
         for bucket_meta in buckets_list["Buckets"]:
             issue_detected = False
             bucket_name = bucket_meta["Name"]
             bucket_region = bucket_meta['location_constraint']
             try:
-                bucket_policy = self._get_bucket_policy(bucket_name)
-                policy_statements = json.loads(bucket_policy['Policy'])['Statement']
-                for statement in policy_statements:
-                    if statement["Principal"] == '*' and "s3:PutObject" in statement["Action"] and str(statement["Resource"]).endswith('*'):
-                        bucket_policy = json.loads(bucket_policy['Policy'])
-                        result.append({
-                            "user": self.user_id,
-                            "account_arn": self.account_arn,
-                            "account": self.account_id,
-                            "timestamp": time.time(),
-                            "item": bucket_name,
-                            "item_type": "s3_bucket",
-                            "test_name": test_name,
-                            "policy": bucket_policy,
-                            "test_result": "issue_found",
-                            "region": bucket_region
-                        })
-                        issue_detected = True
+                policy = analyze_policy(self.bucket_attributes[bucket_name].get('policy')['Policy'])
+                if policy.grants('s3:PutObject', anonymous=True):
+                    yield self.result_context.new_result(
+                        bucket_name, "s3_bucket", test_name, "issue_found", region=bucket_region,
+                        policy=policy.copy_document())
+                    issue_detected = True
             except botocore.exceptions.ClientError as ex:
                 if ex.response['Error']['Code'] == 'NoSuchBucketPolicy':
-                    # No policy means the bucket content is not listable by policy
+                    # No policy means the bucket content is not writable by policy
                     pass
                 else:
                     raise ex
 
             if not issue_detected:
-                result.append({
-                    "user": self.user_id,
-                    "account_arn": self.account_arn,
-                    "account": self.account_id,
-                    "timestamp": time.time(),
-                    "item": bucket_name,
-                    "item_type": "s3_bucket",
-                    "test_name": test_name,
-                    "test_result": "no_issue_found",
-                    "region": bucket_region
-                })
-
-        return result
+                yield self.result_context.new_result(
+                    bucket_name, "s3_bucket", test_name, "no_issue_found", region=bucket_region)
 
     def detect_buckets_without_logging_set(self, buckets_list):
         test_name = "aws_s3_no_logging_policy_set"
-        result = []
         for bucket_meta in buckets_list["Buckets"]:
             issue_detected = False
             bucket_name = bucket_meta["Name"]
             bucket_region = bucket_meta['location_constraint']
             try:
-                raw_logging_policy = self.aws_s3_resource.BucketLogging(bucket_name)
-                if not raw_logging_policy.logging_enabled:
-                    result.append({
-                        "user": self.user_id,
-                        "account_arn": self.account_arn,
-                        "account": self.account_id,
-                        "timestamp": time.time(),
-                        "item": bucket_name,
-                        "item_type": "s3_bucket",
-                        "test_name": test_name,
-                        "test_result": "issue_found",
-                        "region": bucket_region
-                    })
+                raw_logging_policy = self.bucket_attributes[bucket_name].get('logging')
+                if not raw_logging_policy.get("LoggingEnabled"):
+                    yield self.result_context.new_result(
+                        bucket_name, "s3_bucket", test_name, "issue_found", region=bucket_region)
                     issue_detected = True
             except botocore.exceptions.ClientError as ex:
                 raise ex
 
             if not issue_detected:
-                result.append({
-                    "user": self.user_id,
-                    "account_arn": self.account_arn,
-                    "account": self.account_id,
-                    "timestamp": time.time(),
-                    "item": bucket_name,
-                    "item_type": "s3_bucket",
-                    "test_name": test_name,
-                    "test_result": "no_issue_found",
-                    "region": bucket_region
-                })
-
-        return result
+                yield self.result_context.new_result(
+                    bucket_name, "s3_bucket", test_name, "no_issue_found", region=bucket_region)
 
     def detect_buckets_accessible_by_http_url(self, buckets_list):
         test_name = "aws_s3_publicly_accessible_s3_buckets_by_http_url"
@@ -589,47 +437,26 @@ class Tester(interfaces.TesterInterface):
 
     def detect_bucket_logging_disabled(self, buckets_list):
         test_name = "aws_s3_bucket_logging_disabled"
-        result = []
         for bucket in buckets_list["Buckets"]:
             bucket_name = bucket["Name"]
             bucket_region = bucket["location_constraint"]
-            logging = self.aws_s3_client.get_bucket_logging(Bucket=bucket_name)
+            logging = self.bucket_attributes[bucket_name].get('logging')
             if not logging.get("LoggingEnabled"):
-                result.append({
-                    "user": self.user_id,
-                    "account_arn": self.account_arn,
-                    "account": self.account_id,
-                    "timestamp": time.time(),
-                    "item": bucket_name,
-                    "item_type": "s3_bucket",
-                    "test_name": test_name,
-                    "test_result": "issue_found",
-                    "region": bucket_region
-                })
+                yield self.result_context.new_result(
+                    bucket_name, "s3_bucket", test_name, "issue_found", region=bucket_region)
             else:
-                result.append({
-                    "user": self.user_id,
-                    "account_arn": self.account_arn,
-                    "account": self.account_id,
-                    "timestamp": time.time(),
-                    "item": bucket_name,
-                    "item_type": "s3_bucket",
-                    "test_name": test_name,
-                    "test_result": "no_issue_found",
-                    "region": bucket_region
-                })
-        return result
+                yield self.result_context.new_result(
+                    bucket_name, "s3_bucket", test_name, "no_issue_found", region=bucket_region)
 
     def detect_bucket_not_encrypted_with_cmk(self, buckets_list):
         test_name = "aws_s3_bucket_not_encrypted_with_cmk"
-        result = []
         buckets = buckets_list["Buckets"]
         for bucket in buckets:
             issue_detected = False
             bucket_name = bucket["Name"]
             bucket_region = bucket["location_constraint"]
             try:
-                encryption = self.aws_s3_client.get_bucket_encryption(Bucket=bucket_name)
+                encryption = self.bucket_attributes[bucket_name].get('encryption')
                 encryption_rules = encryption['ServerSideEncryptionConfiguration']['Rules']
                 for rule in encryption_rules:
                     if not rule['BucketKeyEnabled']: continue
@@ -644,10 +471,8 @@ class Tester(interfaces.TesterInterface):
                             break
                         key_id = default_sse['KMSMasterKeyID']
                         try:
-                            kms_key_description_response = self.aws_kms_client.describe_key(KeyId=key_id)
-                            key_id = kms_key_description_response['KeyMetadata']['KeyId']
-                            kms_response = self.aws_kms_client.list_aliases(KeyId=key_id)
-                            key_aliases = kms_response['Aliases']
+                            key_aliases = self.kms_key_aliases.get(
+                                key_id, lambda: self._get_kms_key_aliases(key_id))
 
                             for alias in key_aliases:
                                 alias_name = alias['AliasName']
@@ -666,35 +491,14 @@ class Tester(interfaces.TesterInterface):
                     raise ex
 
             if not issue_detected:
-                result.append({
-                    "user": self.user_id,
-                    "account_arn": self.account_arn,
-                    "account": self.account_id,
-                    "timestamp": time.time(),
-                    "item": bucket_name,
-                    "item_type": "s3_bucket",
-                    "test_name": test_name,
-                    "test_result": "no_issue_found",
-                    "region": bucket_region
-                })
+                yield self.result_context.new_result(
+                    bucket_name, "s3_bucket", test_name, "no_issue_found", region=bucket_region)
             else:
-                result.append({
-                    "user": self.user_id,
-                    "account_arn": self.account_arn,
-                    "account": self.account_id,
-                    "timestamp": time.time(),
-                    "item": bucket_name,
-                    "item_type": "s3_bucket",
-                    "test_name": test_name,
-                    "test_result": "issue_found",
-                    "region": bucket_region
-                })
-
-        return result
+                yield self.result_context.new_result(
+                    bucket_name, "s3_bucket", test_name, "issue_found", region=bucket_region)
 
     def detect_block_public_access_setting_disabled(self):
         test_name = "aws_s3_block_public_access_setting_disabled"
-        result = []
         issue_detected = False
         try:
             public_access_setting = self.aws_s3_control_client.get_public_access_block(AccountId=self.account_id)
@@ -708,38 +512,18 @@ class Tester(interfaces.TesterInterface):
             else:
                 raise ex
         if issue_detected:
-            result.append({
-                "user": self.user_id,
-                "account_arn": self.account_arn,
-                "account": self.account_id,
-                "timestamp": time.time(),
-                "item": self.account_id,
-                "item_type": "s3_account",
-                "test_name": test_name,
-                "test_result": "issue_found"
-            })
+            yield self.result_context.new_result(self.account_id, "s3_account", test_name, "issue_found")
         else:
-            result.append({
-                "user": self.user_id,
-                "account_arn": self.account_arn,
-                "account": self.account_id,
-                "timestamp": time.time(),
-                "item": self.account_id,
-                "item_type": "s3_account",
-                "test_name": test_name,
-                "test_result": "no_issue_found"
-            })
-        return result
+            yield self.result_context.new_result(self.account_id, "s3_account", test_name, "no_issue_found")
 
     def detect_bucket_not_configured_with_block_public_access(self, buckets_list):
         test_name = "aws_s3_bucket_not_configured_with_block_public_access"
-        result = []
         for bucket in buckets_list["Buckets"]:
             bucket_name = bucket["Name"]
             bucket_region = bucket["location_constraint"]
             issue_detected = False
             try:
-                public_access = self.aws_s3_client.get_public_access_block(Bucket=bucket_name)
+                public_access = self.bucket_attributes[bucket_name].get('public_access_block')
                 conf = public_access["PublicAccessBlockConfiguration"]
                 if not conf["BlockPublicAcls"] or not conf["IgnorePublicAcls"] or not conf["BlockPublicPolicy"] or not conf["RestrictPublicBuckets"]:
                     issue_detected = True
@@ -749,532 +533,122 @@ class Tester(interfaces.TesterInterface):
                 else:
                     raise ex
             if issue_detected:
-                result.append({
-                    "user": self.user_id,
-                    "account_arn": self.account_arn,
-                    "account": self.account_id,
-                    "timestamp": time.time(),
-                    "item": bucket_name,
-                    "item_type": "s3_bucket",
-                    "test_name": test_name,
-                    "test_result": "issue_found",
-                    "region": bucket_region
-                })
+                yield self.result_context.new_result(
+                    bucket_name, "s3_bucket", test_name, "issue_found", region=bucket_region)
             else:
-                result.append({
-                    "user": self.user_id,
-                    "account_arn": self.account_arn,
-                    "account": self.account_id,
-                    "timestamp": time.time(),
-                    "item": bucket_name,
-                    "item_type": "s3_bucket",
-                    "test_name": test_name,
-                    "test_result": "no_issue_found",
-                    "region": bucket_region
-                })
-        return result
+                yield self.result_context.new_result(
+                    bucket_name, "s3_bucket", test_name, "no_issue_found", region=bucket_region)
 
     def detect_buckets_with_global_upload_and_delete_permission(self, buckets_list):
         test_name = "aws_s3_buckets_with_global_upload_and_delete_permission"
-        result = []
         for bucket_meta in buckets_list["Buckets"]:
             bucket_name = bucket_meta["Name"]
             bucket_region = bucket_meta["location_constraint"]
-            bucket_acl = self.aws_s3_client.get_bucket_acl(Bucket=bucket_name)
+            bucket_acl = self.bucket_attributes[bucket_name].get('acl')
             issue_found = False
             for grant in bucket_acl["Grants"]:
                 if (grant["Permission"] == "WRITE" or grant["Permission"] == "READ") and grant["Grantee"].get("URI") == "http://acs.amazonaws.com/groups/global/AllUsers":
-                    result.append({
-                        "user": self.user_id,
-                        "account_arn": self.account_arn,
-                        "account": self.account_id,
-                        "timestamp": time.time(),
-                        "item": bucket_name,
-                        "item_type": "s3_bucket",
-                        "test_name": test_name,
-                        "test_result": "issue_found",
-                        "region": bucket_region
-                    })
+                    yield self.result_context.new_result(
+                        bucket_name, "s3_bucket", test_name, "issue_found", region=bucket_region)
                     issue_found = True
                     break
             if not issue_found:
-                result.append({
-                    "user": self.user_id,
-                    "account_arn": self.account_arn,
-                    "account": self.account_id,
-                    "timestamp": time.time(),
-                    "item": bucket_name,
-                    "item_type": "s3_bucket",
-                    "test_name": test_name,
-                    "test_result": "no_issue_found",
-                    "region": bucket_region
-                })
-        return result
+                yield self.result_context.new_result(
+                    bucket_name, "s3_bucket", test_name, "no_issue_found", region=bucket_region)
 
     def detect_bucket_has_global_list_acl_permission_through_acl(self, buckets_list):
         test_name = "aws_s3_bucket_has_global_list_acl_permission_through_acl"
-        result = []
         for bucket_meta in buckets_list["Buckets"]:
             bucket_name = bucket_meta["Name"]
             bucket_region = bucket_meta["location_constraint"]
-            bucket_acl = self.aws_s3_client.get_bucket_acl(Bucket=bucket_name)
+            bucket_acl = self.bucket_attributes[bucket_name].get('acl')
             issue_found = False
             for grant in bucket_acl["Grants"]:
                 if (grant["Permission"] == "WRITE_ACP" or grant["Permission"] == "READ_ACP") and grant["Grantee"].get("URI") == "http://acs.amazonaws.com/groups/global/AllUsers":
-                    result.append({
-                        "user": self.user_id,
-                        "account_arn": self.account_arn,
-                        "account": self.account_id,
-                        "timestamp": time.time(),
-                        "item": bucket_name,
-                        "item_type": "s3_bucket",
-                        "test_name": test_name,
-                        "test_result": "issue_found",
-                        "region": bucket_region
-                    })
+                    yield self.result_context.new_result(
+                        bucket_name, "s3_bucket", test_name, "issue_found", region=bucket_region)
                     issue_found = True
                     break
             if not issue_found:
-                result.append({
-                    "user": self.user_id,
-                    "account_arn": self.account_arn,
-                    "account": self.account_id,
-                    "timestamp": time.time(),
-                    "item": bucket_name,
-                    "item_type": "s3_bucket",
-                    "test_name": test_name,
-                    "test_result": "no_issue_found",
-                    "region": bucket_region
-                })
-        return result
+                yield self.result_context.new_result(
+                    bucket_name, "s3_bucket", test_name, "no_issue_found", region=bucket_region)
 
     def detect_bucket_has_global_list_permissions_enabled_via_bucket_policy(self, buckets_list):
-        result = []
-        test_name = "aws_s3_bucket_has_global_list_permissions_enabled_via_bucket_policy"
-        buckets = buckets_list["Buckets"]
-
-        for bucket_meta in buckets:
-            bucket_name = bucket_meta["Name"]
-            bucket_region = bucket_meta["location_constraint"]
-            try:
-                response = self._get_bucket_policy(bucket_name=bucket_name)
-                policies = response['Policy']
-
-                policy_obj = json.loads(policies)
-                policy_statements = policy_obj['Statement']
-
-                filtered_result = list(filter(lambda x: x['Effect'] == 'Allow', policy_statements))
-                if filtered_result:
-                    filtered_principal = list(filter(lambda x: x['Principal'] == '*' or x['Principal'] == {"AWS": "*"}, filtered_result))
-
-                    if filtered_principal:
-                        all_actions = []
-                        for i in filtered_principal:
-                            actions = i['Action']
-                            if isinstance(actions, str): all_actions.append(actions)
-                            else: all_actions.extend(actions)
-                        list_actions = list(filter(lambda x: x == '*' or x == 's3:*' or x.startswith('s3:List'), all_actions))
-
-                        if list_actions:
-                            result.append({
-                                "user": self.user_id,
-                                "account_arn": self.account_arn,
-                                "account": self.account_id,
-                                "timestamp": time.time(),
-                                "item": bucket_name,
-                                "item_type": "s3_bucket",
-                                "test_name": test_name,
-                                "policy": policy_obj,
-                                "test_result": "issue_found",
-                                "region": bucket_region
-                            })
-                        else:
-                            result.append({
-                                "user": self.user_id,
-                                "account_arn": self.account_arn,
-                                "account": self.account_id,
-                                "timestamp": time.time(),
-                                "item": bucket_name,
-                                "item_type": "s3_bucket",
-                                "test_name": test_name,
-                                "test_result": "no_issue_found",
-                                "region": bucket_region
-                            })
-                    else:
-                        result.append({
-                            "user": self.user_id,
-                            "account_arn": self.account_arn,
-                            "account": self.account_id,
-                            "timestamp": time.time(),
-                            "item": bucket_name,
-                            "item_type": "s3_bucket",
-                            "test_name": test_name,
-                            "test_result": "no_issue_found"
-                        })
-                else:
-                    result.append({
-                        "user": self.user_id,
-                        "account_arn": self.account_arn,
-                        "account": self.account_id,
-                        "timestamp": time.time(),
-                        "item": bucket_name,
-                        "item_type": "s3_bucket",
-                        "test_name": test_name,
-                        "test_result": "no_issue_found",
-                        "region": bucket_region
-                    })
-
-            except botocore.exceptions.ClientError as ex:
-                if ex.response['Error']['Code'] == 'NoSuchBucketPolicy':
-                    # No policy means the bucket content is not listable by policy
-                    pass
-                else:
-                    raise ex
-
-        return result
+        return self._detect_global_permissions_via_bucket_policy(
+            buckets_list, "s3:List*", "aws_s3_bucket_has_global_list_permissions_enabled_via_bucket_policy")
 
     def detect_bucket_has_global_get_permissions_enabled_via_bucket_policy(self, buckets_list):
-        result = []
-        test_name = "aws_s3_bucket_has_global_get_permissions_enabled_via_bucket_policy"
-        buckets = buckets_list["Buckets"]
-        for bucket_meta in buckets:
-            bucket_name = bucket_meta["Name"]
-            bucket_region = bucket_meta["location_constraint"]
-            try:
-                response = self._get_bucket_policy(bucket_name=bucket_name)
-                policies = response['Policy']
-
-                policy_obj = json.loads(policies)
-                policy_statements = policy_obj['Statement']
-
-                filtered_result = list(filter(lambda x: x['Effect'] == 'Allow', policy_statements))
-                if filtered_result:
-                    filtered_principal = list(filter(lambda x: x['Principal'] == '*' or x['Principal'] == {"AWS": "*"}, filtered_result))
-                    if filtered_principal:
-                        all_actions = []
-                        for i in filtered_principal:
-                            actions = i['Action']
-                            if isinstance(actions, str): all_actions.append(actions)
-                            else: all_actions.extend(actions)
-                        get_actions = list(filter(lambda x: x == '*' or x == 's3:*' or x.startswith('s3:Get'), all_actions))
-                        if get_actions:
-                            result.append({
-                                "user": self.user_id,
-                                "account_arn": self.account_arn,
-                                "account": self.account_id,
-                                "timestamp": time.time(),
-                                "item": bucket_name,
-                                "item_type": "s3_bucket",
-                                "test_name": test_name,
-                                "policy": policy_obj,
-                                "test_result": "issue_found",
-                                "region": bucket_region
-                            })
-                        else:
-                            result.append({
-                                "user": self.user_id,
-                                "account_arn": self.account_arn,
-                                "account": self.account_id,
-                                "timestamp": time.time(),
-                                "item": bucket_name,
-                                "item_type": "s3_bucket",
-                                "test_name": test_name,
-                                "test_result": "no_issue_found",
-                                "region": bucket_region
-                            })
-                    else:
-                        result.append({
-                            "user": self.user_id,
-                            "account_arn": self.account_arn,
-                            "account": self.account_id,
-                            "timestamp": time.time(),
-                            "item": bucket_name,
-                            "item_type": "s3_bucket",
-                            "test_name": test_name,
-                            "test_result": "no_issue_found",
-                            "region": bucket_region
-                        })
-                else:
-                    result.append({
-                        "user": self.user_id,
-                        "account_arn": self.account_arn,
-                        "account": self.account_id,
-                        "timestamp": time.time(),
-                        "item": bucket_name,
-                        "item_type": "s3_bucket",
-                        "test_name": test_name,
-                        "test_result": "no_issue_found",
-                        "region": bucket_region
-                    })
-            except botocore.exceptions.ClientError as ex:
-                if ex.response['Error']['Code'] == 'NoSuchBucketPolicy':
-                    # No policy means the bucket content is not listable by policy
-                    pass
-                else:
-                    raise ex
-
-        return result
+        return self._detect_global_permissions_via_bucket_policy(
+            buckets_list, "s3:Get*", "aws_s3_bucket_has_global_get_permissions_enabled_via_bucket_policy")
 
     def detect_bucket_has_global_put_permissions_enabled_via_bucket_policy(self, buckets_list):
-        result = []
-        test_name = "aws_s3_bucket_has_global_put_permissions_enabled_via_bucket_policy"
-        buckets = buckets_list["Buckets"]
-
-        for bucket_meta in buckets:
-            bucket_name = bucket_meta["Name"]
-            bucket_region = bucket_meta["location_constraint"]
-            try:
-                response = self._get_bucket_policy(bucket_name=bucket_name)
-                policies = response['Policy']
-
-                policy_obj = json.loads(policies)
-                policy_statements = policy_obj['Statement']
-
-                filtered_result = list(filter(lambda x: x['Effect'] == 'Allow', policy_statements))
-                if filtered_result:
-                    filtered_principal = list(filter(lambda x: x['Principal'] == '*' or x['Principal'] == {"AWS": "*"}, filtered_result))
-                    if filtered_principal:
-                        all_actions = []
-                        for i in filtered_principal:
-                            actions = i['Action']
-                            if isinstance(actions, str): all_actions.append(actions)
-                            else: all_actions.extend(actions)
-                        put_actions = list(filter(lambda x: x == '*' or x == 's3:*' or x.startswith('s3:Put'), all_actions))
-                        if put_actions:
-                            result.append({
-                                "user": self.user_id,
-                                "account_arn": self.account_arn,
-                                "account": self.account_id,
-                                "timestamp": time.time(),
-                                "item": bucket_name,
-                                "item_type": "s3_bucket",
-                                "test_name": test_name,
-                                "policy": policy_obj,
-                                "test_result": "issue_found",
-                                "region": bucket_region
-                            })
-                        else:
-                            result.append({
-                                "user": self.user_id,
-                                "account_arn": self.account_arn,
-                                "account": self.account_id,
-                                "timestamp": time.time(),
-                                "item": bucket_name,
-                                "item_type": "s3_bucket",
-                                "test_name": test_name,
-                                "test_result": "no_issue_found",
-                                "region": bucket_region
-                            })
-                    else:
-                        result.append({
-                            "user": self.user_id,
-                            "account_arn": self.account_arn,
-                            "account": self.account_id,
-                            "timestamp": time.time(),
-                            "item": bucket_name,
-                            "item_type": "s3_bucket",
-                            "test_name": test_name,
-                            "test_result": "no_issue_found",
-                            "region": bucket_region
-                        })
-                else:
-                    result.append({
-                        "user": self.user_id,
-                        "account_arn": self.account_arn,
-                        "account": self.account_id,
-                        "timestamp": time.time(),
-                        "item": bucket_name,
-                        "item_type": "s3_bucket",
-                        "test_name": test_name,
-                        "test_result": "no_issue_found",
-                        "region": bucket_region
-                    })
-            except botocore.exceptions.ClientError as ex:
-                if ex.response['Error']['Code'] == 'NoSuchBucketPolicy':
-                    # No policy means the bucket content is not listable by policy
-                    pass
-                else:
-                    raise ex
-
-        return result
+        return self._detect_global_permissions_via_bucket_policy(
+            buckets_list, "s3:Put*", "aws_s3_bucket_has_global_put_permissions_enabled_via_bucket_policy")
 
     def _test_bucket_url_access(self, buckets_list, protocol, test_name):
-        result = []
+        # run_tests prefetched the URLs, the probes are shared or already done
         for bucket_meta in buckets_list["Buckets"]:
             bucket_name = bucket_meta["Name"]
             bucket_region = bucket_meta["location_constraint"]
-            issue_detected = False
-            try:
-                url = protocol + "://" + urllib.parse.quote_plus(bucket_name) + ".s3.amazonaws.com"
-                resp = requests.head(url)
-                if resp.status_code >= 200 and resp.status_code < 300:
-                    result.append({
-                        "user": self.user_id,
-                        "account_arn": self.account_arn,
-                        "account": self.account_id,
-                        "timestamp": time.time(),
-                        "item": bucket_name,
-                        "item_type": "s3_bucket",
-                        "test_name": test_name,
-                        "bucket_url": url,
-                        "test_result": "issue_found",
-                        "region": bucket_region
-                    })
-                    issue_detected = True
-            except Exception:
+            url = self._bucket_url(bucket_name, protocol)
+            status_code = self.http_prober.probe(url)
+            if status_code is None:
+                # A bucket URL that cannot be reached is not reported
                 continue
-            if not issue_detected:
-                result.append({
-                    "user": self.user_id,
-                    "account_arn": self.account_arn,
-                    "account": self.account_id,
-                    "timestamp": time.time(),
-                    "item": bucket_name,
-                    "item_type": "s3_bucket",
-                    "test_name": test_name,
-                    "test_result": "no_issue_found",
-                    "region": bucket_region
-                })
-        return result
-
-    def _get_bucket_policy(self, bucket_name):
-        if "bucket_policy" not in self.cache:
-            self.cache["bucket_policy"] = {}
-        if bucket_name not in self.cache["bucket_policy"]:
-            self.cache["bucket_policy"][bucket_name] = self.aws_s3_client.get_bucket_policy(Bucket=bucket_name)
-
-        return self.cache["bucket_policy"][bucket_name]
+            if 200 <= status_code < 300:
+                yield self.result_context.new_result(
+                    bucket_name, "s3_bucket", test_name, "issue_found", region=bucket_region, bucket_url=url)
+            else:
+                yield self.result_context.new_result(
+                    bucket_name, "s3_bucket", test_name, "no_issue_found", region=bucket_region)
 
-    def _get_bucket_versioning(self, bucket_name):
-        if "bucket_versioning" not in self.cache:
-            self.cache["bucket_versioning"] = {}
-        if bucket_name not in self.cache["bucket_versioning"]:
-            self.cache["bucket_versioning"][bucket_name] = self.aws_s3_resource.BucketVersioning(bucket_name)
-        return self.cache["bucket_versioning"][bucket_name]
+    def _bucket_url(self, bucket_name, protocol):
+        return self.bucket_url_template.format(protocol=protocol, bucket=urllib.parse.quote_plus(bucket_name))
 
-    def _get_bucket_acl(self, bucket_name):
-        if "bucket_acl" not in self.cache:
-            self.cache["bucket_acl"] = {}
-        if bucket_name not in self.cache["bucket_acl"]:
-            self.cache["bucket_acl"][bucket_name] = self.aws_s3_resource.BucketAcl(bucket_name)
-        return self.cache["bucket_acl"][bucket_name]
+    def _get_kms_key_aliases(self, key_id):
+        kms_key_description_response = self.aws_kms_client.describe_key(KeyId=key_id)
+        kms_response = self.aws_kms_client.list_aliases(KeyId=kms_key_description_response['KeyMetadata']['KeyId'])
+        return kms_response['Aliases']
 
     def _detect_buckets_with_permissions_matching(self, buckets_list, permission_to_check, test_name):
-        result = []
         write_enabled_buckets = []
         for bucket_meta in buckets_list["Buckets"]:
             bucket_name = bucket_meta["Name"]
             bucket_region = bucket_meta['location_constraint']
-            cur_bucket_permissions = self._get_bucket_acl(bucket_name)
+            bucket_grants = self.bucket_attributes[bucket_name].get('acl')["Grants"]
             issue_detected = False
-            for grantee in cur_bucket_permissions.grants:
+            for grantee in bucket_grants:
                 if grantee["Permission"] == permission_to_check:
                     if bucket_name not in write_enabled_buckets:
                         write_enabled_buckets.append(bucket_name)
-                        result.append({
-                            "user": self.user_id,
-                            "account_arn": self.account_arn,
-                            "account": self.account_id,
-                            "timestamp": time.time(),
-                            "item": bucket_name,
-                            "item_type": "s3_bucket",
-                            "test_name": test_name,
-                            "permissions": cur_bucket_permissions.grants,
-                            "test_result": "issue_found",
-                            "region": bucket_region
-                        })
+                        yield self.result_context.new_result(
+                            bucket_name, "s3_bucket", test_name, "issue_found", region=bucket_region,
+                            permissions=bucket_grants)
                         issue_detected = True
             if not issue_detected:
-                result.append({
-                    "user": self.user_id,
-                    "account_arn": self.account_arn,
-                    "account": self.account_id,
-                    "timestamp": time.time(),
-                    "item": bucket_name,
-                    "item_type": "s3_bucket",
-                    "test_name": test_name,
-                    "test_result": "no_issue_found",
-                    "region": bucket_region
-                })
-        return result
+                yield self.result_context.new_result(
+                    bucket_name, "s3_bucket", test_name, "no_issue_found", region=bucket_region)
 
     def detect_bucket_has_global_delete_permissions_enabled_via_bucket_policy(self, buckets_list):
-        result = []
-        test_name = "aws_s3_bucket_has_global_delete_permissions_enabled_via_bucket_policy"
-        buckets = buckets_list["Buckets"]
-        for bucket_meta in buckets:
-            bucket_name = bucket_meta['Name']
+        return self._detect_global_permissions_via_bucket_policy(
+            buckets_list, "s3:Delete*", "aws_s3_bucket_has_global_delete_permissions_enabled_via_bucket_policy")
+
+    def _detect_global_permissions_via_bucket_policy(self, buckets_list, action, test_name):
+        for bucket_meta in buckets_list["Buckets"]:
+            bucket_name = bucket_meta["Name"]
             bucket_region = bucket_meta["location_constraint"]
             try:
-                response = self._get_bucket_policy(bucket_name=bucket_name)
-                policies = response['Policy']
-
-                policy_obj = json.loads(policies)
-                policy_statements = policy_obj['Statement']
-
-                filtered_result = list(filter(lambda x: x['Effect'] == 'Allow', policy_statements))
-                if filtered_result:
-                    filtered_principal = list(filter(lambda x: x['Principal'] == '*' or x['Principal'] == {"AWS": "*"}, filtered_result))
-                    if filtered_principal:
-                        all_actions = []
-                        for i in filtered_principal:
-                            actions = i['Action']
-                            if isinstance(actions, str): all_actions.append(actions)
-                            else: all_actions.extend(actions)
-                        delete_actions = list(filter(lambda x: x == '*' or x == 's3:*' or x.startswith('s3:Delete'), all_actions))
-                        if delete_actions:
-                            result.append({
-                                "user": self.user_id,
-                                "account_arn": self.account_arn,
-                                "account": self.account_id,
-                                "timestamp": time.time(),
-                                "item": bucket_name,
-                                "item_type": "s3_bucket",
-                                "test_name": test_name,
-                                "policy": policy_obj,
-                                "test_result": "issue_found",
-                                "region": bucket_region
-                            })
-                        else:
-                            result.append({
-                                "user": self.user_id,
-                                "account_arn": self.account_arn,
-                                "account": self.account_id,
-                                "timestamp": time.time(),
-                                "item": bucket_name,
-                                "item_type": "s3_bucket",
-                                "test_name": test_name,
-                                "test_result": "no_issue_found",
-                                "region": bucket_region
-                            })
-                    else:
-                        result.append({
-                            "user": self.user_id,
-                            "account_arn": self.account_arn,
-                            "account": self.account_id,
-                            "timestamp": time.time(),
-                            "item": bucket_name,
-                            "item_type": "s3_bucket",
-                            "test_name": test_name,
-                            "test_result": "no_issue_found",
-                            "region": bucket_region
-                        })
-                else:
-                    result.append({
-                        "user": self.user_id,
-                        "account_arn": self.account_arn,
-                        "account": self.account_id,
-                        "timestamp": time.time(),
-                        "item": bucket_name,
-                        "item_type": "s3_bucket",
-                        "test_name": test_name,
-                        "test_result": "no_issue_found",
-                        "region": bucket_region
-                    })
-            except botocore.exceptions.ClientError as c:
-                if c.response['Error']['Code'] == 'NoSuchBucketPolicy':
-                    pass
-                else:
-                    raise c
-
-        return result
+                policy = analyze_policy(self.bucket_attributes[bucket_name].get('policy')['Policy'])
+            except botocore.exceptions.ClientError as ex:
+                if ex.response['Error']['Code'] == 'NoSuchBucketPolicy':
+                    # No policy grants nothing
+                    yield self.result_context.new_result(
+                        bucket_name, "s3_bucket", test_name, "no_issue_found", region=bucket_region)
+                    continue
+                raise ex
+            if policy.grants(action, anonymous=True):
+                yield self.result_context.new_result(
+                    bucket_name, "s3_bucket", test_name, "issue_found", region=bucket_region, policy=policy.copy_document())
+            else:
+                yield self.result_context.new_result(
+                    bucket_name, "s3_bucket", test_name, "no_issue_found", region=bucket_region)
@@ -1,6 +1,6 @@
-import time
-import boto3
 import interfaces
+from aws_context import AwsContext
+from policy_analysis import analyze_policy
 import json, re
 import concurrent.futures
 
@@ -9,33 +9,21 @@ def _format_string_to_json(text):
 
 
 def _check_sns_restriction_enabled(access_policy, is_topic):
-    access_policy = _format_string_to_json(access_policy)
-    restricted = True
     if is_topic:
         action_value = "SNS:Publish"
     else:
         action_value = "SNS:Subscribe"
-    for statement in access_policy['Statement']:
-        if 'Effect' in statement and statement['Effect'] == 'Deny':
-            continue
-        if 'Principal' in statement and 'AWS' in statement['Principal'] and statement['Principal'][
-            'AWS'] == '*' and 'Condition' not in statement:
-            if 'Action' in statement and statement['Action'] == action_value or action_value in statement['Action'] or \
-                    statement['Action'] == '*':
-                restricted = False
-                break
-    return restricted
+    return not analyze_policy(access_policy).grants(action_value, anonymous=True, unconditional=True)
 
 
 class Tester(interfaces.TesterInterface):
-    def __init__(self, region_name):
-        self.ssm = boto3.client('ssm')
+    def __init__(self, region_name, aws_context=None):
+        self.aws_context = aws_context if aws_context else AwsContext()
         self.region_name = region_name
-        self.aws_sns_client = boto3.client('sns', region_name=region_name)
+        self.aws_sns_client = self.aws_context.get_client('sns', region_name=region_name)
         self.cache = {}
-        self.user_id = boto3.client('sts').get_caller_identity().get('UserId')
-        self.account_arn = boto3.client('sts').get_caller_identity().get('Arn')
-        self.account_id = boto3.client('sts').get_caller_identity().get('Account')
+        self.account_id = self.aws_context.account_id
+        self.result_context = self.aws_context.result_context(region_name)
 
     def declare_tested_service(self) -> str:
         return 'sns'
@@ -59,26 +47,10 @@ class Tester(interfaces.TesterInterface):
         return return_value
 
     def _get_regions(self) -> list:
-        region_list = []
-        for page in self.ssm.get_paginator('get_parameters_by_path').paginate(
-                Path='/aws/service/global-infrastructure/regions'
-        ):
-            for p in page['Parameters']:
-                region_list.append(p['Value'])
-        return region_list
+        return self.aws_context.get_enabled_regions()
 
     def _append_sns_test_result(self, topic_arn, test_name, issue_status):
-        return {
-            "user": self.user_id,
-            "account_arn": self.account_arn,
-            "account": self.account_id,
-            "timestamp": time.time(),
-            "item": topic_arn,
-            "item_type": "sns",
-            "test_name": test_name,
-            "test_result": issue_status,
-            "region": self.region_name
-        }
+        return self.result_context.new_result(topic_arn, "sns", test_name, issue_status)
 
     def _return_all_the_topic_arns(self):
         response = self.aws_sns_client.list_topics()
@@ -150,7 +122,7 @@ class Tester(interfaces.TesterInterface):
     def detect_sns_cross_account_access(self):
         test_name = "aws_sns_cross_account_access"
         result = []
-        client_organizations = boto3.client('organizations')
+        client_organizations = self.aws_context.get_client('organizations')
         try:
             resp = client_organizations.list_accounts()
             all_account_obj = ['Accounts'] in resp and resp['Accounts'] or []
@@ -1,6 +1,7 @@
-import time
-import boto3
 import interfaces
+from aws_context import AwsContext
+from result_record import ResultRecord
+from policy_analysis import analyze_policy
 import json, re
 import concurrent.futures
 
@@ -9,14 +10,13 @@ def _format_string_to_json(text):
 
 
 class Tester(interfaces.TesterInterface):
-    def __init__(self, region_name):
-        self.ssm = boto3.client('ssm')
+    def __init__(self, region_name, aws_context=None):
+        self.aws_context = aws_context if aws_context else AwsContext()
         self.region_name = region_name
-        self.aws_sqs_client = boto3.client('sqs', region_name=region_name)
+        self.aws_sqs_client = self.aws_context.get_client('sqs', region_name=region_name)
         self.cache = {}
-        self.user_id = boto3.client('sts').get_caller_identity().get('UserId')
-        self.account_arn = boto3.client('sts').get_caller_identity().get('Arn')
-        self.account_id = boto3.client('sts').get_caller_identity().get('Account')
+        self.account_id = self.aws_context.account_id
+        self.result_context = self.aws_context.result_context(region_name)
 
     def declare_tested_service(self) -> str:
         return 'sqs'
@@ -40,26 +40,10 @@ class Tester(interfaces.TesterInterface):
         return return_value
 
     def _get_regions(self) -> list:
-        region_list = []
-        for page in self.ssm.get_paginator('get_parameters_by_path').paginate(
-                Path='/aws/service/global-infrastructure/regions'
-        ):
-            for p in page['Parameters']:
-                region_list.append(p['Value'])
-        return region_list
-
-    def _append_sqs_test_result(self, sqs_url, test_name, issue_status) -> dict:
-        return {
-            "user": self.user_id,
-            "account_arn": self.account_arn,
-            "account": self.account_id,
-            "timestamp": time.time(),
-            "item": sqs_url,
-            "item_type": "sqs",
-            "test_name": test_name,
-            "test_result": issue_status,
-            "region": self.region_name
-        }
+        return self.aws_context.get_enabled_regions()
+
+    def _append_sqs_test_result(self, sqs_url, test_name, issue_status) -> ResultRecord:
+        return self.result_context.new_result(sqs_url, "sqs", test_name, issue_status)
 
     def _return_all_the_sqs(self):
         response = self.aws_sqs_client.list_queues(MaxResults=100)
@@ -112,17 +96,8 @@ class Tester(interfaces.TesterInterface):
         get_attribute_result = self.aws_sqs_client.get_queue_attributes(
             QueueUrl=queue_url,
             AttributeNames=['Policy'])
-        policy_dict = _format_string_to_json(get_attribute_result['Attributes']['Policy'])
-        restricted = True
-        for policy_statement_dict in policy_dict['Statement']:
-            if policy_statement_dict['Effect'] == 'Allow':
-                if 'Principal' in policy_statement_dict and 'AWS' in policy_statement_dict['Principal'] and \
-                        policy_statement_dict['Principal'][
-                            'AWS'] == '*' and 'Condition' not in policy_statement_dict:
-                    restricted = False
-                    break
-                if 'Effect' in policy_statement_dict and policy_statement_dict['Effect'] == 'Deny':
-                    continue
+        policy = analyze_policy(get_attribute_result['Attributes']['Policy'])
+        restricted = not policy.grants(anonymous=True, unconditional=True)
         if restricted:
             result.append(self._append_sqs_test_result(queue_url, test_name, "no_issue_found"))
         else:
@@ -156,7 +131,7 @@ class Tester(interfaces.TesterInterface):
     def detect_sqs_cross_account_access(self) -> list:
         result = []
         test_name = 'aws_sqs_cross_account_access'
-        client_organizations = boto3.client('organizations')
+        client_organizations = self.aws_context.get_client('organizations')
         try:
             resp = client_organizations.list_accounts()
             all_account_obj = ['Accounts'] in resp and resp['Accounts'] or []
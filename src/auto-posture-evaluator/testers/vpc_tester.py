@@ -1,9 +1,9 @@
+import collections
 import concurrent.futures
 import json
-import time
 
-import boto3
 import interfaces
+from aws_context import AwsContext
 
 
 def _format_string_to_json(text):
@@ -11,15 +11,19 @@ def _format_string_to_json(text):
 
 
 class Tester(interfaces.TesterInterface):
-    def __init__(self, region_name):
-        self.ssm = boto3.client('ssm')
+    inventory_views = ['ec2.vpcs', 'ec2.instances', 'ec2.security_groups', 'ec2.network_acls', 'ec2.addresses']
+    resource_tests = ['aws_vpc_security_group_per_vpc_limit',
+                      'aws_vpc_network_acl_do_not_allow_ingress_from_0.0.0.0_to_remote_server_administration_ports',
+                      'aws_vpc_default_nacl_used', 'aws_vpc_ip_address_is_attached_to_a_host_or_eni']
+
+    def __init__(self, region_name, aws_context=None):
+        self.aws_context = aws_context if aws_context else AwsContext()
         self.region_name = region_name
-        self.aws_vpc_client = boto3.client('ec2', region_name=region_name)
-        self.cache = {}
-        self.user_id = boto3.client('sts').get_caller_identity().get('UserId')
-        self.account_arn = boto3.client('sts').get_caller_identity().get('Arn')
-        self.account_id = boto3.client('sts').get_caller_identity().get('Account')
+        self.aws_vpc_client = self.aws_context.get_client('ec2', region_name=region_name)
+        self.inventory = self.aws_context.inventory
+        self.result_context = self.aws_context.result_context(region_name)
         self.all_vpc_details = list()
+        self.evaluated_vpc_details = list()
 
     def declare_tested_service(self) -> str:
         return 'vpc'
@@ -31,6 +35,8 @@ class Tester(interfaces.TesterInterface):
         if self.region_name == 'global' or self.region_name not in self._get_regions():
             return None
         self.all_vpc_details = self._get_all_vpc()
+        # The tests calling the EC2 API evaluate every VPC, their answers are not part of the fingerprints
+        self.evaluated_vpc_details = self.select_evaluated(self.all_vpc_details, 'VpcId')
 
         executor_list = []
         return_value = []
@@ -50,52 +56,36 @@ class Tester(interfaces.TesterInterface):
         return return_value
 
     def _get_regions(self) -> list:
-        region_list = []
-        for page in self.ssm.get_paginator('get_parameters_by_path').paginate(
-                Path='/aws/service/global-infrastructure/regions'
-        ):
-            for p in page['Parameters']:
-                region_list.append(p['Value'])
-        return region_list
+        return self.aws_context.get_enabled_regions()
+
+    def resource_fingerprints(self) -> dict:
+        network_acls_by_vpc = self._get_network_acls_by_vpc()
+        security_groups = self.inventory.get('ec2.security_groups', self.region_name)
+        security_groups_per_vpc = collections.Counter(security_group.get('VpcId') for security_group in security_groups)
+        fingerprints = {}
+        for vpc_detail in self._get_all_vpc():
+            fingerprints[vpc_detail['VpcId']] = [vpc_detail, network_acls_by_vpc.get(vpc_detail['VpcId']),
+                                                 security_groups_per_vpc[vpc_detail['VpcId']]]
+        for address_dict in self.inventory.get('ec2.addresses', self.region_name):
+            fingerprints[address_dict['AllocationId']] = address_dict
+        return fingerprints
 
     def _get_all_vpc(self):
-        response = self.aws_vpc_client.describe_vpcs()
-        vpc_detail = []
-        # If you have the required permissions, the error response is DryRunOperation .
-        # Otherwise, it is UnauthorizedOperation .
-        if response and 'Vpcs' in response and response['Vpcs']:
-            vpc_detail.extend(response['Vpcs'])
-        while 'NextToken' in response and response['NextToken']:
-            response = self.aws_vpc_client.describe_vpcs(NextToken=response['NextToken'])
-            if response and 'Vpcs' in response and response['Vpcs']:
-                vpc_detail.extend(response['Vpcs'])
-        return vpc_detail
-
-    def _append_vpc_test_result(self, vpc_detail, test_name, issue_status):
-        return {
-            "user": self.user_id,
-            "account_arn": self.account_arn,
-            "account": self.account_id,
-            "timestamp": time.time(),
-            "item": vpc_detail['VpcId'],
-            "item_type": "vpc",
-            "test_name": test_name,
-            "test_result": issue_status,
-            "region": self.region_name
-        }
+        return self.inventory.get('ec2.vpcs', self.region_name)
+
+    def _get_network_acls_by_vpc(self) -> dict:
+        network_acls_by_vpc = {}
+        for acl in self.inventory.get('ec2.network_acls', self.region_name):
+            network_acls_by_vpc.setdefault(acl['VpcId'], []).append(acl)
+        return network_acls_by_vpc
+
+    def _append_vpc_test_result(self, vpc_detail, test_name, issue_status, item=None):
+        # `item` replaces the VPC id, the inventory is shared with the other testers and is never modified
+        return self.result_context.new_result(item if item is not None else vpc_detail['VpcId'], "vpc", test_name,
+                                              issue_status)
 
     def _append_epi_test_result(self, eip_detail, test_name, issue_status):
-        return {
-            "user": self.user_id,
-            "account_arn": self.account_arn,
-            "account": self.account_id,
-            "timestamp": time.time(),
-            "item": eip_detail['AllocationId'],
-            "item_type": "vpc_elastic_ip",
-            "test_name": test_name,
-            "test_result": issue_status,
-            "region": self.region_name
-        }
+        return self.result_context.new_result(eip_detail['AllocationId'], "vpc_elastic_ip", test_name, issue_status)
 
     def _check_logging_status(self, test_name, ):
         logging_result = []
@@ -146,14 +136,11 @@ class Tester(interfaces.TesterInterface):
 
     def _check_ingress_administration_ports_range_for_network_acls_inbound_rule(self, test_name):
         ingress_traffic_test_result = []
-        for vpc_detail in self.all_vpc_details:
-            vpc_id = vpc_detail['VpcId']
-            response = self.aws_vpc_client.describe_network_acls(Filters=[{
-                'Name': 'vpc-id',
-                'Values': [vpc_id]
-            }, ])
-            if response and 'NetworkAcls' in response and len(response['NetworkAcls']):
-                for acl in response['NetworkAcls']:
+        network_acls_by_vpc = self._get_network_acls_by_vpc()
+        for vpc_detail in self.evaluated_vpc_details:
+            network_acls = network_acls_by_vpc.get(vpc_detail['VpcId'])
+            if network_acls:
+                for acl in network_acls:
                     issue_found = False
                     for network_acl_rules in acl['Entries']:
                         if 'Egress' in network_acl_rules and not network_acl_rules['Egress'] and network_acl_rules[
@@ -175,14 +162,12 @@ class Tester(interfaces.TesterInterface):
 
     def _check_default_nacl_used(self, test_name):
         default_nacl_used_result = []
-        for vpc_detail in self.all_vpc_details:
-            network_acls_response = self.aws_vpc_client.describe_network_acls(Filters=[{
-                'Name': 'vpc-id',
-                'Values': [vpc_detail['VpcId']]
-            }])
+        network_acls_by_vpc = self._get_network_acls_by_vpc()
+        for vpc_detail in self.evaluated_vpc_details:
+            network_acls = network_acls_by_vpc.get(vpc_detail['VpcId'])
             issue_found = False
-            if 'NetworkAcls' in network_acls_response and network_acls_response['NetworkAcls']:
-                for network_acls_dict in network_acls_response['NetworkAcls']:
+            if network_acls:
+                for network_acls_dict in network_acls:
                     if 'IsDefault' in network_acls_dict and network_acls_dict['IsDefault']:
                         issue_found = True
                         break
@@ -214,39 +199,28 @@ class Tester(interfaces.TesterInterface):
     def detect_vpc_default_security_groups_in_use(self):
         result = []
         test_name = 'aws_vpc_default_security_groups_in_use'
-        all_ec2_instance = []
-        ec2_response = self.aws_vpc_client.describe_instances()
-        if ec2_response and 'Reservations' in ec2_response and ec2_response['Reservations']:
-            for reservations_dict in ec2_response['Reservations']:
-                if 'Instances' in reservations_dict and reservations_dict['Instances']:
-                    all_ec2_instance.extend(reservations_dict['Instances'])
-        for ec2_instance_dict in all_ec2_instance:
-            response = self.aws_vpc_client.describe_security_groups(
-                Filters=[
-                    {
-                        'Name': 'group-id',
-                        'Values': [security_group_dict['GroupId'] for security_group_dict in
-                                   ec2_instance_dict['SecurityGroups']]
-                    }
-                ])
-            if 'SecurityGroups' in response and response['SecurityGroups']:
-                for security_groups_dict in response['SecurityGroups']:
-                    if 'GroupName' in security_groups_dict and security_groups_dict['GroupName'] == 'default':
-                        ec2_instance_dict['VpcId'] = security_groups_dict['VpcId'] + '@@' + security_groups_dict[
-                            'GroupId']
-                        result.append(self._append_vpc_test_result(ec2_instance_dict, test_name, 'issue_found'))
-                        ec2_instance_dict['VpcId'] = security_groups_dict['VpcId']
-                    else:
-                        result.append(self._append_vpc_test_result(ec2_instance_dict, test_name, 'no_issue_found'))
+        security_groups_by_id = self.inventory.get('ec2.security_groups_by_id', self.region_name)
+        for ec2_instance_dict in self.inventory.get('ec2.instances', self.region_name):
+            group_ids = {security_group_dict['GroupId'] for security_group_dict in ec2_instance_dict['SecurityGroups']}
+            for group_id in group_ids:
+                security_groups_dict = security_groups_by_id.get(group_id)
+                if security_groups_dict is None:
+                    continue
+                if 'GroupName' in security_groups_dict and security_groups_dict['GroupName'] == 'default':
+                    result.append(self._append_vpc_test_result(
+                        ec2_instance_dict, test_name, 'issue_found',
+                        security_groups_dict['VpcId'] + '@@' + security_groups_dict['GroupId']))
+                else:
+                    result.append(self._append_vpc_test_result(ec2_instance_dict, test_name, 'no_issue_found'))
         return result
 
     def detect_vpc_security_group_per_vpc_limit(self):
         result = []
         test_name = 'aws_vpc_security_group_per_vpc_limit'
-        for vpc_detail in self.all_vpc_details:
-            security_groups_response = self.aws_vpc_client.describe_security_groups(
-                Filters=[{'Name': 'vpc-id', 'Values': [vpc_detail['VpcId']]}], MaxResults=451)
-            count = len(security_groups_response['SecurityGroups'])
+        security_groups = self.inventory.get('ec2.security_groups', self.region_name)
+        security_groups_per_vpc = collections.Counter(security_group.get('VpcId') for security_group in security_groups)
+        for vpc_detail in self.evaluated_vpc_details:
+            count = security_groups_per_vpc[vpc_detail['VpcId']]
             if count >= 450:
                 result.append(self._append_vpc_test_result(vpc_detail, test_name, 'issue_found'))
             else:
@@ -285,11 +259,10 @@ class Tester(interfaces.TesterInterface):
                         issue_found.append(vpc_peering_connection_dict['VpcPeeringConnectionId'])
 
             if issue_found:
-                vpc_id = vpc_detail['VpcId']
                 for data in issue_found:
-                    vpc_detail['VpcId'] = vpc_id + '@@' + data
                     vpc_peering_connection_status.append(
-                        self._append_vpc_test_result(vpc_detail, test_name, 'issue_found'))
+                        self._append_vpc_test_result(vpc_detail, test_name, 'issue_found',
+                                                     vpc_detail['VpcId'] + '@@' + data))
             else:
                 vpc_peering_connection_status.append(
                     self._append_vpc_test_result(vpc_detail, test_name, 'no_issue_found'))
@@ -298,8 +271,8 @@ class Tester(interfaces.TesterInterface):
     def detect_vpc_eip_in_use(self):
         result = []
         test_name = 'aws_vpc_ip_address_is_attached_to_a_host_or_eni'
-        response = self.aws_vpc_client.describe_addresses()
-        for address_dict in response['Addresses']:
+        addresses = self.inventory.get('ec2.addresses', self.region_name)
+        for address_dict in self.select_evaluated(addresses, 'AllocationId'):
             if 'AssociationId' not in address_dict or (
                     'AssociationId' in address_dict and not address_dict['AssociationId']):
                 result.append(self._append_epi_test_result(address_dict, test_name, 'issue_found'))
@@ -1,19 +1,19 @@
 import concurrent.futures
-import time
 
-import boto3
 import interfaces
+from aws_context import AwsContext
+from result_record import ResultRecord
 
 
 class Tester(interfaces.TesterInterface):
-    def __init__(self, region_name):
-        self.ssm = boto3.client('ssm')
+    tested_region_scope = interfaces.REGION_SCOPE_GLOBAL_AND_REGIONAL
+
+    def __init__(self, region_name, aws_context=None):
+        self.aws_context = aws_context if aws_context else AwsContext()
         self.region_name = region_name
         self.aws_waf_client = None
         self.cache = {}
-        self.user_id = boto3.client('sts').get_caller_identity().get('UserId')
-        self.account_arn = boto3.client('sts').get_caller_identity().get('Arn')
-        self.account_id = boto3.client('sts').get_caller_identity().get('Account')
+        self.result_context = self.aws_context.result_context(region_name)
         self.scope = None
         self.web_acls = []
 
@@ -28,12 +28,12 @@ class Tester(interfaces.TesterInterface):
             '''If region is global by default we have to consider region name as us-east-1.
                All the web acls will lie in us-east-1 for the CLOUDFRONT'''
             self.region_name = 'us-east-1'
-            self.aws_waf_client = boto3.client('wafv2', region_name=self.region_name)
+            self.aws_waf_client = self.aws_context.get_client('wafv2', region_name=self.region_name)
             self.scope = 'CLOUDFRONT'
             self.web_acls = self._return_all_web_acls(self.scope)
             waf_dict = self._get_all_rule_sets(self.scope, self.aws_waf_client, self.web_acls)
         elif self.region_name in self._get_regions():
-            self.aws_waf_client = boto3.client('wafv2', region_name=self.region_name)
+            self.aws_waf_client = self.aws_context.get_client('wafv2', region_name=self.region_name)
             self.scope = 'REGIONAL'
             self.web_acls = self._return_all_web_acls(self.scope)
             waf_dict = self._get_all_rule_sets(self.scope, self.aws_waf_client, self.web_acls)
@@ -52,26 +52,10 @@ class Tester(interfaces.TesterInterface):
         return return_value
 
     def _get_regions(self) -> list:
-        region_list = []
-        for page in self.ssm.get_paginator('get_parameters_by_path').paginate(
-                Path='/aws/service/global-infrastructure/regions'
-        ):
-            for p in page['Parameters']:
-                region_list.append(p['Value'])
-        return region_list
-
-    def _append_waf_test_result(self, waf, test_name, issue_status) -> dict:
-        return {
-            "user": self.user_id,
-            "account_arn": self.account_arn,
-            "account": self.account_id,
-            "timestamp": time.time(),
-            "item": waf,
-            "item_type": "waf",
-            "test_name": test_name,
-            "test_result": issue_status,
-            "region": self.region_name
-        }
+        return self.aws_context.get_enabled_regions()
+
+    def _append_waf_test_result(self, waf, test_name, issue_status) -> ResultRecord:
+        return self.result_context.new_result(waf, "waf", test_name, issue_status)
 
     def _return_web_acls_based_on_scope(self, scope, waf_client) -> list:
         web_acls = []
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The evaluator's modules are top level modules, imported from the directory of the Lambda
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
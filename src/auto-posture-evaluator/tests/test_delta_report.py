@@ -0,0 +1,53 @@
+from delta_report import DELTA_CHANGED, DELTA_DISAPPEARED, DELTA_NEW, DeltaReporter
+from result_record import ResultContext
+from state_store import FileStateStore
+
+
+def _run(delta_reporter, results):
+    result_context = ResultContext("user", "arn:aws:iam::123456789012:root", "123456789012", "us-east-1")
+    delta_filter = delta_reporter.create_filter("123456789012", "s3", "us-east-1", result_context)
+    sent = [result for result in delta_filter.filter(
+        [result_context.new_result(item, "s3_bucket", test_name, test_result)
+         for item, test_name, test_result in results])]
+    return delta_filter, sent
+
+
+def test_results_are_sent_when_they_change(tmp_path):
+    delta_reporter = DeltaReporter(FileStateStore(str(tmp_path)))
+    delta_filter, sent = _run(delta_reporter, [("bucket-a", "encryption", "issue_found"),
+                                               ("bucket-b", "encryption", "no_issue_found")])
+    assert [result.additional_data["delta"] for result in sent if result.item_type == "s3_bucket"] == \
+        [DELTA_NEW, DELTA_NEW]
+    delta_reporter.save("123456789012", "s3", "us-east-1", delta_filter)
+
+    delta_filter, sent = _run(delta_reporter, [("bucket-a", "encryption", "no_issue_found")])
+    deltas = {result.item: result.additional_data["delta"] for result in sent if result.item_type == "s3_bucket"}
+    assert deltas == {"bucket-a": DELTA_CHANGED, "bucket-b": DELTA_DISAPPEARED}
+    assert delta_filter.unchanged == 0
+
+
+def test_unsaved_baseline_sends_the_results_again(tmp_path):
+    delta_reporter = DeltaReporter(FileStateStore(str(tmp_path)))
+    _run(delta_reporter, [("bucket-a", "encryption", "issue_found")])
+    # The batches failed, the baseline was not saved
+    delta_filter, sent = _run(delta_reporter, [("bucket-a", "encryption", "issue_found")])
+    assert [result.additional_data["delta"] for result in sent if result.item_type == "s3_bucket"] == [DELTA_NEW]
+
+
+def test_names_with_tabs_round_trip(tmp_path):
+    delta_reporter = DeltaReporter(FileStateStore(str(tmp_path)))
+    delta_filter, _ = _run(delta_reporter, [("bucket\twith\ttabs", "test\tname", "issue_found")])
+    delta_reporter.save("123456789012", "s3", "us-east-1", delta_filter)
+
+    delta_filter, sent = _run(delta_reporter, [])
+    disappeared = [result for result in sent if result.item_type == "s3_bucket"]
+    assert [(result.item, result.test_name) for result in disappeared] == [("bucket\twith\ttabs", "test\tname")]
+    assert disappeared[0].additional_data["delta"] == DELTA_DISAPPEARED
+
+
+def test_summary_results_are_about_the_tester(tmp_path):
+    delta_reporter = DeltaReporter(FileStateStore(str(tmp_path)))
+    _, sent = _run(delta_reporter, [("bucket-a", "encryption", "issue_found")])
+    summaries = [result for result in sent if result.item_type == "delta_summary"]
+    assert [(result.item, result.test_name) for result in summaries] == [("s3/us-east-1", "encryption")]
+    assert summaries[0].additional_data["failed"] == 1
@@ -0,0 +1,145 @@
+import datetime as dt
+
+import betterproto
+import pytest
+
+from auto_posture_evaluator import _encode_record, _encode_result, _to_model
+from model import SecurityReport, SecurityReportContext, SecurityReportTestResultResult
+from model.encoder import EncodedSecurityReport, encode_end_time, encode_report_context, encode_start_time
+from result_record import ResultContext
+
+START = dt.datetime(2022, 1, 1, 0, 0, 0, 123456)
+END = dt.datetime(2022, 1, 1, 0, 5)
+
+CONTEXT = SecurityReportContext(provider="aws", service="s3", execution_id="00000000-0000-0000-0000-000000000000",
+                                application_name="application", computer_name="computer", subsystem_name="subsystem")
+
+
+def _result(**fields) -> dict:
+    result = {"user": "AIDAEXAMPLEUSERID", "account_arn": "arn:aws:iam::123456789012:user/evaluator",
+              "account": "123456789012", "timestamp": 1650000000.5, "item": "bucket", "item_type": "s3_bucket",
+              "test_name": "s3_bucket_acl", "test_result": "issue_found", "region": "us-east-1"}
+    result.update(fields)
+    return result
+
+
+def _betterproto(results: list, context=CONTEXT, start=START, end=END) -> bytes:
+    return bytes(SecurityReport(context=context, test_results=[_to_model(dict(result), start, end)
+                                                               for result in results]))
+
+
+def _encoded(results: list, context=CONTEXT, start=START, end=END) -> bytes:
+    start_time_field = encode_start_time(start)
+    return bytes(EncodedSecurityReport(encode_report_context(context),
+                                       [_encode_result(dict(result), start_time_field) for result in results],
+                                       encode_end_time(end)))
+
+
+def _python_value(value):
+    kind, content = betterproto.which_one_of(value, "kind")
+    if kind == "struct_value":
+        return _python_struct(content)
+    if kind == "list_value":
+        return [_python_value(item) for item in content.values]
+    if kind == "null_value":
+        return None
+    return content
+
+
+def _python_struct(struct) -> dict:
+    return {key: _python_value(value) for key, value in struct.fields.items()}
+
+
+CASES = {
+    "empty strings": _result(item="", item_type="", test_name="", test_result="no_issue_found"),
+    "none fields": _result(item=None, item_type=None, test_name=None),
+    "falsy extras": _result(zero=0, false=False, empty_list=[], empty_dict={}, none=None, empty="", some="x"),
+    "nested": _result(nested={"": "empty key", "list": [1, "a", None, {"k": [True, {}]}, [], dt.datetime(2021, 1, 1)],
+                              "deep": {"deeper": {"deepest": ""}}, "int_keys": {1: "a", 2: "b"}}),
+    "non ascii": _result(item="ŝẗŕĩñğ ☃", test_name="тест", detail="日本語 \U0001F512", **{"ключ": "значение"}),
+    "numbers": _result(big=2 ** 60, huge=2 ** 64 + 1, negative=-12, float=3.25, tiny=1e-300, true=True,
+                       nan_like=float("inf")),
+    "datetime": _result(when=dt.datetime(2022, 3, 4, 5, 6, 7, 891011)),
+}
+
+
+@pytest.mark.parametrize("name", sorted(CASES))
+def test_encoding_is_byte_identical(name):
+    assert _encoded([CASES[name]]) == _betterproto([CASES[name]])
+
+
+def test_batch_of_every_case_is_byte_identical():
+    results = [CASES[name] for name in sorted(CASES)] * 3
+    assert _encoded(results) == _betterproto(results)
+
+
+@pytest.mark.parametrize("start, end", [
+    (START, END),
+    (dt.datetime.fromtimestamp(0, dt.timezone.utc), dt.datetime.fromtimestamp(0, dt.timezone.utc)),
+    (dt.datetime(2022, 1, 1, 0, 0, 0, 999999), dt.datetime(2038, 1, 19, 3, 14, 8)),
+])
+def test_timestamp_fields_are_byte_identical(start, end):
+    results = [CASES["numbers"], CASES["none fields"]]
+    assert _encoded(results, start=start, end=end) == _betterproto(results, start=start, end=end)
+
+
+def test_empty_report_is_byte_identical():
+    assert _encoded([], context=SecurityReportContext()) == bytes(SecurityReport(context=SecurityReportContext()))
+    assert _encoded([]) == _betterproto([])
+
+
+def test_encoding_decodes_back():
+    result = CASES["nested"]
+    report = SecurityReport().parse(_encoded([CASES["non ascii"], result]))
+    assert report.context == CONTEXT
+    non_ascii, nested = report.test_results
+    assert (non_ascii.name, non_ascii.item, non_ascii.item_type) == ("тест", "ŝẗŕĩñğ ☃", "s3_bucket")
+    assert non_ascii.result == SecurityReportTestResultResult.TEST_FAILED
+    assert _python_struct(non_ascii.additional_data)["ключ"] == "значение"
+    assert _python_struct(non_ascii.additional_data)["detail"] == "日本語 \U0001F512"
+    assert nested.start_time == START.astimezone(dt.timezone.utc)
+    assert nested.end_time == END.astimezone(dt.timezone.utc)
+    additional_data = _python_struct(nested.additional_data)
+    assert additional_data["nested"] == {"": "empty key", "list": [1.0, "a", None, {"k": [1.0, None]}, [],
+                                                                  "2021-01-01T00:00:00"],
+                                         "deep": {"deeper": {"deepest": ""}}, "int_keys": None}
+    assert additional_data["account"] == "123456789012"
+    assert additional_data["timestamp"] == 1650000000.5
+
+
+def test_numbers_decode_back_as_doubles():
+    report = SecurityReport().parse(_encoded([CASES["numbers"]]))
+    additional_data = _python_struct(report.test_results[0].additional_data)
+    assert additional_data["big"] == float(2 ** 60)
+    assert additional_data["huge"] == float(2 ** 64 + 1)
+    assert additional_data["negative"] == -12.0
+    assert additional_data["float"] == 3.25
+    assert additional_data["tiny"] == 1e-300
+    assert additional_data["true"] == 1.0
+    assert additional_data["nan_like"] == float("inf")
+
+
+def test_records_sharing_a_context_encode_like_dicts():
+    # The account fields of a context are encoded once and reused by every result of it
+    result_context = ResultContext("AIDAEXAMPLEUSERID", "arn:aws:iam::123456789012:user/evaluator", "123456789012")
+    start_time_field = encode_start_time(START)
+    encoded_contexts = {}
+    for index, extras in enumerate([{}, {"grants": [{"grantee": "AllUsers", "count": 3}]}, {"unicode": "☃"}]):
+        result = _result(item="bucket-" + str(index), **extras)
+        record = result_context.new_result(result["item"], result["item_type"], result["test_name"],
+                                           result["test_result"], region=result["region"], **extras)
+        record.timestamp = result["timestamp"]
+        assert _encode_record(record, start_time_field, encoded_contexts).encode(b"") == \
+            _encode_result(dict(result), start_time_field).encode(b"")
+    assert list(encoded_contexts) == [result_context]
+
+
+def test_split_reports_reuse_the_encoded_fields():
+    results = [CASES[name] for name in sorted(CASES)]
+    start_time_field = encode_start_time(START)
+    report = EncodedSecurityReport(encode_report_context(CONTEXT),
+                                   [_encode_result(dict(result), start_time_field) for result in results],
+                                   encode_end_time(END))
+    first, second = report.split()
+    assert bytes(first) == _betterproto(results[:len(results) // 2])
+    assert bytes(second) == _betterproto(results[len(results) // 2:])
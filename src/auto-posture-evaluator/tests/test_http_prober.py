@@ -0,0 +1,161 @@
+import collections
+import http.server
+import threading
+import time
+
+import pytest
+
+from http_prober import HttpProber
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    def do_HEAD(self):
+        server = self.server
+        with server.lock:
+            server.requests[self.path] += 1
+            attempt = server.requests[self.path]
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            if self.path.startswith("/slow"):
+                time.sleep(1)
+            elif self.path.startswith("/busy"):
+                time.sleep(0.1)
+            elif self.path.startswith("/reset") and attempt == 1:
+                # Closed without an answer, the client sees the connection drop
+                self.close_connection = True
+                return
+            if self.path.startswith("/unavailable") or (self.path.startswith("/flaky") and attempt == 1):
+                self.send_response(503)
+            else:
+                self.send_response(200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+class _Server(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 64
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.lock = threading.Lock()
+        self.requests = collections.Counter()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def url(self, path: str) -> str:
+        return "http://127.0.0.1:" + str(self.server_address[1]) + path
+
+
+@pytest.fixture
+def server():
+    server = _Server()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_timeout_is_reported_as_unreachable(server):
+    prober = HttpProber(read_timeout=0.2, retries=1, backoff_factor=0.01)
+    started = time.monotonic()
+    assert prober.probe(server.url("/slow")) is None
+    assert time.monotonic() - started < 0.9
+    assert server.requests["/slow"] == 2
+    prober.close()
+
+
+def test_transient_status_is_retried(server):
+    prober = HttpProber(retries=2, backoff_factor=0.01)
+    assert prober.probe(server.url("/flaky")) == 200
+    assert server.requests["/flaky"] == 2
+    prober.close()
+
+
+def test_last_status_is_kept_once_retries_are_exhausted(server):
+    prober = HttpProber(retries=2, backoff_factor=0.01)
+    assert prober.probe(server.url("/unavailable")) == 503
+    assert server.requests["/unavailable"] == 3
+    prober.close()
+
+
+def test_connection_reset_is_retried(server):
+    prober = HttpProber(retries=2, backoff_factor=0.01)
+    assert prober.probe(server.url("/reset")) == 200
+    assert server.requests["/reset"] == 2
+    prober.close()
+
+
+def test_concurrency_is_bounded(server):
+    prober = HttpProber(max_workers=3)
+    urls = [server.url("/busy/" + str(index)) for index in range(12)]
+    # Two callers at the same time share the bound
+    callers = [threading.Thread(target=prober.probe_all, args=(urls[index::2],)) for index in range(2)]
+    for caller in callers:
+        caller.start()
+    for caller in callers:
+        caller.join()
+    assert server.max_in_flight <= 3
+    assert sum(server.requests.values()) == 12
+    prober.close()
+
+
+def test_each_url_is_probed_once(server):
+    prober = HttpProber(max_workers=4)
+    url = server.url("/busy/shared")
+    results = []
+    callers = [threading.Thread(target=lambda: results.append(prober.probe_all([url] * 5))) for _ in range(4)]
+    for caller in callers:
+        caller.start()
+    for caller in callers:
+        caller.join()
+    assert results == [{url: 200}] * 4
+    assert server.requests["/busy/shared"] == 1
+    prober.close()
+
+
+def test_backoff_does_not_hold_a_slot(server):
+    prober = HttpProber(max_workers=1, retries=1, backoff_factor=1)
+    backing_off = threading.Thread(target=prober.probe, args=(server.url("/unavailable"),))
+    backing_off.start()
+    time.sleep(0.2)
+    started = time.monotonic()
+    assert prober.probe(server.url("/ok")) == 200
+    assert time.monotonic() - started < 0.5
+    backing_off.join()
+    prober.close()
+
+
+def test_close_releases_the_pool(server):
+    prober = HttpProber()
+    prober.probe_all([server.url("/ok")])
+    prober.close()
+    assert prober._executor is None
+
+
+def test_prefetched_urls_are_not_probed_again(server):
+    prober = HttpProber(max_workers=2)
+    urls = [server.url("/busy/prefetched-" + str(index)) for index in range(4)]
+    prober.prefetch(urls)
+    assert [prober.probe(url) for url in urls] == [200] * 4
+    assert sum(server.requests.values()) == 4
+    prober.close()
+
+
+def test_close_drops_the_queued_prefetches(server):
+    prober = HttpProber(max_workers=1, read_timeout=2)
+    prober.prefetch([server.url("/slow/" + str(index)) for index in range(10)])
+    time.sleep(0.1)
+    started = time.monotonic()
+    prober.close()
+    # Only the probes already running are waited for, not the 10 seconds of the whole queue
+    assert time.monotonic() - started < 2.5
+    assert sum(server.requests.values()) <= 2
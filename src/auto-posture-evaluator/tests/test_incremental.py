@@ -0,0 +1,97 @@
+import interfaces
+from incremental import MODE_REEMIT, MODE_SUPPRESS, IncrementalEvaluator
+from result_record import ResultContext
+from state_store import FileStateStore
+
+WORK_ITEM_KEY = "emr_tester:us-east-1"
+
+
+def _result_context() -> ResultContext:
+    return ResultContext("user", "arn:aws:iam::123456789012:root", "123456789012", "us-east-1")
+
+
+class _Tester(interfaces.TesterInterface):
+    resource_tests = ['emr_logs']
+
+    def __init__(self, clusters: list):
+        self.clusters = clusters
+        self.result_context = _result_context()
+        self.evaluated_clusters = None
+
+    def declare_tested_service(self) -> str:
+        return "emr"
+
+    def declare_tested_provider(self) -> str:
+        return "aws"
+
+    def resource_fingerprints(self) -> dict:
+        return {cluster['Id']: cluster for cluster in self.clusters}
+
+    def run_tests(self) -> list:
+        self.evaluated_clusters = self.select_evaluated(self.clusters, 'Id')
+        results = [self.result_context.new_result(cluster['Id'], "emr_cluster", "emr_logs",
+                                                  "issue_found" if cluster.get('LogUri') is None else "no_issue_found",
+                                                  detail="x")
+                   for cluster in self.evaluated_clusters]
+        # A region test, never reused
+        results.append(self.result_context.new_result("us-east-1", "emr_region", "emr_region_test", "no_issue_found"))
+        return results
+
+
+def _run(tmp_path, clusters: list, mode: str = MODE_REEMIT, max_age_seconds: float = 86400):
+    incremental = IncrementalEvaluator(FileStateStore(str(tmp_path)), mode, max_age_seconds)
+    tester = _Tester(clusters)
+    incremental_tester = incremental.wrap(WORK_ITEM_KEY, tester, _result_context())
+    results = [(result.item, result.test_name, result.test_result, result.additional_data)
+               for result in incremental_tester.run_tests()]
+    incremental.save(WORK_ITEM_KEY, incremental_tester)
+    return tester, results
+
+
+def test_unchanged_resources_reuse_their_results(tmp_path):
+    _, first_results = _run(tmp_path, [{'Id': 'j-1'}, {'Id': 'j-2', 'LogUri': 's3://logs'}])
+    tester, results = _run(tmp_path, [{'Id': 'j-1'}, {'Id': 'j-2', 'LogUri': 's3://logs'}])
+    assert tester.evaluated_clusters == []
+    assert sorted(results) == sorted(first_results)
+    assert ("j-1", "emr_logs", "issue_found", {"detail": "x"}) in results
+
+
+def test_changed_and_new_resources_are_evaluated(tmp_path):
+    _run(tmp_path, [{'Id': 'j-1'}, {'Id': 'j-2'}])
+    tester, results = _run(tmp_path, [{'Id': 'j-1'}, {'Id': 'j-2', 'LogUri': 's3://logs'}, {'Id': 'j-3'}])
+    assert [cluster['Id'] for cluster in tester.evaluated_clusters] == ['j-2', 'j-3']
+    assert sorted(item for item, test_name, _, _ in results if test_name == "emr_logs") == ['j-1', 'j-2', 'j-3']
+    assert ("j-2", "emr_logs", "no_issue_found", {"detail": "x"}) in results
+
+
+def test_suppress_mode_emits_nothing_for_unchanged_resources(tmp_path):
+    _run(tmp_path, [{'Id': 'j-1'}], MODE_SUPPRESS)
+    tester, results = _run(tmp_path, [{'Id': 'j-1'}, {'Id': 'j-2'}], MODE_SUPPRESS)
+    assert [cluster['Id'] for cluster in tester.evaluated_clusters] == ['j-2']
+    assert [(item, test_name) for item, test_name, _, _ in results] == \
+        [("j-2", "emr_logs"), ("us-east-1", "emr_region_test")]
+    # The unchanged resource keeps its stored results for a later re-emit run
+    _, results = _run(tmp_path, [{'Id': 'j-1'}, {'Id': 'j-2'}], MODE_REEMIT)
+    assert sorted(item for item, test_name, _, _ in results if test_name == "emr_logs") == ['j-1', 'j-2']
+
+
+def test_expired_evaluations_are_evaluated_again(tmp_path):
+    _run(tmp_path, [{'Id': 'j-1'}], max_age_seconds=-1)
+    tester, _ = _run(tmp_path, [{'Id': 'j-1'}], max_age_seconds=-1)
+    assert [cluster['Id'] for cluster in tester.evaluated_clusters] == ['j-1']
+
+
+def test_unstorable_results_are_not_saved(tmp_path):
+    incremental = IncrementalEvaluator(FileStateStore(str(tmp_path)), MODE_REEMIT)
+    incremental_tester = incremental.wrap(WORK_ITEM_KEY, _Tester([{'Id': 'j-1'}]), _result_context())
+    incremental_tester.results = {"j-1": [{"dict": {"item": object()}}]}
+    incremental.save(WORK_ITEM_KEY, incremental_tester)
+    assert FileStateStore(str(tmp_path)).load("incremental-" + WORK_ITEM_KEY) is None
+
+
+def test_select_evaluated_keeps_every_resource_by_default():
+    tester = _Tester([])
+    resources = [{'Id': 'j-1'}, {'Id': 'j-2'}]
+    assert tester.select_evaluated(resources, 'Id') == resources
+    tester.evaluated_resources = {'j-2'}
+    assert tester.select_evaluated(resources, 'Id') == [{'Id': 'j-2'}]
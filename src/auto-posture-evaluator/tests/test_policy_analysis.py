@@ -0,0 +1,34 @@
+import json
+
+from policy_analysis import analyze_policy
+
+POLICY = json.dumps({
+    "Version": "2012-10-17",
+    "Statement": [
+        {"Effect": "Allow", "Principal": "*", "Action": "s3:GetObject", "Resource": "arn:aws:s3:::bucket/*"},
+        {"Effect": "Allow", "Principal": {"AWS": "arn:aws:iam::123456789012:root"}, "Action": ["s3:List*"],
+         "Resource": "arn:aws:s3:::bucket", "Condition": {"StringEquals": {"aws:SourceVpce": "vpce-1"}}},
+    ]
+})
+
+
+def test_grants_by_principal_and_condition():
+    policy = analyze_policy(POLICY)
+    assert policy.grants("s3:GetObject", anonymous=True)
+    assert policy.grants("s3:Get*", anonymous=True, unconditional=True)
+    assert not policy.grants("s3:ListBucket", anonymous=True)
+    assert policy.grants("s3:ListBucket", anonymous=False)
+    assert not policy.grants("s3:ListBucket", anonymous=False, unconditional=True)
+    assert policy.principal_accounts() == {"123456789012"}
+
+
+def test_analyses_are_shared_by_text():
+    assert analyze_policy(POLICY) is analyze_policy(POLICY)
+
+
+def test_copied_documents_leave_the_shared_analysis_unchanged():
+    document = analyze_policy(POLICY).copy_document()
+    document["Statement"][0]["Effect"] = "Deny"
+    document["Statement"].clear()
+    assert analyze_policy(POLICY).document == json.loads(POLICY)
+    assert analyze_policy(POLICY).grants("s3:GetObject", anonymous=True)
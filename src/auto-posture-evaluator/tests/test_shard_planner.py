@@ -0,0 +1,60 @@
+import collections
+
+from scheduler import WorkItem
+from shard_planner import DURATIONS_DOCUMENT, DurationHistory, ShardPlanner
+from state_store import FileStateStore
+
+SERVICES = ['s3_tester', 'iam_tester', 'ec2_tester', 'sqs_tester', 'sns_tester', 'kms_tester', 'rds_tester']
+REGIONS = ['us-east-1', 'eu-west-1', 'ap-south-1']
+
+
+def _work_items() -> list:
+    work_items = []
+    for service in SERVICES:
+        tester = type(service, (), {'__module__': 'testers.' + service})
+        for region in REGIONS:
+            work_items.append(WorkItem(tester, region))
+    return work_items
+
+
+def _local_store(directory, seconds_by_service: dict) -> FileStateStore:
+    state_store = FileStateStore(str(directory))
+    history = DurationHistory()
+    for work_item in _work_items():
+        history.record(work_item.key, seconds_by_service.get(work_item.service, 1.0), "previous-execution")
+    history.save(state_store, DURATIONS_DOCUMENT)
+    return state_store
+
+
+def _independent_shard(state_store, shard_index: int, shard_count: int) -> list:
+    history = DurationHistory.load(state_store, shard_count)
+    planner = ShardPlanner.for_independent_shards(shard_count, state_store, history, "execution")
+    return [work_item.key for work_item in planner.plan(_work_items())[shard_index].work_items]
+
+
+def test_local_histories_plan_differently(tmp_path):
+    first_store = _local_store(tmp_path / "first", {'s3_tester': 60.0, 'kms_tester': 0.1})
+    second_store = _local_store(tmp_path / "second", {'s3_tester': 0.1, 'kms_tester': 60.0})
+    first_plan = ShardPlanner(2, DurationHistory.load(first_store, 2), "execution").plan(_work_items())
+    second_plan = ShardPlanner(2, DurationHistory.load(second_store, 2), "execution").plan(_work_items())
+    assert [work_item.key for work_item in first_plan[0].work_items] != \
+        [work_item.key for work_item in second_plan[0].work_items]
+
+
+def test_independent_shards_with_local_histories_cover_each_item_once(tmp_path):
+    shard_count = 2
+    stores = [_local_store(tmp_path / "first", {'s3_tester': 60.0, 'kms_tester': 0.1}),
+              _local_store(tmp_path / "second", {'s3_tester': 0.1, 'kms_tester': 60.0})]
+    runs = collections.Counter()
+    for shard_index in range(shard_count):
+        runs.update(_independent_shard(stores[shard_index], shard_index, shard_count))
+    assert sorted(runs) == sorted(work_item.key for work_item in _work_items())
+    assert set(runs.values()) == {1}
+
+
+def test_shared_store_plans_from_the_recorded_durations(tmp_path):
+    state_store = _local_store(tmp_path, {'kms_tester': 60.0})
+    state_store.shared = True
+    planner = ShardPlanner.for_independent_shards(2, state_store, DurationHistory.load(state_store, 2), "execution")
+    estimates = planner.estimate(_work_items())
+    assert estimates["kms_tester:us-east-1"] == 60.0
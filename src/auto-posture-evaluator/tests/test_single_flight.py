@@ -0,0 +1,135 @@
+import threading
+import time
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+class _NotFound(Exception):
+    pass
+
+
+class _Throttled(Exception):
+    pass
+
+
+def test_concurrent_callers_share_one_computation():
+    single_flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    computations = []
+
+    def compute():
+        computations.append(1)
+        started.set()
+        release.wait(5)
+        return "value"
+
+    values = []
+    callers = [threading.Thread(target=lambda: values.append(single_flight.get("key", compute))) for _ in range(8)]
+    callers[0].start()
+    started.wait(5)
+    for caller in callers[1:]:
+        caller.start()
+    # The followers are waiting on the leader's computation
+    time.sleep(0.1)
+    release.set()
+    for caller in callers:
+        caller.join()
+    assert values == ["value"] * 8
+    assert len(computations) == 1
+    assert single_flight.stats() == {"hits": 7, "misses": 1, "evictions": 0, "size": 1}
+
+
+def test_concurrent_callers_share_a_failure():
+    single_flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def compute():
+        started.set()
+        release.wait(5)
+        raise _Throttled("slow down")
+
+    errors = []
+
+    def call():
+        try:
+            single_flight.get("key", compute)
+        except _Throttled as ex:
+            errors.append(ex)
+
+    callers = [threading.Thread(target=call) for _ in range(4)]
+    callers[0].start()
+    started.wait(5)
+    for caller in callers[1:]:
+        caller.start()
+    time.sleep(0.1)
+    release.set()
+    for caller in callers:
+        caller.join()
+    assert len(errors) == 4
+
+
+def test_errors_are_computed_again_unless_cached():
+    single_flight = SingleFlight(cache_error=lambda ex: isinstance(ex, _NotFound))
+    calls = []
+
+    def throttled():
+        calls.append("throttled")
+        raise _Throttled()
+
+    def not_found():
+        calls.append("not_found")
+        raise _NotFound()
+
+    for _ in range(2):
+        with pytest.raises(_Throttled):
+            single_flight.get("throttled", throttled)
+        with pytest.raises(_NotFound):
+            single_flight.get("missing", not_found)
+    assert calls == ["throttled", "not_found", "throttled"]
+    # Memoized errors are not values
+    assert "missing" not in single_flight
+    assert single_flight.items() == []
+    assert single_flight.stats() == {"hits": 1, "misses": 3, "evictions": 0, "size": 1}
+
+
+def test_entries_expire_after_the_ttl():
+    single_flight = SingleFlight(ttl_seconds=0.05)
+    values = iter(["first", "second"])
+    assert single_flight.get("key", lambda: next(values)) == "first"
+    assert single_flight.get("key", lambda: next(values)) == "first"
+    assert "key" in single_flight
+    time.sleep(0.1)
+    assert "key" not in single_flight
+    assert single_flight.items() == []
+    assert single_flight.get("key", lambda: next(values)) == "second"
+    assert single_flight.stats() == {"hits": 1, "misses": 2, "evictions": 1, "size": 1}
+
+
+def test_cached_errors_expire_after_the_ttl():
+    single_flight = SingleFlight(ttl_seconds=0.05, cache_error=lambda ex: True)
+
+    def fail():
+        raise _NotFound()
+
+    with pytest.raises(_NotFound):
+        single_flight.get("key", fail)
+    with pytest.raises(_NotFound):
+        single_flight.get("key", lambda: "never computed")
+    time.sleep(0.1)
+    assert single_flight.get("key", lambda: "value") == "value"
+
+
+def test_least_recently_used_entry_is_evicted_at_max_size():
+    single_flight = SingleFlight(max_size=2)
+    single_flight.get("a", lambda: 1)
+    single_flight.get("b", lambda: 2)
+    # "a" becomes the most recently used, "b" is evicted by "c"
+    single_flight.get("a", lambda: 0)
+    single_flight.get("c", lambda: 3)
+    assert sorted(single_flight.items()) == [("a", 1), ("c", 3)]
+    assert single_flight.get("b", lambda: 20) == 20
+    assert single_flight.stats() == {"hits": 1, "misses": 4, "evictions": 2, "size": 2}